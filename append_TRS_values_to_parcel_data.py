@@ -20,15 +20,13 @@
 
 
 # Import modules and packages
-import arcpy,os,time,datetime,copy                                                          # necessary modules
+import os,time,datetime,copy                                                                # necessary modules
+from arcpy_runtime import arcpy                                                             # arcpy is imported when the first tool is called (see arcpy_runtime.py)
+import stage_tracing,streaming_writer                                                       # stage spans with timing, memory, and feature counts; streamed copies
 from datetime import date, timedelta                                                        # extract submodules
-from arcpy import env                                                                       # extract submodules
-from arcpy.sa import *                                                                      # import the Spatial Analyst toolbar
-arcpy.CheckOutExtension("Spatial")                                                          # check out the Spatial Analyst toolbar
 
 # Date Management
 
-start_time = time.time()                                                                    # define the start time of the script
 today = date.today()                                                                        # define the date of the script's run
 today_year = today.year                                                                     # define the year of the script's run
 today_month = today.month                                                                   # define the month of the script's run
@@ -44,72 +42,136 @@ Parcel_Data = r"*folderpath*\ParcelProcessing.gdb\Input_Parcel_Data"
 PLS_Section = r"*folderpath*\pls_sect_data"                                                 # define location of feature class with TRS information
 Parcel_Processing_GDB = r"*folderpath*\ParcelProcessing.gdb"                                # define location of geodatabase in which product will be sent
 
-# Set up feature layers and add appropriate field
-
-arcpy.MakeFeatureLayer_management(Parcel_Data, "Parcel_Data")                                               # make a temporary layer for the input data
-arcpy.MakeFeatureLayer_management(PLS_Section, "PLS_Section")                                               # make a temporary layer for the feature class with TRS info
-
-Parcel_Data_Addition = os.path.join(Parcel_Processing_GDB, 'Parcel_Data_Addition'+'_' + today_full_str)     # set up a path for the shapefile which will have the new field
-
-# Select only the features that are above a certain size
-#   This 'Threshold' value is up to the user. Some parcels are so small that they
-#   may not be worth investigating. If unnecessary, adjust the script to skip this step.  
-Threshold = 8093.71                                                                                         # square meters for 1 acre: 4046.86, sq m for 2 acres: 8093.71
-Size = "Shape_Area >= {}".format(Threshold)                                                                 # set up the expression that will be used to select parcel size
-arcpy.SelectLayerByAttribute_management('Parcel_Data', "NEW_SELECTION", Size)                               # use the 'SelectLayerByAttribute_management' function to select parcels greater than the specified size
-arcpy.CopyFeatures_management('Parcel_Data', Parcel_Data_Addition)                                          # copy the "finalized" product to add the new field to the previously-defined file path
-arcpy.MakeFeatureLayer_management(Parcel_Data_Addition, 'TRS_Add')                                          # make a temporary layer for the input data
-# Add the field
-inFeatures = 'TRS_Add'                                                                                      # define the inFeatures
-fieldName1 = 'TRS'                                                                                          # define the fieldName
-fieldType1 = "TEXT"                                                                                         # define the fieldType
-fieldPrecision1 = ""                                                                                        # define fieldPrecision (in this case, empty)
-fieldScale = ""                                                                                             # define the fieldScale (in this case, empty)
-fieldLength1 = 2000                                                                                         # this may need to be very large to account for multiple intersections
-fieldAlias1 = 'TRS'                                                                                         # define the fieldAlias
-arcpy.management.AddField(inFeatures, fieldName1, fieldType1, fieldPrecision1, fieldScale, fieldLength1, fieldAlias1)   # add the field with the defined attributes
-
-
-print('Adding a new field took %s seconds...' % round(time.time() - start_time))                                 # in case of a large dataset, use this as a benchmark
-print('Initiating addition of TRS values to the new field...')
-# select just the parcels smaller than a certain size
-Expression = "Shape_Area < 11700000"                                                                        # in case of datasets with VERY large parcels, some will have so many intersections that the field of added TRS values will be massive; this reduces the number of parcels slightly to remove the largest from the analysis
-arcpy.SelectLayerByAttribute_management("TRS_Add", "NEW_SELECTION", Expression)                             # select parcels based on the previous expression
-
-parcel_count = int(arcpy.GetCount_management('TRS_Add').getOutput(0))                                       # calculate the number of parcels being edited
-
-
-# Begin nested cursor series
-#   This code block begins an iteration over all polygons within the 'TRS_Add' layer.
-#   The general flow of this nested series is as follows:
-#       1. A 'TRS_Add' polygon is selected based on an iterable expression
-#       2. This selected polygon is used to select all intersecting polygons within the 'PLS_Section' layer
-#       3. A FOR loop produces a string of all values from the 'TRS_SEARCH' field within the 'PLS_Section' polygons
-#           A) This string is saved to a variable
-#       4. An UpdateCursor class is called to update the 'TRS' field within the 'TRS_Add' polygon from the first step
-#       5. The initial loop repeats until it completes all rows of the initial SearchCursor
-n = int(0)                                                                                                  # set the start value of the rows
-with arcpy.da.SearchCursor("TRS_Add", ['OBJECTID']) as cursor:                                              # start an iteration with SearchCursor
-    for entry in cursor:                                                                                    # iterate with the 'OBJECT_List' list entries
-        n += 1                                                                                              # add integer value of 1 to every prior value of 'n' within this code block
-        Expression = "OBJECTID = {}".format(entry[0])                                                       # set up an iterable expression with the first value of the entry (the value in the row in the field 'OBJECTID')
-        stringA = ''                                                                                        # set up an empty string for the expression
-        arcpy.SelectLayerByAttribute_management("TRS_Add", "NEW_SELECTION", Expression)                     # use the 'SelectLayerByAttribute_management' function with the 'TRS_Add' layer for "NEW_SELECTION" with the expression defined previously
-        arcpy.SelectLayerByLocation_management("PLS_Section", "INTERSECT", "TRS_Add", "", "NEW_SELECTION")  # use the 'SelectLayerByLocation_management' function to select from 'PLS_Section' layer for all features that intersect selected features within 'TRS_Add'
-        with arcpy.da.SearchCursor("PLS_Section", ['OBJECTID', 'TRS_SEARCH']) as cursor2:                   # utilize a second, nested SearchCursor to iterate over the 'PLS_Section' layer according to 'OBJECTID' and 'TRS_SEARCH' fields
-            for row in cursor2:                                                                             # set up a FOR loop to investigate each row within the cursor2
-                str_row1 = str(row[1])                                                                      # convert the data in the second field within the row to be a string value
-                stringA = stringA + ", " + str_row1                                                         # add each iteration of str_row1 to the stringA string; while running in Python window in ArcMap 10.8, this needed "str_row[3:-3]" for some reason
-                stringB = stringA[2:]                                                                       # remove the ", " from the start of stringA once it has completed its loop
-                #print(type(stringB))                                                                       # print the statement to the terminal, if desired
-            print(n,"of {}:".format(parcel_count), stringB)                                                 # print a statement to the terminal with the index value of the rows in 'TRS_Add' and the data that will be added to the new 'TRS' field
-        with arcpy.da.UpdateCursor("TRS_Add", ['TRS']) as cursor3:                                          # set up an UpdateCursor to update the 'TRS' field by iterating over the 'TRS_Add' feature class
-            for row3 in cursor3:                                                                            # set up a FOR loop to investigate each row within cursor3
-                row3[0] = stringB                                                                           # define the value of the entry that will be added to the row (as of 2 December 2022, removed the str(stringB) because it was already a string value)
-                #print(row3)                                                                                # print the entry to be added to the terminal, if desired
-                cursor3.updateRow(row3)                                                                     # update the current row in the table according to stringB
-
-arcpy.SelectLayerByAttribute_management("TRS_Add", "CLEAR_SELECTION")                                       # clear the selection on 'TRS_Add'
-
-# Display time taken just for fun:
-print('This script took %s seconds...' % round(time.time() - start_time))                                   # print the statement on time taken to the terminal
+# Processing Mode
+#   'bulk' reads the PLS sections into a spatial index once and joins every parcel in a single pass (see trs_spatial_join.py)
+#   'parallel' runs the bulk join in worker processes, one township/range tile at a time, with a checkpoint per tile (see trs_parallel.py)
+#   'incremental' only intersects parcels that are new or whose geometry changed since the last run, reusing cached TRS values for the rest (see trs_incremental.py)
+#   'loop' runs the original per-parcel selection loop
+TRS_Mode = 'bulk'                                                                           # define how TRS values will be found
+TRS_Workers = None                                                                          # number of worker processes for the 'parallel' mode (None uses every core)
+TRS_Fingerprints = os.path.join(os.path.dirname(Parcel_Processing_GDB), 'TRS_Fingerprints.sqlite')       # define the location of the fingerprint store kept between runs for the 'incremental' mode
+Parcel_ID_Field = 'PIN'                                                                     # define the field that identifies a parcel from one parcel release to the next
+# Output Options (apply to every mode except 'loop')
+#   'field' writes the 'TRS' text field, 'table' writes a 'Parcel_TRS' table with one row per parcel/section pair, 'both' writes both
+#   With the relation table ('table' or 'both'), the largest parcels are no longer left out of the analysis (their complete values are in the table)
+TRS_Output = 'field'                                                                        # define where TRS values will be written
+TRS_Compact = False                                                                         # set to True to collapse consecutive sections in the 'TRS' field (e.g. 'T45N R12W S1-6')
+TRS_Checkpoints = os.path.join(os.path.dirname(Parcel_Processing_GDB), 'TRS_Checkpoints_' + today_full_str)  # define the folder that holds finished tiles; rerunning on the same day resumes from it
+Copy_Engine = 'arcpy'                                                                       # define how the parcels are copied: 'arcpy' (CopyFeatures_management, which keeps the full schema) or 'streaming' (in batches, see streaming_writer.py)
+Trace_Folder = os.path.join(os.path.dirname(Parcel_Processing_GDB), 'Traces')               # define the folder that receives the JSON trace of each run (None writes no trace)
+Profile_Stages = []                                                                         # define the stages to run under cProfile, e.g. ['join'] ('*' for every stage; see stage_tracing.py)
+Memory_Stages = []                                                                          # define the stages to run under tracemalloc, e.g. ['join'] ('*' for every stage)
+
+
+
+# Produce the parcels with the new TRS field (run when the script is started directly, or by another script that imports it and calls main())
+def main():
+    tracer = stage_tracing.Tracer('trs_values', Trace_Folder, Profile_Stages, Memory_Stages)                # record the time, memory, and feature counts of each stage of the run
+    span = tracer.start('add_field')                                                                        # start the stage span
+    # Set up feature layers and add appropriate field
+
+    arcpy.MakeFeatureLayer_management(Parcel_Data, "Parcel_Data")                                           # make a temporary layer for the input data
+    arcpy.MakeFeatureLayer_management(PLS_Section, "PLS_Section")                                           # make a temporary layer for the feature class with TRS info
+
+    Parcel_Data_Addition = os.path.join(Parcel_Processing_GDB, 'Parcel_Data_Addition'+'_' + today_full_str) # set up a path for the shapefile which will have the new field
+
+    # Select only the features that are above a certain size
+    #   This 'Threshold' value is up to the user. Some parcels are so small that they
+    #   may not be worth investigating. If unnecessary, adjust the script to skip this step.  
+    Threshold = 8093.71                                                                                     # square meters for 1 acre: 4046.86, sq m for 2 acres: 8093.71
+    Size = "Shape_Area >= {}".format(Threshold)                                                             # set up the expression that will be used to select parcel size
+    arcpy.SelectLayerByAttribute_management('Parcel_Data', "NEW_SELECTION", Size)                           # use the 'SelectLayerByAttribute_management' function to select parcels greater than the specified size
+    if Copy_Engine == 'streaming':                                                                          # stream the selected parcels to the new feature class in batches
+        streaming_writer.copy_features('Parcel_Data', Parcel_Data_Addition)                                 # copy the "finalized" product without holding the selection in memory
+    else:                                                                                                   # otherwise use the arcpy copy
+        arcpy.CopyFeatures_management('Parcel_Data', Parcel_Data_Addition)                                  # copy the "finalized" product to add the new field to the previously-defined file path
+    arcpy.MakeFeatureLayer_management(Parcel_Data_Addition, 'TRS_Add')                                      # make a temporary layer for the input data
+    # Add the field
+    inFeatures = 'TRS_Add'                                                                                  # define the inFeatures
+    fieldName1 = 'TRS'                                                                                      # define the fieldName
+    fieldType1 = "TEXT"                                                                                     # define the fieldType
+    fieldPrecision1 = ""                                                                                    # define fieldPrecision (in this case, empty)
+    fieldScale = ""                                                                                         # define the fieldScale (in this case, empty)
+    fieldLength1 = 2000                                                                                     # this may need to be very large to account for multiple intersections
+    fieldAlias1 = 'TRS'                                                                                     # define the fieldAlias
+    arcpy.management.AddField(inFeatures, fieldName1, fieldType1, fieldPrecision1, fieldScale, fieldLength1, fieldAlias1)   # add the field with the defined attributes
+
+
+    span.end(features_out=int(arcpy.GetCount_management('TRS_Add').getOutput(0)))                           # end the stage span with the number of parcels copied
+    print('Initiating addition of TRS values to the new field...')
+    # select just the parcels smaller than a certain size
+    Parcel_Where = None                                                                                     # the same selection as a where clause, for the worker processes of the parallel mode (which cannot see the 'TRS_Add' layer)
+    if TRS_Mode not in ('bulk', 'parallel', 'incremental') or TRS_Output == 'field':                      # only the relation table keeps every section of a parcel whose value is cut to fit the field, so only it can include every parcel
+        Expression = "Shape_Area < 11700000"                                                                # in case of datasets with VERY large parcels, some will have so many intersections that the field of added TRS values will be massive; this reduces the number of parcels slightly to remove the largest from the analysis
+        arcpy.SelectLayerByAttribute_management("TRS_Add", "NEW_SELECTION", Expression)                     # select parcels based on the previous expression
+        Parcel_Where = Expression                                                                           # keep the expression for the parallel mode
+
+    parcel_count = int(arcpy.GetCount_management('TRS_Add').getOutput(0))                                   # calculate the number of parcels being edited
+
+    span = tracer.start('join', features_in=parcel_count)                                                   # start the stage span
+
+
+    if TRS_Mode == 'bulk':                                                                                   # use the bulk spatial join
+        import trs_spatial_join                                                                             # only needed for the bulk mode
+        TRS_Values = trs_spatial_join.join_trs("TRS_Add", "PLS_Section")                                    # build {OBJECTID: [TRS_SEARCH, ...]} for the selected parcels in one pass over an in-memory index of 'PLS_Section'
+        print('Found TRS values for {} of {} parcels.'.format(len(TRS_Values), parcel_count))               # print a statement to the terminal with the number of parcels that intersect 'PLS_Section' polygons
+    elif TRS_Mode == 'parallel':                                                                            # use the bulk spatial join across worker processes
+        import trs_parallel, trs_spatial_join                                                               # only needed for the parallel mode
+        TRS_Values = trs_parallel.join_trs_parallel(Parcel_Data_Addition, PLS_Section, TRS_Checkpoints, Parcel_Where, workers=TRS_Workers) # process each township/range tile in a worker that reads its own parcels, skipping tiles already in the checkpoint folder
+    elif TRS_Mode == 'incremental':                                                                         # recompute only new and changed parcels
+        import trs_incremental, trs_spatial_join                                                            # only needed for the incremental mode
+        TRS_Values, TRS_Changes = trs_incremental.refresh_trs(Parcel_Data_Addition, PLS_Section, TRS_Fingerprints, Parcel_ID_Field, Parcel_Where, run_date=today_full_str) # diff every copied parcel against the fingerprint store, intersect only the added/modified parcels, and keep the values of the selected ones
+    else:                                                                                                   # otherwise use the original nested cursor series
+        # Begin nested cursor series
+        #   This code block begins an iteration over all polygons within the 'TRS_Add' layer.
+        #   The general flow of this nested series is as follows:
+        #       1. A 'TRS_Add' polygon is selected based on an iterable expression
+        #       2. This selected polygon is used to select all intersecting polygons within the 'PLS_Section' layer
+        #       3. A FOR loop produces a string of all values from the 'TRS_SEARCH' field within the 'PLS_Section' polygons
+        #           A) This string is saved to a variable
+        #       4. An UpdateCursor class is called to update the 'TRS' field within the 'TRS_Add' polygon from the first step
+        #       5. The initial loop repeats until it completes all rows of the initial SearchCursor
+        n = int(0)                                                                                              # set the start value of the rows
+        with arcpy.da.SearchCursor("TRS_Add", ['OBJECTID']) as cursor:                                          # start an iteration with SearchCursor
+            for entry in cursor:                                                                                # iterate with the 'OBJECT_List' list entries
+                n += 1                                                                                          # add integer value of 1 to every prior value of 'n' within this code block
+                Expression = "OBJECTID = {}".format(entry[0])                                                   # set up an iterable expression with the first value of the entry (the value in the row in the field 'OBJECTID')
+                stringA = ''                                                                                    # set up an empty string for the expression
+                arcpy.SelectLayerByAttribute_management("TRS_Add", "NEW_SELECTION", Expression)                 # use the 'SelectLayerByAttribute_management' function with the 'TRS_Add' layer for "NEW_SELECTION" with the expression defined previously
+                arcpy.SelectLayerByLocation_management("PLS_Section", "INTERSECT", "TRS_Add", "", "NEW_SELECTION")  # use the 'SelectLayerByLocation_management' function to select from 'PLS_Section' layer for all features that intersect selected features within 'TRS_Add'
+                with arcpy.da.SearchCursor("PLS_Section", ['OBJECTID', 'TRS_SEARCH']) as cursor2:               # utilize a second, nested SearchCursor to iterate over the 'PLS_Section' layer according to 'OBJECTID' and 'TRS_SEARCH' fields
+                    for row in cursor2:                                                                         # set up a FOR loop to investigate each row within the cursor2
+                        str_row1 = str(row[1])                                                                  # convert the data in the second field within the row to be a string value
+                        stringA = stringA + ", " + str_row1                                                     # add each iteration of str_row1 to the stringA string; while running in Python window in ArcMap 10.8, this needed "str_row[3:-3]" for some reason
+                        stringB = stringA[2:]                                                                   # remove the ", " from the start of stringA once it has completed its loop
+                        #print(type(stringB))                                                                       # print the statement to the terminal, if desired
+                    span.progress(n, parcel_count)                                                              # report the progress through the parcels (at most every stage_tracing.PROGRESS_INTERVAL seconds)
+                with arcpy.da.UpdateCursor("TRS_Add", ['TRS']) as cursor3:                                      # set up an UpdateCursor to update the 'TRS' field by iterating over the 'TRS_Add' feature class
+                    for row3 in cursor3:                                                                        # set up a FOR loop to investigate each row within cursor3
+                        row3[0] = stringB                                                                       # define the value of the entry that will be added to the row (as of 2 December 2022, removed the str(stringB) because it was already a string value)
+                        #print(row3)                                                                                # print the entry to be added to the terminal, if desired
+                        cursor3.updateRow(row3)                                                                 # update the current row in the table according to stringB
+
+    span.end(features_out=len(TRS_Values) if TRS_Mode in ('bulk', 'parallel', 'incremental') else n)        # end the stage span with the number of parcels that were given TRS values
+
+    if TRS_Mode in ('bulk', 'parallel', 'incremental'):                                                     # write the results of the bulk modes
+        span = tracer.start('write')                                                                        # start the stage span
+        if TRS_Output in ('table', 'both'):                                                                 # write the parcel-to-TRS relation table
+            Parcel_TRS = os.path.join(Parcel_Processing_GDB, 'Parcel_TRS' + '_' + today_full_str)           # set up a path for the relation table
+            row_count = trs_spatial_join.write_relation_table(Parcel_TRS, TRS_Values)                       # write one row per parcel/section pair with a single InsertCursor
+            print('Wrote {} parcel/section rows to {}.'.format(row_count, Parcel_TRS))                      # print a statement to the terminal with the number of rows in the relation table
+        if TRS_Output in ('field', 'both'):                                                                 # write the 'TRS' field
+            TRS_Field_Values = trs_spatial_join.format_trs_field(TRS_Values, fieldLength1, TRS_Compact)     # compact the values (if requested) and fit them into the field length
+            trs_spatial_join.write_trs("TRS_Add", TRS_Field_Values, fieldName1)                             # write all of the TRS values to the 'TRS' field with a single UpdateCursor
+        print('TRS values written.')                                                                        # print a statement to the terminal indicating the results have been written
+        span.end(features_out=len(TRS_Values))                                                              # end the stage span
+
+    arcpy.SelectLayerByAttribute_management("TRS_Add", "CLEAR_SELECTION")                                   # clear the selection on 'TRS_Add'
+
+    # Display time taken just for fun:
+    tracer.finish()                                                                                         # print the time taken and write the JSON trace of the run
+    return Parcel_Data_Addition                                                                             # return the path of the parcels with the new TRS field to the calling script
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+#-------------------------------------------------------------------------------
+# Name:        arcpy_runtime.py (Lazy arcpy Import)
+# Purpose:      Every production script used to start with 'import arcpy',
+#                   'from arcpy.sa import *', and arcpy.CheckOutExtension("Spatial"),
+#                   although none of them calls a Spatial Analyst tool. Importing arcpy
+#                   takes several seconds, and the checkout fails (or waits) when every
+#                   Spatial Analyst license in the pool is in use.
+#
+#                   'arcpy' from this module stands in for the arcpy package; the package
+#                   is imported the first time one of its tools is used, so runs that only
+#                   touch open-format data never import it. The Spatial Analyst import and
+#                   checkout are dropped altogether.
+#
+#                   The production scripts expose their steps as main(), so that one
+#                   process can import several scripts and run their products one after
+#                   another while importing arcpy only once.
+#
+# Author:      draleigh
+#
+# Created:     18 October 2026
+# Copyright:   (c) draleigh 2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+
+
+# Import modules and packages
+import importlib,threading                                                                  # list of required modules
+
+
+_lock = threading.Lock()                                                                    # guards the import when stages run in threads
+_module = None                                                                              # the arcpy package, once it has been imported
+_missing = False                                                                            # True once the import has failed, so that it is not tried again
+
+
+# Import arcpy (once per process) and return it
+def load():
+    global _module, _missing
+    with _lock:
+        if _module is None:
+            if _missing:
+                raise ImportError('arcpy is not available in this Python environment.')
+            try:
+                _module = importlib.import_module('arcpy')
+            except ImportError:
+                _missing = True
+                raise
+    return _module
+
+
+# True if arcpy can be imported (imports it if it has not been yet)
+def available():
+    try:
+        load()
+    except ImportError:
+        return False
+    return True
+
+
+# True if arcpy has already been imported by this process (never imports it)
+def loaded():
+    return _module is not None
+
+
+# Stand-in for the arcpy package: 'arcpy.CopyFeatures_management(...)' imports arcpy on first use
+class _LazyArcpy(object):
+
+    def __getattr__(self, name):
+        return getattr(load(), name)
+
+    def __repr__(self):
+        return '<arcpy ({})>'.format('loaded' if loaded() else 'not loaded yet')
+
+
+arcpy = _LazyArcpy()
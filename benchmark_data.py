@@ -0,0 +1,263 @@
+#-------------------------------------------------------------------------------
+# Name:        benchmark_data.py (Synthetic Benchmark Data)
+# Purpose:      This module writes a seeded, synthetic stand-in for the statewide
+#                   inputs of the production scripts to a GeoPackage, so that every
+#                   pipeline can be timed (see benchmark_suite.py) without arcpy and
+#                   without the real data:
+#
+#                   'parcels'        - parcel polygons with 'PIN', 'OWNER_NAME', 'TAX_NAME', and 'Shape_Area'
+#                   'pls_sections'   - 1 square mile PLS sections with 'TRS_SEARCH'
+#                   'forest_stands'  - forest stand polygons with 'MN_CTYPE', 'STAND_AGE', and 'SURVEY_YR'
+#                   'work_areas'     - work area polygons with 'AREA_NAME'
+#                   'selector'       - Selector trails (lines) with 'TRAIL_NAME' and 'Requires_Deletion'
+#                   'lakes'          - lake polygons with 'DOWLKNUM'
+#
+#                   The term workbook ('FN_Terms' and 'Public_Terms' sheets) and the lake
+#                   ID workbook ('Test_Lakes' sheet) are written beside the GeoPackage.
+#
+#                   Parcels and forest stands are tessellations of a jittered grid, so that
+#                   neighbouring polygons share their edges (as real parcels do) and the
+#                   dissolves have real work to do. Every row of the grid is generated from
+#                   its own seed, so the layers are streamed to disk a row at a time and
+#                   the same seed always gives the same data, from 10 thousand to 5 million
+#                   parcels.
+#
+# Author:      draleigh
+#
+# Created:     18 October 2026
+# Copyright:   (c) draleigh 2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+
+
+# Import modules and packages
+import os,json,math,time                                                                    # list of required modules
+import numpy as np                                                                          # seeded random numbers and coordinate arrays
+import shapely                                                                              # vectorized geometry construction
+import openpyxl                                                                             # writing the term and lake ID workbooks
+import layer_io                                                                             # shared feature reading/writing helpers
+
+
+GENERATOR_VERSION = 1                                                                       # bump when the generated data changes, so that old copies are regenerated
+SCALES = {'10k': 10000, '100k': 100000, '1m': 1000000, '5m': 5000000}                       # named numbers of parcels (and of forest stands)
+PARCEL_SIZE = 150.0                                                                         # average width of a parcel, in meters
+SECTION_SIZE = 1609.344                                                                     # width of a PLS section (1 mile), in meters
+WORK_AREA_SIZE = 10000.0                                                                    # width of a work area, in meters
+PARCELS_PER_TRAIL = 20000                                                                   # one Selector trail for this many parcels
+PARCELS_PER_LAKE = 200                                                                      # one lake for this many parcels
+LAKE_ID_SHARE = 0.5                                                                         # share of the lakes listed in the lake ID workbook
+
+# Layers of the GeoPackage
+LAYERS = ('parcels', 'pls_sections', 'forest_stands', 'work_areas', 'selector', 'lakes')
+
+# Owner name terms, as in 'First_Nations_Terms.xlsx' and 'Public_Property_Terms.xlsx' (the public terms include the First Nations terms)
+FN_TERMS = ['RED LAKE BAND OF CHIPPEWA INDIANS', 'LEECH LAKE BAND OF OJIBWE', 'WHITE EARTH BAND OF CHIPPEWA',
+            'BOIS FORTE BAND OF CHIPPEWA', 'FOND DU LAC BAND', 'GRAND PORTAGE BAND OF CHIPPEWA',
+            'MILLE LACS BAND OF OJIBWE', 'UNITED STATES IN TRUST', 'MINNESOTA CHIPPEWA TRIBE']
+PUBLIC_TERMS = FN_TERMS + ['STATE OF MINNESOTA', 'STATE OF MN', 'MN DEPT OF NATURAL RESOURCES', 'DEPARTMENT OF NATURAL RESOURCES',
+                           'MN DEPT OF TRANSPORTATION', 'UNITED STATES OF AMERICA', 'USA', 'US FOREST SERVICE',
+                           'US FISH & WILDLIFE SERVICE', 'UNIVERSITY OF MINNESOTA', 'STATE OF MN TAX FORFEIT'] + \
+               ['{} COUNTY'.format(name) for name in ('AITKIN', 'BECKER', 'BELTRAMI', 'CASS', 'CLEARWATER', 'COOK', 'CROW WING',
+                                                      'HUBBARD', 'ITASCA', 'KOOCHICHING', 'LAKE', 'ST LOUIS')] + \
+               ['CITY OF {}'.format(name) for name in ('BEMIDJI', 'BRAINERD', 'DULUTH', 'GRAND RAPIDS', 'INTERNATIONAL FALLS',
+                                                       'PARK RAPIDS', 'VIRGINIA', 'WALKER')]
+SURNAMES = ['ANDERSON', 'JOHNSON', 'OLSON', 'PETERSON', 'NELSON', 'LARSON', 'SMITH', 'HANSON', 'MILLER', 'CARLSON',
+            'SWANSON', 'SCHMIDT', 'JOHNSTON', 'BERG', 'LUND', 'HALVORSON', 'LINDQUIST', 'WAGNER', 'KOCH', 'MEYER']
+GIVEN_NAMES = ['JOHN', 'MARY', 'ROBERT', 'LINDA', 'JAMES', 'KAREN', 'DAVID', 'SUSAN', 'MARK', 'NANCY', 'PAUL', 'JEAN']
+
+# Share of parcels owned by each kind of owner (the rest are private)
+FN_SHARE = 0.02
+PUBLIC_SHARE = 0.18
+UNKNOWN_SHARE = 0.05
+
+# Forest stand cover types: those in forest_stand_rules.csv, and others that the prefilter leaves out
+RULE_CTYPES = [12, 13, 14, 30, 53, 62, 71, 73, 74, 79, 82]
+OTHER_CTYPES = [1, 2, 9, 20, 25, 40, 45, 50, 51, 52, 54, 55, 56, 57, 58, 59, 60, 61, 70, 72, 75, 80, 81, 83, 90]
+
+
+# Work out how many parcels a scale stands for ('10k', '1m', ... or a number)
+def parse_scale(scale):
+    if str(scale).lower() in SCALES:
+        return SCALES[str(scale).lower()]
+    return int(scale)
+
+
+# One row of jittered grid corners; the row's own seed makes it the same whichever row is generated first
+def _corner_row(seed, layer, row, columns, cell):
+    rng = np.random.default_rng([seed, layer, row])
+    x = (np.arange(columns + 1) + rng.uniform(-0.25, 0.25, columns + 1)) * cell
+    y = (row + rng.uniform(-0.25, 0.25, columns + 1)) * cell
+    return np.column_stack([x, y])
+
+
+# Yield (row number, array of quadrilaterals) for 'count' cells of a jittered grid, a row at a time
+#   The corners are moved by at most a quarter of a cell, so every quadrilateral is valid and shares its edges with its neighbours.
+def tessellation(seed, layer, count, cell):
+    columns = int(math.ceil(math.sqrt(count)))
+    lower = _corner_row(seed, layer, 0, columns, cell)
+    made, row = 0, 0
+    while made < count:
+        upper = _corner_row(seed, layer, row + 1, columns, cell)
+        n = min(columns, count - made)
+        rings = np.stack([lower[:n], lower[1:n + 1], upper[1:n + 1], upper[:n], lower[:n]], axis=1)   # (n, 5, 2)
+        yield row, shapely.polygons(rings)
+        lower = upper
+        made += n
+        row += 1
+
+
+# Width of the area covered by 'count' parcels
+def extent_size(count):
+    return int(math.ceil(math.sqrt(count))) * PARCEL_SIZE
+
+
+# Owner and tax names for a row of parcels
+def _owner_names(rng, n):
+    kind = rng.choice(4, n, p=[FN_SHARE, PUBLIC_SHARE, UNKNOWN_SHARE, 1.0 - FN_SHARE - PUBLIC_SHARE - UNKNOWN_SHARE])
+    fn = rng.integers(len(FN_TERMS), size=n)
+    public = rng.integers(len(FN_TERMS), len(PUBLIC_TERMS), size=n)
+    surname = rng.integers(len(SURNAMES), size=n)
+    given = rng.integers(len(GIVEN_NAMES), size=n)
+    tax_differs = rng.random(n) < 0.1                                                       # a few parcels are taxed to someone else
+    names = []
+    for i in range(n):
+        if kind[i] == 0:
+            owner = FN_TERMS[fn[i]]
+        elif kind[i] == 1:
+            owner = PUBLIC_TERMS[public[i]]
+        elif kind[i] == 2:
+            names.append((None, None))
+            continue
+        else:
+            owner = '{} {}'.format(SURNAMES[surname[i]], GIVEN_NAMES[given[i]])
+        tax = '{} {}'.format(SURNAMES[(surname[i] + 7) % len(SURNAMES)], GIVEN_NAMES[given[i]]) if tax_differs[i] and kind[i] == 3 else owner
+        names.append((owner, tax))
+    return names
+
+
+def _parcel_rows(seed, count):
+    columns = int(math.ceil(math.sqrt(count)))
+    for row, polygons in tessellation(seed, 1, count, PARCEL_SIZE):
+        rng = np.random.default_rng([seed, 1, row, 1])
+        areas = shapely.area(polygons)
+        for i, (geom, (owner, tax)) in enumerate(zip(polygons, _owner_names(rng, len(polygons)))):
+            yield ('{:09d}'.format(row * columns + i + 1), owner, tax, float(areas[i])), geom
+
+
+def _section_rows(size):
+    sections = int(math.ceil(size / SECTION_SIZE))
+    for row in range(sections):
+        for column in range(sections):
+            township, section_row = divmod(row, 6)
+            range_, section_column = divmod(column, 6)
+            section = section_row * 6 + (section_column if section_row % 2 else 5 - section_column) + 1   # sections are numbered back and forth
+            label = 'T{}N R{}W S{}'.format(40 + township, 10 + range_, section)
+            geom = shapely.box(column * SECTION_SIZE, row * SECTION_SIZE, (column + 1) * SECTION_SIZE, (row + 1) * SECTION_SIZE)
+            yield (label,), geom
+
+
+def _stand_rows(seed, count, size):
+    cell = size / math.ceil(math.sqrt(count))
+    for row, polygons in tessellation(seed, 2, count, cell):
+        rng = np.random.default_rng([seed, 2, row, 1])
+        n = len(polygons)
+        ctypes = np.where(rng.random(n) < 0.6, rng.choice(RULE_CTYPES, n), rng.choice(OTHER_CTYPES, n))
+        ages = rng.integers(0, 121, n)
+        years = rng.integers(1990, 2026, n)
+        missing_age = rng.random(n) < 0.03
+        missing_year = rng.random(n) < 0.03
+        for i in range(n):
+            yield (int(ctypes[i]), None if missing_age[i] else int(ages[i]), 0 if missing_year[i] else int(years[i])), polygons[i]
+
+
+def _work_area_rows(size):
+    areas = max(1, int(math.ceil(size / WORK_AREA_SIZE)))
+    width = size / areas
+    for row in range(areas):
+        for column in range(areas):
+            yield ('Work Area {:02d}-{:02d}'.format(row + 1, column + 1),), shapely.box(column * width, row * width, (column + 1) * width, (row + 1) * width)
+
+
+def _trail_rows(seed, count, size):
+    rng = np.random.default_rng([seed, 3])
+    for k in range(count):
+        steps = rng.normal(0.0, 500.0, (20, 2)).cumsum(axis=0)                              # a random walk of 20 segments
+        start = rng.uniform(0.0, size, 2)
+        coords = np.clip(np.vstack([start, start + steps]), 0.0, size)
+        yield ('Trail {:04d}'.format(k + 1), 'Yes' if rng.random() < 0.1 else 'No'), shapely.linestrings(coords)
+
+
+def _lake_rows(seed, count, size):
+    rng = np.random.default_rng([seed, 4])
+    centers = rng.uniform(0.0, size, (count, 2))
+    radii = rng.uniform(60.0, 400.0, count)
+    lakes = shapely.buffer(shapely.points(centers), radii, quad_segs=8)
+    for k in range(count):
+        yield (lake_id(k),), lakes[k]
+
+
+# The 'DOWLKNUM' of the k-th generated lake
+def lake_id(k):
+    return '{:08d}'.format(10000000 + k)
+
+
+# Write the term workbook and the lake ID workbook
+def _write_workbooks(folder, seed, lakes):
+    terms_path = os.path.join(folder, 'terms.xlsx')
+    wb = openpyxl.Workbook()
+    wb.active.title = 'FN_Terms'
+    for sheet, terms in ((wb.active, FN_TERMS), (wb.create_sheet('Public_Terms'), PUBLIC_TERMS)):
+        sheet.append(['Terms'])
+        for term in terms:
+            sheet.append([term])
+    wb.save(terms_path)
+    lakes_path = os.path.join(folder, 'lakes.xlsx')
+    rng = np.random.default_rng([seed, 5])
+    wb = openpyxl.Workbook()
+    wb.active.title = 'Test_Lakes'
+    wb.active.append(['LAKE_NAME', 'DOWLKNUM'])
+    for k in np.flatnonzero(rng.random(lakes) < LAKE_ID_SHARE):
+        wb.active.append(['Lake {}'.format(k + 1), int(lake_id(k))])                      # stored as numbers, as in the real workbook
+    wb.save(lakes_path)
+    return terms_path, lakes_path
+
+
+# Generate the benchmark data for 'scale' parcels (and forest stands) into 'folder', unless it is already there
+#   Returns the manifest: {'scale', 'seed', 'features': {layer: count}, 'layers': {layer: path}, 'terms', 'lakes_workbook', ...}.
+def generate(folder, scale='10k', seed=0, overwrite=False):
+    count = parse_scale(scale)
+    if not os.path.isdir(folder):
+        os.makedirs(folder)
+    gpkg = os.path.join(folder, 'benchmark_{}_{}.gpkg'.format(count, seed))
+    manifest_path = os.path.splitext(gpkg)[0] + '.json'
+    if not overwrite and os.path.exists(manifest_path) and os.path.exists(gpkg):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get('version') == GENERATOR_VERSION:
+            return manifest
+    if os.path.exists(gpkg):
+        os.remove(gpkg)
+    start_time = time.time()
+    size = extent_size(count)
+    lakes = max(1, count // PARCELS_PER_LAKE)
+    trails = max(5, count // PARCELS_PER_TRAIL)
+    layers = dict((name, gpkg + '/' + name) for name in LAYERS)
+    features = {}
+    for name, fields, geometry_type, rows in [
+            ('parcels', [('PIN', 'TEXT', 20), ('OWNER_NAME', 'TEXT', 80), ('TAX_NAME', 'TEXT', 80), ('Shape_Area', 'DOUBLE', None)], 'Polygon', _parcel_rows(seed, count)),
+            ('pls_sections', [('TRS_SEARCH', 'TEXT', 40)], 'Polygon', _section_rows(size)),
+            ('forest_stands', [('MN_CTYPE', 'LONG', None), ('STAND_AGE', 'LONG', None), ('SURVEY_YR', 'LONG', None)], 'Polygon', _stand_rows(seed, count, size)),
+            ('work_areas', [('AREA_NAME', 'TEXT', 50)], 'Polygon', _work_area_rows(size)),
+            ('selector', [('TRAIL_NAME', 'TEXT', 50), ('Requires_Deletion', 'TEXT', 3)], 'LineString', _trail_rows(seed, trails, size)),
+            ('lakes', [('DOWLKNUM', 'TEXT', 20)], 'Polygon', _lake_rows(seed, lakes, size))]:
+        block_start = time.time()
+        features[name] = layer_io.write_features(layers[name], fields, rows, geometry_type)
+        print('Wrote {} {} (%s seconds).'.format(features[name], name) % round(time.time() - block_start))
+    terms_path, lakes_path = _write_workbooks(folder, seed, lakes)
+    manifest = {'version': GENERATOR_VERSION, 'scale': count, 'seed': seed, 'extent': [0.0, 0.0, size, size],
+                'features': features, 'layers': layers, 'terms': terms_path, 'lakes_workbook': lakes_path,
+                'seconds': round(time.time() - start_time, 1)}
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    print('Benchmark data for {} parcels written to {} (%s seconds).'.format(count, gpkg) % round(time.time() - start_time))
+    return manifest
@@ -0,0 +1,204 @@
+#-------------------------------------------------------------------------------
+# Name:        benchmark_suite.py (Pipeline Benchmark Suite)
+# Purpose:      This module times every stage of the five production pipelines against
+#                   the synthetic GeoPackage data from benchmark_data.py, in place of the
+#                   "This script took ... seconds" lines, and writes a JSON report that
+#                   can be compared with the report of an earlier run:
+#
+#                   'trs'            - parcel copy, PLS section index, TRS join, 'TRS' field values, relation table
+#                   'first_nations'  - term workbook, proximity selection, keyword classification, dissolve
+#                   'private'        - term workbook, proximity selection, selection copy, keyword classification, dissolve
+#                   'lakeshore'      - lake ID workbook, lake index, parcel/lake join, parcel selection
+#                   'forest'         - rule table, work-area filter and grouping, dissolve
+#
+#                   Each pipeline runs in a fresh process, so its peak memory is its own.
+#                   Every stage is a stage_tracing.py span, so the report records its wall
+#                   and CPU time, the number of features handled, the throughput (features
+#                   per second), and its peak memory; '--profile' and '--memory' add the
+#                   hottest functions and the largest allocation sites of chosen stages.
+#
+#                       python benchmark_suite.py C:\Benchmarks --scale 1m --report report_1m.json --compare report_1m_last.json
+#
+# Author:      draleigh
+#
+# Created:     18 October 2026
+# Copyright:   (c) draleigh 2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+
+
+# Import modules and packages
+import os,sys,json,argparse,platform,datetime                                               # list of required modules
+import benchmark_data                                                                       # the synthetic input data
+import forest_stand_pipeline                                                                # forest stand filter, grouping, and dissolve
+import forest_stand_rules                                                                   # the grouping rule table
+import lakeshore_engine                                                                     # indexed parcel/lake join
+import layer_io                                                                             # shared feature reading/writing helpers
+import ownership_classifier                                                                 # owner name classification
+import process_pool                                                                         # a fresh process for each pipeline
+import proximity_selection                                                                  # indexed proximity selection
+import spreadsheet_loader                                                                   # workbook loading
+import stage_tracing                                                                        # stage spans with timing, memory, and feature counts
+import streaming_writer                                                                     # streamed copies of the parcel selections
+import tiled_dissolve                                                                       # parallel tiled dissolve
+import trs_spatial_join                                                                     # bulk TRS join
+
+
+PIPELINES = ('trs', 'first_nations', 'private', 'lakeshore', 'forest')
+TRS_THRESHOLD = 8093.71                                                                     # minimum 'Shape_Area' of parcels given TRS values (as in append_TRS_values_to_parcel_data.py)
+TRS_FIELD_LENGTH = 2000                                                                     # length of the 'TRS' field
+SELECTOR_DISTANCE = '2 kilometers'                                                          # distance from the Selector trails within which parcels are examined
+REGRESSION_THRESHOLD = 0.10                                                                 # a stage that is this much slower than in the earlier report is a regression
+REGRESSION_MIN_SECONDS = 0.5                                                                # ... and at least this many seconds slower
+
+
+def _trs(data, output, workers, tracer):
+    parcels, sections = data['layers']['parcels'], data['layers']['pls_sections']
+    with tracer.stage('copy', features_in=data['features']['parcels']) as span:
+        span.features_out = streaming_writer.copy_features(parcels, output + '/Parcel_Data_Addition', 'Shape_Area >= {}'.format(TRS_THRESHOLD))
+    with tracer.stage('index_sections') as span:
+        index = trs_spatial_join.SectionIndex.from_layer(sections)
+        span.features_out = len(index)
+    with tracer.stage('join', features_in=data['features']['parcels']):
+        trs_by_oid = trs_spatial_join.join_trs(parcels, sections, 'Shape_Area >= {}'.format(TRS_THRESHOLD), index=index)
+    with tracer.stage('format_field', features_in=len(trs_by_oid)):
+        trs_spatial_join.format_trs_field(trs_by_oid, TRS_FIELD_LENGTH)
+    with tracer.stage('relation_table') as span:
+        span.features_out = trs_spatial_join.write_relation_table(output + '/Parcel_TRS', trs_by_oid)
+
+
+def _ownership(data, output, workers, tracer, sheet, select, copy=False):
+    parcels = data['layers']['parcels']
+    with tracer.stage('load_terms') as span:
+        terms = spreadsheet_loader.load_column(data['terms'], sheet, 'Terms', cache_dir=None)   # no cache, so the workbook is read every time
+        span.features_out = len(terms)
+    with tracer.stage('proximity', features_in=data['features']['parcels']):
+        nearby = proximity_selection.select_parcels_near_selector(parcels, data['layers']['selector'], SELECTOR_DISTANCE)
+    source, within = parcels, set(nearby)                                                   # as in the scripts, only the nearby parcels are classified
+    if copy:                                                                                # the private script copies the selection and classifies the copy
+        with tracer.stage('copy_selection', features_in=len(nearby)) as span:
+            span.features_out = streaming_writer.copy_features(parcels, output + '/Parcel_Selection', oids=within)
+        source, within = output + '/Parcel_Selection', None
+    with tracer.stage('classify', features_in=len(nearby)):
+        selected = select(source, ownership_classifier.OwnershipClassifier(terms), within=within)
+    with tracer.stage('dissolve', features_in=len(selected)):
+        features = (((), geom) for oid, _, geom in layer_io.read_features(source) if oid in selected)
+        tiled_dissolve.write_dissolved(output + '/Dissolved', [], tiled_dissolve.dissolve_features(features, workers), parcels)
+
+
+def _first_nations(data, output, workers, tracer):
+    _ownership(data, output, workers, tracer, 'FN_Terms', ownership_classifier.select_matching)
+
+
+def _private(data, output, workers, tracer):
+    _ownership(data, output, workers, tracer, 'Public_Terms', ownership_classifier.select_non_matching, copy=True)
+
+
+def _lakeshore(data, output, workers, tracer):
+    parcels = data['layers']['parcels']
+    with tracer.stage('load_lake_ids') as span:
+        lake_ids = spreadsheet_loader.load_column(data['lakes_workbook'], 'Test_Lakes', 'DOWLKNUM', normalize=lakeshore_engine.normalize_lake_id, cache_dir=None)
+        span.features_out = len(lake_ids)
+    with tracer.stage('index_lakes') as span:
+        index, _ = lakeshore_engine.LakeIndex.from_layer(data['layers']['lakes'], lake_ids)
+        span.features_out = len(index)
+    with tracer.stage('join', features_in=data['features']['parcels']):
+        lakes_by_oid, perimeters = lakeshore_engine.join_parcels_to_lakes(parcels, index, workers=workers)
+    with tracer.stage('write', features_in=len(lakes_by_oid)):
+        lakeshore_engine.write_relation_table(output + '/Parcel_Lake', lakes_by_oid)
+        lakeshore_engine.write_parcel_selection(parcels, output + '/Parcel_Selection', lakes_by_oid, perimeters)
+
+
+def _forest(data, output, workers, tracer):
+    inventory = data['layers']['forest_stands']
+    with tracer.stage('load_rules') as span:
+        rules = forest_stand_rules.load_rules()
+        span.features_out = len(rules)
+    with tracer.stage('filter_group', features_in=data['features']['forest_stands']):
+        areas = [geom for _, _, geom in layer_io.read_features(data['layers']['work_areas'])]
+        stands = forest_stand_pipeline.filter_stands(inventory, areas, rules, datetime.date.today().year)
+    with tracer.stage('dissolve', features_in=len(stands)):
+        forest_stand_pipeline.dissolve_stands(stands, output + '/Dissolved', inventory, 'tiled', workers)
+
+
+RUNNERS = {'trs': _trs, 'first_nations': _first_nations, 'private': _private, 'lakeshore': _lakeshore, 'forest': _forest}
+
+
+# Run one pipeline and return its trace (run in a fresh process by run_suite())
+#   The outputs are written to a GeoPackage of their own in 'folder', replacing any earlier run's.
+#   'profile' and 'memory' are stage names to run under cProfile and tracemalloc (see stage_tracing.py).
+def run_pipeline(name, data, folder, workers=None, profile=(), memory=()):
+    output = os.path.join(folder, 'benchmark_output_{}.gpkg'.format(name))
+    if os.path.exists(output):
+        os.remove(output)
+    print('{}:'.format(name))
+    tracer = stage_tracing.Tracer(name, profile=profile, memory=memory)
+    RUNNERS[name](data, output, workers, tracer)
+    return tracer.finish()
+
+
+# Generate (or reuse) the data in 'folder' and run each pipeline in its own process
+#   Returns the report as a dictionary.
+def run_suite(folder, scale='10k', seed=0, pipelines=PIPELINES, workers=None, profile=(), memory=()):
+    data = benchmark_data.generate(folder, scale, seed)
+    report = {'created': datetime.datetime.now().isoformat(timespec='seconds'),
+              'machine': {'platform': platform.platform(), 'python': platform.python_version(), 'cpus': os.cpu_count()},
+              'scale': data['scale'], 'seed': data['seed'], 'features': data['features'], 'workers': workers,
+              'pipelines': {}}
+    for name in pipelines:
+        with process_pool.worker_pool(1) as pool:
+            report['pipelines'][name] = pool.submit(run_pipeline, name, data, folder, workers, profile, memory).result()
+    return report
+
+
+# Compare two reports stage by stage; returns a list of (pipeline, stage, earlier seconds, seconds) for the regressions
+def compare(earlier, report, threshold=REGRESSION_THRESHOLD, min_seconds=REGRESSION_MIN_SECONDS):
+    if earlier.get('scale') != report.get('scale') or earlier.get('seed') != report.get('seed'):
+        print('Warning: the reports were run on different data (scale {} seed {} and scale {} seed {}).'.format(
+            earlier.get('scale'), earlier.get('seed'), report.get('scale'), report.get('seed')))
+    regressions = []
+    for name, pipeline in report['pipelines'].items():
+        before = dict((record['stage'], record) for record in earlier.get('pipelines', {}).get(name, {}).get('stages', []))
+        for record in pipeline['stages']:
+            if record['stage'] not in before:
+                continue
+            old, new = before[record['stage']]['seconds'], record['seconds']
+            change = (new - old) / old if old > 0 else 0.0
+            slower = change > threshold and new - old >= min_seconds
+            print('{:<14} {:<16} {:>9.2f} s -> {:>9.2f} s  {:+7.1%}{}'.format(name, record['stage'], old, new, change, '  REGRESSION' if slower else ''))
+            if slower:
+                regressions.append((name, record['stage'], old, new))
+    return regressions
+
+
+# Command line entry point
+#   Exits with status 1 if '--compare' finds a regression, so the suite can gate a scheduled run.
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time every stage of the production pipelines on synthetic data.')
+    parser.add_argument('folder', help='folder for the synthetic data and the benchmark outputs')
+    parser.add_argument('--scale', default='10k', help='number of parcels and forest stands: {} or a number'.format(', '.join(benchmark_data.SCALES)))
+    parser.add_argument('--seed', type=int, default=0, help='seed of the synthetic data')
+    parser.add_argument('--pipelines', nargs='+', choices=PIPELINES, default=list(PIPELINES), help='pipelines to run (default: all)')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes for each pipeline (default: every core)')
+    parser.add_argument('--profile', nargs='+', default=[], help="stages to run under cProfile ('*' for every stage); the hottest functions go into the report")
+    parser.add_argument('--memory', nargs='+', default=[], help="stages to run under tracemalloc ('*' for every stage); the largest allocation sites go into the report")
+    parser.add_argument('--report', help='JSON report to write (default: benchmark_report_<scale>_<seed>.json in the folder)')
+    parser.add_argument('--compare', help='earlier JSON report to compare this run with')
+    args = parser.parse_args(argv)
+
+    report = run_suite(args.folder, args.scale, args.seed, args.pipelines, args.workers, args.profile, args.memory)
+    report_path = args.report or os.path.join(args.folder, 'benchmark_report_{}_{}.json'.format(report['scale'], report['seed']))
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print('Report written to {}.'.format(report_path))
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), report)
+        print('{} regression(s) found.'.format(len(regressions)))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    import benchmark_suite                                                                  # run from the module rather than '__main__', so the pipeline processes can find run_pipeline
+    sys.exit(benchmark_suite.main())
@@ -17,17 +17,15 @@
 
 
 # Import modules and packages
-import os,arcpy,time,datetime,copy,openpyxl                                                 # list of required modules
+import os,time,datetime,copy                                                                # list of required modules
+from arcpy_runtime import arcpy                                                             # arcpy is imported when the first tool is called (see arcpy_runtime.py)
 from datetime import date, timedelta                                                        # extract submodules
 #from shutil import copyfile                                                                # extract submodule
 #from ftplib import FTP                                                                     # extract submodule
-from arcpy import env                                                                       # extract submodule
-from arcpy.sa import *                                                                      # import the Spatial Analyst toolbar
-arcpy.CheckOutExtension("Spatial")                                                          # check out the Spatial Analyst toolbar
+import layer_io,ownership_classifier,parcel_snapshot,proximity_selection,spreadsheet_loader,stage_tracing,tiled_dissolve   # shared helpers for reading workbooks and layers, classifying owner names, snapshotting parcels, tracing stages, and dissolving
 
 
 # Date Management
-start_time = time.time()                                                                    # define the start time of the script
 today = date.today()                                                                        # define the date of the script's run
 today_year = today.year                                                                     # define the year of the script's run
 today_month = today.month                                                                   # define the month of the script's run
@@ -44,74 +42,98 @@ AllParcels = r"*folderpath*\parcel_FC"
 Selector = r"*folderpath*\selector_feature_class"                                                       # define the location of the current dataset which contains the selection features
 Ownership_DataFolder = r"*folderpath*\Data"                                                             # define the location of the "Data" subfolder (if necessary)
 Input = r"*folderpath*\First_Nations_Terms.xlsx"                                                        # define the location of the XLSX file with the search terms
-
-
-# Set up layers and feature classes (with file paths)
-block_start = time.time()                                                                       # set the start time of the code block
-print('Setting up file paths, making feature layers.')                                          # print a statement to the terminal indicating what steps will be taken next
-Selector_Features = []                                                                          # set up an empty list to receive Selector feature names
-arcpy.MakeFeatureLayer_management(AllParcels, 'Parcels')                                        # Make a temporary layer for full set of parcels
-arcpy.MakeFeatureLayer_management(Selector, 'Selector')                                              # Make temporary layer for Hunter Walking Trails
-FirstNations_dissolved_path = os.path.join(GDB, 'FirstNations_Parcels_Dissolved' + today_full_str) # Define path of the dissolved layer of non-public entities
-arcpy.SelectLayerByAttribute_management('Selector', "CLEAR_SELECTION")                          # Confirm that the 'Selector' layer has no selection
-print('Prep work complete (%s taken).\n' % round(time.time() - block_start))                    # print a statement to the terminal indicating the steps that have completed
-
-# Find all entries in 'OWNER_NAME' field
-block_start = time.time()                                                                               # set the start time of the code block
-print('Confirming active trails, setting aside parcel selections.')                                     # print a statement to the terminal indicating next steps
-arcpy.SelectLayerByAttribute_management('Selector', "NEW_SELECTION", "Requires_Deletion = 'No'")            # Select 'Selector' features according to the 'Requires_Deletion' field; this may require adjustments to the Selector feature class ahead of time
-with arcpy.da.SearchCursor('Selector', ['TRAIL_NAME']) as cursor:                                           # set up a SearchCursor to iterate over the 'Selector' layer according to the 'TRAIL_NAME' field
-    for row in cursor:                                                                                  # set up a FOR loop to investigate each row within the cursor
-        print('Trail Name: {}'.format(row[0]))                                                          # print a statement to the terminal that contains each Selector name
-        Selector_Features = Selector_Features + ['{}'.format(row[0])]                               # append each row's trail name to the 'Hunter_Walking_Trails' list; this list will be unsorted
-print('Number of selector features: ', len(Selector_Features))                                                   # print a statement to the terminal with the number of 'Selector' features in the list
-arcpy.SelectLayerByLocation_management('Parcels', "WITHIN_A_DISTANCE", 'Selector', '2 kilometers', "NEW_SELECTION")  # Select all parcels within 2km of the "active" 'Selector' features
-arcpy.MakeFeatureLayer_management('Parcels', 'Parcel_Selection')                                    # make a temporary layer for the selected parcels (confirm that this works? 5 Dec 2022)       
-arcpy.SelectLayerByAttribute_management('Parcels', "CLEAR_SELECTION")                               # Clear selection for the full parcel layer
-
-# Acquire keywords and proceed to setting up definition queries
-block_start = time.time()                                                                           # set the start time of the code block
-keyWords_Full = []                                                                                  # set up a list of keyWords to be used for selection
-wb = openpyxl.load_workbook(Input)                                                                  # use the openpyxl module to load the predefined workbook
-sheet = wb['FN_Terms']                                                                              # define the sheet within the workbook that will be utilized
-for val in sheet.iter_rows(min_col=1):                                                              # set up a FOR loop to iterate over rows in the sheet for the first column (in this case, the terms are in the first column, the only column with data in the sheet)
-    keyWords_Full.append(val[0].value)                                                              # add the initial value from that row (limited to start a 'min_col=#') to the 'keyWords_Full' list
-    print(val[0].value)                                                                             # print statement to the terminal with the value being appended
-keyWords = keyWords_Full[1:]                                                                        # remove the first value in the list (the header of the column, if necessary)
-#print(keyWords)                                                                                    # print the list to the terminal (if desired)
-
-# Fields containing the owner name
-ownerFields = ['OWNER_NAME', 'TAX_NAME']                                                            # this list contains fields that are supposed to only contain ownership designations/names
-
-
-# Set up empty strings for the expressions
-Owner_Exp = ''                                                                                      # set up a string for Owner expression with 1st field (to combine with Tax expression)
-Tax_Exp = ''                                                                                        # set up a string for Tax expression with 1st field (to combine with Owner expression)
-Full_Exp = ''                                                                                       # set up a string to receive the expression combinations
-
-# Set up Owner_Exp
-for i in range(len(keyWords)):                                                                      # set up a FOR loop to iterate over each entry in the keyWords list 
-    Owner_Exp = Owner_Exp + str(ownerFields[0] + " = '{}' Or ".format(keyWords[i]))                 # append each slice of the keyWords list with appropriate syntax for the ultimate SQL expression
-Owner_Edit = Owner_Exp[:-4]                                                                         # once the FOR loop has completed, remove the final 4 digits to excise the last " OR "
-
-# Set up Tax_Exp
-for j in range(len(keyWords)):                                                                      # set up a FOR loop to iterate over each entry in the keyWords list
-    Tax_Exp = Tax_Exp + str(ownerFields[1] + " = '{}' Or ".format(keyWords[j]))                     # append each slice of the keyWords list with appropriate syntax for the ultimate SQL expression
-Tax_Edit = Tax_Exp[:-4]                                                                             # once the FOR loop has completed, remove the final 4 digits to excise the last " OR "                   
-
-Full_Exp = Owner_Edit+" Or "+Tax_Edit                                                               # complete the expression by combining the four partial expressions (Owner and Tax)                
-##print(Full_Exp)
-print('Definition query has been completed (%s seconds).\n' % round(time.time() - block_start))     # print a statement to the terminal which indicates the actions which have been completed
-
-
-print('Starting selection of First Nations parcels...')                                             # print a statement to the terminal indicating the next steps
-block_start = time.time()                                                                           # set the start time of the code block 
-arcpy.SelectLayerByAttribute_management('Parcel_Selection', "NEW_SELECTION", Full_Exp)              # select all polygons within 'Parcel_Selection' according to the Full_Exp
-# Dissolve the First Nations/Native American parcels to produce pre-defined feature class by name with multipart options, dissolving along lines
-arcpy.Dissolve_management('Parcel_Selection', FirstNations_dissolved_path,
-                          "", "", 'MULTI_PART', 'DISSOLVE_LINES')
-
-print('Finished with dissolving. Check for a shapefile named FirstNations_Parcels_Dissolved_' + today_full_str) # print statement to the terminal with the expected name of the product
-
-# Display time taken just for fun:
-print('This script took %s seconds...' % round(time.time() - start_time))                           # print statement to the terminal with time taken to complete the script
+Terms_Column = None                                                                                     # define the header of the workbook column that holds the terms (None uses the first column)
+Match_Mode = 'exact'                                                                                    # define how owner names are compared to the keywords: 'exact', 'normalized', or 'substring'
+Selector_Where = "Requires_Deletion = 'No'"                                                             # define the expression for the active Selector features
+Selector_Distance = '2 kilometers'                                                                      # define the distance from the Selector features within which parcels are examined
+Proximity_Engine = 'arcpy'                                                                              # define how parcels near the Selector features are found: 'arcpy' (SelectLayerByLocation_management) or 'indexed' (see proximity_selection.py)
+Dissolve_Engine = 'arcpy'                                                                               # define how the output layer is dissolved: 'arcpy' (Dissolve_management) or 'tiled' (parallel, see tiled_dissolve.py)
+Scratch_Folder = os.path.join(os.path.dirname(GDB), 'Scratch')                                          # define the folder that receives the temporary spill files of the 'tiled' dissolve (None uses the system temporary folder)
+Parcel_Snapshot = None                                                                                  # define the folder of the columnar parcel snapshot used by the 'indexed' engine, e.g. os.path.join(os.path.dirname(GDB), 'parcel_snapshot') (rebuilt when the parcels change; None, the default, reads the parcel layer; see parcel_snapshot.py)
+Trace_Folder = os.path.join(os.path.dirname(GDB), 'Traces')                                             # define the folder that receives the JSON trace of each run (None writes no trace)
+Profile_Stages = []                                                                                     # define the stages to run under cProfile, e.g. ['classify'] ('*' for every stage; see stage_tracing.py)
+Memory_Stages = []                                                                                      # define the stages to run under tracemalloc, e.g. ['classify'] ('*' for every stage)
+
+
+
+# Produce the First Nations layer (run when the script is started directly, or by another script that imports it and calls main())
+def main():
+    tracer = stage_tracing.Tracer('first_nations_ownership', Trace_Folder, Profile_Stages, Memory_Stages)   # record the time, memory, and feature counts of each stage of the run
+    # Set up layers and feature classes (with file paths)
+    span = tracer.start('setup')                                                                # start the stage span
+    print('Setting up file paths, making feature layers.')                                      # print a statement to the terminal indicating what steps will be taken next
+    Selector_Features = []                                                                      # set up an empty list to receive Selector feature names
+    arcpy.MakeFeatureLayer_management(AllParcels, 'Parcels')                                    # Make a temporary layer for full set of parcels
+    arcpy.MakeFeatureLayer_management(Selector, 'Selector')                                          # Make temporary layer for Hunter Walking Trails
+    FirstNations_dissolved_path = os.path.join(GDB, 'FirstNations_Parcels_Dissolved' + today_full_str) # Define path of the dissolved layer of non-public entities
+    arcpy.SelectLayerByAttribute_management('Selector', "CLEAR_SELECTION")                      # Confirm that the 'Selector' layer has no selection
+    print('Prep work complete.\n')                                                              # print a statement to the terminal indicating the steps that have completed
+    span.end()                                                                                  # end the stage span
+
+    # Find all entries in 'OWNER_NAME' field
+    span = tracer.start('proximity_selection')                                                          # start the stage span
+    print('Confirming active trails, setting aside parcel selections.')                                 # print a statement to the terminal indicating next steps
+    arcpy.SelectLayerByAttribute_management('Selector', "NEW_SELECTION", Selector_Where)                    # Select 'Selector' features according to the 'Requires_Deletion' field; this may require adjustments to the Selector feature class ahead of time
+    with arcpy.da.SearchCursor('Selector', ['TRAIL_NAME']) as cursor:                                       # set up a SearchCursor to iterate over the 'Selector' layer according to the 'TRAIL_NAME' field
+        for row in cursor:                                                                              # set up a FOR loop to investigate each row within the cursor
+            print('Trail Name: {}'.format(row[0]))                                                      # print a statement to the terminal that contains each Selector name
+            Selector_Features = Selector_Features + ['{}'.format(row[0])]                           # append each row's trail name to the 'Hunter_Walking_Trails' list; this list will be unsorted
+    print('Number of selector features: ', len(Selector_Features))                                               # print a statement to the terminal with the number of 'Selector' features in the list
+    ownerFields = ['OWNER_NAME', 'TAX_NAME']                                                            # fields containing the owner name; this list contains fields that are supposed to only contain ownership designations/names
+    Snapshot = None                                                                                     # set up the parcel snapshot (only used with the 'indexed' engine)
+    if Proximity_Engine == 'indexed' and Parcel_Snapshot:                                               # use the indexed proximity selection on the parcel snapshot
+        Snapshot = parcel_snapshot.ensure(AllParcels, Parcel_Snapshot, ownerFields)                     # open the memory-mapped snapshot, writing it first if the parcels have changed since it was built
+        Selector_Index = proximity_selection.SelectorIndex.from_layer(Selector, Selector_Where)         # read the active Selector features once
+        Nearby_OIDs = proximity_selection.select_snapshot(Snapshot, Selector_Index, Selector_Distance)  # find the OBJECTIDs of parcels within the distance of the active Selector features, parsing only the parcels that pass the envelope prefilter
+        print('{} parcels within {} of the Selector features.'.format(len(Nearby_OIDs), Selector_Distance))  # print a statement to the terminal with the number of parcels selected
+        layer_io.select_by_oids('Parcels', Nearby_OIDs)                                                 # select those parcels in the 'Parcels' layer
+    elif Proximity_Engine == 'indexed':                                                                 # use the indexed proximity selection on the parcel layer
+        Nearby_OIDs = proximity_selection.select_parcels_near_selector(AllParcels, Selector, Selector_Distance, Selector_Where) # find the OBJECTIDs of parcels within the distance of the active Selector features with a prefilter, a segment index, and an exact distance check
+        layer_io.select_by_oids('Parcels', Nearby_OIDs)                                                 # select those parcels in the 'Parcels' layer
+    else:                                                                                               # otherwise use the arcpy selection
+        arcpy.SelectLayerByLocation_management('Parcels', "WITHIN_A_DISTANCE", 'Selector', Selector_Distance, "NEW_SELECTION")  # Select all parcels within 2km of the "active" 'Selector' features
+    arcpy.MakeFeatureLayer_management('Parcels', 'Parcel_Selection')                                # make a temporary layer for the selected parcels (confirm that this works? 5 Dec 2022)       
+    span.end(features_out=layer_io.count_features('Parcel_Selection'))                              # end the stage span with the number of parcels selected
+    arcpy.SelectLayerByAttribute_management('Parcels', "CLEAR_SELECTION")                           # Clear selection for the full parcel layer
+
+    # Acquire keywords and proceed to setting up definition queries
+    span = tracer.start('classify')                                                                 # start the stage span
+    keyWords = spreadsheet_loader.load_column(Input, 'FN_Terms', Terms_Column)                      # stream the terms column of the 'FN_Terms' sheet (read-only, cached while the workbook is unchanged), without the header, empty cells, or repeated terms
+    print('{} keywords loaded from FN_Terms.'.format(len(keyWords)))                                # print a statement to the terminal with the number of keywords
+
+
+    # Classify the parcels by owner name
+    #   Instead of building one large SQL expression from the keyWords list, the owner fields of the selected
+    #   parcels are read once and compared against the keyWords in memory (see ownership_classifier.py).
+    #   'exact' matches the names the same way the SQL expression did; 'normalized' and 'substring' also catch
+    #   variants in case, punctuation, and abbreviations (e.g. 'DEPT'/'DEPARTMENT').
+    classifier = ownership_classifier.OwnershipClassifier(keyWords, Match_Mode)                     # set up the classifier with the keyWords list
+    if Snapshot is not None:                                                                        # classify the selected parcels from the snapshot, testing each distinct owner name once
+        FirstNations_OIDs = ownership_classifier.select_matching_snapshot(Snapshot, classifier, ownerFields, Snapshot.positions(Nearby_OIDs))   # collect the OBJECTIDs of parcels with an owner or tax name that matches a keyword
+    else:                                                                                           # otherwise read the owner fields of the selected parcels
+        FirstNations_OIDs = ownership_classifier.select_matching('Parcel_Selection', classifier, ownerFields)   # collect the OBJECTIDs of parcels with an owner or tax name that matches a keyword
+    print('{} First Nations parcels found.'.format(len(FirstNations_OIDs)))                         # print a statement to the terminal with the number of parcels found
+    print('Owner names have been classified.\n')                                                    # print a statement to the terminal which indicates the actions which have been completed
+    span.end(features_out=len(FirstNations_OIDs))                                                   # end the stage span with the number of First Nations parcels
+
+
+    print('Starting selection of First Nations parcels...')                                         # print a statement to the terminal indicating the next steps
+    span = tracer.start('dissolve', features_in=len(FirstNations_OIDs))                             # start the stage span
+    layer_io.select_by_oids('Parcel_Selection', FirstNations_OIDs)                                  # select all polygons within 'Parcel_Selection' that were classified as First Nations ownership
+    # Dissolve the First Nations/Native American parcels to produce pre-defined feature class by name with multipart options, dissolving along lines
+    if Dissolve_Engine == 'tiled':                                                                  # use the parallel tiled dissolve on the selected parcels
+        span.features_out = tiled_dissolve.dissolve_to('Parcel_Selection', FirstNations_dissolved_path, spill_dir=Scratch_Folder)   # union the parcels tile by tile in worker processes and write one multipart feature
+    else:                                                                                           # otherwise use the arcpy dissolve
+        arcpy.Dissolve_management('Parcel_Selection', FirstNations_dissolved_path,
+                                  "", "", 'MULTI_PART', 'DISSOLVE_LINES')
+
+    print('Finished with dissolving. Check for a shapefile named FirstNations_Parcels_Dissolved_' + today_full_str) # print statement to the terminal with the expected name of the product
+    span.end()                                                                                      # end the stage span
+
+    # Display time taken just for fun:
+    tracer.finish()                                                                                 # print the time taken and write the JSON trace of the run
+    return FirstNations_dissolved_path                                                              # return the path of the First Nations layer to the calling script
+
+
+if __name__ == '__main__':
+    main()
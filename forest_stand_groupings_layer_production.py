@@ -15,15 +15,13 @@
 
 
 # Import modules
-import os,arcpy,time,datetime,copy                                                          # list of modules that will be needed
+import os,time,datetime,copy                                                                # list of modules that will be needed
+from arcpy_runtime import arcpy                                                             # arcpy is imported when the first tool is called (see arcpy_runtime.py)
 from datetime import date, timedelta                                                        # extract the sub-modules
-from arcpy import env                                                                       # extract the sub-module
-from arcpy.sa import *                                                                      # import the spatial analyst toolbox
-arcpy.CheckOutExtension("Spatial")                                                          # check out the Spatial Analyst extension
+import forest_stand_pipeline,forest_stand_rules,product_cache,stage_tracing,tiled_dissolve  # lazy pipeline, grouping rule table, product cache, stage tracing, and parallel tiled dissolve
 
 
 # Date Management
-start_time = time.time()                                                                    # define the start time of the script
 today = date.today()                                                                        # define the date of the script's run
 today_year = today.year                                                                     # define the year of the script's run
 today_month = today.month                                                                   # define the month of the script's run
@@ -39,113 +37,131 @@ GDB = r"...\Workspace.gdb"
 ForestStandInventory = r"forest_stand_inventory.gdb\dnr_forest_stand_inventory"             # define the location of the forest stand inventory dataset
 WorkAreas = r".gdb\dnr_wildlife_workareas"                                                  # define the the location of the work area feature class
 Selector = r"Selector.gdb\Selector"                                                         # define the location of the most recent Selector feature class
-
-# Determine the number of areas that will provide data for layer production
-Selector_WorkAreas = []                                                                                         # set up a temporary list to hold the areas in question
-
-# Set up list of Work Areas based on Hunter Walking Trail presence
-block_start = time.time()                                                                                       # set the start time of the code block
-arcpy.MakeFeatureLayer_management(ForestStandInventory, 'ForestStands')                                         # Make a temporary layer for the full forest stand inventory
-arcpy.MakeFeatureLayer_management(WorkAreas, 'WorkAreas')                                                       # Make temporary layer for work areas
-arcpy.MakeFeatureLayer_management(Selector, 'Selector')                                                         # Make temporary layer for Hunter Walking Trails
-FSI_Selection_path = os.path.join(GDB, 'ForestStandSelection'+'_' + today_full_str)                             # define the path name of the feature class which will contain all forest stand polygons
-FSI_selection_reduced_path = os.path.join(GDB, 'ForestStandSelection_Reduced' +'_' + today_full_str)            # define the path name of the feature class which will hold the refined collection of forest stand polygons
-Expression1 = "Requires_Deletion = 'No'"                                                                      # set up a SQL expression to select all active Selector features (if necessary)
-arcpy.SelectLayerByAttribute_management('Selector', "NEW_SELECTION", Expression1)                             # select all features that are active from the full list
-
-arcpy.SelectLayerByLocation_management('WorkAreas', "INTERSECT", 'Selector', 0, "NEW_SELECTION")                # select all areas that intersect with the active Selector features
-with arcpy.da.SearchCursor('WorkAreas', ['AREA_NAME']) as cursor:                                               # set up a SearchCursor to iterate over the 'WorkAreas' layer according to the field 'AREA_NAME'
-    for row in cursor:                                                                                          # set up a FOR loop to investigate each row within the cursor
-        print('{} Work Area'.format(row[0]))                                                                    # print the work area name for each entry found per row (which will be the first entry in the 'AREA_NAME' field)
-        Selector_WorkAreas = Selector_WorkAreas + ['{}'.format(row[0])]                                         # append each row's area name to the Selector_WorkAreas list; this list will be unsorted
-print('\nForest Stand Inventory processing will require data from {} work areas.\n'.format(len(Selector_WorkAreas))) # print the statement to the terminal indicating progress
-arcpy.SelectLayerByLocation_management('ForestStands', "WITHIN", 'WorkAreas', 0, "NEW_SELECTION")               # once the SearchCursor has completed, select all polygons from the 'ForestStands' layer that are "WITHIN" the 'WorkAreas' layer
-arcpy.CopyFeatures_management('ForestStands', FSI_Selection_path)                                               # make a copy of the selected 'ForestStands' polygons to be the previously-defined FSI_Selection_path feature class
-arcpy.SelectLayerByAttribute_management('WorkAreas', "CLEAR_SELECTION")                                         # clear the selection in 'WorkAreas'
-print('Forest stands have been selected (%s seconds to process).' % round(time.time() - block_start))           # print a statement that indicates how long the previous code block took to process
-print('Forest stands will now be subset with added fields for ongoing analysis.\n')                             # print a statement to the terminal to indicate the next stage of the script
-
-
-# Subset the Selector-based Forest Stand Inventory Selection and add appropriate columns
-#   These steps make the following selections:
-#       1. Subset the Forest Stand Inventory to have only polygons that lie within Work Areas with active Selector features
-#       2. Subset that selection to only include specific types of trees (based on 'MN_CTYPE' values)
-#       3. Subset that tree-type selection based on other specific criteria
-block_start = time.time()
-arcpy.MakeFeatureLayer_management(FSI_Selection_path, 'ForestStandSelection')                                   # Make a temporary layer for forest stand inventory
-Expression2 = "MN_CTYPE = 12 Or MN_CTYPE = 13 Or MN_CTYPE = 14 Or MN_CTYPE = 82 Or MN_CTYPE = 30 Or MN_CTYPE = 79 Or MN_CTYPE = 71 Or MN_CTYPE = 74 Or MN_CTYPE = 53 Or MN_CTYPE = 62 Or MN_CTYPE = 73" # This expression refers to specific 'MN_CTYPE' values for forest stand species types; the selection was approved by wildlife personnel
-arcpy.SelectLayerByAttribute_management('ForestStandSelection', "NEW_SELECTION", Expression2)                   # select all forest stand polygons based on the previously-defined expression
-arcpy.CopyFeatures_management('ForestStandSelection', FSI_selection_reduced_path)                               # make a copy of the selected 'ForestStandSelection' polygons to be the previously-defined FSI_selection_reduced_path feature class
-arcpy.SelectLayerByAttribute_management('ForestStandSelection', "CLEAR_SELECTION")                              # clear the selection on 'ForestStandSelection'
-arcpy.MakeFeatureLayer_management(FSI_selection_reduced_path, 'FSI_Reduced')                                    # make a temporary layer for the reduced forest stand inventory
-# Set up attributes for new fields that will be produced, then add the fields:
-inFeatures = 'FSI_Reduced'                                                                                      # define a variable for the 'in_table'
-fieldName1 = 'Groupings'                                                                                        # define a variable for 'field_name' (field #1)
-fieldName2 = 'StangeAge'                                                                                        # define a variable for 'field_name' (field #2, which could have a suffix with the year in question, e.g. "StandAge2022")
-fieldType1 = "TEXT"                                                                                             # define a variable for 'field_type' (field #1)
-fieldType2 = "SHORT"                                                                                            # define a variable for 'field_type' (field #2)
-fieldPrecision1 = ""                                                                                            # define a variable for 'field_precision' (field #1)
-fieldPrecision2 = 4                                                                                             # define a variable for 'field_precision' (field #2)
-fieldScale = ""                                                                                                 # define a variable for 'field_scale' (to be used for both fields)
-fieldLength1 = 25                                                                                               # define a variable for 'field_length' (field #1)
-fieldLength2 = ""                                                                                               # define a variable for 'field_length' (field #2)
-fieldAlias1 = 'Groupings'                                                                                       # define a variable for 'field_alias' (field #1)
-fieldAlias2 = 'StangeAge'                                                                                    # define a variable for 'field_alias' (field #2)
-
-arcpy.management.AddField(inFeatures, fieldName1, fieldType1, fieldPrecision1, fieldScale, fieldLength1, fieldAlias1) # add field #1 to 'FSI_Reduced'
-arcpy.management.AddField(inFeatures, fieldName2, fieldType2, fieldPrecision2, fieldScale, fieldLength2, fieldAlias2) # add field #2 to 'FSI_Reduced'
-print('Forest stands have been subset and fields have been added (%s seconds to process).' % round(time.time() - block_start))      # print a statement that indicates how long the previous code block took to process
-print('Forest stand dataset will now be refined according to species type and age.\n')                          # print a statement to the terminal to indicate the next steps
-
-
-# Populate 'StangeAge' field values
-block_start = time.time()
-with arcpy.da.UpdateCursor('FSI_Reduced', ['STAND_AGE', 'SURVEY_YR', 'StangeAge']) as cursor:                   # set up an UpdateCursor to iterate over the 'FSI_Reduced' layer according to the fields 'STAND_AGE', 'SURVEY_YR', and 'StangeAge'
-    for row in cursor:                                                                                          # set up a FOR loop to investigate each row within the cursor
-        if row[1] > 0:                                                                                          # set up an IF statement to evaluate whether the second value in the row of specified fields ('SURVEY_YR') is greater than 0;
-            row[2] = (int(today_year_str) - row[1] + row[0])                                                    # prompt the 'StangeAge' value to be the calculated value of the 'STAND_AGE' added to 'SURVEY_YR' which is subtracted from the current year's value
-        else:                                                                                                   # set up an ELSE statement for any entry within 'SURVEY_YR' that is <=0 (0 or <Null>)
-            row[2] = 1000                                                                                       # for my purposes, I'm only concerned with display a certain grouping of tree types that are younger than 20 years; I'd prefer that any unknown age be considered too old, and a future expression will prompt these entries to be removed from the dataset
-        cursor.updateRow(row)                                                                                   # prompt the cursor to update the row with the values prompted based on the IF statement
-
-# Populate 'Groupings' field values
-
-with arcpy.da.UpdateCursor('FSI_Reduced', ['MN_CTYPE', 'StangeAge', 'Groupings']) as cursor:                    # set up an UpdateCursor to iterate over the 'FSI_Reduced' layer according to the fields 'MN_CTYPE', 'StangeAge', and 'Groupings'
-    for row in cursor:                                                                                          # set up a FOR loop to investigate each row within the cursor
-        if (row[0] == 12 and row[1] < 20) or (row[0] == 13 and row[1] < 20) or (row[0] == 14 and row[1] < 20) or (row[0] == 82 and row[1] < 20): # set up an IF statement that evaluates the polygons within 'FSI_Reduced' according to the 'MN_CTYPE' and 'StangeAge'
-            row[2] = 'Young Forest'                                                                             # if the ELIF statement evaluates to true, populate the third field with 'Young Forest' if the youngest polygons are found to match the 'MN_CTYPE' values, as well
-        elif row[0] == 30 or row[0] == 79:                                                                      # set up an ELIF statement to evaluate whether polygons have specific 'MN_CTYPE' values
-            row[2] = 'Oak'                                                                                      # if the ELIF statement evaluates to TRUE, populate the third field with 'Oak'
-        elif (row[0] == 53 and row[1] < 20) or row[0] == 62 or row[0] == 71 or row[0] == 73 or row[0] == 74:    # set up an ELIF statement to evaluate whether polygons have specific values according to 'MN_CTYPE' and 'StangeAge'
-            row[2] = 'Dense Conifer'                                                                            # if the ELIF statement evaluates to TRUE, populate the third field with 'Dense Conifer'
-        elif (row[0] == 12 and row[1] >= 20) or (row[0] == 13 and row[1] >= 20) or (row[0] == 14 and row[1] >= 20) or (row[0] == 82 and row[1] >= 20) or (row[0] == 53 and row[1] >= 20): # set up an ELIF statement to evaluate whether polygons have specific values according to 'MN_CTYPE' and 'StangeAge'
-            row[2] = 'Remove'                                                                                   # if the ELIF statement evaluates to TRUE, populate the third field with 'Remove'
-        cursor.updateRow(row)                                                                                   # once the IF/ELIF statements have processed, update the row of the cursor
-
-# Remove inapplicable polygons
-
-with arcpy.da.UpdateCursor('FSI_Reduced', ['Groupings']) as cursor:                                             # set up an UpdateCursor to iterate over the 'FSI_Reduced' layer according to the 'Groupings' field
-    for row in cursor:                                                                                          # set up a FOR loop to investigate each row within the cursor
-        if row[0] == 'Remove':                                                                                  # set up an IF statement to evaluate whether the first value within the row (row[0]) is equivalent to 'Remove'
-            cursor.deleteRow()                                                                                  # if the IF statement evaluates to TRUE, delete the row
-print('Forest stand final product has been completed (%s seconds to process).' % round(time.time() - block_start))   # print a statement that indicates how long the previous code block took to process
-print('The final product will now be dissolved according to the "'"Grouping"'" field.\n')                       # print a statement to the terminal indicating the next step in the script.
-
-# Dissolve by 'Groupings' field entries
-#
-# For my work, I present product layer in ArcMap documents so that each dissolved (multipart) polygon
-#   displays its forest grouping type with a label. I don't need to know the individual species, but
-#   this next bit can be ignored if it's unnecessary.
-FSI_Reduced_Dis_path = os.path.join(GDB, 'ForestStandSelection_Reduced_Dissolved' +'_' + today_full_str)        # define the path name of the feature class which will contain all forest stand polygons
-arcpy.management.Dissolve('FSI_Reduced', FSI_Reduced_Dis_path, ['Groupings'], "", "MULTI_PART", "DISSOLVE_LINES")   # dissolve the 'FSI_Reduced' feature class (with all of the populated fields and reduced rows) so that it is multipart and dissolved along lines according to the just-defined FC name
-
-
-# Display time taken just for fun:
-print('This script took %s seconds to complete...' % round(time.time() - start_time))                                    # print a statement to the terminal to indicate how long the script took to fully process
-
-
-
-
-
-
-
+Grouping_Rules = forest_stand_rules.RULE_TABLE                                              # define the location of the rule table of 'MN_CTYPE' groupings and age cutoffs (forest_stand_rules.csv)
+Dissolve_Engine = 'arcpy'                                                                   # define how the final product is dissolved: 'arcpy' (Dissolve) or 'tiled' (parallel, see tiled_dissolve.py)
+Scratch_Folder = os.path.join(os.path.dirname(GDB), 'Scratch')                              # define the folder that receives the temporary spill files of the 'tiled' dissolve (None uses the system temporary folder)
+Keep_Intermediates = False                                                                  # set to True to write the intermediate 'ForestStandSelection' feature classes to the geodatabase (for debugging)
+Shard_Cache = os.path.join(os.path.dirname(GDB), 'forest_stand_shards.sqlite')              # define the location of the cache of work-area results (None processes every work area together, without a cache)
+Inventory_Edition = None                                                                    # define the edition of the forest stand inventory (e.g. its release date); None uses the edition of the inventory's own files (see layer_io.dataset_edition())
+Product_Cache = os.path.join(os.path.dirname(GDB), 'product_cache.sqlite')                  # define the location of the index of built products (None rebuilds the product on every run; see product_cache.py)
+Cache_Max_Days = 14                                                                         # define the number of days an unused dated copy of the product is kept
+Cache_Max_GB = 10                                                                           # define the size (in GB) the dated copies of the products are trimmed to
+Trace_Folder = os.path.join(os.path.dirname(GDB), 'Traces')                                 # define the folder that receives the JSON trace of each run (None writes no trace)
+Profile_Stages = []                                                                         # define the stages to run under cProfile, e.g. ['lazy_pipeline'] ('*' for every stage; see stage_tracing.py)
+Memory_Stages = []                                                                          # define the stages to run under tracemalloc, e.g. ['lazy_pipeline'] ('*' for every stage)
+
+
+
+# Produce the dissolved forest stand layer (run when the script is started directly, or by another script that imports it and calls main())
+def main():
+    tracer = stage_tracing.Tracer('forest_stand_groupings', Trace_Folder, Profile_Stages, Memory_Stages)   # record the time, memory, and feature counts of each stage of the run
+    FSI_Reduced_Dis_path = os.path.join(GDB, 'ForestStandSelection_Reduced_Dissolved' +'_' + today_full_str)    # define the path name of the feature class which will contain the dissolved forest stand polygons
+
+    # Publish the product from the product cache if none of its inputs or settings have changed since it was last built
+    if Product_Cache:                                                                                           # check the product cache before any work is done
+        Cache = product_cache.ProductCache(Product_Cache)                                                       # open the index of built products
+        Cache_Key = product_cache.fingerprint({'inventory': Inventory_Edition or product_cache.edition(ForestStandInventory),
+                                               'work_areas': product_cache.content_hash(WorkAreas),
+                                               'selector': product_cache.content_hash(Selector, (), "Requires_Deletion = 'No'"),
+                                               'rules': forest_stand_pipeline.rules_hash(forest_stand_rules.load_rules(Grouping_Rules)),
+                                               'year': today_year, 'product': 'forest'})                        # fingerprint the inventory, the work areas, the active Selector features, the rules, and the year (the stand ages change with it)
+        if Cache.publish('forest', Cache_Key, [FSI_Reduced_Dis_path], today_full_str):                          # copy the earlier product to today's name if it was built from the same inputs
+            Cache.evict(Cache_Max_GB * 1024 ** 3, Cache_Max_Days)                                               # delete the dated copies that are no longer needed
+            Cache.close()                                                                                       # close the index
+            tracer.finish()                                                                                     # print the time taken and write the JSON trace of the run
+            return FSI_Reduced_Dis_path                                                                         # return the path of the dissolved forest stand layer to the calling script
+
+    # Determine the number of areas that will provide data for layer production
+    Selector_WorkAreas = []                                                                                     # set up a temporary list to hold the areas in question
+
+    # Set up list of Work Areas based on Hunter Walking Trail presence
+    span = tracer.start('select_work_areas')                                                                    # start the stage span
+    arcpy.MakeFeatureLayer_management(ForestStandInventory, 'ForestStands')                                     # Make a temporary layer for the full forest stand inventory
+    arcpy.MakeFeatureLayer_management(WorkAreas, 'WorkAreas')                                                   # Make temporary layer for work areas
+    arcpy.MakeFeatureLayer_management(Selector, 'Selector')                                                     # Make temporary layer for Hunter Walking Trails
+    FSI_Selection_path = os.path.join(GDB, 'ForestStandSelection'+'_' + today_full_str)                         # define the path name of the feature class which will contain all forest stand polygons
+    FSI_selection_reduced_path = os.path.join(GDB, 'ForestStandSelection_Reduced' +'_' + today_full_str)        # define the path name of the feature class which will hold the refined collection of forest stand polygons
+    Expression1 = "Requires_Deletion = 'No'"                                                                  # set up a SQL expression to select all active Selector features (if necessary)
+    arcpy.SelectLayerByAttribute_management('Selector', "NEW_SELECTION", Expression1)                         # select all features that are active from the full list
+
+    arcpy.SelectLayerByLocation_management('WorkAreas', "INTERSECT", 'Selector', 0, "NEW_SELECTION")            # select all areas that intersect with the active Selector features
+    with arcpy.da.SearchCursor('WorkAreas', ['AREA_NAME']) as cursor:                                           # set up a SearchCursor to iterate over the 'WorkAreas' layer according to the field 'AREA_NAME'
+        for row in cursor:                                                                                      # set up a FOR loop to investigate each row within the cursor
+            print('{} Work Area'.format(row[0]))                                                                # print the work area name for each entry found per row (which will be the first entry in the 'AREA_NAME' field)
+            Selector_WorkAreas = Selector_WorkAreas + ['{}'.format(row[0])]                                     # append each row's area name to the Selector_WorkAreas list; this list will be unsorted
+    print('\nForest Stand Inventory processing will require data from {} work areas.\n'.format(len(Selector_WorkAreas))) # print the statement to the terminal indicating progress
+    span.end(features_out=len(Selector_WorkAreas))                                                              # end the stage span with the number of work areas
+    Rules = forest_stand_rules.load_rules(Grouping_Rules)                                                       # read the grouping rules, in order of priority
+    Expression2 = forest_stand_rules.prefilter(Rules)                                                           # build the 'MN_CTYPE IN (...)' expression from every cover type in the rules; the selection was approved by wildlife personnel
+    print('{} grouping rules loaded; prefilter: {}'.format(len(Rules), Expression2))                             # print the number of rules and the resulting expression to the terminal
+
+
+    # Lazy pipeline (the default): the work-area and 'MN_CTYPE' filters are applied while the forest stand inventory is read,
+    #   the stands are grouped in memory, and only the dissolved product is written to the geodatabase (see forest_stand_pipeline.py)
+    if not Keep_Intermediates:
+        span = tracer.start('lazy_pipeline')                                                                    # start the stage span
+        if Shard_Cache:                                                                                         # run each work area as its own shard, reusing the cached work areas
+            Group_Counts = forest_stand_pipeline.run_sharded(ForestStandInventory, 'WorkAreas', FSI_Reduced_Dis_path, Rules, today_year,
+                                                             Shard_Cache, 'AREA_NAME', Inventory_Edition, Dissolve_Engine, spill_dir=Scratch_Folder)   # filter, group, and dissolve the stands of each work area in worker processes, then reassemble the product
+        else:                                                                                                   # otherwise process every work area together
+            Group_Counts = forest_stand_pipeline.run(ForestStandInventory, 'WorkAreas', FSI_Reduced_Dis_path, Rules, today_year, Dissolve_Engine, spill_dir=Scratch_Folder).counts()   # filter, group, and dissolve the stands within the selected work areas
+        for grouping, count in sorted(Group_Counts.items(), key=lambda item: str(item[0])):                     # set up a FOR loop over the groupings that were kept
+            print('{}: {} stands'.format(grouping, count))                                                      # print the number of stands in each grouping
+        arcpy.SelectLayerByAttribute_management('WorkAreas', "CLEAR_SELECTION")                                 # clear the selection in 'WorkAreas'
+        print('Forest stand product has been dissolved.')                                                       # print a statement to the terminal indicating progress
+        span.end(features_out=sum(Group_Counts.values()))                                                       # end the stage span with the number of stands kept
+
+
+    # Debugging (Keep_Intermediates = True): write the 'ForestStandSelection' and 'ForestStandSelection_Reduced' feature classes
+    #   to the geodatabase on the way to the product, as the script originally did
+    else:
+        span = tracer.start('select_stands')                                                                    # start the stage span
+        arcpy.SelectLayerByLocation_management('ForestStands', "WITHIN", 'WorkAreas', 0, "NEW_SELECTION")       # once the SearchCursor has completed, select all polygons from the 'ForestStands' layer that are "WITHIN" the 'WorkAreas' layer
+        arcpy.CopyFeatures_management('ForestStands', FSI_Selection_path)                                       # make a copy of the selected 'ForestStands' polygons to be the previously-defined FSI_Selection_path feature class
+        arcpy.SelectLayerByAttribute_management('WorkAreas', "CLEAR_SELECTION")                                 # clear the selection in 'WorkAreas'
+        print('Forest stands have been selected.')                                                              # print a statement to the terminal indicating progress
+        span.end()                                                                                              # end the stage span
+        print('Forest stands will now be subset with added fields for ongoing analysis.\n')                     # print a statement to the terminal to indicate the next stage of the script
+
+
+        # Subset the Selector-based Forest Stand Inventory Selection, then group and age the stands in one pass
+        #   These steps make the following selections:
+        #       1. Subset the Forest Stand Inventory to have only polygons that lie within Work Areas with active Selector features
+        #       2. Subset that selection to only include specific types of trees (the 'MN_CTYPE' values in the rule table)
+        #       3. Group the stands by 'MN_CTYPE' and stand age according to the rule table, leaving out the stands grouped as 'Remove'
+        #   The rule table (see forest_stand_rules.py) was approved by wildlife personnel and can be edited without changing this script.
+        span = tracer.start('build_groupings')                                                                  # start the stage span
+        Group_Counts = forest_stand_rules.build_groupings(FSI_Selection_path, FSI_selection_reduced_path, Rules, today_year)   # read 'MN_CTYPE', 'STAND_AGE', and 'SURVEY_YR' once, work out 'StangeAge' and 'Groupings' for every stand, and copy only the stands that are kept
+        for grouping, count in sorted(Group_Counts.items(), key=lambda item: str(item[0])):                     # set up a FOR loop over the groupings that were found
+            print('{}: {} stands'.format(grouping, count))                                                      # print the number of stands in each grouping (including those removed)
+        arcpy.MakeFeatureLayer_management(FSI_selection_reduced_path, 'FSI_Reduced')                            # make a temporary layer for the reduced forest stand inventory
+        print('Forest stand final product has been completed.')                                                 # print a statement to the terminal indicating progress
+        span.end(features_out=sum(Group_Counts.values()))                                                       # end the stage span with the number of stands grouped
+        print('The final product will now be dissolved according to the "'"Grouping"'" field.\n')               # print a statement to the terminal indicating the next step in the script.
+
+        # Dissolve by 'Groupings' field entries
+        #
+        # For my work, I present product layer in ArcMap documents so that each dissolved (multipart) polygon
+        #   displays its forest grouping type with a label. I don't need to know the individual species, but
+        #   this next bit can be ignored if it's unnecessary.
+        span = tracer.start('dissolve')                                                                         # start the stage span
+        if Dissolve_Engine == 'tiled':                                                                          # use the parallel tiled dissolve, one multipart polygon per 'Groupings' value
+            span.features_out = tiled_dissolve.dissolve_to('FSI_Reduced', FSI_Reduced_Dis_path, ['Groupings'], spill_dir=Scratch_Folder)  # union the stands tile by tile in worker processes and write the dissolved feature class
+        else:                                                                                                   # otherwise use the arcpy dissolve
+            arcpy.management.Dissolve('FSI_Reduced', FSI_Reduced_Dis_path, ['Groupings'], "", "MULTI_PART", "DISSOLVE_LINES")   # dissolve the 'FSI_Reduced' feature class (with all of the populated fields and reduced rows) so that it is multipart and dissolved along lines according to the just-defined FC name
+        span.end()                                                                                              # end the stage span with the number of dissolved features (tiled only)
+
+
+    # Record the new product in the product cache and delete the dated copies that are no longer needed
+    if Product_Cache:                                                                                           # only when the product cache is in use
+        Cache.store('forest', Cache_Key, [FSI_Reduced_Dis_path], today_full_str)                                # record the product under the fingerprint of its inputs
+        Cache.evict(Cache_Max_GB * 1024 ** 3, Cache_Max_Days)                                                   # delete the dated copies that are no longer needed
+        Cache.close()                                                                                           # close the index
+
+    # Display time taken just for fun:
+    tracer.finish()                                                                                             # print the time taken and write the JSON trace of the run
+    return FSI_Reduced_Dis_path                                                                                          # return the path of the dissolved forest stand layer to the calling script
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,267 @@
+#-------------------------------------------------------------------------------
+# Name:        forest_stand_pipeline.py (Lazy Forest Stand Pipeline)
+# Purpose:      This module runs the forest stand product without writing the
+#                   intermediate 'ForestStandSelection_<date>' and
+#                   'ForestStandSelection_Reduced_<date>' feature classes.
+#
+#                   1. The forest stand inventory is read once with a single filter: the
+#                       'MN_CTYPE IN (...)' prefilter from the rule table and an envelope
+#                       around the work areas are applied while reading, and each stand is
+#                       then checked to lie within one of the work areas (as with
+#                       SelectLayerByLocation_management(..., "WITHIN", 'WorkAreas')).
+#                   2. The stands are grouped and aged in memory (see forest_stand_rules.py)
+#                       and the stands grouped as 'Remove' are dropped.
+#                   3. The stands that are kept are dissolved by 'Groupings' straight from
+#                       memory (or, for the arcpy dissolve, from the 'memory' workspace), so the
+#                       final dissolved layer is the only feature class written to disk.
+#
+#                   run_sharded() splits the same work by work area: each selected work area
+#                   is an independent shard run in a worker process, and each shard's grouped
+#                   result is cached under a key made from the work-area geometry, the
+#                   inventory edition, the rule table, and the year. A rerun after a trail
+#                   becomes active or inactive only runs the work areas that are new, and
+#                   the final layer is reassembled from the cached shards. Shards cached for
+#                   an earlier inventory edition are dropped once a run finishes, and an
+#                   inventory whose edition cannot be told is never served from the cache.
+#
+# Author:      draleigh
+#
+# Created:     18 October 2026
+# Copyright:   (c) draleigh 2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+
+
+# Import modules and packages
+import os,hashlib,sqlite3,time                                                              # list of required modules
+from concurrent.futures import as_completed                                                 # collect the shards as the workers finish them
+import numpy as np                                                                          # vectorized grouping of the stands
+import shapely                                                                              # vectorized geometry functions
+from shapely import STRtree, wkb                                                            # the spatial index over the work areas; shards are passed as WKB
+import layer_io                                                                             # shared feature reading/writing helpers
+import forest_stand_rules                                                                   # the grouping rule table
+import process_pool                                                                         # worker processes for the shards
+import tiled_dissolve                                                                       # parallel tiled dissolve
+import trs_incremental                                                                      # geometry hashing
+
+import arcpy_runtime                                                                        # arcpy is only needed for the arcpy dissolve
+from arcpy_runtime import arcpy                                                             # imported on first use
+
+
+MEMORY_STANDS = r'memory\ForestStandSelection_Reduced'                                      # in-memory feature class for the arcpy dissolve
+
+
+# The stands that are kept, held in memory as parallel arrays
+class Stands(object):
+
+    def __init__(self, oids, ctypes, groupings, ages, geometries):
+        self.oids = np.asarray(oids, dtype=np.int64)
+        self.ctypes = np.asarray(ctypes)
+        self.groupings = np.asarray(groupings, dtype=object)
+        self.ages = np.asarray(ages, dtype=np.int64)
+        self.geometries = np.asarray(geometries, dtype=object)
+
+    def __len__(self):
+        return len(self.oids)
+
+    # Count the stands in each grouping
+    def counts(self):
+        counts = {}
+        for grouping in self.groupings:
+            counts[grouping] = counts.get(grouping, 0) + 1
+        return counts
+
+
+# Read the stands that lie within any of the work areas and pass the rule table's prefilter, then group them
+#   'areas' is a list of shapely work-area polygons; 'where' is added to the prefilter.
+#   Returns the kept stands (not grouped as 'Remove') as a Stands object.
+def filter_stands(inventory, areas, rules, year, where=None):
+    areas = [area for area in areas if area is not None and not area.is_empty]
+    if not areas:
+        return Stands([], [], [], [], [])
+    expression = forest_stand_rules.prefilter(rules)
+    if where:
+        expression = '({}) AND ({})'.format(where, expression)
+    bounds = shapely.bounds(np.asarray(areas, dtype=object))
+    bbox = (bounds[:, 0].min(), bounds[:, 1].min(), bounds[:, 2].max(), bounds[:, 3].max())     # envelope around every work area
+    fields = [forest_stand_rules.CTYPE_FIELD, forest_stand_rules.STAND_AGE_FIELD, forest_stand_rules.SURVEY_YEAR_FIELD]
+    rows, geometries = [], []
+    for oid, values, geom in layer_io.read_features(inventory, fields, expression, bbox=bbox):
+        if geom is None or geom.is_empty:
+            continue
+        rows.append((oid,) + tuple(-1 if v is None else v for v in values))
+        geometries.append(geom)
+    if not rows:
+        return Stands([], [], [], [], [])
+    geometries = np.asarray(geometries, dtype=object)
+    within = np.zeros(len(geometries), dtype=bool)
+    within[np.unique(STRtree(areas).query(geometries, predicate='within')[0])] = True     # stands that lie within a single work area
+    columns = np.asarray(rows, dtype=np.int64)[within]
+    ages = forest_stand_rules.stand_ages(columns[:, 2], columns[:, 3], year)
+    groupings = forest_stand_rules.classify(columns[:, 1], ages, rules)
+    keep = groupings != forest_stand_rules.REMOVE
+    return Stands(columns[keep, 0], columns[keep, 1], groupings[keep], ages[keep], geometries[within][keep])
+
+
+# Write the kept stands with their 'Groupings' and 'StangeAge' (e.g. to keep an intermediate, or to the 'memory' workspace)
+def write_stands(target, stands, template=None):
+    fields = [(forest_stand_rules.CTYPE_FIELD, 'LONG', None)] + forest_stand_rules.OUTPUT_FIELDS
+    rows = (((int(c), g, int(a)), geom) for c, g, a, geom in zip(stands.ctypes, stands.groupings, stands.ages, stands.geometries))
+    return layer_io.write_features(target, fields, rows, 'Polygon', template=template)
+
+
+# Dissolve the kept stands by 'Groupings' into 'target', the only feature class written to disk
+#   'engine' is 'tiled' (dissolved from memory in worker processes, spilling to 'spill_dir') or 'arcpy' (Dissolve from the 'memory' workspace).
+def dissolve_stands(stands, target, template, engine='tiled', workers=None, spill_dir=None):
+    if engine == 'tiled':
+        dissolved = tiled_dissolve.dissolve_features((((g,), geom) for g, geom in zip(stands.groupings, stands.geometries)), workers, spill_dir=spill_dir)
+        return tiled_dissolve.write_dissolved(target, [forest_stand_rules.OUTPUT_FIELDS[0]], dissolved, template)
+    if not arcpy_runtime.available():
+        raise ImportError('arcpy is required for the arcpy dissolve of {}.'.format(target))
+    write_stands(MEMORY_STANDS, stands, template)
+    arcpy.management.Dissolve(MEMORY_STANDS, target, ['Groupings'], "", "MULTI_PART", "DISSOLVE_LINES")
+    arcpy.Delete_management(MEMORY_STANDS)
+    return int(arcpy.GetCount_management(target).getOutput(0))
+
+
+# Run the whole product: filter and group the stands within the work areas, then dissolve them into 'target'
+#   'work_areas' is a feature class or layer (a layer's selection is honored). Returns the kept Stands.
+def run(inventory, work_areas, target, rules, year, engine='tiled', where=None, workers=None, spill_dir=None):
+    start_time = time.time()
+    areas = [geom for _, _, geom in layer_io.read_features(work_areas)]
+    stands = filter_stands(inventory, areas, rules, year, where)
+    print('{} stands kept within {} work areas (%s seconds).'.format(len(stands), len(areas)) % round(time.time() - start_time))
+    dissolve_stands(stands, target, inventory, engine, workers, spill_dir)
+    return stands
+
+
+# Persistent cache of shard results: {shard key: {grouping: (dissolved WKB, number of stands)}}
+class ShardCache(object):
+
+    def __init__(self, path):
+        self.path = path                                                                    # location of the SQLite file
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS shards (shard_key TEXT, area_name TEXT, grouping TEXT, geometry BLOB, stands INTEGER, run_date TEXT, edition TEXT)')
+        if 'edition' not in [row[1] for row in self.conn.execute('PRAGMA table_info(shards)')]:   # caches written before shards recorded their edition
+            self.conn.execute('ALTER TABLE shards ADD COLUMN edition TEXT')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS shards_key ON shards (shard_key)')
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    # Return the cached {grouping: (WKB, stands)} for a shard key, or None if the shard has not been run
+    def get(self, key):
+        rows = self.conn.execute('SELECT grouping, geometry, stands FROM shards WHERE shard_key = ?', (key,)).fetchall()
+        if not rows:
+            return None
+        return dict((grouping, (geometry, stands)) for grouping, geometry, stands in rows if geometry is not None)
+
+    # Save a shard's result; an empty result is kept as a single marker row so the shard is not run again
+    def save(self, key, area_name, result, run_date, edition=None):
+        self.conn.execute('DELETE FROM shards WHERE shard_key = ?', (key,))
+        rows = ([(key, area_name, grouping, geometry, stands, run_date, edition) for grouping, (geometry, stands) in result.items()]
+                or [(key, area_name, None, None, 0, run_date, edition)])
+        self.conn.executemany('INSERT INTO shards (shard_key, area_name, grouping, geometry, stands, run_date, edition) VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+        self.conn.commit()
+
+    # Drop every shard cached for another inventory edition (they can never be used again); returns the number of rows dropped
+    def evict(self, edition):
+        dropped = self.conn.execute('DELETE FROM shards WHERE edition IS NULL OR edition <> ?', (edition,)).rowcount
+        self.conn.commit()
+        if dropped:
+            self.conn.execute('VACUUM')                                                     # give the space of the dropped geometries back
+        return dropped
+
+
+# Describe the edition of the inventory from its files (see layer_io.dataset_edition())
+def inventory_edition(inventory):
+    return layer_io.dataset_edition(inventory)
+
+
+# Hash the rule table so that changing a grouping or an age cutoff invalidates the cached shards
+def rules_hash(rules):
+    return hashlib.sha1(repr(rules).encode('utf-8')).hexdigest()
+
+
+# Key for one shard: the work-area geometry, the inventory edition, the rules, the year, and any extra filter
+def shard_key(area, edition, rules, year, where=None):
+    parts = [trs_incremental.geometry_hash(area), str(edition), rules_hash(rules), str(year), where or '']
+    return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+# Worker initializer: import arcpy once per worker when the inventory is read through it
+def _start_worker(inventory):
+    if not layer_io.is_open_format(inventory):
+        arcpy_runtime.load()
+
+
+# Worker: filter, group, and dissolve the stands within one work area
+#   Returns {grouping: (dissolved WKB, number of stands)}.
+def _run_shard(inventory, area_wkb, rules, year, where):
+    stands = filter_stands(inventory, [wkb.loads(area_wkb)], rules, year, where)
+    result = {}
+    for grouping in set(stands.groupings):
+        mask = stands.groupings == grouping
+        result[grouping] = (wkb.dumps(shapely.union_all(stands.geometries[mask])), int(mask.sum()))
+    return result
+
+
+# Run the product one work area at a time in worker processes, reusing cached shards from 'cache_path'
+#   'work_areas' is a feature class or layer (a layer's selection is honored); 'edition' defaults to inventory_edition().
+#   If the edition cannot be told, every work area is run and nothing is read from or saved to the cache.
+#   Returns {grouping: number of stands} over every shard (stands in overlapping work areas count once per area).
+def run_sharded(inventory, work_areas, target, rules, year, cache_path, name_field='AREA_NAME', edition=None, engine='tiled', where=None, workers=None, spill_dir=None):
+    start_time = time.time()
+    edition = edition if edition is not None else inventory_edition(inventory)
+    if edition is None:
+        print('The edition of {} cannot be told (see layer_io.dataset_edition()), so no cached work areas are used; pass its release as the edition to use the cache.'.format(inventory))
+    shards = [(values[0], geom, shard_key(geom, edition, rules, year, where))
+              for _, values, geom in layer_io.read_features(work_areas, [name_field]) if geom is not None and not geom.is_empty]
+    results = {}
+    with ShardCache(cache_path) as cache:
+        pending = []
+        for name, geom, key in shards:
+            cached = cache.get(key) if edition is not None else None
+            if cached is None:
+                pending.append((name, geom, key))
+            else:
+                results[key] = cached
+        print('{} work areas, {} cached, {} to process.'.format(len(shards), len(shards) - len(pending), len(pending)))
+        if pending:
+            workers = min(workers or os.cpu_count(), len(pending))                           # no more workers (each importing arcpy) than work areas to run
+            with process_pool.worker_pool(workers, _start_worker, (inventory,)) as pool:
+                futures = dict((pool.submit(_run_shard, inventory, wkb.dumps(geom), rules, year, where), (name, key)) for name, geom, key in pending)
+                for future in as_completed(futures):
+                    name, key = futures[future]
+                    results[key] = future.result()                                          # re-raises any worker error
+                    if edition is not None:
+                        cache.save(key, name, results[key], time.strftime('%Y%m%d'), str(edition))   # save each shard as soon as it finishes
+                    print('{} Work Area processed ({} stands).'.format(name, sum(stands for _, stands in results[key].values())))
+        if edition is not None:
+            dropped = cache.evict(str(edition))                                             # keep only the shards of the current edition
+            if dropped:
+                print('{} cached shard rows of earlier inventory editions dropped.'.format(dropped))
+
+    counts, pieces = {}, []                                                                 # reassemble the product from every shard
+    for name, geom, key in shards:
+        for grouping, (geometry, stands) in results[key].items():
+            counts[grouping] = counts.get(grouping, 0) + stands
+            pieces.append(((grouping,), wkb.loads(geometry)))
+    fields = [forest_stand_rules.OUTPUT_FIELDS[0]]
+    if engine == 'tiled':
+        tiled_dissolve.write_dissolved(target, fields, tiled_dissolve.dissolve_features(pieces, workers, spill_dir=spill_dir), inventory)
+    else:
+        if not arcpy_runtime.available():
+            raise ImportError('arcpy is required for the arcpy dissolve of {}.'.format(target))
+        layer_io.write_features(MEMORY_STANDS, fields, pieces, 'MultiPolygon', template=inventory)
+        arcpy.management.Dissolve(MEMORY_STANDS, target, ['Groupings'], "", "MULTI_PART", "DISSOLVE_LINES")
+        arcpy.Delete_management(MEMORY_STANDS)
+    print('Sharded forest stand product complete (%s seconds).' % round(time.time() - start_time))
+    return counts
@@ -0,0 +1,134 @@
+#-------------------------------------------------------------------------------
+# Name:        forest_stand_rules.py (Forest Stand Grouping Rules)
+# Purpose:      This module replaces the three UpdateCursor passes of
+#                   forest_stand_groupings_layer_production.py ('StangeAge', then
+#                   'Groupings', then deleting 'Remove' rows) and the hard-coded
+#                   'MN_CTYPE = 12 Or ...' expression with a single rule table.
+#
+#                   The rule table (forest_stand_rules.csv) has one row per rule, in order
+#                   of priority; the first rule that matches a stand sets its grouping:
+#
+#                       Grouping,MN_CTYPE,MinAge,MaxAge
+#                       Young Forest,12 13 14 82,,20
+#
+#                   'MN_CTYPE' lists the cover types (separated by spaces), 'MinAge' is
+#                   the youngest stand age included and 'MaxAge' the first age excluded
+#                   (a blank age means no limit). Stands grouped as 'Remove' are left out
+#                   of the product. Every cover type in the table is part of the prefilter.
+#
+#                   The stands are read once into NumPy arrays, the age and grouping are
+#                   worked out for every stand at once, and only the stands that are kept
+#                   are written to the reduced feature class.
+#
+# Author:      draleigh
+#
+# Created:     18 October 2026
+# Copyright:   (c) draleigh 2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+
+
+# Import modules and packages
+import os,csv                                                                               # list of required modules
+import numpy as np                                                                          # vectorized age and grouping calculations
+import layer_io                                                                             # shared feature reading/writing helpers
+
+
+RULE_TABLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'forest_stand_rules.csv')  # the default rule table, kept beside the scripts
+REMOVE = 'Remove'                                                                           # grouping for stands that are left out of the product
+UNKNOWN_AGE = 1000                                                                          # age given to stands without a survey year, so that they count as too old
+CTYPE_FIELD = 'MN_CTYPE'                                                                    # forest stand cover type
+STAND_AGE_FIELD = 'STAND_AGE'                                                               # stand age in the survey year
+SURVEY_YEAR_FIELD = 'SURVEY_YR'                                                             # year of the survey
+
+# Fields added to the reduced feature class, as (name, type, length) for AddField
+OUTPUT_FIELDS = [('Groupings', 'TEXT', 25), ('StangeAge', 'SHORT', None)]
+
+
+# One row of the rule table
+class Rule(object):
+
+    def __init__(self, grouping, ctypes, min_age=None, max_age=None):
+        self.grouping = grouping
+        self.ctypes = sorted(set(int(c) for c in ctypes))
+        self.min_age = min_age                                                              # youngest age included (None for no limit)
+        self.max_age = max_age                                                              # first age excluded (None for no limit)
+
+    def __repr__(self):
+        return 'Rule({!r}, {}, {}, {})'.format(self.grouping, self.ctypes, self.min_age, self.max_age)
+
+    # Boolean mask of the stands this rule matches
+    def matches(self, ctypes, ages):
+        mask = np.isin(ctypes, self.ctypes)
+        if self.min_age is not None:
+            mask &= ages >= self.min_age
+        if self.max_age is not None:
+            mask &= ages < self.max_age
+        return mask
+
+
+# Read the rule table (a CSV file with Grouping, MN_CTYPE, MinAge, and MaxAge columns), in order of priority
+def load_rules(path=RULE_TABLE):
+    rules = []
+    with open(path, newline='') as f:
+        for number, row in enumerate(csv.DictReader(f), 2):                                 # row 1 is the header
+            grouping = (row.get('Grouping') or '').strip()
+            if not grouping:
+                continue                                                                    # blank lines are ignored
+            try:
+                ctypes = [int(c) for c in (row.get('MN_CTYPE') or '').replace(',', ' ').split()]
+                min_age = int(row['MinAge']) if (row.get('MinAge') or '').strip() else None
+                max_age = int(row['MaxAge']) if (row.get('MaxAge') or '').strip() else None
+            except ValueError:
+                raise ValueError('Row {} of {} is not a valid rule: {}'.format(number, path, row))
+            if not ctypes:
+                raise ValueError('Row {} of {} has no MN_CTYPE values.'.format(number, path))
+            rules.append(Rule(grouping, ctypes, min_age, max_age))
+    return rules
+
+
+# Build the prefilter for the stands covered by the rules, e.g. "MN_CTYPE IN (12, 13, 14, ...)"
+def prefilter(rules, field=CTYPE_FIELD):
+    ctypes = sorted(set(c for rule in rules for c in rule.ctypes))
+    return '{} IN ({})'.format(field, ', '.join(str(c) for c in ctypes))
+
+
+# Work out the age of every stand in 'year': year - SURVEY_YR + STAND_AGE
+#   Stands without a survey year (0 or <Null>) or without a stand age get UNKNOWN_AGE.
+def stand_ages(stand_age, survey_year, year):
+    stand_age = np.asarray(stand_age, dtype=np.int64)
+    survey_year = np.asarray(survey_year, dtype=np.int64)
+    known = (survey_year > 0) & (stand_age >= 0)
+    return np.where(known, year - survey_year + stand_age, UNKNOWN_AGE)
+
+
+# Apply the rules to every stand at once; the first matching rule wins
+#   Returns an array of groupings (None where no rule matches).
+def classify(ctypes, ages, rules):
+    ctypes = np.asarray(ctypes)
+    ages = np.asarray(ages)
+    groupings = np.full(len(ctypes), None, dtype=object)
+    open_rows = np.ones(len(ctypes), dtype=bool)                                            # stands not yet grouped
+    for rule in rules:
+        mask = open_rows & rule.matches(ctypes, ages)
+        groupings[mask] = rule.grouping
+        open_rows &= ~mask
+    return groupings
+
+
+# Read the stands, group them, and write the stands that are kept (with 'Groupings' and 'StangeAge') to 'target'
+#   'where' is added to the prefilter built from the rules. Returns {grouping: number of stands}.
+def build_groupings(source, target, rules, year, where=None):
+    expression = prefilter(rules)
+    if where:
+        expression = '({}) AND ({})'.format(where, expression)
+    oids, columns = layer_io.read_columns(source, [CTYPE_FIELD, STAND_AGE_FIELD, SURVEY_YEAR_FIELD], expression, null_value=-1)
+    ages = stand_ages(columns[STAND_AGE_FIELD], columns[SURVEY_YEAR_FIELD], year)
+    groupings = classify(columns[CTYPE_FIELD], ages, rules)
+    keep = np.flatnonzero(groupings != REMOVE)
+    values_by_oid = dict((int(oids[i]), (groupings[i], int(ages[i]))) for i in keep)
+    layer_io.copy_with_fields(source, target, OUTPUT_FIELDS, values_by_oid, expression)
+    counts = {}
+    for grouping in groupings:
+        counts[grouping] = counts.get(grouping, 0) + 1
+    return counts
@@ -0,0 +1,268 @@
+#-------------------------------------------------------------------------------
+# Name:        lakeshore_engine.py (Lakeshore Parcel Engine)
+# Purpose:      This module replaces the "DOWLKNUM = '...' OR ..." expression and the
+#                   single SelectLayerByLocation_management(..., "INTERSECT", 'Lakes')
+#                   of lakeshore_parcel_selection_layer_production.py.
+#
+#                   1. The lake IDs from the workbook are resolved with chunked
+#                       "DOWLKNUM IN (...)" lists, and every lake read back is checked
+#                       against a set of the requested IDs (so IDs stored as numbers in
+#                       the workbook still match the text field).
+#                   2. The selected lakes are held in an STR-tree spatial index, loaded
+#                       once into each worker process.
+#                   3. The parcels inside the envelope of the selected lakes are streamed
+#                       in chunks to the workers, which join each parcel to every lake it
+#                       intersects.
+#
+#                   4. In the same pass, the shoreline frontage of each parcel is measured:
+#                       the lake boundary rings are kept as arrays of segments, the segments
+#                       outside each parcel's envelope are pruned with a NumPy test, and the
+#                       remaining segments are clipped to the parcel. 'Frontage_M' is the length
+#                       of shoreline on the parcel, and 'Frontage_Pct' is that length as a share
+#                       of the parcel perimeter.
+#
+#                   The result is a parcel-to-lake attribution ({parcel OBJECTID: {lake ID: frontage}})
+#                   that is written as a relation table and as fields on the parcel selection.
+#
+# Author:      draleigh
+#
+# Created:     18 October 2026
+# Copyright:   (c) draleigh 2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+
+
+# Import modules and packages
+import time                                                                                 # list of required modules
+from concurrent.futures import as_completed                                                 # collect the chunks as the workers finish them
+import numpy as np                                                                          # used for the lake envelopes
+import shapely                                                                              # vectorized geometry functions
+from shapely import STRtree, wkb                                                            # the spatial index over the lakes; geometries are passed as WKB
+import layer_io                                                                             # shared feature reading/writing helpers
+import process_pool                                                                         # worker processes for the parcel chunks
+import trs_values                                                                           # trimming lists of values to a field length
+
+
+LAKE_ID_FIELD = 'DOWLKNUM'                                                                  # lake ID field of the hydrography layer
+ID_CHUNK_SIZE = 1000                                                                        # lake IDs per "IN (...)" list
+CHUNK_SIZE = 20000                                                                          # parcels sent to a worker at a time
+FRONTAGE_TOLERANCE = 0.0                                                                    # shoreline this far (in meters) outside a parcel still counts as its frontage
+
+# Fields added to the parcel selection, as (name, type, length) for AddField
+FRONTAGE_FIELDS = [('Frontage_M', 'DOUBLE', None), ('Frontage_Pct', 'DOUBLE', None)]
+
+
+# Turn a workbook value into a lake ID: 18030800.0 -> '18030800', ' 01006200 ' -> '01006200'
+def normalize_lake_id(value):
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    value = str(value).strip()
+    return value or None
+
+
+# Build "DOWLKNUM IN ('a', 'b', ...)" expressions for the lake IDs, 'chunk_size' IDs at a time
+def lake_id_expressions(lake_ids, field=LAKE_ID_FIELD, chunk_size=ID_CHUNK_SIZE):
+    lake_ids = sorted(set(lake_ids))
+    for start in range(0, len(lake_ids), chunk_size):
+        chunk = lake_ids[start:start + chunk_size]
+        yield '{} IN ({})'.format(field, ', '.join("'{}'".format(lake_id.replace("'", "''")) for lake_id in chunk))
+
+
+# Break the boundary rings of a polygon into an (n, 4) array of segments (x1, y1, x2, y2)
+def boundary_segments(geometry):
+    segments = [np.empty((0, 4))]
+    for ring in shapely.get_parts(shapely.boundary(geometry)):
+        coords = shapely.get_coordinates(ring)
+        if len(coords) > 1:
+            segments.append(np.hstack([coords[:-1], coords[1:]]))
+    return np.vstack(segments)
+
+
+# The selected lakes with their IDs, in an STR-tree index, and their shorelines as segment arrays
+class LakeIndex(object):
+
+    def __init__(self, lake_ids, geometries):
+        self.lake_ids = list(lake_ids)
+        self.geometries = np.asarray(geometries, dtype=object)
+        self.tree = STRtree(self.geometries)
+        segments = [boundary_segments(g) for g in self.geometries]
+        self.offsets = np.cumsum([0] + [len(seg) for seg in segments])                      # the segments of lake i are offsets[i]:offsets[i + 1]
+        self.segments = np.vstack(segments) if segments else np.empty((0, 4))
+        self.segment_boxes = np.column_stack([np.minimum(self.segments[:, 0], self.segments[:, 2]), np.minimum(self.segments[:, 1], self.segments[:, 3]),
+                                              np.maximum(self.segments[:, 0], self.segments[:, 2]), np.maximum(self.segments[:, 1], self.segments[:, 3])])
+
+    def __len__(self):
+        return len(self.lake_ids)
+
+    # Envelope around every selected lake (xmin, ymin, xmax, ymax), or None without lakes
+    def extent(self):
+        if not len(self.geometries):
+            return None
+        bounds = shapely.bounds(self.geometries)
+        return (bounds[:, 0].min(), bounds[:, 1].min(), bounds[:, 2].max(), bounds[:, 3].max())
+
+    # Measure the shoreline of lake 'lakes[k]' that lies on geometry 'positions[k]' for every pair k
+    #   Segments outside the envelope of the geometry are pruned before the rest are clipped to it.
+    def frontage(self, geometries, positions, lakes, tolerance=FRONTAGE_TOLERANCE):
+        bounds = shapely.bounds(geometries) + np.array([-tolerance, -tolerance, tolerance, tolerance])
+        segment_index, segment_pair = [], []
+        for k, (position, lake) in enumerate(zip(positions, lakes)):
+            start, end = self.offsets[lake], self.offsets[lake + 1]
+            boxes, box = self.segment_boxes[start:end], bounds[position]
+            near = np.flatnonzero((boxes[:, 0] <= box[2]) & (boxes[:, 2] >= box[0]) & (boxes[:, 1] <= box[3]) & (boxes[:, 3] >= box[1]))
+            segment_index.append(near + start)
+            segment_pair.append(np.full(len(near), k))
+        if not segment_index:
+            return np.zeros(0)
+        segment_index, segment_pair = np.concatenate(segment_index), np.concatenate(segment_pair)
+        clip = geometries if not tolerance else shapely.buffer(geometries, tolerance)
+        lines = shapely.linestrings(self.segments[segment_index].reshape(-1, 2, 2))
+        lengths = shapely.length(shapely.intersection(lines, clip[np.asarray(positions)[segment_pair]]))   # every candidate segment clipped at once
+        return np.bincount(segment_pair, lengths, minlength=len(positions))
+
+    # Join geometries to the lakes they intersect and measure the frontage on each lake
+    #   Returns {position: {lake ID: frontage}} for the geometries that touch a lake.
+    def join(self, geometries, tolerance=FRONTAGE_TOLERANCE):
+        found = {}
+        if not len(self.geometries):
+            return found
+        geometries = np.asarray(geometries, dtype=object)
+        pairs = self.tree.query(geometries, predicate='intersects')
+        lengths = self.frontage(geometries, pairs[0], pairs[1], tolerance)
+        for position, lake, length in zip(pairs[0].tolist(), pairs[1].tolist(), lengths.tolist()):
+            lake_id = self.lake_ids[lake]
+            frontages = found.setdefault(position, {})
+            frontages[lake_id] = frontages.get(lake_id, 0.0) + length                      # a lake made of several features is listed once
+        return found
+
+    # Read the lakes with the requested IDs
+    #   Returns (LakeIndex, sorted list of requested IDs that were not found).
+    @classmethod
+    def from_layer(cls, lakes, lake_ids, field=LAKE_ID_FIELD, chunk_size=ID_CHUNK_SIZE):
+        wanted = set(lake_id for lake_id in (normalize_lake_id(value) for value in lake_ids) if lake_id)
+        found_ids, geometries = [], []
+        for expression in lake_id_expressions(wanted, field, chunk_size):
+            for _, values, geom in layer_io.read_features(lakes, [field], expression):
+                lake_id = normalize_lake_id(values[0])
+                if lake_id in wanted and geom is not None and not geom.is_empty:             # hash lookup against the requested IDs
+                    found_ids.append(lake_id)
+                    geometries.append(geom)
+        return cls(found_ids, geometries), sorted(wanted - set(found_ids))
+
+
+_worker_lakes = None                                                                        # the lake index in each worker process
+
+
+# Worker initializer: build the lake index once per worker
+def _load_lakes(lake_ids, lake_wkb):
+    global _worker_lakes
+    _worker_lakes = LakeIndex(lake_ids, [wkb.loads(g) for g in lake_wkb])
+
+
+# Worker: join one chunk of parcels [(OBJECTID, WKB)] to the lakes
+#   Returns {OBJECTID: ({lake ID: frontage}, perimeter)}.
+def _join_chunk(parcels, tolerance):
+    geometries = [wkb.loads(g) for _, g in parcels]
+    found = _worker_lakes.join(geometries, tolerance)
+    return dict((parcels[position][0], (frontages, geometries[position].length)) for position, frontages in found.items())
+
+
+# Join the parcels to the lakes they intersect and measure their frontage, in parallel chunks
+#   Returns ({parcel OBJECTID: {lake ID: frontage}}, {parcel OBJECTID: perimeter}) for every parcel that touches a selected lake.
+def join_parcels_to_lakes(parcels, index, where=None, workers=None, chunk_size=CHUNK_SIZE, tolerance=FRONTAGE_TOLERANCE):
+    extent = index.extent()
+    if extent is None:
+        return {}, {}
+    features = ((oid, geom) for oid, _, geom in layer_io.read_features(parcels, where=where, bbox=extent))   # only parcels near the selected lakes are read
+    return join_features_to_lakes(features, index, workers, chunk_size, tolerance)
+
+
+# Join (OBJECTID, shapely geometry) pairs (e.g. parcels already in memory) to the lakes, as join_parcels_to_lakes() does
+def join_features_to_lakes(features, index, workers=None, chunk_size=CHUNK_SIZE, tolerance=FRONTAGE_TOLERANCE):
+    start_time = time.time()
+    lakes_by_oid, perimeter_by_oid = {}, {}
+    if not len(index):
+        return lakes_by_oid, perimeter_by_oid
+    lake_wkb = [wkb.dumps(g) for g in index.geometries]
+    with process_pool.worker_pool(workers, _load_lakes, (index.lake_ids, lake_wkb)) as pool:
+        futures, chunk = [], []
+        for oid, geom in features:
+            if geom is None or geom.is_empty:
+                continue
+            chunk.append((oid, wkb.dumps(geom)))
+            if len(chunk) >= chunk_size:
+                futures.append(pool.submit(_join_chunk, chunk, tolerance))
+                chunk = []
+        if chunk:
+            futures.append(pool.submit(_join_chunk, chunk, tolerance))
+        for future in as_completed(futures):
+            for oid, (frontages, perimeter) in future.result().items():                     # re-raises any worker error
+                lakes_by_oid[oid] = frontages
+                perimeter_by_oid[oid] = perimeter
+    print('{} parcels touch {} selected lakes (%s seconds).'.format(len(lakes_by_oid), len(index)) % round(time.time() - start_time))
+    return lakes_by_oid, perimeter_by_oid
+
+
+_worker_snapshot = None                                                                     # the parcel snapshot in each worker process
+
+
+# Worker initializer for join_snapshot_to_lakes(): build the lake index and open the snapshot (which maps its files) once per worker
+def _load_lakes_and_snapshot(lake_ids, lake_wkb, snapshot):
+    global _worker_snapshot
+    _load_lakes(lake_ids, lake_wkb)
+    _worker_snapshot = snapshot
+
+
+# Worker: join the parcels at one chunk of snapshot positions to the lakes, reading their WKB from the mapped files
+#   Returns {OBJECTID: ({lake ID: frontage}, perimeter)}.
+def _join_snapshot_chunk(positions, tolerance):
+    geometries = _worker_snapshot.geometries(positions)
+    oids = _worker_snapshot.oids[positions].tolist()
+    found = _worker_lakes.join(geometries, tolerance)
+    return dict((oids[position], (frontages, shapely.length(geometries[position]))) for position, frontages in found.items())
+
+
+# Join the parcels in a snapshot (see parcel_snapshot.py) to the lakes, as join_parcels_to_lakes() does
+#   Only positions are sent to the workers; each reads the parcels it needs from the snapshot itself.
+def join_snapshot_to_lakes(snapshot, index, workers=None, chunk_size=CHUNK_SIZE, tolerance=FRONTAGE_TOLERANCE):
+    start_time = time.time()
+    lakes_by_oid, perimeter_by_oid = {}, {}
+    if not len(index):
+        return lakes_by_oid, perimeter_by_oid
+    positions = snapshot.within_bbox(index.extent())                                        # only parcels near the selected lakes are read
+    lake_wkb = [wkb.dumps(g) for g in index.geometries]
+    with process_pool.worker_pool(workers, _load_lakes_and_snapshot, (index.lake_ids, lake_wkb, snapshot)) as pool:
+        futures = [pool.submit(_join_snapshot_chunk, positions[start:start + chunk_size], tolerance) for start in range(0, len(positions), chunk_size)]
+        for future in as_completed(futures):
+            for oid, (frontages, perimeter) in future.result().items():                     # re-raises any worker error
+                lakes_by_oid[oid] = frontages
+                perimeter_by_oid[oid] = perimeter
+    print('{} parcels touch {} selected lakes (%s seconds).'.format(len(lakes_by_oid), len(index)) % round(time.time() - start_time))
+    return lakes_by_oid, perimeter_by_oid
+
+
+# Return (Frontage_M, Frontage_Pct) for one parcel: its total frontage and the share of its perimeter on the shore
+def frontage_metrics(frontages, perimeter):
+    length = sum(frontages.values())
+    percent = min(100.0, 100.0 * length / perimeter) if perimeter else 0.0                  # shoreline crossing the parcel can be longer than its perimeter
+    return round(length, 2), round(percent, 2)
+
+
+# Write the parcel-to-lake relation table: one row per (parcel OBJECTID, lake ID) pair, with the frontage on that lake
+def write_relation_table(target, lakes_by_oid, parcel_field='PARCEL_OID', lake_field=LAKE_ID_FIELD, lake_length=20):
+    rows = ((oid, lake_id, round(frontage, 2)) for oid in sorted(lakes_by_oid) for lake_id, frontage in lakes_by_oid[oid].items())
+    return layer_io.write_table(target, [(parcel_field, 'LONG', None), (lake_field, 'TEXT', lake_length), (FRONTAGE_FIELDS[0][0], 'DOUBLE', None)], rows)
+
+
+# Copy the parcels that touch a selected lake to 'target', with the lake IDs of each parcel in 'field'
+#   and its frontage metrics in 'Frontage_M' and 'Frontage_Pct'
+def write_parcel_selection(parcels, target, lakes_by_oid, perimeter_by_oid, field=(LAKE_ID_FIELD, 'TEXT', 254)):
+    return layer_io.copy_with_fields(parcels, target, [field] + FRONTAGE_FIELDS, selection_values(lakes_by_oid, perimeter_by_oid, field))
+
+
+# Return {parcel OBJECTID: (lake IDs, Frontage_M, Frontage_Pct)}, the values write_parcel_selection() adds to each parcel
+def selection_values(lakes_by_oid, perimeter_by_oid, field=(LAKE_ID_FIELD, 'TEXT', 254)):
+    return dict((oid, (trs_values.fit_field(', '.join(frontages), field[2]),) + frontage_metrics(frontages, perimeter_by_oid[oid]))
+                for oid, frontages in lakes_by_oid.items())
@@ -16,15 +16,12 @@
 
 
 # Import modules and packages
-import os,arcpy,time,datetime,copy,openpyxl                                                 # list of modules that will be needed
+import os,time,datetime,copy                                                                # list of modules that will be needed
+from arcpy_runtime import arcpy                                                             # arcpy is imported when the first tool is called (see arcpy_runtime.py)
 from datetime import date, timedelta                                                        # extract the sub modules
-from openpyxl import load_workbook                                                          # extract the sub module
-from arcpy import env                                                                       # extract the sub module
-from arcpy.sa import *                                                                      # import the Spatial Analyst toolbar
-arcpy.CheckOutExtension("Spatial")                                                          # check out the Spatial Analyst toolbar
+import lakeshore_engine,parcel_snapshot,product_cache,spreadsheet_loader,stage_tracing      # indexed parcel/lake join, parcel snapshot, product cache, workbook loading, and stage tracing
 
 # Date Management
-start_time = time.time()                                                                    # define the start time of the script
 today = date.today()                                                                        # define the date of the script's run
 today_year = today.year                                                                     # define the year of the script's run
 today_month = today.month                                                                   # define the month of the script's run
@@ -42,30 +39,79 @@ Lakeshore_GDB = r"*folderpath*\Lakeshore_Parcel_Ownership_Analysis.gdb"
 Lakes = r"*folderpath*\dnr_hydro_features_all"                                                   # define the location of the feature class that you'll pull the selecting features from
 Parcels = r"*folderpath*\plan_parcels_minnesota"                                                # define the location of the feature class that you'll ultimately select parcels from
 Input = r"*folderpath*\Test_Lakes.xlsx"                                                         # define the location of the file that holds the lake ID values
+Lake_ID_Column = 2                                                                              # define the workbook column that holds the lake ID values: a column number (2 reads column B, as the script always has) or a header name (e.g. 'DOWLKNUM')
 Parcel_Selection = os.path.join(Lakeshore_GDB, 'Parcel_Selection_' + today_full_str)            # define the file path of the feature class that will be produced
+Parcel_Lake_Table = os.path.join(Lakeshore_GDB, 'Parcel_Lake_' + today_full_str)                # define the file path of the table that records which lake(s) each parcel touches
+Lakeshore_Engine = 'indexed'                                                                    # define how parcels are matched to lakes: 'indexed' (see lakeshore_engine.py) or 'arcpy' (SelectLayerByLocation_management)
+Parcel_Snapshot = None                                                                          # define the folder of the columnar parcel snapshot used by the 'indexed' engine, e.g. os.path.join(os.path.dirname(Lakeshore_GDB), 'parcel_snapshot') (rebuilt when the parcels change; None, the default, reads the parcel layer; see parcel_snapshot.py)
+Product_Cache = os.path.join(os.path.dirname(Lakeshore_GDB), 'product_cache.sqlite')            # define the location of the index of built products (None rebuilds the product on every run; see product_cache.py)
+Cache_Max_Days = 14                                                                             # define the number of days an unused dated copy of the product is kept
+Cache_Max_GB = 10                                                                               # define the size (in GB) the dated copies of the products are trimmed to
+Trace_Folder = os.path.join(os.path.dirname(Lakeshore_GDB), 'Traces')                           # define the folder that receives the JSON trace of each run (None writes no trace)
+Profile_Stages = []                                                                             # define the stages to run under cProfile, e.g. ['select_parcels'] ('*' for every stage; see stage_tracing.py)
+Memory_Stages = []                                                                              # define the stages to run under tracemalloc, e.g. ['select_parcels'] ('*' for every stage)
 
 
-# Obtain Lake IDs by the column specified (but need to know the number, not name of column)
-Lake_IDs_full = []                                                                              # set up an empty list to hold values
-wb = openpyxl.load_workbook(Input)                                                              # use the openpyxl module to load the workbook that you've already defined
-sheet = wb['Test_Lakes']                                                                        # define the sheet according to the name of the sheet in the workbook
-for val in sheet.iter_rows(min_col=2):                                                          # set up for loop to iterate over rows in the sheet for the second column (this one holds the lake ID values)
-    Lake_IDs_full.append(val[0].value)                                                          # add the initial value from that row (limited to start at column 2) to the previously set-up list
-    print(val[0].value)                                                                         # display the value to the terminal (not necessary)
-Lake_IDs = Lake_IDs_full[1:]                                                                    # remove the first value in the list (the header of the column, if necessary)
-print(Lake_IDs)                                                                                 # print the entire list (if necessary)
 
-# Use the Lake IDs (Lake_IDs list) to select the lakes from the GDRS Hydrography shapefile
-arcpy.MakeFeatureLayer_management(Lakes, 'Lakes')                                               # set up a temporary feature layer for use with the arcpy module
-Lake_String = ''                                                                                # set up an empty string
-for x in range(len(Lake_IDs)):                                                                  # start a for loop to iterate over the list that has been previously defined
-    Lake_String = Lake_String + "DOWLKNUM = '" + str(Lake_IDs[x]) + "' OR "                     # the for loop will add values to the string for each iteration to produce an expression in SQL
-Lake_Expression = Lake_String[:-4]                                                              # once the for loop is finished, define a new string that takes off the final 4 digits (which are " OR ")
-print(Lake_Expression)                                                                          # print the entire string (if necessary)
+# Produce the lakeshore parcel layer (run when the script is started directly, or by another script that imports it and calls main())
+def main():
+    tracer = stage_tracing.Tracer('lakeshore_parcel_selection', Trace_Folder, Profile_Stages, Memory_Stages)   # record the time, memory, and feature counts of each stage of the run
+    # Publish the product from the product cache if none of its inputs or settings have changed since it was last built
+    Product_Datasets = [Parcel_Selection, Parcel_Lake_Table] if Lakeshore_Engine == 'indexed' else [Parcel_Selection]  # the datasets that make up the product (the arcpy selection writes no table)
+    if Product_Cache:                                                                           # check the product cache before any work is done
+        Cache = product_cache.ProductCache(Product_Cache)                                       # open the index of built products
+        Cache_Key = product_cache.fingerprint({'parcels': product_cache.edition(Parcels), 'lakes': product_cache.edition(Lakes),
+                                               'lake_ids': product_cache.file_hash(Input), 'lake_id_column': Lake_ID_Column,
+                                               'tolerance': lakeshore_engine.FRONTAGE_TOLERANCE, 'engine': Lakeshore_Engine, 'product': 'lakeshore'})  # fingerprint the parcels, the lakes, the lake ID workbook, and the settings
+        if Cache.publish('lakeshore', Cache_Key, Product_Datasets, today_full_str):             # copy the earlier product to today's names if it was built from the same inputs
+            Cache.evict(Cache_Max_GB * 1024 ** 3, Cache_Max_Days)                               # delete the dated copies that are no longer needed
+            Cache.close()                                                                       # close the index
+            tracer.finish()                                                                     # print the time taken and write the JSON trace of the run
+            return Parcel_Selection                                                             # return the path of the lakeshore parcel layer to the calling script
 
-arcpy.SelectLayerByAttribute_management('Lakes', "NEW_SELECTION", Lake_Expression)              # utilize the 'SelectLayerByAttribute_management' function to select from the temporary 'Lakes' layer with a "NEW SELECTION" utilizing the previously-defined string expression
-arcpy.MakeFeatureLayer_management(Parcels, 'Parcels')                                           # set up a temporary feature layer for use with the arcpy module
-arcpy.SelectLayerByLocation_management('Parcels', "INTERSECT", 'Lakes', "", "NEW_SELECTION")    # using the selected features within the 'Lakes' layer, select all 'Parcels' polygons that "INTERSECT" with the 'Lakes' polygons
-arcpy.CopyFeatures_management('Parcels', Parcel_Selection)                                      # copy the selected features from 'Parcels' to make a new feature class whose file path has been previously defined
+    # Obtain Lake IDs from the 'Lake_ID_Column' column (column B by default)
+    span = tracer.start('load_lake_ids')                                                        # start the stage span
+    Lake_IDs = spreadsheet_loader.load_column(Input, 'Test_Lakes', Lake_ID_Column, normalize=lakeshore_engine.normalize_lake_id)   # stream the lake ID column (read-only, cached while the workbook is unchanged), without the header, empty cells, or repeated IDs
+    print('{} lake IDs loaded.'.format(len(Lake_IDs)))                                          # print the number of lake IDs to the terminal
+    span.end(features_out=len(Lake_IDs))                                                        # end the stage span with the number of lake IDs
 
+    # Use the Lake IDs (Lake_IDs list) to select the lakes from the GDRS Hydrography shapefile, then find the parcels that touch them
+    span = tracer.start('select_parcels')                                                       # start the stage span
+    if Lakeshore_Engine == 'indexed':                                                           # use the indexed parcel/lake join
+        Lake_Index, Missing_IDs = lakeshore_engine.LakeIndex.from_layer(Lakes, Lake_IDs)        # read the lakes in chunked "DOWLKNUM IN (...)" lists and index them
+        print('{} lake features selected; lake IDs not found: {}'.format(len(Lake_Index), Missing_IDs))   # print the number of lakes and any IDs that were not found
+        if Parcel_Snapshot:                                                                     # join the parcels from the memory-mapped snapshot (written first if the parcels have changed since it was built)
+            Snapshot = parcel_snapshot.ensure(Parcels, Parcel_Snapshot)                         # open the snapshot; the worker processes map the same files
+            Lakes_By_Parcel, Perimeters = lakeshore_engine.join_snapshot_to_lakes(Snapshot, Lake_Index)  # join every parcel near the lakes to the lake(s) it intersects and measure its shoreline frontage, in parallel chunks
+        else:                                                                                   # otherwise read the parcels near the lakes from the parcel layer
+            Lakes_By_Parcel, Perimeters = lakeshore_engine.join_parcels_to_lakes(Parcels, Lake_Index)   # join every parcel near the lakes to the lake(s) it intersects and measure its shoreline frontage, in parallel chunks
+        lakeshore_engine.write_relation_table(Parcel_Lake_Table, Lakes_By_Parcel)               # write one row per parcel and lake, with the frontage on that lake, to the parcel-to-lake table
+        lakeshore_engine.write_parcel_selection(Parcels, Parcel_Selection, Lakes_By_Parcel, Perimeters)   # copy the parcels that touch a lake, with their lake IDs, 'Frontage_M', and 'Frontage_Pct', to the final feature class
+        span.features_out = len(Lakes_By_Parcel)                                                # record the number of lakeshore parcels
+        print('Lakeshore parcels selected.')                                                    # print a statement to the terminal indicating the steps that have completed
+    else:                                                                                       # otherwise build the SQL expression and select with arcpy
+        arcpy.MakeFeatureLayer_management(Lakes, 'Lakes')                                       # set up a temporary feature layer for use with the arcpy module
+        Lake_String = ''                                                                        # set up an empty string
+        for x in range(len(Lake_IDs)):                                                          # start a for loop to iterate over the list that has been previously defined
+            Lake_String = Lake_String + "DOWLKNUM = '" + str(Lake_IDs[x]) + "' OR "             # the for loop will add values to the string for each iteration to produce an expression in SQL
+        Lake_Expression = Lake_String[:-4]                                                      # once the for loop is finished, define a new string that takes off the final 4 digits (which are " OR ")
+        print(Lake_Expression)                                                                  # print the entire string (if necessary)
 
+        arcpy.SelectLayerByAttribute_management('Lakes', "NEW_SELECTION", Lake_Expression)      # utilize the 'SelectLayerByAttribute_management' function to select from the temporary 'Lakes' layer with a "NEW SELECTION" utilizing the previously-defined string expression
+        arcpy.MakeFeatureLayer_management(Parcels, 'Parcels')                                   # set up a temporary feature layer for use with the arcpy module
+        arcpy.SelectLayerByLocation_management('Parcels', "INTERSECT", 'Lakes', "", "NEW_SELECTION")    # using the selected features within the 'Lakes' layer, select all 'Parcels' polygons that "INTERSECT" with the 'Lakes' polygons
+        arcpy.CopyFeatures_management('Parcels', Parcel_Selection)                              # copy the selected features from 'Parcels' to make a new feature class whose file path has been previously defined
+        span.features_out = int(arcpy.GetCount_management(Parcel_Selection).getOutput(0))       # record the number of lakeshore parcels
+    span.end()                                                                                  # end the stage span
+
+    # Record the new product in the product cache and delete the dated copies that are no longer needed
+    if Product_Cache:                                                                           # only when the product cache is in use
+        Cache.store('lakeshore', Cache_Key, Product_Datasets, today_full_str)                   # record the product under the fingerprint of its inputs
+        Cache.evict(Cache_Max_GB * 1024 ** 3, Cache_Max_Days)                                   # delete the dated copies that are no longer needed
+        Cache.close()                                                                           # close the index
+    tracer.finish()                                                                             # print the time taken and write the JSON trace of the run
+    return Parcel_Selection                                                                     # return the path of the lakeshore parcel layer to the calling script
+
+
+if __name__ == '__main__':
+    main()
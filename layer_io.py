@@ -0,0 +1,784 @@
+#-------------------------------------------------------------------------------
+# Name:        layer_io.py (Feature Class Reading and Writing Helpers)
+# Purpose:      This module gives the production scripts a single way to read
+#                   features, update fields, and copy feature classes, regardless
+#                   of whether the data lives in a file geodatabase (through arcpy)
+#                   or in an open format (GeoPackage, shapefile, FlatGeobuf) that
+#                   can be read on machines without an ArcGIS license.
+#
+#                   Geometries are handed back as shapely geometries so that the
+#                   spatial work can happen in memory instead of through repeated
+#                   layer selections.
+#
+#                   Open-format layers inside a GeoPackage are addressed like feature
+#                   classes inside a geodatabase, e.g. os.path.join(r"C:\data\Parcels.gpkg", 'Parcel_Data').
+#
+# Author:      draleigh
+#
+# Created:     18 October 2026
+# Copyright:   (c) draleigh 2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+
+
+# Import modules and packages
+import os,re,sqlite3                                                                        # list of required modules
+import numpy as np                                                                          # attribute columns are returned as NumPy arrays
+import shapely                                                                              # bulk envelopes of WKB geometries
+from shapely import wkb                                                                     # shapely is used for all in-memory geometry work
+from shapely.geometry import shape, mapping                                                 # convert between fiona records and shapely geometries
+from shapely.geometry import MultiPolygon, MultiLineString, MultiPoint                        # single parts written to multipart layers
+
+import arcpy_runtime                                                                        # arcpy is only available on machines with ArcGIS installed
+from arcpy_runtime import arcpy                                                             # imported on first use, so open-format runs never import it
+
+try:                                                                                        # fiona is only needed for the open-format backend
+    import fiona                                                                            # import fiona if it can be found
+except ImportError:
+    fiona = None
+
+
+# Open formats recognized by the file extension of the dataset (or of the GeoPackage holding the layer)
+OPEN_FORMAT_DRIVERS = {'.gpkg': 'GPKG', '.shp': 'ESRI Shapefile', '.fgb': 'FlatGeobuf', '.geojson': 'GeoJSON'}
+
+# Field types used by the production scripts, mapped to the equivalent fiona schema types
+FIELD_TYPES = {'TEXT': 'str', 'SHORT': 'int32', 'LONG': 'int', 'DOUBLE': 'float', 'FLOAT': 'float', 'DATE': 'date'}
+
+# arcpy field types (from ListFields) and fiona schema types, mapped back to the AddField type names
+ARCPY_FIELD_TYPES = {'String': 'TEXT', 'SmallInteger': 'SHORT', 'Integer': 'LONG', 'BigInteger': 'LONG', 'Double': 'DOUBLE', 'Single': 'FLOAT', 'Date': 'DATE'}
+FIONA_FIELD_TYPES = {'str': 'TEXT', 'int32': 'SHORT', 'int': 'LONG', 'int64': 'LONG', 'float': 'DOUBLE', 'date': 'DATE', 'datetime': 'DATE'}
+
+# Multipart geometry types and the classes that wrap a single part in them
+MULTIPART_TYPES = {'MultiPolygon': MultiPolygon, 'MultiLineString': MultiLineString, 'MultiPoint': MultiPoint}
+
+# arcpy shape types (from Describe) mapped to geometry types, and geometry types for new feature classes mapped to the arcpy names
+ARCPY_SHAPE_TYPES = {'Polygon': 'MultiPolygon', 'Polyline': 'MultiLineString', 'Point': 'Point', 'Multipoint': 'MultiPoint'}
+ARCPY_GEOMETRY_TYPES = {'Polygon': 'POLYGON', 'MultiPolygon': 'POLYGON', 'LineString': 'POLYLINE', 'MultiLineString': 'POLYLINE', 'Point': 'POINT', 'MultiPoint': 'MULTIPOINT'}
+
+
+# Split a path into (dataset path, layer name, OGR driver) if it points at an open-format dataset
+#   r"...\Parcels.gpkg\Parcel_Data" -> (r"...\Parcels.gpkg", 'Parcel_Data', 'GPKG')
+#   r"...\pls_sect.shp"             -> (r"...\pls_sect.shp", None, 'ESRI Shapefile')
+#   Layer names and geodatabase paths return None so that arcpy handles them.
+def split_open_path(path):
+    path = str(path)                                                                        # accept pathlib objects as well as strings
+    ext = os.path.splitext(path)[1].lower()                                                 # extension of the full path
+    if ext in OPEN_FORMAT_DRIVERS:                                                          # the path is the dataset itself
+        return path, None, OPEN_FORMAT_DRIVERS[ext]
+    parent, layer = os.path.split(path)                                                     # the path may be a layer inside a GeoPackage
+    if os.path.splitext(parent)[1].lower() == '.gpkg':
+        return parent, layer, 'GPKG'
+    return None                                                                             # anything else is left to arcpy
+
+
+def is_open_format(path):
+    return split_open_path(path) is not None
+
+
+def _require_arcpy(path):
+    if not arcpy_runtime.available():                                                       # the data can only be reached through arcpy
+        raise RuntimeError('{} is not an open-format dataset and arcpy is not available.'.format(path))
+
+
+def _require_fiona(path):
+    if fiona is None:
+        raise RuntimeError('fiona is required to read or write {}.'.format(path))
+
+
+def _open_collection(path, mode='r', **kwargs):
+    dataset, layer, driver = split_open_path(path)
+    _require_fiona(path)
+    if layer is not None:                                                                   # pass the layer name for GeoPackage layers
+        kwargs['layer'] = layer
+    return fiona.open(dataset, mode, driver=driver, **kwargs)
+
+
+# Read features from a feature class, layer name, or open-format dataset
+#   Yields (OBJECTID, tuple of field values, shapely geometry) for each feature.
+#   'where' is a SQL expression (like those used with SelectLayerByAttribute_management),
+#   'bbox' is (xmin, ymin, xmax, ymax) and keeps only features whose envelopes overlap it.
+#   Feature layers made with MakeFeatureLayer_management honor their current selection.
+def read_features(path, fields=(), where=None, bbox=None, geometry=True):
+    fields = list(fields)                                                                   # the requested attribute fields
+    if is_open_format(path):
+        with _open_collection(path) as src:
+            for feat in src.filter(bbox=bbox, where=where):                                 # fiona passes the SQL expression to OGR
+                props = feat['properties']
+                geom = shape(feat['geometry']) if (geometry and feat['geometry'] is not None) else None
+                yield int(feat['id']), tuple(props.get(f) for f in fields), geom
+        return
+    _require_arcpy(path)
+    cursor_fields = ['OID@'] + fields + (['SHAPE@WKB'] if geometry else [])                 # read geometry as WKB to hand to shapely
+    kwargs = {}
+    if bbox is not None:                                                                    # use an envelope spatial filter (ArcGIS Pro 3.0+)
+        xmin, ymin, xmax, ymax = bbox
+        extent = arcpy.Extent(xmin, ymin, xmax, ymax)
+        kwargs['spatial_filter'] = extent.polygon
+        kwargs['spatial_relationship'] = 'ENVELOPE_INTERSECTS'
+    with arcpy.da.SearchCursor(path, cursor_fields, where, **kwargs) as cursor:
+        for row in cursor:
+            geom = None
+            if geometry and row[-1] is not None:
+                geom = wkb.loads(bytes(row[-1]))                                            # arcpy returns a bytearray
+            yield row[0], tuple(row[1:1 + len(fields)]), geom
+
+
+# GeoPackage geometry header sizes (in bytes) by the envelope indicator in the header flags
+GPKG_ENVELOPE_SIZES = {0: 0, 1: 32, 2: 48, 3: 48, 4: 64}
+
+
+# Read features as raw WKB bytes, without building shapely geometries
+#   Yields (OBJECTID, tuple of field values, WKB bytes or None) for each feature, for callers that
+#   only need to tell whether a geometry's bytes changed (and parse the few that did with wkb.loads).
+#   A GeoPackage layer is read straight from its SQLite tables; other open formats go through fiona.
+def read_wkb(path, fields=(), where=None):
+    fields = list(fields)                                                                   # the requested attribute fields
+    parts = split_open_path(path)
+    if parts is not None and parts[2] == 'GPKG' and parts[1] is not None:
+        opened = _gpkg_wkb_rows(parts[0], parts[1], fields, where)
+        if opened is not None:
+            conn, rows = opened
+            try:
+                for row in rows:
+                    yield row[0], tuple(row[1:1 + len(fields)]), _strip_gpkg_header(row[-1])
+            finally:
+                conn.close()
+            return
+    if parts is not None:
+        for oid, values, geom in read_features(path, fields, where):
+            yield oid, values, (geom.wkb if geom is not None else None)
+        return
+    _require_arcpy(path)
+    with arcpy.da.SearchCursor(path, ['OID@'] + fields + ['SHAPE@WKB'], where) as cursor:
+        for row in cursor:
+            yield row[0], tuple(row[1:1 + len(fields)]), (bytes(row[-1]) if row[-1] is not None else None)
+
+
+# Read the envelopes of a dataset's features, parsing as little geometry as the format allows
+#   Returns (array of OBJECTIDs, (n, 4) array of (xmin, ymin, xmax, ymax)); null and empty geometries are left out.
+#   A GeoPackage layer's envelopes come from its spatial index without touching the geometries; other
+#   datasets are read as WKB and parsed in bulk a chunk at a time, keeping only the envelopes.
+def read_envelopes(path, where=None, chunk_size=50000):
+    parts = split_open_path(path)
+    if parts is not None and parts[2] == 'GPKG' and parts[1] is not None:
+        found = _gpkg_index_envelopes(parts[0], parts[1], where)
+        if found is not None:
+            return found
+    oids, envelopes, chunk_oids, chunk = [], [], [], []
+
+    def flush():
+        bounds = shapely.bounds(shapely.from_wkb(np.asarray(chunk, dtype=object))).reshape(-1, 4)
+        keep = ~np.isnan(bounds[:, 0])                                                      # empty geometries have no envelope
+        oids.append(np.asarray(chunk_oids, dtype=np.int64)[keep])
+        envelopes.append(bounds[keep])
+        del chunk_oids[:], chunk[:]
+
+    for oid, _, geometry_wkb in read_wkb(path, where=where):
+        if geometry_wkb is None:
+            continue
+        chunk_oids.append(oid)
+        chunk.append(geometry_wkb)
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+    if not oids:
+        return np.zeros(0, dtype=np.int64), np.zeros((0, 4))
+    return np.concatenate(oids), np.concatenate(envelopes)
+
+
+# Return (OBJECTIDs, envelopes) of a GeoPackage layer from its R-tree spatial index, or None if it has none
+def _gpkg_index_envelopes(dataset, layer, where=None):
+    try:
+        with sqlite3.connect('file:{}?mode=ro'.format(dataset), uri=True) as conn:
+            column = conn.execute('SELECT column_name FROM gpkg_geometry_columns WHERE table_name = ?', (layer,)).fetchone()
+            key = [row[1] for row in conn.execute('PRAGMA table_info("{}")'.format(layer)) if row[5]]
+            if column is None or len(key) != 1:
+                return None
+            sql = ('SELECT t."{0}", r.minx, r.miny, r.maxx, r.maxy FROM "{1}" t JOIN "rtree_{1}_{2}" r ON r.id = t."{0}"'.format(key[0], layer, column[0])
+                   + (' WHERE {}'.format(where) if where else ''))
+            rows = conn.execute(sql).fetchall()
+    except sqlite3.Error:                                                                   # no spatial index (or a where clause SQLite cannot run)
+        return None
+    if not rows:
+        return np.zeros(0, dtype=np.int64), np.zeros((0, 4))
+    table = np.asarray(rows, dtype=float)
+    return table[:, 0].astype(np.int64), table[:, 1:]
+
+
+# Return (connection, cursor over (fid, fields..., geometry blob)) for a GeoPackage layer, or None
+#   if the layer's tables cannot be read directly (the caller then falls back to fiona)
+def _gpkg_wkb_rows(dataset, layer, fields, where=None):
+    conn = None
+    try:
+        conn = sqlite3.connect('file:{}?mode=ro'.format(dataset), uri=True)
+        column = conn.execute('SELECT column_name FROM gpkg_geometry_columns WHERE table_name = ?', (layer,)).fetchone()
+        key = [row[1] for row in conn.execute('PRAGMA table_info("{}")'.format(layer)) if row[5]]
+        if column is None or len(key) != 1:
+            conn.close()
+            return None
+        names = ', '.join('"{}"'.format(name) for name in [key[0]] + fields + [column[0]])
+        sql = 'SELECT {} FROM "{}"'.format(names, layer) + (' WHERE {}'.format(where) if where else '')
+        return conn, conn.execute(sql)
+    except sqlite3.Error:
+        if conn is not None:
+            conn.close()
+        return None
+
+
+# Drop the GeoPackage header (magic, version, flags, SRS ID, envelope) from a geometry blob, leaving standard WKB
+def _strip_gpkg_header(blob):
+    if blob is None:
+        return None
+    blob = bytes(blob)
+    if blob[:2] != b'GP':
+        return blob
+    return blob[8 + GPKG_ENVELOPE_SIZES.get((blob[3] >> 1) & 7, 0):]
+
+
+# Register the SQL functions that GDAL's spatial index triggers call (ST_IsEmpty, ST_MinX, ...) on a GeoPackage connection
+#   Without them SQLite cannot prepare any UPDATE of a layer that has a spatial index.
+def _gpkg_functions(conn):
+    def geometry(blob):
+        return shapely.from_wkb(_strip_gpkg_header(blob)) if blob is not None else None
+
+    conn.create_function('ST_IsEmpty', 1, lambda blob: None if blob is None else int(geometry(blob).is_empty), deterministic=True)
+    for position, name in enumerate(('ST_MinX', 'ST_MinY', 'ST_MaxX', 'ST_MaxY')):
+        conn.create_function(name, 1, lambda blob, position=position: None if blob is None else float(shapely.bounds(geometry(blob))[position]), deterministic=True)
+
+
+# Yield (OBJECTID, properties, GeoJSON-like geometry) from an open-format dataset without converting to shapely
+def _iter_records(path, where=None):
+    with _open_collection(path) as src:
+        for feat in src.filter(where=where):
+            yield int(feat['id']), dict(feat['properties']), feat['geometry']
+
+
+# Read attribute fields into NumPy arrays (one array per field) without reading any geometry
+#   Returns (array of OBJECTIDs, {field: array}); <Null> values are replaced by 'null_value'.
+#   Feature layers made with MakeFeatureLayer_management honor their current selection.
+def read_columns(path, fields, where=None, null_value=None):
+    fields = list(fields)
+    if is_open_format(path):
+        rows = [(oid,) + tuple(null_value if v is None else v for v in values)
+                for oid, values, _ in read_features(path, fields, where, geometry=False)]
+        columns = list(zip(*rows)) if rows else [()] * (len(fields) + 1)
+        return np.asarray(columns[0], dtype=np.int64), dict((f, np.asarray(c)) for f, c in zip(fields, columns[1:]))
+    _require_arcpy(path)
+    kwargs = {'null_value': null_value} if null_value is not None else {}
+    table = arcpy.da.TableToNumPyArray(path, ['OID@'] + fields, where, **kwargs)            # a single read of the requested fields
+    return table['OID@'].astype(np.int64), dict((f, table[f]) for f in fields)
+
+
+# Count the features in a feature class, layer, or open-format dataset (respecting 'where')
+def count_features(path, where=None):
+    if is_open_format(path):
+        if where is None:
+            with _open_collection(path) as src:
+                return len(src)
+        return sum(1 for _ in read_features(path, where=where, geometry=False))
+    _require_arcpy(path)
+    if where is None:
+        return int(arcpy.GetCount_management(path).getOutput(0))
+    return sum(1 for _ in arcpy.da.SearchCursor(path, ['OID@'], where))
+
+
+# Write a dictionary of {OBJECTID: value} to a single field in one update pass
+#   Rows whose OBJECTID is not in the dictionary are left untouched.
+#   Returns the number of rows that were updated.
+def update_field(path, field, values_by_oid):
+    if is_open_format(path):
+        dataset, layer, driver = split_open_path(path)
+        if driver != 'GPKG':                                                                # only GeoPackages can be updated in place
+            raise ValueError('In-place field updates are only supported for GeoPackage layers, not {}.'.format(path))
+        with sqlite3.connect(dataset) as conn:
+            _gpkg_functions(conn)
+            pk = [r[1] for r in conn.execute('PRAGMA table_info("{}")'.format(layer)) if r[5]][0]   # the GeoPackage feature id column
+            cur = conn.executemany('UPDATE "{}" SET "{}" = ? WHERE "{}" = ?'.format(layer, field, pk),
+                                   ((value, oid) for oid, value in values_by_oid.items()))
+            conn.execute("UPDATE gpkg_contents SET last_change = strftime('%Y-%m-%dT%H:%M:%fZ', 'now') WHERE table_name = ?", (layer,))   # as GDAL does, so dataset_edition() sees the change
+            return cur.rowcount
+    _require_arcpy(path)
+    updated = 0
+    with arcpy.da.UpdateCursor(path, ['OID@', field]) as cursor:                            # a single cursor for the whole feature class
+        for row in cursor:
+            if row[0] in values_by_oid:
+                row[1] = values_by_oid[row[0]]
+                cursor.updateRow(row)
+                updated += 1
+    return updated
+
+
+# Copy features from 'source' to 'target' (optionally filtered by 'where'), adding a new field
+#   populated from {OBJECTID: value} in the same pass. 'field' is (name, type, length) using the
+#   same type names as AddField (e.g. ('TRS', 'TEXT', 2000)). Returns the number of features copied.
+def copy_with_field(source, target, field, values_by_oid, where=None):
+    name, field_type, length = field
+    if is_open_format(source) and is_open_format(target):
+        with _open_collection(source) as src:
+            schema = dict(src.schema)                                                       # copy the schema, then add the new field
+            crs_wkt = src.crs_wkt
+        props = dict(schema['properties'])
+        ftype = FIELD_TYPES[field_type]
+        props[name] = '{}:{}'.format(ftype, length) if (ftype == 'str' and length) else ftype
+        schema['properties'] = props
+        records = ({'geometry': geom, 'properties': dict(properties, **{name: values_by_oid.get(oid)})}
+                   for oid, properties, geom in _iter_records(source, where))
+        if split_open_path(source)[0] == split_open_path(target)[0]:                        # SQLite cannot read and write the same GeoPackage at once
+            records = list(records)
+        copied = 0
+        with _open_collection(target, 'w', schema=schema, crs_wkt=crs_wkt) as dst:
+            batch = []
+            for record in records:
+                batch.append(record)
+                if len(batch) >= 10000:                                                     # write in batches rather than all at once
+                    dst.writerecords(batch)
+                    copied += len(batch)
+                    batch = []
+            dst.writerecords(batch)
+            copied += len(batch)
+        return copied
+    _require_arcpy(source)
+    arcpy.MakeFeatureLayer_management(source, 'layer_io_copy', where)                       # honor the 'where' expression with a temporary layer
+    _copy_with_source_oids('layer_io_copy', target)
+    arcpy.Delete_management('layer_io_copy')
+    arcpy.management.AddField(target, name, field_type, "", "", length if field_type == 'TEXT' else "", name)
+    return _fill_by_source_oid(target, [name], dict((oid, (value,)) for oid, value in values_by_oid.items()))
+
+
+# The field that carries each feature's source OBJECTID through an arcpy copy (removed once the copy is filled)
+SOURCE_OID_FIELD = 'LAYER_IO_SOURCE_OID'
+
+
+# Copy a feature layer (honoring its selection) to 'target' with each feature's source OBJECTID in SOURCE_OID_FIELD
+#   The copy renumbers its OBJECTIDs, and the order of its features is not guaranteed to follow the source,
+#   so the source OBJECTID is mapped into a field of its own.
+def _copy_with_source_oids(layer, target):
+    mappings = arcpy.FieldMappings()
+    mappings.addTable(layer)                                                                # every attribute field, as CopyFeatures would copy
+    source_oid = arcpy.FieldMap()
+    source_oid.addInputField(layer, arcpy.Describe(layer).OIDFieldName)
+    output = source_oid.outputField
+    output.name, output.aliasName, output.type = SOURCE_OID_FIELD, SOURCE_OID_FIELD, 'Long'
+    source_oid.outputField = output
+    mappings.addFieldMap(source_oid)
+    folder, name = os.path.split(target)
+    arcpy.FeatureClassToFeatureClass_conversion(layer, folder, name, "", mappings)
+
+
+# Fill the new 'names' fields of a copy made by _copy_with_source_oids() from {source OBJECTID: tuple of values}
+#   joining each feature to its values by SOURCE_OID_FIELD, then drop that field. Returns the number of features.
+def _fill_by_source_oid(target, names, values_by_oid):
+    copied = 0
+    empty = (None,) * len(names)
+    with arcpy.da.UpdateCursor(target, [SOURCE_OID_FIELD] + names) as cursor:               # a single update pass for all of the new fields
+        for row in cursor:
+            cursor.updateRow([row[0]] + list(values_by_oid.get(row[0], empty)))
+            copied += 1
+    arcpy.DeleteField_management(target, SOURCE_OID_FIELD)
+    return copied
+
+
+# Copy only the features listed in {OBJECTID: tuple of values} from 'source' to 'target', adding
+#   new fields populated from those values in the same pass. 'fields' is a list of (name, type, length)
+#   using the same type names as AddField. Returns the number of features copied.
+def copy_with_fields(source, target, fields, values_by_oid, where=None):
+    names = [name for name, _, _ in fields]
+    if is_open_format(source) and is_open_format(target):
+        with _open_collection(source) as src:
+            schema = dict(src.schema)                                                       # copy the schema, then add the new fields
+            crs_wkt = src.crs_wkt
+        props = dict(schema['properties'])
+        for name, field_type, length in fields:
+            ftype = FIELD_TYPES[field_type]
+            props[name] = '{}:{}'.format(ftype, length) if (ftype == 'str' and length) else ftype
+        schema['properties'] = props
+        records = ({'geometry': geom, 'properties': dict(properties, **dict(zip(names, values_by_oid[oid])))}
+                   for oid, properties, geom in _iter_records(source, where) if oid in values_by_oid)
+        if split_open_path(source)[0] == split_open_path(target)[0]:                        # SQLite cannot read and write the same GeoPackage at once
+            records = list(records)
+        copied = 0
+        with _open_collection(target, 'w', schema=schema, crs_wkt=crs_wkt) as dst:
+            batch = []
+            for record in records:
+                batch.append(record)
+                if len(batch) >= 10000:                                                     # write in batches rather than all at once
+                    dst.writerecords(batch)
+                    copied += len(batch)
+                    batch = []
+            dst.writerecords(batch)
+            copied += len(batch)
+        return copied
+    _require_arcpy(source)
+    arcpy.MakeFeatureLayer_management(source, 'layer_io_copy', where)                       # honor the 'where' expression with a temporary layer
+    select_by_oids('layer_io_copy', values_by_oid)                                          # only the listed features are copied
+    _copy_with_source_oids('layer_io_copy', target)
+    arcpy.Delete_management('layer_io_copy')
+    for name, field_type, length in fields:
+        arcpy.management.AddField(target, name, field_type, "", "", length if field_type == 'TEXT' else "", name)
+    return _fill_by_source_oid(target, names, values_by_oid)
+
+
+# Create a table (no geometry) at 'target' and insert 'rows' in batches
+#   'fields' is a list of (name, type, length) using the same type names as AddField.
+#   Returns the number of rows written.
+def write_table(target, fields, rows, batch_size=10000):
+    names = [name for name, _, _ in fields]
+    written = 0
+    if is_open_format(target):
+        props = {}
+        for name, field_type, length in fields:
+            ftype = FIELD_TYPES[field_type]
+            props[name] = '{}:{}'.format(ftype, length) if (ftype == 'str' and length) else ftype
+        with _open_collection(target, 'w', schema={'geometry': 'None', 'properties': props}) as dst:
+            batch = []
+            for row in rows:
+                batch.append({'geometry': None, 'properties': dict(zip(names, row))})
+                if len(batch) >= batch_size:
+                    dst.writerecords(batch)
+                    written += len(batch)
+                    batch = []
+            dst.writerecords(batch)
+            written += len(batch)
+        return written
+    _require_arcpy(target)
+    arcpy.CreateTable_management(os.path.dirname(target), os.path.basename(target))        # create the empty table in its geodatabase
+    for name, field_type, length in fields:
+        arcpy.management.AddField(target, name, field_type, "", "", length if field_type == 'TEXT' else "", name)
+    with arcpy.da.InsertCursor(target, names) as cursor:                                    # a single InsertCursor for every row
+        for row in rows:
+            cursor.insertRow(row)
+            written += 1
+    return written
+
+
+# Select features in a feature layer by a set of OBJECTIDs
+#   The OBJECTIDs are written to a temporary table that is joined to the layer (keeping only the
+#   matching features), so the selection is made in one step however many OBJECTIDs there are.
+#   An empty set leaves nothing selected (rather than clearing the selection, which would select everything).
+def select_by_oids(layer, oids):
+    _require_arcpy(layer)
+    oid_field = arcpy.Describe(layer).OIDFieldName                                          # e.g. 'OBJECTID' or 'FID'
+    oids = sorted(set(oids))
+    if not oids:
+        arcpy.SelectLayerByAttribute_management(layer, "NEW_SELECTION", '{} IS NULL'.format(oid_field))
+        return 0
+    table = 'memory\\layer_io_oids'
+    if arcpy.Exists(table):
+        arcpy.Delete_management(table)
+    arcpy.CreateTable_management('memory', 'layer_io_oids')
+    arcpy.AddField_management(table, 'SOURCE_OID', 'LONG')
+    with arcpy.da.InsertCursor(table, ['SOURCE_OID']) as cursor:                            # a single InsertCursor for every OBJECTID
+        for oid in oids:
+            cursor.insertRow((oid,))
+    arcpy.AddJoin_management(layer, oid_field, table, 'SOURCE_OID', 'KEEP_COMMON')          # the joined layer holds only the listed features
+    try:
+        arcpy.SelectLayerByAttribute_management(layer, "NEW_SELECTION")                     # select all of them; the selection outlasts the join
+    finally:
+        arcpy.RemoveJoin_management(layer)
+        arcpy.Delete_management(table)
+    return len(oids)
+
+
+# Return [(name, type, length)] for the named fields of a dataset, using the AddField type names
+def field_definitions(path, names):
+    definitions = {}
+    if is_open_format(path):
+        with _open_collection(path) as src:
+            for name, spec in src.schema['properties'].items():
+                ftype, _, length = spec.partition(':')
+                definitions[name] = (name, FIONA_FIELD_TYPES.get(ftype, 'TEXT'), int(length.split('.')[0]) if (ftype == 'str' and length) else None)
+    else:
+        _require_arcpy(path)
+        for field in arcpy.ListFields(path):
+            definitions[field.name] = (field.name, ARCPY_FIELD_TYPES.get(field.type, 'TEXT'), field.length if field.type == 'String' else None)
+    return [definitions[name] for name in names]
+
+
+# Return [(name, type, length)] for every attribute field of a dataset that can be written to a copy
+#   The OBJECTID, geometry, and the geometry fields that arcpy maintains itself (e.g. 'Shape_Area') are left out.
+def list_fields(path):
+    if is_open_format(path):
+        with _open_collection(path) as src:
+            names = list(src.schema['properties'])
+    else:
+        _require_arcpy(path)
+        names = [field.name for field in arcpy.ListFields(path) if field.type not in ('OID', 'Geometry') and not field.required]
+    return field_definitions(path, names)
+
+
+# Return the geometry type of a dataset as used by write_features() (e.g. 'MultiPolygon')
+#   Polygons and lines are always returned as multipart types, so that multipart features can be copied.
+def geometry_type(path):
+    if is_open_format(path):
+        with _open_collection(path) as src:
+            name = src.schema['geometry'].replace('3D ', '')
+    else:
+        _require_arcpy(path)
+        name = ARCPY_SHAPE_TYPES[arcpy.Describe(path).shapeType]
+    return {'Polygon': 'MultiPolygon', 'LineString': 'MultiLineString'}.get(name, name)
+
+
+# Return the coordinate system of a dataset: WKT for open formats, a SpatialReference object for arcpy
+def spatial_reference(path):
+    if is_open_format(path):
+        with _open_collection(path) as src:
+            return src.crs_wkt
+    _require_arcpy(path)
+    return arcpy.Describe(path).spatialReference
+
+
+# Return (unit name, meters per unit) for the linear unit of a dataset's coordinate system
+#   A geographic coordinate system returns (unit name, None), since its units are angles.
+#   Returns None when the dataset has no coordinate system, or it cannot be read.
+def linear_unit(path):
+    sr = spatial_reference(path)
+    if sr is None or sr == '':
+        return None
+    if not isinstance(sr, str):                                                             # an arcpy SpatialReference
+        if sr.type == 'Geographic':
+            return sr.angularUnitName, None
+        return sr.linearUnitName, float(sr.metersPerUnit)
+    if sr.lstrip().upper().startswith(('GEOGCS', 'GEOGCRS', 'GEODCRS')):
+        return 'degree', None
+    units = re.findall(r'(?:LENGTHUNIT|UNIT)\[\s*"([^"]+)"\s*,\s*([0-9.eE+-]+)', sr)      # the projected coordinate system's unit comes last
+    if not units:
+        return None
+    return units[-1][0], float(units[-1][1])
+
+
+# Files in a file geodatabase that change without its data changing: the lock files ArcGIS writes
+#   whenever a feature class is opened (e.g. 'a00000009.<host>.<pid>.sr.lock'), and the
+#   geodatabase-wide 'gdb' and 'timestamps' files
+GDB_SHARED_FILES = ('gdb', 'timestamps')
+
+
+# Describe a set of files by their latest modification time and total size (files removed meanwhile are skipped)
+def _files_edition(paths):
+    stats = []
+    for path in paths:
+        try:
+            stats.append(os.stat(path))
+        except OSError:                                                                     # e.g. a lock file released between listing and reading
+            pass
+    if not stats:
+        return None
+    return '{}:{}'.format(int(max(stat.st_mtime for stat in stats)), sum(stat.st_size for stat in stats))
+
+
+# Describe an arcpy dataset by its editor tracking: the latest 'last edited' date and the number of rows
+#   The latest date is the first row of a cursor sorted on the 'last edited' field, and the row count comes
+#   from GetCount, so the table is not scanned. None without editor tracking.
+def _edit_date_edition(path):
+    if not arcpy_runtime.available():
+        return None
+    try:
+        desc = arcpy.Describe(path)
+        field = desc.lastEditDateFieldName if getattr(desc, 'editorTrackingEnabled', False) else None
+    except Exception:                                                                       # e.g. a path arcpy cannot describe
+        return None
+    if not field:
+        return None
+    delimited = arcpy.AddFieldDelimiters(path, field)
+    latest = None
+    with arcpy.da.SearchCursor(path, [field], '{} IS NOT NULL'.format(delimited), sql_clause=(None, 'ORDER BY {} DESC'.format(delimited))) as cursor:
+        for (latest,) in cursor:                                                            # only the newest row is read
+            break
+    count = int(arcpy.GetCount_management(path).getOutput(0))
+    return 'edited:{}:{}'.format(latest.isoformat() if latest is not None else '', count)
+
+
+# Return the files that hold a dataset on disk, never counting lock files
+#   - a shapefile or other open-format file (or the GeoPackage holding a layer): every file sharing its
+#       name, e.g. the .shp, .shx, and .dbf of a shapefile, or the -wal file of a GeoPackage
+#   - a feature class in a file geodatabase: the files of the whole geodatabase, less its shared files
+#   Returns None for a dataset that is not held in files (e.g. in an enterprise geodatabase).
+def dataset_files(path):
+    parts = split_open_path(path)
+    if parts is not None:
+        folder, name = os.path.split(parts[0])
+        folder = folder or '.'
+        stem = os.path.splitext(name)[0].lower()
+        return [os.path.join(folder, n) for n in os.listdir(folder) if os.path.splitext(n)[0].lower() == stem and not n.lower().endswith('.lock')]
+    gdb = str(path)
+    while gdb and not gdb.lower().endswith('.gdb'):
+        parent = os.path.dirname(gdb)
+        if parent == gdb:
+            break
+        gdb = parent
+    if not (gdb.lower().endswith('.gdb') and os.path.isdir(gdb)):
+        return None
+    return [os.path.join(gdb, n) for n in os.listdir(gdb) if not n.lower().endswith('.lock') and n not in GDB_SHARED_FILES]
+
+
+# Describe the edition of a dataset, so a changed dataset can be told from an unchanged one without reading it
+#   - a GeoPackage layer: its 'last_change' in gpkg_contents and its highest feature id
+#   - an arcpy dataset with editor tracking (in a file or an enterprise geodatabase): its editor tracking dates
+#   - a dataset held in files (see dataset_files()): their latest modification time and total size, so
+#       lock files do not count. A feature class in a file geodatabase without editor tracking takes the
+#       edition of the whole geodatabase, so an edit to any feature class in it counts.
+#   Returns None if the edition cannot be told; callers then treat the dataset as changed.
+def dataset_edition(path):
+    parts = split_open_path(path)
+    if parts is not None and parts[2] == 'GPKG' and parts[1] is not None:
+        try:
+            with sqlite3.connect('file:{}?mode=ro'.format(parts[0]), uri=True) as conn:
+                change = conn.execute('SELECT last_change FROM gpkg_contents WHERE table_name = ?', (parts[1],)).fetchone()
+                if change is not None:
+                    return '{}:{}'.format(change[0], conn.execute('SELECT max(rowid) FROM "{}"'.format(parts[1])).fetchone()[0])
+        except sqlite3.Error:
+            pass
+    if parts is None:
+        edition = _edit_date_edition(path)
+        if edition is not None:
+            return edition
+    files = dataset_files(path)
+    return _files_edition(files) if files is not None else None
+
+
+# Return the size of a dataset on disk in bytes, without reading its features
+#   A GeoPackage layer counts its own pages (and those of its spatial index) where SQLite can report
+#   them, and the whole GeoPackage otherwise. A feature class in a geodatabase counts 0, since the files
+#   of one feature class cannot be told from those of the rest of its geodatabase.
+def dataset_size(path):
+    parts = split_open_path(path)
+    if parts is None:
+        return 0
+    if parts is not None and parts[2] == 'GPKG' and parts[1] is not None:
+        try:
+            with sqlite3.connect('file:{}?mode=ro'.format(parts[0]), uri=True) as conn:
+                size = conn.execute("SELECT sum(pgsize) FROM dbstat WHERE name = ? OR name LIKE ?", (parts[1], 'rtree_{}_%'.format(parts[1]))).fetchone()[0]
+                if size is not None:
+                    return size
+        except sqlite3.Error:                                                               # SQLite built without the dbstat table
+            pass
+    size = 0
+    for name in dataset_files(path):
+        try:
+            size += os.path.getsize(name)
+        except OSError:
+            pass
+    return size
+
+
+# Return True if a feature class, table, or open-format dataset (or GeoPackage layer) exists
+def dataset_exists(path):
+    parts = split_open_path(path)
+    if parts is None:
+        _require_arcpy(path)
+        return bool(arcpy.Exists(path))
+    dataset, layer, driver = parts
+    if not os.path.exists(dataset):
+        return False
+    if layer is None:
+        return True
+    _require_fiona(path)
+    try:
+        return layer in fiona.listlayers(dataset)
+    except fiona.errors.DriverError:                                                        # a GeoPackage whose last layer was deleted cannot be opened
+        return False
+
+
+# Delete a feature class, table, or open-format dataset (or GeoPackage layer) if it exists
+def delete_dataset(path):
+    if not dataset_exists(path):
+        return False
+    parts = split_open_path(path)
+    if parts is None:
+        arcpy.Delete_management(path)
+        return True
+    dataset, layer, driver = parts
+    if layer is None:
+        fiona.remove(dataset, driver=driver)
+    else:
+        fiona.remove(dataset, driver=driver, layer=layer)
+    return True
+
+
+# Copy a whole feature class or table (every field and feature) to 'target'; returns the number of rows copied
+def copy_dataset(source, target):
+    if is_open_format(source) and is_open_format(target):
+        with _open_collection(source) as src:
+            schema = dict(src.schema)
+            crs_wkt = src.crs_wkt
+        records = ({'geometry': geom, 'properties': properties} for _, properties, geom in _iter_records(source))
+        if split_open_path(source)[0] == split_open_path(target)[0]:                        # SQLite cannot read and write the same GeoPackage at once
+            records = list(records)
+        copied = 0
+        with _open_collection(target, 'w', schema=schema, crs_wkt=crs_wkt) as dst:
+            batch = []
+            for record in records:
+                batch.append(record)
+                if len(batch) >= 10000:
+                    dst.writerecords(batch)
+                    copied += len(batch)
+                    batch = []
+            dst.writerecords(batch)
+            copied += len(batch)
+        return copied
+    _require_arcpy(source)
+    arcpy.Copy_management(source, target)                                                   # copies the dataset's files, without reading the features
+    return count_features(target)
+
+
+# Create a feature class (or open-format layer) at 'target' and insert features in batches
+#   'fields' is a list of (name, type, length) using the same type names as AddField, 'rows' yields
+#   (tuple of field values, shapely geometry), and 'template' is a dataset whose coordinate system is copied.
+#   Returns the number of features written.
+def write_features(target, fields, rows, geometry_type='MultiPolygon', template=None, batch_size=10000):
+    names = [name for name, _, _ in fields]
+    written = 0
+    if is_open_format(target):
+        props = {}
+        for name, field_type, length in fields:
+            ftype = FIELD_TYPES[field_type]
+            props[name] = '{}:{}'.format(ftype, length) if (ftype == 'str' and length) else ftype
+        crs_wkt = _wkt(spatial_reference(template)) if template is not None else ''
+        with _open_collection(target, 'w', schema={'geometry': geometry_type, 'properties': props}, crs_wkt=crs_wkt) as dst:
+            batch = []
+            for values, geom in rows:
+                batch.append({'geometry': mapping(_promote(geom, geometry_type)) if geom is not None else None, 'properties': dict(zip(names, values))})
+                if len(batch) >= batch_size:
+                    dst.writerecords(batch)
+                    written += len(batch)
+                    batch = []
+            dst.writerecords(batch)
+            written += len(batch)
+        return written
+    sr = create_feature_class(target, fields, geometry_type, template)
+    with arcpy.da.InsertCursor(target, names + ['SHAPE@']) as cursor:                       # a single InsertCursor for every feature
+        for values, geom in rows:
+            cursor.insertRow(list(values) + [arcpy_geometry(geom, sr)])
+            written += 1
+    return written
+
+
+# Create an empty feature class in a geodatabase with 'fields' (as for write_features()), and return its spatial reference
+def create_feature_class(target, fields, geometry_type='MultiPolygon', template=None):
+    _require_arcpy(target)
+    sr = spatial_reference(template) if template is not None else None
+    if sr is not None and not hasattr(sr, 'factoryCode'):                                   # a WKT string from an open-format template
+        sr = arcpy.SpatialReference(text=sr)
+    arcpy.CreateFeatureclass_management(os.path.dirname(target), os.path.basename(target), ARCPY_GEOMETRY_TYPES[geometry_type], spatial_reference=sr)
+    for name, field_type, length in fields:
+        arcpy.management.AddField(target, name, field_type, "", "", length if field_type == 'TEXT' else "", name)
+    return sr
+
+
+# Convert a shapely geometry (or None) to an arcpy geometry for an InsertCursor
+def arcpy_geometry(geom, sr):
+    return arcpy.FromWKB(bytearray(wkb.dumps(geom)), sr) if geom is not None else None
+
+
+# Make a single-part geometry multipart when the layer is multipart (open formats check the geometry type of each feature)
+def _promote(geom, geometry_type):
+    if geometry_type in MULTIPART_TYPES and geom.geom_type == geometry_type[len('Multi'):]:
+        return MULTIPART_TYPES[geometry_type]([geom])
+    return geom
+
+
+# Return WKT for a coordinate system given as WKT or as an arcpy SpatialReference
+def _wkt(sr):
+    if sr is None or isinstance(sr, str):
+        return sr or ''
+    return sr.exportToString().split(';')[0]                                               # drop the XY tolerance/resolution that arcpy appends
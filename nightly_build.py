@@ -0,0 +1,375 @@
+#-------------------------------------------------------------------------------
+# Name:        nightly_build.py (Nightly Map-Layer Build)
+# Purpose:      The nightly job ran the production scripts one after another, and each
+#                   script read 'parcel_FC', 'selector_feature_class', and its other
+#                   inputs from scratch, so the statewide parcel layer was scanned at
+#                   least four times. This script builds every map-layer product as one
+#                   dependency graph of stages (see stage_graph.py):
+#
+#                   parcels ----------+---> nearby -------+---> dissolve_first_nations
+#                   selector ---------+                   |     dissolve_private
+#                   terms ----------------> ownership ----+     dissolve_public
+#                                                               dissolve_unknown
+#                   parcels, sections ----> trs_join -------> trs_write
+#                   parcels, lakes -------> lakeshore_join -> lakeshore_write
+#                   selector, work_areas -> forest_filter --> forest_dissolve
+#
+#                   1. Every input is read once: the parcels come from the memory-mapped
+#                       parcel snapshot (OBJECTIDs, areas, envelopes, owner names, and WKB;
+#                       see parcel_snapshot.py), which the proximity selection, the
+#                       ownership classification, the TRS join, and the lakeshore join
+#                       share, parsing only the geometries they use. The attribute fields
+#                       of the TRS and lakeshore copies are streamed from the parcel layer
+#                       as the copies are written. The Selector features serve both the
+#                       ownership layers and the forest stand work areas.
+#                   2. Stages whose inputs are ready run at the same time, so the whole
+#                       build takes about as long as its longest branch rather than the sum
+#                       of the scripts.
+#                   3. Each parcel is classified once (First Nations first, as in
+#                       ownership_layer_production.py), and every ownership layer is
+#                       dissolved from the same proximity selection.
+#                   4. Products whose inputs and settings have not changed since they were
+#                       last built are copied from the product cache (see product_cache.py)
+#                       instead of being rebuilt, and only the stages the other products
+#                       need are run.
+#                   5. The dissolved layers in 'Tile_Layers' are then published for display
+#                       (see tile_pyramid.py): the tiles under the parts that changed are
+#                       rendered again, and their levels of detail are rewritten.
+#
+#                   Every product goes to the same workspace, and a geodatabase (or
+#                   GeoPackage) takes one writer at a time, so the writes themselves are made
+#                   one after another (under Output_Lock) while the work that produces them
+#                   runs concurrently.
+#
+#                   The products match those of ownership_layer_production.py,
+#                   append_TRS_values_to_parcel_data.py ('bulk' mode),
+#                   lakeshore_parcel_selection_layer_production.py ('indexed' engine), and
+#                   forest_stand_groupings_layer_production.py (lazy pipeline, 'tiled'
+#                   dissolve). Remove a product from 'Products' to skip it.
+#
+# Author:      draleigh
+#
+# Created:     18 October 2026
+# Copyright:   (c) draleigh 2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+
+
+# Import modules and packages
+import os,threading                                                                         # list of required modules
+from datetime import date                                                                   # extract submodules
+import numpy as np                                                                          # the parcel columns are mapped NumPy arrays
+import forest_stand_pipeline,forest_stand_rules                                             # forest stand filter, grouping, and dissolve
+import lakeshore_engine,layer_io,ownership_classifier,parcel_snapshot,product_cache         # lake join, feature reading/writing, owner names, the parcel snapshot, built products
+import proximity_selection                                                                   # Selector proximity
+import spreadsheet_loader,stage_graph,stage_tracing,streaming_writer,tiled_dissolve         # workbooks, the stage graph, tracing, streamed outputs, dissolves
+import tile_pyramid,trs_spatial_join                                                        # display tiles and levels of detail, bulk TRS join
+
+
+# Date Management
+today = date.today()                                                                        # define the date of the script's run
+today_full_str = today.strftime("%Y%m%d")                                                   # set up string value of the script's run date (e.g. for January 5, 2002: 20020105)
+
+
+# Define Data Locations and Other Variables
+GDB = r"*folderpath*\Nightly.gdb"                                                           # define the location of the geodatabase that receives every product
+AllParcels = r"*folderpath*\parcel_FC"                                                      # define the location of the Minnesota parcel dataset
+Selector = r"*folderpath*\selector_feature_class"                                           # define the location of the current dataset which contains the selection features
+FN_Input = r"*folderpath*\First_Nations_Terms.xlsx"                                         # define the location of the XLSX file with the First Nations search terms
+Public_Input = r"*folderpath*\Public_Property_Terms.xlsx"                                   # define the location of the XLSX file with the public (and First Nations) search terms
+PLS_Section = r"*folderpath*\pls_sect_data"                                                 # define the location of the feature class with TRS information
+Lakes = r"*folderpath*\dnr_hydro_features_all"                                              # define the location of the lakes feature class
+Lake_Input = r"*folderpath*\Test_Lakes.xlsx"                                                # define the location of the XLSX file that holds the lake ID values
+ForestStandInventory = r"*folderpath*\dnr_forest_stand_inventory"                           # define the location of the forest stand inventory dataset
+WorkAreas = r"*folderpath*\dnr_wildlife_workareas"                                          # define the location of the work area feature class
+Grouping_Rules = forest_stand_rules.RULE_TABLE                                              # define the location of the rule table of 'MN_CTYPE' groupings and age cutoffs
+Terms_Column = None                                                                         # define the header of the column that holds the terms in both workbooks (None uses the first column)
+Lake_ID_Column = 2                                                                          # define the workbook column that holds the lake ID values: a column number (2 for column B) or a header name (e.g. 'DOWLKNUM')
+Match_Mode = 'exact'                                                                        # define how owner names are compared to the keywords: 'exact', 'normalized', or 'substring'
+Exclusive_Categories = False                                                                # define whether First Nations parcels are left out of the private layer (True) or kept where they also have a non-public owner name, as in the private script (False)
+Selector_Where = "Requires_Deletion = 'No'"                                                 # define the expression for the active Selector features
+Selector_Distance = '2 kilometers'                                                          # define the distance from the Selector features within which parcels are examined
+TRS_Threshold = 8093.71                                                                     # define the minimum 'Shape_Area' of the parcels given TRS values (square meters for 2 acres)
+TRS_Area_Cap = 11700000                                                                     # define the 'Shape_Area' from which parcels are copied without TRS values when TRS_Output is 'field' (as in append_TRS_values_to_parcel_data.py)
+TRS_Field_Length = 2000                                                                     # define the length of the 'TRS' field
+TRS_Output = 'field'                                                                        # define where TRS values are written: 'field', 'table', or 'both' (as in append_TRS_values_to_parcel_data.py)
+Stage_Workers = None                                                                        # define the number of stages that may run at once (None runs every stage whose inputs are ready)
+Process_Workers = None                                                                      # define the number of worker processes for each dissolve and join (None uses every core)
+Scratch_Folder = os.path.join(os.path.dirname(GDB), 'Scratch')                              # define the folder that receives the temporary spill files of the dissolves (None uses the system temporary folder)
+Parcel_Snapshot = os.path.join(os.path.dirname(GDB), 'parcel_snapshot')                     # define the folder of the columnar parcel snapshot that every parcel stage reads (written when the parcels change; see parcel_snapshot.py)
+Trace_Folder = os.path.join(os.path.dirname(GDB), 'Traces')                                 # define the folder that receives the JSON trace of each run (None writes no trace)
+Profile_Stages = []                                                                         # define the stages to run under cProfile, e.g. ['ownership'] ('*' for every stage; see stage_tracing.py)
+Memory_Stages = []                                                                          # define the stages to run under tracemalloc, e.g. ['parcels'] ('*' for every stage)
+Product_Cache = os.path.join(os.path.dirname(GDB), 'product_cache.sqlite')                  # define the location of the index of built products (None rebuilds every product; see product_cache.py)
+Cache_Max_Days = 14                                                                         # define the number of days an unused dated copy of a product is kept
+Cache_Max_GB = 10                                                                           # define the size (in GB) the dated copies of the products are trimmed to
+Tile_Pyramid = os.path.join(os.path.dirname(GDB), 'MapLayers.mbtiles')                      # define the MBTiles file of display tiles (None publishes no tiles or levels of detail; see tile_pyramid.py)
+Tile_EPSG = None                                                                            # define the EPSG code of the products when they do not record their coordinate system (e.g. 26915)
+ownerFields = ['OWNER_NAME', 'TAX_NAME']                                                    # this list contains fields that are supposed to only contain ownership designations/names
+
+Output_Lock = threading.Lock()                                                              # held while a stage writes to the output workspace
+
+# Products to build, and the final stage of each (remove an entry to skip producing that product)
+Products = {
+    'first_nations': 'dissolve_first_nations',                                              # FirstNations_Parcels_Dissolved<date>
+    'private': 'dissolve_private',                                                          # PrivateParcelSelection_Dissolved_<date>
+    'public': 'dissolve_public',                                                            # PublicParcelSelection_Dissolved_<date>
+    'unknown': 'dissolve_unknown',                                                          # UnknownOwnerParcelSelection_Dissolved_<date>
+    'trs': 'trs_write',                                                                     # Parcel_Data_Addition_<date> (and/or Parcel_TRS_<date>)
+    'lakeshore': 'lakeshore_write',                                                         # Parcel_Selection_<date> and Parcel_Lake_<date>
+    'forest': 'forest_dissolve',                                                            # ForestStandSelection_Reduced_Dissolved_<date>
+    }
+
+
+# Products published for display after they are built: the name of the tile layer and of the levels of detail
+#   ('<GDB>\<name>_LOD1' to '_LOD3', replaced whenever the product changes) for each product
+Tile_Layers = {
+    'FirstNations_Parcels': 'first_nations',                                                # FirstNations_Parcels_Dissolved<date>
+    'PrivateParcelSelection': 'private',                                                    # PrivateParcelSelection_Dissolved_<date>
+    'ForestStandSelection': 'forest',                                                       # ForestStandSelection_Reduced_Dissolved_<date> (with 'Groupings' for labels)
+    }
+
+
+# Output locations of each product
+def output_paths(gdb, run_date):
+    return {
+        'first_nations': os.path.join(gdb, 'FirstNations_Parcels_Dissolved' + run_date),
+        'private': os.path.join(gdb, 'PrivateParcelSelection_Dissolved_' + run_date),
+        'public': os.path.join(gdb, 'PublicParcelSelection_Dissolved_' + run_date),
+        'unknown': os.path.join(gdb, 'UnknownOwnerParcelSelection_Dissolved_' + run_date),
+        'trs': os.path.join(gdb, 'Parcel_Data_Addition_' + run_date),
+        'trs_table': os.path.join(gdb, 'Parcel_TRS_' + run_date),
+        'lakeshore': os.path.join(gdb, 'Parcel_Selection_' + run_date),
+        'lakeshore_table': os.path.join(gdb, 'Parcel_Lake_' + run_date),
+        'forest': os.path.join(gdb, 'ForestStandSelection_Reduced_Dissolved_' + run_date),
+        }
+
+
+# The datasets that make up each product, in the order they are stored in the product cache
+def product_datasets(outputs):
+    trs = {'field': [outputs['trs']], 'table': [outputs['trs_table']], 'both': [outputs['trs'], outputs['trs_table']]}[TRS_Output]
+    datasets = dict((category, [outputs[category]]) for category in ownership_classifier.CATEGORIES)
+    datasets.update({'trs': trs, 'lakeshore': [outputs['lakeshore'], outputs['lakeshore_table']], 'forest': [outputs['forest']]})
+    return datasets
+
+
+# Fingerprint the inputs and settings of each product in 'products' (see product_cache.py)
+#   Each input is described once, and only if a product needs it.
+def product_keys(products):
+    inputs = {}
+
+    def describe(name, function, *args):
+        if name not in inputs:
+            inputs[name] = function(*args)
+        return inputs[name]
+
+    keys = {}
+    for product in products:
+        if product in ownership_classifier.CATEGORIES:
+            parts = {'parcels': describe('parcels', product_cache.edition, AllParcels),
+                     'selector': describe('selector', product_cache.content_hash, Selector, (), Selector_Where),
+                     'first_nations_terms': describe('first_nations_terms', product_cache.file_hash, FN_Input),
+                     'public_terms': describe('public_terms', product_cache.file_hash, Public_Input),
+                     'terms_column': Terms_Column, 'match': Match_Mode, 'owner_fields': ownerFields, 'distance': Selector_Distance, 'exclusive': Exclusive_Categories}
+        elif product == 'trs':
+            parts = {'parcels': describe('parcels', product_cache.edition, AllParcels),
+                     'sections': describe('sections', product_cache.edition, PLS_Section),
+                     'threshold': TRS_Threshold, 'cap': TRS_Area_Cap, 'length': TRS_Field_Length, 'output': TRS_Output}
+        elif product == 'lakeshore':
+            parts = {'parcels': describe('parcels', product_cache.edition, AllParcels),
+                     'lakes': describe('lakes', product_cache.edition, Lakes),
+                     'lake_ids': describe('lake_ids', product_cache.file_hash, Lake_Input),
+                     'lake_id_column': Lake_ID_Column, 'tolerance': lakeshore_engine.FRONTAGE_TOLERANCE, 'engine': 'indexed'}
+        else:
+            parts = {'inventory': describe('inventory', product_cache.edition, ForestStandInventory),
+                     'work_areas': describe('work_areas', product_cache.content_hash, WorkAreas),
+                     'selector': describe('selector', product_cache.content_hash, Selector, (), Selector_Where),
+                     'rules': forest_stand_pipeline.rules_hash(forest_stand_rules.load_rules(Grouping_Rules)), 'year': today.year}
+        keys[product] = product_cache.fingerprint(dict(parts, product=product))
+    return keys
+
+
+# Stage functions
+#   Each takes the results of the stages it depends on, in the order they are listed in build_graph().
+#   The shared 'parcels' input is the parcel snapshot (see parcel_snapshot.py): OBJECTIDs, areas, envelopes,
+#   and the owner names in mapped files, with the geometries parsed only for the parcels a stage uses.
+
+def _load_parcels():
+    return parcel_snapshot.ensure(AllParcels, Parcel_Snapshot, ownerFields)
+
+
+def _select_nearby(parcels, selector):
+    nearby = proximity_selection.select_snapshot(parcels, selector, Selector_Distance)     # checks the distance against the snapshot's units
+    print('{} parcels within {} of {} Selector features.'.format(len(nearby), Selector_Distance, len(selector)))
+    return nearby
+
+
+# Yield (values + the added values, geometry) of the source parcels in 'values_by_oid', reading the source a row at a time
+#   Only the outputs need every attribute field, so they are read from the source as they are written.
+def _source_rows(fields, values_by_oid):
+    for oid, values, geom in layer_io.read_features(AllParcels, [name for name, _, _ in fields]):
+        if oid in values_by_oid:
+            yield tuple(values) + values_by_oid[oid], geom
+
+
+def _load_terms():
+    first_nations = spreadsheet_loader.load_column(FN_Input, 'FN_Terms', Terms_Column)
+    public = spreadsheet_loader.load_column(Public_Input, 'Public_Terms', Terms_Column)
+    print('{} First Nations and {} public keywords loaded.'.format(len(first_nations), len(public)))
+    return ownership_classifier.OwnershipClassifier(first_nations, Match_Mode), ownership_classifier.OwnershipClassifier(public, Match_Mode)
+
+
+def _classify(parcels, terms):
+    return ownership_classifier.classify_snapshot(parcels, terms[0], terms[1], ownerFields, exclusive=Exclusive_Categories)   # every parcel, while the proximity selection runs
+
+
+def _dissolve(category, target):
+    def dissolve(parcels, nearby, ownership):
+        positions = parcels.positions(ownership[category] & nearby)
+        print('{}: {} parcels'.format(category, len(positions)))
+        dissolved = tiled_dissolve.dissolve_features((((), geom) for _, geom in parcels.iter_features(positions)), Process_Workers, spill_dir=Scratch_Folder)
+        with Output_Lock:
+            return tiled_dissolve.write_dissolved(target, [], dissolved, AllParcels)
+    return dissolve
+
+
+# Join the parcels of at least TRS_Threshold to the sections
+#   As in append_TRS_values_to_parcel_data.py, the parcels of TRS_Area_Cap or more are copied without TRS values when only the
+#   field is written, since their values would be cut short to fit it; the relation table keeps every section of every parcel.
+def _trs_join(parcels, sections):
+    copied = np.flatnonzero(parcels.areas >= TRS_Threshold)                                 # the snapshot's areas stand in for 'Shape_Area'
+    joined = copied[parcels.areas[copied] < TRS_Area_Cap] if TRS_Output == 'field' else copied
+    trs_by_oid = dict(trs_spatial_join.iter_parcel_sections(parcels.iter_features(joined), sections))
+    print('Found TRS values for {} of {} parcels.'.format(len(trs_by_oid), len(joined)))
+    return set(parcels.oids[copied].tolist()), trs_by_oid
+
+
+# Write the TRS product; returns the number of parcels written ('field'), of relation table rows ('table'), or both as a tuple ('both')
+def _trs_write(target, table_target):
+    def write(trs_join):
+        copied, trs_by_oid = trs_join
+        features = rows = None
+        with Output_Lock:
+            if TRS_Output in ('table', 'both'):
+                rows = trs_spatial_join.write_relation_table(table_target, trs_by_oid)
+            if TRS_Output in ('field', 'both'):
+                values = trs_spatial_join.format_trs_field(trs_by_oid, TRS_Field_Length)
+                fields = layer_io.list_fields(AllParcels)
+                added = dict((oid, (values.get(oid),)) for oid in copied)
+                features = streaming_writer.write_stream(target, fields + [('TRS', 'TEXT', TRS_Field_Length)], _source_rows(fields, added),
+                                                         layer_io.geometry_type(AllParcels), AllParcels)
+        return {'field': features, 'table': rows, 'both': (features, rows)}[TRS_Output]
+    return write
+
+
+def _load_lakes():
+    lake_ids = spreadsheet_loader.load_column(Lake_Input, 'Test_Lakes', Lake_ID_Column, normalize=lakeshore_engine.normalize_lake_id)
+    index, missing = lakeshore_engine.LakeIndex.from_layer(Lakes, lake_ids)
+    print('{} lake features selected; lake IDs not found: {}'.format(len(index), missing))
+    return index
+
+
+def _lakeshore_join(parcels, lakes):
+    return lakeshore_engine.join_snapshot_to_lakes(parcels, lakes, Process_Workers)        # the workers map the snapshot themselves
+
+
+def _lakeshore_write(target, table_target):
+    def write(lakeshore_join):
+        lakes_by_oid, perimeters = lakeshore_join
+        field = (lakeshore_engine.LAKE_ID_FIELD, 'TEXT', 254)
+        values = lakeshore_engine.selection_values(lakes_by_oid, perimeters, field)
+        fields = layer_io.list_fields(AllParcels)
+        with Output_Lock:
+            lakeshore_engine.write_relation_table(table_target, lakes_by_oid)
+            return streaming_writer.write_stream(target, fields + [field] + lakeshore_engine.FRONTAGE_FIELDS, _source_rows(fields, values),
+                                                 layer_io.geometry_type(AllParcels), AllParcels)
+    return write
+
+
+def _select_work_areas(selector):
+    areas = [geom for _, _, geom in layer_io.read_features(WorkAreas) if geom is not None and not geom.is_empty]
+    if not areas:
+        return []
+    touching = np.unique(selector.tree.query(np.asarray(areas, dtype=object), predicate='intersects')[0])   # work areas that intersect an active Selector feature
+    print('Forest Stand Inventory processing will require data from {} work areas.'.format(len(touching)))
+    return [areas[i] for i in touching]
+
+
+def _filter_stands(work_areas, rules):
+    return forest_stand_pipeline.filter_stands(ForestStandInventory, work_areas, rules, today.year)
+
+
+def _dissolve_stands(target):
+    def dissolve(stands):
+        dissolved = tiled_dissolve.dissolve_features((((g,), geom) for g, geom in zip(stands.groupings, stands.geometries)), Process_Workers, spill_dir=Scratch_Folder)
+        with Output_Lock:                                                                   # the 'tiled' engine of forest_stand_pipeline.dissolve_stands(), with only the write locked
+            return tiled_dissolve.write_dissolved(target, [forest_stand_rules.OUTPUT_FIELDS[0]], dissolved, ForestStandInventory)
+    return dissolve
+
+
+# Describe every product as one graph of stages
+def build_graph(gdb=None, run_date=None):
+    outputs = output_paths(gdb or GDB, run_date or today_full_str)
+    graph = stage_graph.StageGraph()
+    graph.add('parcels', _load_parcels)
+    graph.add('selector', lambda: proximity_selection.SelectorIndex.from_layer(Selector, Selector_Where))
+    graph.add('nearby', _select_nearby, ['parcels', 'selector'])
+    graph.add('terms', _load_terms)
+    graph.add('ownership', _classify, ['parcels', 'terms'])
+    for category in ownership_classifier.CATEGORIES:
+        graph.add('dissolve_' + category, _dissolve(category, outputs[category]), ['parcels', 'nearby', 'ownership'])
+    graph.add('sections', lambda: trs_spatial_join.SectionIndex.from_layer(PLS_Section))
+    graph.add('trs_join', _trs_join, ['parcels', 'sections'])
+    graph.add('trs_write', _trs_write(outputs['trs'], outputs['trs_table']), ['trs_join'])
+    graph.add('lakes', _load_lakes)
+    graph.add('lakeshore_join', _lakeshore_join, ['parcels', 'lakes'])
+    graph.add('lakeshore_write', _lakeshore_write(outputs['lakeshore'], outputs['lakeshore_table']), ['lakeshore_join'])
+    graph.add('work_areas', _select_work_areas, ['selector'])
+    graph.add('rules', lambda: forest_stand_rules.load_rules(Grouping_Rules))
+    graph.add('forest_filter', _filter_stands, ['work_areas', 'rules'])
+    graph.add('forest_dissolve', _dissolve_stands(outputs['forest']), ['forest_filter'])
+    return graph
+
+
+# Build the products in 'Products' (run when the script is started directly, or by another script that imports it and calls main())
+#   Products whose inputs have not changed since they were last built are copied from the product cache instead.
+#   Returns {product: number of features written (for the TRS product with TRS_Output 'both', (parcels, relation table rows)), or None if it was published from the cache}.
+def main():
+    tracer = stage_tracing.Tracer('nightly_build', Trace_Folder, Profile_Stages, Memory_Stages, concurrent=True)   # record a span for every stage
+    datasets = product_datasets(output_paths(GDB, today_full_str))
+    built = dict((product, None) for product in Products)
+    cache = product_cache.ProductCache(Product_Cache) if Product_Cache else None
+    try:
+        if cache is not None:
+            span = tracer.start('product_cache')                                            # publish the products whose inputs are unchanged
+            keys = product_keys(Products)
+            pending = [product for product in Products if not cache.publish(product, keys[product], datasets[product], today_full_str)]
+            span.end(features_out=len(Products) - len(pending))
+        else:
+            pending = list(Products)
+        if pending:
+            graph = build_graph()
+            targets = [Products[product] for product in pending]
+            for level, names in enumerate(graph.levels(targets)):                           # print the plan: each line can run at the same time
+                print('Step {}: {}'.format(level + 1, ', '.join(names)))
+            results = graph.run(targets, Stage_Workers, tracer)
+            for product in pending:
+                built[product] = results[Products[product]]
+                if cache is not None:
+                    cache.store(product, keys[product], datasets[product], today_full_str)  # record the new dated copy under its fingerprint
+        if Tile_Pyramid:
+            span = tracer.start('tile_pyramid')                                             # render the tiles under the parts of the display products that changed
+            sources = dict((name, datasets[product][0]) for name, product in Tile_Layers.items() if product in Products)
+            rendered, _ = tile_pyramid.publish(sources, Tile_Pyramid, GDB, workers=Process_Workers, epsg=Tile_EPSG)
+            span.end(features_out=rendered)
+        if cache is not None:
+            cache.evict(Cache_Max_GB * 1024 ** 3, Cache_Max_Days)                           # delete the dated copies that are no longer needed
+    finally:
+        if cache is not None:
+            cache.close()
+    tracer.finish()                                                                         # print the time taken and write the JSON trace of the run
+    return built
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,258 @@
+#-------------------------------------------------------------------------------
+# Name:        ownership_classifier.py (Ownership Keyword Classifier)
+# Purpose:      This module replaces the long 'OWNER_NAME = '...' Or ...' and
+#                   'OWNER_NAME <> '...' And ...' SQL expressions built from the
+#                   keyword workbooks. The parcels are read with a single cursor pass
+#                   over the owner fields and each name is checked against the terms
+#                   in memory, producing a set of OBJECTIDs that can be selected and
+#                   dissolved.
+#
+#                   Three ways of matching are available:
+#                       'exact'      - the owner name equals a term exactly (what the SQL expressions did)
+#                       'normalized' - the names are compared after normalize_name() (case, punctuation,
+#                                      spacing, and abbreviations such as 'DEPT'/'DEPARTMENT' are ignored)
+#                       'substring'  - a normalized term appears anywhere in the normalized owner name
+#                                      as whole words (found with an Aho-Corasick automaton)
+#
+#                   Terms containing apostrophes no longer need to be escaped for SQL.
+#
+# Author:      draleigh
+#
+# Created:     18 October 2026
+# Copyright:   (c) draleigh 2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+
+
+# Import modules and packages
+import re                                                                                   # regular expressions for normalizing names
+from collections import deque                                                               # used to build the automaton breadth-first
+import numpy as np                                                                          # spreads the results over the codes of a snapshot
+import layer_io                                                                             # shared feature reading/writing helpers
+
+
+MATCH_MODES = ('exact', 'normalized', 'substring')
+
+# Fields that are supposed to only contain ownership designations/names
+OWNER_FIELDS = ['OWNER_NAME', 'TAX_NAME']
+
+# Abbreviations that are spelled out before names are compared (checked word by word after punctuation is removed)
+#   Ambiguous abbreviations (e.g. 'ST' for Saint/State/Street, 'CO' for County/Company) are left alone.
+ABBREVIATIONS = {
+    'DEPT': 'DEPARTMENT',
+    'DEPART': 'DEPARTMENT',
+    'DEPARTMNT': 'DEPARTMENT',
+    'GOVT': 'GOVERNMENT',
+    'GOV': 'GOVERNMENT',
+    'CNTY': 'COUNTY',
+    'TWP': 'TOWNSHIP',
+    'NATL': 'NATIONAL',
+    'MN': 'MINNESOTA',
+    'MINN': 'MINNESOTA',
+    'USA': 'US',
+    'AND': '&',
+}
+
+_PUNCTUATION = re.compile(r"[^\w&\s]+")                                                     # anything other than letters, digits, '&', and spaces
+_SINGLE_LETTERS = re.compile(r'\b(?:[A-Z] )+[A-Z]\b')                                       # runs of single letters such as 'U S'
+
+
+# Normalize an owner name for comparison: 'U.S. Dept. of the Interior' -> 'US DEPARTMENT OF THE INTERIOR'
+#   Apostrophes are dropped ('Mille Lacs Band's' -> 'MILLE LACS BANDS'), other punctuation becomes a space,
+#   runs of single letters are joined ('U S' -> 'US'), and abbreviations are spelled out.
+def normalize_name(value, abbreviations=ABBREVIATIONS):
+    if value is None:
+        return ''
+    text = str(value).upper().replace("'", '').replace('’', '')
+    text = ' '.join(_PUNCTUATION.sub(' ', text).split())                                   # punctuation to spaces, collapse spacing
+    text = _SINGLE_LETTERS.sub(lambda match: match.group(0).replace(' ', ''), text)
+    return ' '.join(abbreviations.get(word, word) for word in text.split())
+
+
+# Aho-Corasick automaton for finding every term that occurs in a piece of text in a single scan
+#   Terms are matched as whole words: both the terms and the text are padded with spaces.
+class KeywordAutomaton(object):
+
+    def __init__(self, terms):
+        self.goto = [{}]                                                                    # transitions for each state
+        self.fail = [0]                                                                     # failure link for each state
+        self.output = [set()]                                                               # terms that end at each state
+        for term in terms:
+            if term:
+                self._add(' {} '.format(term), term)
+        self._link()
+
+    def _add(self, pattern, term):
+        state = 0
+        for char in pattern:
+            next_state = self.goto[state].get(char)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][char] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append(set())
+            state = next_state
+        self.output[state].add(term)
+
+    def _link(self):
+        queue = deque(self.goto[0].values())                                                # states one character deep fail back to the root
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                link = self.goto[fallback].get(char, 0)
+                self.fail[next_state] = link if link != next_state else 0
+                self.output[next_state] |= self.output[self.fail[next_state]]
+
+    # Return the set of terms found in 'text'
+    def search(self, text):
+        found = set()
+        state = 0
+        for char in ' {} '.format(text):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            if self.output[state]:
+                found |= self.output[state]
+        return found
+
+
+# Decide whether owner names match a list of terms
+#   Results are remembered per distinct name, since the same owner names repeat across many parcels.
+class OwnershipClassifier(object):
+
+    def __init__(self, terms, match='exact', abbreviations=ABBREVIATIONS):
+        if match not in MATCH_MODES:
+            raise ValueError("match must be one of {}, not '{}'".format(MATCH_MODES, match))
+        self.match = match
+        self.abbreviations = abbreviations
+        self.terms = [term for term in terms if term not in (None, '')]                     # empty cells in the workbook are ignored
+        if match == 'exact':
+            self.lookup = set(str(term) for term in self.terms)
+        else:
+            self.lookup = set(normalize_name(term, abbreviations) for term in self.terms) - {''}
+        self.automaton = KeywordAutomaton(self.lookup) if match == 'substring' else None
+        self._memo = {}
+
+    # Return True if the owner name matches one of the terms
+    def matches(self, value):
+        if value is None:
+            return False
+        result = self._memo.get(value)
+        if result is None:
+            if self.match == 'exact':
+                result = str(value) in self.lookup
+            else:
+                name = normalize_name(value, self.abbreviations)
+                if self.match == 'normalized':
+                    result = name in self.lookup
+                else:
+                    result = name in self.lookup or bool(self.automaton.search(name))
+            self._memo[value] = result
+        return result
+
+
+# Return the OBJECTIDs of parcels where any of the owner fields matches a term
+#   (the equivalent of "OWNER_NAME = 'a' Or ... Or TAX_NAME = 'a' Or ...")
+#   'within' limits the parcels tested to a set of OBJECTIDs (e.g. the parcels near the Selector features).
+def select_matching(parcels, classifier, fields=OWNER_FIELDS, within=None):
+    oids = set()
+    for oid, values, _ in layer_io.read_features(parcels, fields, geometry=False):         # a single cursor pass over the owner fields
+        if within is not None and oid not in within:
+            continue
+        if any(classifier.matches(value) for value in values):
+            oids.add(oid)
+    return oids
+
+
+# Return the OBJECTIDs of parcels where at least one owner field has a name that does not match any term
+#   (the equivalent of "(OWNER_NAME <> 'a' And ... And OWNER_NAME IS NOT NULL) Or (TAX_NAME <> 'a' And ... And TAX_NAME IS NOT NULL)")
+#   'within' limits the parcels tested, as for select_matching().
+def select_non_matching(parcels, classifier, fields=OWNER_FIELDS, within=None):
+    oids = set()
+    for oid, values, _ in layer_io.read_features(parcels, fields, geometry=False):         # a single cursor pass over the owner fields
+        if within is not None and oid not in within:
+            continue
+        if any(value is not None and not classifier.matches(value) for value in values):
+            oids.add(oid)
+    return oids
+
+
+# Return the OBJECTIDs of the snapshot parcels at 'positions' (every parcel if None) where at least one owner
+#   field has a name that matches a term, as select_matching() does, testing each distinct name once
+def select_matching_snapshot(snapshot, classifier, fields=OWNER_FIELDS, positions=None):
+    positions = np.arange(len(snapshot)) if positions is None else np.asarray(positions, dtype=np.int64)
+    matched = np.zeros(len(positions), dtype=bool)
+    for field in fields:
+        values = snapshot.values(field)
+        if not len(values):
+            continue
+        codes = np.asarray(snapshot.codes(field)[positions])
+        flags = np.fromiter((classifier.matches(value) for value in values), dtype=bool, count=len(values))
+        matched |= (codes >= 0) & flags[np.where(codes >= 0, codes, 0)]
+    return set(np.asarray(snapshot.oids[positions])[matched].tolist())
+
+
+# Ownership categories produced by classify_ownership(), in order of precedence (when they are exclusive)
+CATEGORIES = ('first_nations', 'public', 'private', 'unknown')
+
+
+# Classify every parcel into an ownership category in a single cursor pass
+#   'first_nations' - any owner field matches a First Nations term (the First Nations script's selection)
+#   'private'       - otherwise, any owner field holds a name that is not a public term (the private script's selection)
+#   'public'        - otherwise, every owner name that is filled in matches a public term
+#   'unknown'       - every owner field is empty
+#   With 'exclusive' False, 'private' also keeps the First Nations parcels that have a name that is not a public
+#   term, exactly as the private script selects them; otherwise each parcel is in exactly one category.
+#   Returns {category: set of OBJECTIDs}.
+def classify_ownership(parcels, first_nations, public, fields=OWNER_FIELDS, exclusive=True):
+    rows = ((oid, values) for oid, values, _ in layer_io.read_features(parcels, fields, geometry=False))   # a single cursor pass over the owner fields
+    return classify_rows(rows, first_nations, public, exclusive)
+
+
+# Classify (OBJECTID, tuple of owner names) pairs that are already in memory, as classify_ownership() does
+def classify_rows(rows, first_nations, public, exclusive=True):
+    result = dict((category, set()) for category in CATEGORIES)
+    for oid, values in rows:
+        names = [value for value in values if value is not None]
+        if not names:
+            result['unknown'].add(oid)
+        elif any(first_nations.matches(name) for name in names):
+            result['first_nations'].add(oid)
+            if not exclusive and any(not public.matches(name) for name in names):
+                result['private'].add(oid)
+        elif any(not public.matches(name) for name in names):
+            result['private'].add(oid)
+        else:
+            result['public'].add(oid)
+    return result
+
+
+# Classify the parcels in a snapshot (see parcel_snapshot.py), as classify_ownership() does
+#   Each distinct owner name is tested once and the results are spread over the parcels through
+#   their codes; 'positions' limits the parcels classified.
+def classify_snapshot(snapshot, first_nations, public, fields=OWNER_FIELDS, positions=None, exclusive=True):
+    positions = np.arange(len(snapshot)) if positions is None else np.asarray(positions, dtype=np.int64)
+    named = np.zeros(len(positions), dtype=bool)
+    first = np.zeros(len(positions), dtype=bool)
+    other = np.zeros(len(positions), dtype=bool)
+    for field in fields:
+        values = snapshot.values(field)
+        codes = np.asarray(snapshot.codes(field)[positions])
+        present = codes >= 0
+        safe = np.where(present, codes, 0)
+        first_flags = np.fromiter((first_nations.matches(value) for value in values), dtype=bool, count=len(values))
+        public_flags = np.fromiter((public.matches(value) for value in values), dtype=bool, count=len(values))
+        named |= present
+        if len(values):
+            first |= present & first_flags[safe]
+            other |= present & ~public_flags[safe]
+    oids = np.asarray(snapshot.oids[positions])
+    return {'first_nations': set(oids[first].tolist()),
+            'public': set(oids[named & ~first & ~other].tolist()),
+            'private': set(oids[named & other & (~first if exclusive else True)].tolist()),
+            'unknown': set(oids[~named].tolist())}
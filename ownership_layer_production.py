@@ -0,0 +1,179 @@
+#-------------------------------------------------------------------------------
+# Name:        ownership_layer_production.py (Combined Ownership Layer Production)
+# Purpose:      This script produces the private, First Nations, and public ownership
+#                   layers together. It examines all parcels within 2km of all active
+#                   Selector features (where 'Requires_Deletion = "No"') once, then
+#                   classifies each of those parcels in a single pass as First Nations,
+#                   public, private, or unknown ownership, using the terms from both
+#                   prepared Excel (.xlsx) documents.
+#
+#                   Each category is dissolved into its own layer for display on maps.
+#                   This replaces running private_ownership_layer_production_xlsx.py and
+#                   first_nations_ownership_layer_production.py one after the other,
+#                   which repeated the proximity selection for each product.
+#
+# Author:      draleigh
+#
+# Created:     18 October 2026
+# Copyright:   (c) draleigh 2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+
+
+# Import modules and packages
+import os                                                                                   # list of required modules
+from arcpy_runtime import arcpy                                                             # arcpy is imported when the first tool is called (see arcpy_runtime.py)
+from datetime import date                                                                   # extract submodules
+import layer_io,ownership_classifier,parcel_snapshot,product_cache,proximity_selection,spreadsheet_loader,stage_tracing,tiled_dissolve   # shared helpers for reading workbooks and layers, classifying owner names, snapshotting parcels, caching products, tracing stages, and dissolving
+
+
+# Date Management
+today = date.today()                                                                        # define the date of the script's run
+today_year_str = today.strftime("%Y")                                                       # produce the string value of the script's run date year
+today_month_str = today.strftime("%m")                                                      # produce the string value of the script's run date month
+today_day_str = today.strftime("%d")                                                        # produce the string value of the script's run date day
+today_full_str = today_year_str + today_month_str + today_day_str                           # set up string value of the script's run date (e.g. for January 5, 2002: 20020105
+
+
+# Define Data Locations and Other Variables
+GDB = r"*folderpath*\Ownership.gdb"                                                                     # define the location of the project database
+AllParcels = r"*folderpath*\parcel_FC"                                                                  # define the location of the Minnesota parcel dataset
+Selector = r"*folderpath*\selector_feature_class"                                                       # define the location of the current dataset which contains the selection features
+FN_Input = r"*folderpath*\First_Nations_Terms.xlsx"                                                     # define the location of the XLSX file with the First Nations search terms
+Public_Input = r"*folderpath*\Public_Property_Terms.xlsx"                                               # define the location of the XLSX file with the public (and First Nations) search terms
+Terms_Column = None                                                                                     # define the header of the column that holds the terms in both workbooks (None uses the first column)
+Match_Mode = 'exact'                                                                                    # define how owner names are compared to the keywords: 'exact', 'normalized', or 'substring'
+Selector_Where = "Requires_Deletion = 'No'"                                                             # define the expression for the active Selector features
+Proximity_Engine = 'arcpy'                                                                              # define how parcels near the Selector features are found: 'arcpy' (SelectLayerByLocation_management) or 'indexed' (see proximity_selection.py)
+Selector_Distance = '2 kilometers'                                                                      # define the distance from the Selector features within which parcels are examined
+Exclusive_Categories = False                                                                            # define whether each parcel goes into one layer only (True: First Nations parcels are left out of the private layer) or the private layer matches private_ownership_layer_production_xlsx.py, keeping First Nations parcels that also have a non-public owner name (False)
+Dissolve_Engine = 'arcpy'                                                                               # define how the output layers are dissolved: 'arcpy' (Dissolve_management) or 'tiled' (parallel, see tiled_dissolve.py)
+Scratch_Folder = os.path.join(os.path.dirname(GDB), 'Scratch')                                          # define the folder that receives the temporary spill files of the 'tiled' dissolve (None uses the system temporary folder)
+Parcel_Snapshot = None                                                                                  # define the folder of the columnar parcel snapshot used by the 'indexed' engine, e.g. os.path.join(os.path.dirname(GDB), 'parcel_snapshot') (rebuilt when the parcels change; None, the default, reads the parcel layer; see parcel_snapshot.py)
+Trace_Folder = os.path.join(os.path.dirname(GDB), 'Traces')                                             # define the folder that receives the JSON trace of each run (None writes no trace)
+Profile_Stages = []                                                                                     # define the stages to run under cProfile, e.g. ['classify'] ('*' for every stage; see stage_tracing.py)
+Memory_Stages = []                                                                                      # define the stages to run under tracemalloc, e.g. ['classify'] ('*' for every stage)
+Product_Cache = os.path.join(os.path.dirname(GDB), 'product_cache.sqlite')                              # define the location of the index of built products (None rebuilds the layers on every run; see product_cache.py)
+Cache_Max_Days = 14                                                                                     # define the number of days an unused dated copy of a layer is kept
+Cache_Max_GB = 10                                                                                       # define the size (in GB) the dated copies of the products are trimmed to
+ownerFields = ['OWNER_NAME', 'TAX_NAME']                                                                # this list contains fields that are supposed to only contain ownership designations/names
+
+# Output layers for each ownership category (remove an entry to skip producing that layer)
+Output_Layers = {
+    'private': os.path.join(GDB, 'PrivateParcelSelection_Dissolved_' + today_full_str),                # the layer of non-public entities (as in private_ownership_layer_production_xlsx.py)
+    'first_nations': os.path.join(GDB, 'FirstNations_Parcels_Dissolved' + today_full_str),             # the layer of First Nations entities (as in first_nations_ownership_layer_production.py)
+    'public': os.path.join(GDB, 'PublicParcelSelection_Dissolved_' + today_full_str),                  # the layer of public entities
+    'unknown': os.path.join(GDB, 'UnknownOwnerParcelSelection_Dissolved_' + today_full_str),           # the layer of parcels without any owner name
+    }
+
+
+
+# Produce the ownership layers (run when the script is started directly, or by another script that imports it and calls main())
+#   The index of built products is closed even if a stage fails.
+def main():
+    tracer = stage_tracing.Tracer('ownership', Trace_Folder, Profile_Stages, Memory_Stages)         # record the time, memory, and feature counts of each stage of the run
+    Cache = product_cache.ProductCache(Product_Cache) if Product_Cache else None                        # open the index of built products (None rebuilds the layers on every run)
+    try:
+        return produce_layers(tracer, Cache)                                                            # build (or publish) the layers
+    finally:
+        if Cache is not None:                                                                           # close the index of built products
+            Cache.close()
+
+
+# Build the ownership layers, or publish them from the product cache 'Cache' (None skips the cache)
+def produce_layers(tracer, Cache):
+    # Publish the layers from the product cache if none of their inputs or settings have changed since they were last built
+    if Cache is not None:                                                                               # check the product cache before any work is done
+        Cache_Inputs = {'parcels': product_cache.edition(AllParcels), 'selector': product_cache.content_hash(Selector, (), Selector_Where),
+                        'first_nations_terms': product_cache.file_hash(FN_Input), 'public_terms': product_cache.file_hash(Public_Input),
+                        'terms_column': Terms_Column, 'match': Match_Mode, 'owner_fields': ownerFields, 'distance': Selector_Distance, 'exclusive': Exclusive_Categories}  # fingerprint the parcels, the active Selector features, both workbooks, and the settings
+        Cache_Keys = dict((category, product_cache.fingerprint(dict(Cache_Inputs, product=category))) for category in Output_Layers)  # one key per ownership layer
+        if all(Cache.lookup(category, Cache_Keys[category]) for category in Output_Layers):             # every requested layer has been built from the same inputs before
+            for category, dissolved_path in Output_Layers.items():                                      # set up a FOR loop over the requested output layers
+                Cache.publish(category, Cache_Keys[category], [dissolved_path], today_full_str)         # copy the earlier layer to today's name
+            Cache.evict(Cache_Max_GB * 1024 ** 3, Cache_Max_Days)                                       # delete the dated copies that are no longer needed
+            tracer.finish()                                                                             # print the time taken and write the JSON trace of the run
+            return Output_Layers                                                                        # return the paths of the ownership layers (by category) to the calling script
+
+    # Set up layers and run the proximity selection once for every product
+    span = tracer.start('proximity_selection')                                                          # start the stage span
+    print('Confirming active trails, setting aside parcel selections.')                                 # print a statement to the terminal indicating next steps
+    Selector_Features = []                                                                              # set up an empty list to receive Selector feature names
+    arcpy.MakeFeatureLayer_management(AllParcels, 'Parcels')                                            # Make a temporary layer for full set of parcels
+    arcpy.MakeFeatureLayer_management(Selector, 'Selector')                                             # Make temporary layer for Hunter Walking Trails
+    arcpy.SelectLayerByAttribute_management('Selector', "NEW_SELECTION", Selector_Where)                # Select features according to the 'Requires_Deletion' field
+    with arcpy.da.SearchCursor('Selector', ['TRAIL_NAME']) as cursor:                                   # set up a SearchCursor to iterate over the 'Selector' layer according to the 'TRAIL_NAME' field
+        for row in cursor:                                                                              # set up a FOR loop to investigate each row within the cursor
+            print('Trail Name: {}'.format(row[0]))                                                      # print a statement to the terminal that contains each Selector name
+            Selector_Features = Selector_Features + ['{}'.format(row[0])]                               # append each row's trail name to the 'Selector_Features' list; this list will be unsorted
+    print('Number of selector features: ', len(Selector_Features))                                      # print a statement to the terminal with the number of Selector features in the list
+    Snapshot = None                                                                                     # set up the parcel snapshot (only used with the 'indexed' engine)
+    if Proximity_Engine == 'indexed' and Parcel_Snapshot:                                               # use the indexed proximity selection on the parcel snapshot
+        Snapshot = parcel_snapshot.ensure(AllParcels, Parcel_Snapshot, ownerFields)                     # open the memory-mapped snapshot, writing it first if the parcels have changed since it was built
+        Selector_Index = proximity_selection.SelectorIndex.from_layer(Selector, Selector_Where)         # read the active Selector features once
+        Nearby_OIDs = proximity_selection.select_snapshot(Snapshot, Selector_Index, Selector_Distance)  # find the OBJECTIDs of parcels within the distance of the active Selector features, parsing only the parcels that pass the envelope prefilter
+        print('{} parcels within {} of the Selector features.'.format(len(Nearby_OIDs), Selector_Distance))  # print a statement to the terminal with the number of parcels selected
+        layer_io.select_by_oids('Parcels', Nearby_OIDs)                                                 # select those parcels in the 'Parcels' layer
+    elif Proximity_Engine == 'indexed':                                                                 # use the indexed proximity selection on the parcel layer
+        Nearby_OIDs = proximity_selection.select_parcels_near_selector(AllParcels, Selector, Selector_Distance, Selector_Where) # find the OBJECTIDs of parcels within the distance of the active Selector features with a prefilter, a segment index, and an exact distance check
+        layer_io.select_by_oids('Parcels', Nearby_OIDs)                                                 # select those parcels in the 'Parcels' layer
+    else:                                                                                               # otherwise use the arcpy selection
+        arcpy.SelectLayerByLocation_management('Parcels', "WITHIN_A_DISTANCE", 'Selector', Selector_Distance, "NEW_SELECTION")  # Select all parcels within the distance of the "active" Selector features (once for all products)
+    arcpy.MakeFeatureLayer_management('Parcels', 'Parcel_Selection')                                   # make a temporary layer for the selected parcels
+    arcpy.SelectLayerByAttribute_management('Parcels', "CLEAR_SELECTION")                               # Clear selection on the full parcel layer
+    print('Parcels selected and set aside.\n')                                                          # print a statement to the terminal indicating the steps that have completed
+    span.end(features_out=layer_io.count_features('Parcel_Selection'))                                  # end the stage span with the number of parcels selected
+
+
+    # Acquire keywords from both workbooks
+    span = tracer.start('load_keywords')                                                                # start the stage span
+    keyWords = {}                                                                                       # set up a dictionary to hold the keyWords list of each workbook
+    for name, path, sheet_name in [('first_nations', FN_Input, 'FN_Terms'), ('public', Public_Input, 'Public_Terms')]:  # set up a FOR loop over both workbooks
+        keyWords[name] = spreadsheet_loader.load_column(path, sheet_name, Terms_Column)                 # stream the terms column (read-only, cached while the workbook is unchanged), without the header, empty cells, or repeated terms
+        print('{} keywords loaded from {}.'.format(len(keyWords[name]), sheet_name))                    # print a statement to the terminal with the number of keywords
+    FN_Classifier = ownership_classifier.OwnershipClassifier(keyWords['first_nations'], Match_Mode)     # set up the classifier for First Nations terms
+    Public_Classifier = ownership_classifier.OwnershipClassifier(keyWords['public'], Match_Mode)        # set up the classifier for public (and First Nations) terms
+    print('Keywords loaded.\n')                                                                         # print a statement to the terminal which indicates the actions which have been completed
+    span.end(features_out=len(keyWords['first_nations']) + len(keyWords['public']))                     # end the stage span with the number of keywords
+
+
+    # Classify every selected parcel in one scan
+    #   By default the private layer holds the same parcels as the private script's, so a First Nations parcel that also
+    #   has a non-public owner name is in both layers; with 'Exclusive_Categories', First Nations ownership takes precedence.
+    span = tracer.start('classify')                                                                     # start the stage span
+    if Snapshot is not None:                                                                            # classify the selected parcels from the snapshot, testing each distinct owner name once
+        Ownership = ownership_classifier.classify_snapshot(Snapshot, FN_Classifier, Public_Classifier, ownerFields, Snapshot.positions(Nearby_OIDs), Exclusive_Categories)  # {category: set of OBJECTIDs}
+    else:                                                                                               # otherwise read the owner fields of the selected parcels
+        Ownership = ownership_classifier.classify_ownership('Parcel_Selection', FN_Classifier, Public_Classifier, ownerFields, Exclusive_Categories)   # {category: set of OBJECTIDs}
+    for category in ownership_classifier.CATEGORIES:                                                    # set up a FOR loop over the categories
+        print('{}: {} parcels'.format(category, len(Ownership[category])))                              # print a statement to the terminal with the number of parcels per category
+    print('Parcels classified.\n')                                                                      # print a statement to the terminal which indicates the actions which have been completed
+    span.end(features_out=len(set().union(*Ownership.values())))                                        # end the stage span with the number of parcels classified
+
+
+    # Dissolve each category from the shared selection
+    for category, dissolved_path in Output_Layers.items():                                              # set up a FOR loop over the requested output layers
+        span = tracer.start('dissolve_' + category, features_in=len(Ownership[category]))               # start the stage span
+        layer_io.select_by_oids('Parcel_Selection', Ownership[category])                                # select the parcels of this category within 'Parcel_Selection'
+        if Dissolve_Engine == 'tiled':                                                                  # use the parallel tiled dissolve on the selected parcels
+            span.features_out = tiled_dissolve.dissolve_to('Parcel_Selection', dissolved_path, spill_dir=Scratch_Folder)   # union the parcels tile by tile in worker processes
+        else:                                                                                           # otherwise use the arcpy dissolve
+            arcpy.Dissolve_management('Parcel_Selection', dissolved_path,
+                                      "", "", 'MULTI_PART', 'DISSOLVE_LINES')                           # dissolve the parcels with multipart options, dissolving along lines
+        print('Finished dissolving {} parcels to {}.'.format(category, dissolved_path))                 # print statement to the terminal with the name of the product
+        span.end()                                                                                      # end the stage span
+    arcpy.SelectLayerByAttribute_management('Parcel_Selection', "CLEAR_SELECTION")                      # clear the selection on 'Parcel_Selection'
+
+    # Record the new layers in the product cache and delete the dated copies that are no longer needed
+    if Cache is not None:                                                                               # only when the product cache is in use
+        for category, dissolved_path in Output_Layers.items():                                          # set up a FOR loop over the requested output layers
+            Cache.store(category, Cache_Keys[category], [dissolved_path], today_full_str)               # record each layer under the fingerprint of its inputs
+        Cache.evict(Cache_Max_GB * 1024 ** 3, Cache_Max_Days)                                           # delete the dated copies that are no longer needed
+
+    # Display time taken just for fun:
+    tracer.finish()                                                                                     # print the time taken and write the JSON trace of the run
+    return Output_Layers                                                                                # return the paths of the ownership layers (by category) to the calling script
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,264 @@
+#-------------------------------------------------------------------------------
+# Name:        parcel_snapshot.py (Columnar Parcel Snapshot)
+# Purpose:      The ownership and lakeshore scripts each start from the statewide parcel
+#                   layer and pay for a full cursor over it on every run, turning millions
+#                   of rows into Python objects. This module writes the columns they need
+#                   to a folder of flat files once per parcel release, and opens them with
+#                   memory mapping:
+#
+#                   oids.npy             OBJECTID of each parcel (int64)
+#                   areas.npy            area of each parcel (float64, as 'Shape_Area')
+#                   envelopes.npy        (xmin, ymin, xmax, ymax) of each parcel (float64)
+#                   <field>.codes.npy    owner names, dictionary-encoded: a code per parcel (int32, -1 for <Null>)
+#                   <field>.values.json  ... and the distinct names the codes point at
+#                   geometry.wkb         the WKB of every parcel, one after another
+#                   geometry.offsets.npy where each parcel's WKB starts (int64, one more than the parcels)
+#                   manifest.json        the source, its edition (see layer_io.dataset_edition()), and the fields
+#
+#                   1. Nothing is read until it is used, and then only the pages that are
+#                       touched; attribute and envelope filters are NumPy expressions over
+#                       the mapped arrays.
+#                   2. Owner names are tested once per distinct name rather than once per
+#                       parcel (see ownership_classifier.classify_snapshot()).
+#                   3. Only the geometries that survive the filters are parsed; the WKB of
+#                       each is copied out of the mapped file as it is parsed (shapely needs
+#                       bytes), so the copies last only as long as the chunk being parsed.
+#                   4. A snapshot is passed to worker processes by its folder name; each
+#                       worker maps the same files, so the operating system holds one copy
+#                       of them however many workers there are.
+#
+#                   Used by ownership_layer_production.py and first_nations_ownership_layer_production.py
+#                   (proximity and classification), private_ownership_layer_production_xlsx.py
+#                   (proximity; its classification runs on the copied selection), and
+#                   lakeshore_parcel_selection_layer_production.py. The TRS script joins a
+#                   copy whose OBJECTIDs are assigned as it is written, so it reads that copy.
+#
+#                   snapshot = parcel_snapshot.ensure(AllParcels, r"*folderpath*\parcel_snapshot")
+#                   nearby = proximity_selection.select_snapshot(snapshot, selector_index, '2 kilometers')
+#
+# Author:      draleigh
+#
+# Created:     18 October 2026
+# Copyright:   (c) draleigh 2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+
+
+# Import modules and packages
+import os,sys,json,time,shutil,argparse                                                     # list of required modules
+from array import array                                                                     # compact buffers for the columns while the snapshot is built
+import numpy as np                                                                          # the mapped columns
+import shapely                                                                              # vectorized envelopes, areas, and WKB
+import layer_io                                                                             # shared feature reading/writing helpers
+
+
+SNAPSHOT_VERSION = 2                                                                        # raise when the layout of the files changes
+TEXT_FIELDS = ['OWNER_NAME', 'TAX_NAME']                                                    # fields that are dictionary-encoded by default (as ownership_classifier.OWNER_FIELDS)
+CHUNK_SIZE = 50000                                                                          # parcels converted to WKB at a time while building, and parsed at a time while reading
+
+
+# Write a snapshot of 'source' (a feature class, layer, or open-format dataset) to 'folder'
+#   'text_fields' are dictionary-encoded; 'edition' defaults to layer_io.dataset_edition(source).
+#   The snapshot is written to a temporary folder first, so a snapshot that is being read is never half written.
+def build(source, folder, text_fields=TEXT_FIELDS, where=None, edition=None):
+    start_time = time.time()
+    text_fields = list(text_fields)
+    edition = edition if edition is not None else layer_io.dataset_edition(source)
+    building = '{}.building.{}'.format(folder, os.getpid())
+    if os.path.exists(building):
+        shutil.rmtree(building)
+    os.makedirs(building)
+    oids, offsets = array('q'), array('q', [0])
+    codes = dict((field, array('i')) for field in text_fields)
+    dictionaries = dict((field, {}) for field in text_fields)                               # {name: code} for each field
+    areas, envelopes = [], []
+    with open(os.path.join(building, 'geometry.wkb'), 'wb') as wkb_file:
+        chunk = []
+
+        def flush():
+            geometries = np.asarray(chunk, dtype=object)
+            areas.append(shapely.area(geometries))
+            envelopes.append(shapely.bounds(geometries).reshape(-1, 4))
+            for data in shapely.to_wkb(geometries):
+                wkb_file.write(data)
+                offsets.append(offsets[-1] + len(data))
+            del chunk[:]
+
+        for oid, values, geom in layer_io.read_features(source, text_fields, where):        # the one cursor over the parcels
+            if geom is None or geom.is_empty:
+                continue
+            oids.append(oid)
+            for field, value in zip(text_fields, values):
+                if value is None:
+                    codes[field].append(-1)
+                else:
+                    codes[field].append(dictionaries[field].setdefault(value, len(dictionaries[field])))
+            chunk.append(geom)
+            if len(chunk) >= CHUNK_SIZE:
+                flush()
+        if chunk:
+            flush()
+    np.save(os.path.join(building, 'oids.npy'), np.frombuffer(oids, dtype=np.int64) if len(oids) else np.zeros(0, dtype=np.int64))
+    np.save(os.path.join(building, 'areas.npy'), np.concatenate(areas) if areas else np.zeros(0))
+    np.save(os.path.join(building, 'envelopes.npy'), np.concatenate(envelopes) if envelopes else np.zeros((0, 4)))
+    np.save(os.path.join(building, 'geometry.offsets.npy'), np.frombuffer(offsets, dtype=np.int64))
+    for field in text_fields:
+        np.save(os.path.join(building, field + '.codes.npy'), np.frombuffer(codes[field], dtype=np.int32) if len(codes[field]) else np.zeros(0, dtype=np.int32))
+        with open(os.path.join(building, field + '.values.json'), 'w') as f:
+            json.dump(sorted(dictionaries[field], key=dictionaries[field].get), f)          # in order of their codes
+    unit = layer_io.linear_unit(source)                                                     # so distances can be checked against the snapshot's units
+    manifest = {'version': SNAPSHOT_VERSION, 'source': str(source), 'edition': edition, 'where': where, 'text_fields': text_fields,
+                'linear_unit': list(unit) if unit is not None else None, 'count': len(oids), 'created': time.strftime('%Y-%m-%dT%H:%M:%S')}
+    with open(os.path.join(building, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    if os.path.exists(folder):
+        shutil.rmtree(folder)
+    os.rename(building, folder)
+    print('Parcel snapshot of {} parcels written to {} (%s seconds).'.format(len(oids), folder) % round(time.time() - start_time))
+    return ParcelSnapshot(folder)
+
+
+# Return the manifest of the snapshot in 'folder' if it was built from 'source' with every field in 'text_fields', or None
+def _matching_manifest(folder, source, text_fields=TEXT_FIELDS, where=None):
+    try:
+        with open(os.path.join(folder, 'manifest.json')) as f:
+            manifest = json.load(f)
+    except (IOError, ValueError):
+        return None
+    if (manifest.get('version') == SNAPSHOT_VERSION and manifest.get('source') == str(source) and manifest.get('where') == where
+            and set(text_fields) <= set(manifest.get('text_fields', []))):
+        return manifest
+    return None
+
+
+# Return True if the snapshot in 'folder' was built from the current edition of 'source' with every field in 'text_fields'
+#   A source whose edition cannot be told (see layer_io.dataset_edition()) is never current.
+def is_current(folder, source, text_fields=TEXT_FIELDS, where=None, edition=None):
+    manifest = _matching_manifest(folder, source, text_fields, where)
+    if manifest is None:
+        return False
+    edition = edition if edition is not None else layer_io.dataset_edition(source)
+    return edition is not None and manifest.get('edition') == edition
+
+
+# Open the snapshot of 'source' in 'folder', building it first if the parcels have changed since it was written
+#   The edition is that of the parcel feature class (see layer_io.dataset_edition()), so the lock files
+#   written when a script makes a layer from it do not cause a rebuild. If the edition cannot be told,
+#   an existing snapshot of the same source is reused (with a warning) rather than rebuilt on every run;
+#   'rebuild' writes a new snapshot whatever the edition.
+def ensure(source, folder, text_fields=TEXT_FIELDS, where=None, edition=None, rebuild=False):
+    edition = edition if edition is not None else layer_io.dataset_edition(source)
+    if not rebuild:
+        if is_current(folder, source, text_fields, where, edition):
+            return ParcelSnapshot(folder)
+        manifest = _matching_manifest(folder, source, text_fields, where) if edition is None else None
+        if manifest is not None:
+            print('Warning: the edition of {} cannot be told (see layer_io.dataset_edition()), so the snapshot written {} is reused; '
+                  'rebuild it after a parcel release with "python parcel_snapshot.py <parcels> <folder> --force".'.format(source, manifest.get('created')))
+            return ParcelSnapshot(folder)
+    return build(source, folder, text_fields, where, edition)
+
+
+# A snapshot opened with memory mapping
+#   Positions (0 to len - 1) index every column; OBJECTIDs are in 'oids'.
+#   A snapshot is pickled as its folder name, so it can be handed to worker processes.
+class ParcelSnapshot(object):
+
+    def __init__(self, folder):
+        self.folder = folder
+        with open(os.path.join(folder, 'manifest.json')) as f:
+            self.manifest = json.load(f)
+        self.text_fields = list(self.manifest['text_fields'])
+        unit = self.manifest.get('linear_unit')
+        self.linear_unit = tuple(unit) if unit is not None else None                        # (name, meters per unit) of the source, as layer_io.linear_unit()
+        self.oids = self._load('oids.npy')
+        self.areas = self._load('areas.npy')
+        self.envelopes = self._load('envelopes.npy')
+        self.offsets = self._load('geometry.offsets.npy')
+        path = os.path.join(folder, 'geometry.wkb')
+        self._wkb = np.memmap(path, dtype=np.uint8, mode='r') if os.path.getsize(path) else np.zeros(0, dtype=np.uint8)   # an empty file cannot be mapped
+        self._codes, self._values = {}, {}
+
+    def _load(self, name):
+        return np.load(os.path.join(self.folder, name), mmap_mode='r')
+
+    def __getstate__(self):
+        return {'folder': self.folder}
+
+    def __setstate__(self, state):
+        self.__init__(state['folder'])
+
+    def __len__(self):
+        return len(self.oids)
+
+    # The code of each parcel for a dictionary-encoded field (-1 for <Null>)
+    def codes(self, field):
+        if field not in self._codes:
+            if field not in self.text_fields:
+                raise KeyError("'{}' is not one of the fields of the snapshot in {} ({}).".format(field, self.folder, ', '.join(self.text_fields)))
+            self._codes[field] = self._load(field + '.codes.npy')
+        return self._codes[field]
+
+    # The distinct values of a dictionary-encoded field, in order of their codes
+    def values(self, field):
+        if field not in self._values:
+            self.codes(field)                                                               # checks the field
+            with open(os.path.join(self.folder, field + '.values.json')) as f:
+                self._values[field] = json.load(f)
+        return self._values[field]
+
+    # Return a boolean mask of the parcels whose 'field' is one of 'values'
+    def matching(self, field, values):
+        values = set(values)
+        wanted = [code for code, value in enumerate(self.values(field)) if value in values]
+        return np.isin(self.codes(field), np.asarray(wanted, dtype=np.int32))
+
+    # Return the positions of the parcels whose envelopes overlap 'bbox' (xmin, ymin, xmax, ymax)
+    def within_bbox(self, bbox):
+        xmin, ymin, xmax, ymax = bbox
+        e = self.envelopes
+        return np.flatnonzero((e[:, 0] <= xmax) & (e[:, 2] >= xmin) & (e[:, 1] <= ymax) & (e[:, 3] >= ymin))
+
+    # Return the positions of the parcels with the given OBJECTIDs
+    def positions(self, oids):
+        return np.flatnonzero(np.isin(self.oids, np.fromiter(oids, dtype=np.int64, count=len(oids))))
+
+    # The WKB of one parcel, as a view of the mapped file (nothing is copied until it is parsed)
+    def wkb(self, position):
+        return memoryview(self._wkb[self.offsets[position]:self.offsets[position + 1]])
+
+    # Parse the geometries at 'positions' (every parcel if None) into an array of shapely geometries
+    #   Each WKB is copied out of the mapped file into bytes for shapely, one call at a time.
+    def geometries(self, positions=None):
+        positions = np.arange(len(self)) if positions is None else np.asarray(positions, dtype=np.int64)
+        data = np.empty(len(positions), dtype=object)
+        starts, ends = self.offsets[positions], self.offsets[positions + 1]
+        for i, (start, end) in enumerate(zip(starts, ends)):
+            data[i] = self._wkb[start:end].tobytes()
+        return shapely.from_wkb(data)
+
+    # Yield (OBJECTID, shapely geometry) for the parcels at 'positions' (every parcel if None), parsing a chunk at a time
+    def iter_features(self, positions=None, chunk_size=CHUNK_SIZE):
+        positions = np.arange(len(self)) if positions is None else np.asarray(positions, dtype=np.int64)
+        for start in range(0, len(positions), chunk_size):
+            chunk = positions[start:start + chunk_size]
+            for oid, geom in zip(self.oids[chunk].tolist(), self.geometries(chunk)):
+                yield oid, geom
+
+
+# Command line entry point: build (or refresh) the snapshot of a parcel layer, e.g. after a new parcel release
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Write a memory-mapped columnar snapshot of a parcel layer.')
+    parser.add_argument('source', help='parcel feature class or open-format dataset')
+    parser.add_argument('folder', help='folder for the snapshot')
+    parser.add_argument('--fields', nargs='+', default=TEXT_FIELDS, help='text fields to dictionary-encode (default: {})'.format(' '.join(TEXT_FIELDS)))
+    parser.add_argument('--where', default=None, help='SQL expression to filter the parcels')
+    parser.add_argument('--force', action='store_true', help='rebuild even if the snapshot is current')
+    args = parser.parse_args(argv)
+    snapshot = ensure(args.source, args.folder, args.fields, args.where, rebuild=args.force)
+    print('{} parcels in {} (edition {}).'.format(len(snapshot), args.folder, snapshot.manifest['edition']))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
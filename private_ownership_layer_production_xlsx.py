@@ -24,15 +24,13 @@
 
 
 # Import Modules and Extensions
-import os,arcpy,time,datetime,copy,openpyxl                                                 # list of required modules
+import os,time,datetime,copy                                                                # list of required modules
+from arcpy_runtime import arcpy                                                             # arcpy is imported when the first tool is called (see arcpy_runtime.py)
 from datetime import date, timedelta                                                        # extract submodules
-from arcpy import env                                                                       # extract submodule
-from arcpy.sa import *                                                                      # import the Spatial Analyst toolbar
-arcpy.CheckOutExtension("Spatial")                                                          # check out the Spatial Analyst toolbar
+import layer_io,ownership_classifier,parcel_snapshot,proximity_selection,spreadsheet_loader,stage_tracing,streaming_writer,tiled_dissolve   # shared helpers for reading workbooks and layers, classifying owner names, snapshotting parcels, tracing stages, and writing and dissolving layers
 
 
 # Date Management
-start_time = time.time()                                                                    # define the start time of the script
 today = date.today()                                                                        # define the date of the script's run
 today_year = today.year                                                                     # define the year of the script's run
 today_month = today.month                                                                   # define the month of the script's run
@@ -50,85 +48,109 @@ AllParcels = r"*folderpath*\parcel_FC"
 Selector = r"*folderpath*\selector_feature_class"                                                       # define the location of the current dataset which contains the selection features
 Ownership_DataFolder = r"*folderpath*\Data"                                                             # define the location of the "Data" subfolder (if necessary)
 Input = r"*folderpath*\Public_Property_Terms.xlsx"                                                      # define the location of the .xlsx file with the search terms
-
-
-
-# Set up layers and feature classes (with file paths)
-block_start = time.time()                                                                               # set the start time of the code block
-print('Setting up file paths, making feature layers.')                                                  # print a statement to the terminal indicating what steps will be taken next
-Selector_Features = []                                                                                  # set up an empty list to receive Selector feature names
-arcpy.MakeFeatureLayer_management(AllParcels, 'Parcels')                                                # Make a temporary layer for full set of parcels
-arcpy.MakeFeatureLayer_management(Selector, 'Selector')                                                          # Make temporary layer for Hunter Walking Trails
-Parcel_selection_path = os.path.join(GDB, 'Parcel_Selection_' + today_full_str)                         # Define path of transitional feature class with selected parcels within specified distance of Selector features
-Parcel_selection_reduced_path = os.path.join(GDB, 'ParcelSelection_Reduced_' + today_full_str)          # Define path of parcel shapefile after running selection for non-public entities
-Parcel_selection_dissolved_path = os.path.join(GDB, 'PrivateParcelSelection_Dissolved_' + today_full_str) # Define path of the dissolved layer of non-public entities
-#print(Parcel_selection_path)                                                                           # print the path of the parcel selection feature class, if desired
-arcpy.SelectLayerByAttribute_management('Selector', "CLEAR_SELECTION")                                  # clear the selection on the 'Selector' layer to confirm that the layer has no selection
-print('Prep work complete (%s taken).\n' % round(time.time() - block_start))                            # print a statement to the terminal indicating the steps that have completed
-
-# Find all entries in 'OWNER_NAME' field
-block_start = time.time()                                                                               # set the start time of the code block
-print('Confirming active trails, setting aside parcel selections.')                                     # print a statement to the terminal indicating next steps
-arcpy.SelectLayerByAttribute_management('Selector', "NEW_SELECTION", "Requires_Deletion = 'No'")        # Select features according to the 'Requires_Deletion' field; this may require adjustments to the Selector shapefile ahead of time
-with arcpy.da.SearchCursor('Selector', ['TRAIL_NAME']) as cursor:                                       # set up a SearchCursor to iterate over the 'Selector' layer according to the 'TRAIL_NAME' field
-    for row in cursor:                                                                                  # set up a FOR loop to investigate each row within the cursor
-        print('Trail Name: {}'.format(row[0]))                                                          # print a statement to the terminal that contains each Selector name
-        Selector_Features = Selector_Features + ['{}'.format(row[0])]                                   # append each row's trail name to the 'Selector_Features' list; this list will be unsorted
-print('Number of selector features: ', len(Selector_Features))                                          # print a statement to the terminal with the number of Selector features in the list
-arcpy.SelectLayerByLocation_management('Parcels', "WITHIN_A_DISTANCE", 'Selector', '2 kilometers', "NEW_SELECTION")  # Select all parcels within 2km of the "active" Selector
-arcpy.CopyFeatures_management('Parcels', Parcel_selection_path)                                         # copy the features from 'Parcels' to the predefined 'Parcel_selection_path' file
-arcpy.MakeFeatureLayer_management(Parcel_selection_path, 'Parcel_Selection')                            # make a temporary layer for the selected parcels
-arcpy.SelectLayerByAttribute_management('Parcels', "CLEAR_SELECTION")                                   # Clear selection on the full parcel layer
-print('''Parcels selected and set aside (%s taken), 
-proceeding with public and First Nations keyword selection from Excel document.\n''' % (round(time.time() - block_start))) # print a statement to the terminal indcating time taken for block to process and next steps
-
-# Acquire keywords and proceed to setting up definition queries
-block_start = time.time()                                                                               # set the start time of the code block
-keyWords_Full = []                                                                                      # set up a list of keyWords to be used for selection
-wb = openpyxl.load_workbook(Input)                                                                      # use the openpyxl module to load the predefined workbook
-sheet = wb['Public_Terms']                                                                              # define the sheet within the workbook that will be utilized
-for val in sheet.iter_rows(min_col=1):                                                                  # set up a FOR loop to iterate over rows in the sheet for the first column (in this case, the terms are in the first column, the only column with data in the sheet)
-    keyWords_Full.append(val[0].value)                                                                  # add the initial value from that row (limited to start a 'min_col=#') to the 'keyWords_Full' list
-    print(val[0].value)                                                                                 # print statement to the terminal with the value being appended
-keyWords = keyWords_Full[1:]                                                                            # remove the first value in the list (the header of the column, if necessary)
-#print(keyWords)                                                                                       # print the list to the terminal (if desired)
-
-# Fields for dissolution and final table
-
-# Define the list of owner fields that could contain owner information
-#   These fields will be investigated for the key terms that relate to public or First Nations ownership
-#ownerFields = ['OWNER_NAME', 'TAX_NAME', 'OWNER_MORE', 'TAX_ADD_L1']                                # this is the full list of fields that do and could potentially contain ownership designations/names
-ownerFields = ['OWNER_NAME', 'TAX_NAME']                                                            # this list contains fields that are supposed to only contain ownership designations/names
-
-
-# Set up empty strings for the expressions
-Owner_Exp = ''                                                                                      # set up a string for Owner expression with 1st field (to combine with Tax expression)
-Tax_Exp = ''                                                                                        # set up a string for Tax expression with 1st field (to combine with Owner expression)
-Full_Exp = ''                                                                                       # set up a string to receive the expression combinations
-
-# Set up Owner_Exp
-for i in range(len(keyWords)):                                                                      # set up a FOR loop to iterate over each entry in the keyWords list
-    Owner_Exp = Owner_Exp + str(ownerFields[0] + " <> '{}' And ".format(keyWords[i]))               # append each slice of the keyWords list with appropriate syntax for the ultimate SQL expression
-Owner_Exp = Owner_Exp + str(ownerFields[0] + ' IS NOT NULL')                                        # once the FOR loop has completed, add a final expression
-
-# Set up Tax_Exp
-for k in range(len(keyWords)):                                                                      # set up a FOR loop to iterate over each entry in the keyWords list
-    Tax_Exp = Tax_Exp + str(ownerFields[1] + " <> '{}' And ".format(keyWords[k]))                   # append each slice of the keyWords list with appropriate syntax for the ultimate SQL expression
-Tax_Exp = Tax_Exp + str(ownerFields[1] + ' IS NOT NULL')                                            # once the FOR loop has completed, add a final expression
-
-Full_Exp = "("+Owner_Exp+") Or ("+Tax_Exp+")"                                                       # complete the expression by combining the four partial expressions (Owner and Tax)
-##print(Full_Exp)
-print('Definition query has been completed (%s seconds).\n' % (time.time() - block_start))          # print a statement to the terminal which indicates the actions which have been completed
-
-
-print('Starting selection of non-public parcels...')
-block_start = time.time()                                                                           # set the start time of the code block 
-arcpy.SelectLayerByAttribute_management('Parcel_Selection', "NEW_SELECTION", Full_Exp)              # select all polygons within 'Parcel_Selection' according to the Full_Exp
-# Dissolve the non-public parcels to produce pre-defined feature class by name with multipart options, dissolving along lines
-arcpy.Dissolve_management('Parcel_Selection', Parcel_selection_dissolved_path,
-                          "", "", 'MULTI_PART', 'DISSOLVE_LINES')
-
-print('Finished with dissolving. Check for a shapefile named MNPrivateParcelSelection_Dissolved_' + today_full_str) # print statement to the terminal with the expected name of the product
-
-# Display time taken just for fun:
-print('This script took %s seconds...' % round(time.time() - start_time))                           # print statement to the terminal with time taken to complete the script
+Terms_Column = None                                                                                     # define the header of the workbook column that holds the terms (None uses the first column)
+Match_Mode = 'exact'                                                                                    # define how owner names are compared to the keywords: 'exact', 'normalized', or 'substring'
+Selector_Where = "Requires_Deletion = 'No'"                                                             # define the expression for the active Selector features
+Selector_Distance = '2 kilometers'                                                                      # define the distance from the Selector features within which parcels are examined
+Proximity_Engine = 'arcpy'                                                                              # define how parcels near the Selector features are found: 'arcpy' (SelectLayerByLocation_management) or 'indexed' (see proximity_selection.py)
+Dissolve_Engine = 'arcpy'                                                                               # define how the output layer is dissolved: 'arcpy' (Dissolve_management) or 'tiled' (parallel, see tiled_dissolve.py)
+Scratch_Folder = os.path.join(os.path.dirname(GDB), 'Scratch')                                          # define the folder that receives the temporary spill files of the 'tiled' dissolve (None uses the system temporary folder)
+Parcel_Snapshot = None                                                                                  # define the folder of the columnar parcel snapshot used by the 'indexed' engine to find the parcels near the Selector features, e.g. os.path.join(os.path.dirname(GDB), 'parcel_snapshot') (rebuilt when the parcels change; None, the default, reads the parcel layer; see parcel_snapshot.py)
+Copy_Engine = 'arcpy'                                                                                   # define how the parcel selection is copied: 'arcpy' (CopyFeatures_management, which keeps the full schema) or 'streaming' (in batches, see streaming_writer.py)
+Trace_Folder = os.path.join(os.path.dirname(GDB), 'Traces')                                             # define the folder that receives the JSON trace of each run (None writes no trace)
+Profile_Stages = []                                                                                     # define the stages to run under cProfile, e.g. ['classify'] ('*' for every stage; see stage_tracing.py)
+Memory_Stages = []                                                                                      # define the stages to run under tracemalloc, e.g. ['classify'] ('*' for every stage)
+
+
+
+# Produce the private ownership layer (run when the script is started directly, or by another script that imports it and calls main())
+def main():
+    tracer = stage_tracing.Tracer('private_ownership', Trace_Folder, Profile_Stages, Memory_Stages)   # record the time, memory, and feature counts of each stage of the run
+    # Set up layers and feature classes (with file paths)
+    span = tracer.start('setup')                                                                        # start the stage span
+    print('Setting up file paths, making feature layers.')                                              # print a statement to the terminal indicating what steps will be taken next
+    Selector_Features = []                                                                              # set up an empty list to receive Selector feature names
+    arcpy.MakeFeatureLayer_management(AllParcels, 'Parcels')                                            # Make a temporary layer for full set of parcels
+    arcpy.MakeFeatureLayer_management(Selector, 'Selector')                                                      # Make temporary layer for Hunter Walking Trails
+    Parcel_selection_path = os.path.join(GDB, 'Parcel_Selection_' + today_full_str)                     # Define path of transitional feature class with selected parcels within specified distance of Selector features
+    Parcel_selection_reduced_path = os.path.join(GDB, 'ParcelSelection_Reduced_' + today_full_str)      # Define path of parcel shapefile after running selection for non-public entities
+    Parcel_selection_dissolved_path = os.path.join(GDB, 'PrivateParcelSelection_Dissolved_' + today_full_str) # Define path of the dissolved layer of non-public entities
+    #print(Parcel_selection_path)                                                                           # print the path of the parcel selection feature class, if desired
+    arcpy.SelectLayerByAttribute_management('Selector', "CLEAR_SELECTION")                              # clear the selection on the 'Selector' layer to confirm that the layer has no selection
+    print('Prep work complete.\n')                                                                      # print a statement to the terminal indicating the steps that have completed
+    span.end()                                                                                          # end the stage span
+
+    # Find all entries in 'OWNER_NAME' field
+    span = tracer.start('proximity_selection')                                                          # start the stage span
+    print('Confirming active trails, setting aside parcel selections.')                                 # print a statement to the terminal indicating next steps
+    arcpy.SelectLayerByAttribute_management('Selector', "NEW_SELECTION", Selector_Where)                # Select features according to the 'Requires_Deletion' field; this may require adjustments to the Selector shapefile ahead of time
+    with arcpy.da.SearchCursor('Selector', ['TRAIL_NAME']) as cursor:                                   # set up a SearchCursor to iterate over the 'Selector' layer according to the 'TRAIL_NAME' field
+        for row in cursor:                                                                              # set up a FOR loop to investigate each row within the cursor
+            print('Trail Name: {}'.format(row[0]))                                                      # print a statement to the terminal that contains each Selector name
+            Selector_Features = Selector_Features + ['{}'.format(row[0])]                               # append each row's trail name to the 'Selector_Features' list; this list will be unsorted
+    print('Number of selector features: ', len(Selector_Features))                                      # print a statement to the terminal with the number of Selector features in the list
+    if Proximity_Engine == 'indexed' and Parcel_Snapshot:                                               # use the indexed proximity selection on the parcel snapshot (the owner names are classified on the copy below, whose OBJECTIDs are new)
+        Snapshot = parcel_snapshot.ensure(AllParcels, Parcel_Snapshot)                                  # open the memory-mapped snapshot, writing it first if the parcels have changed since it was built
+        Selector_Index = proximity_selection.SelectorIndex.from_layer(Selector, Selector_Where)         # read the active Selector features once
+        Nearby_OIDs = proximity_selection.select_snapshot(Snapshot, Selector_Index, Selector_Distance)  # find the OBJECTIDs of parcels within the distance of the active Selector features, parsing only the parcels that pass the envelope prefilter
+        print('{} parcels within {} of the Selector features.'.format(len(Nearby_OIDs), Selector_Distance))  # print a statement to the terminal with the number of parcels selected
+        layer_io.select_by_oids('Parcels', Nearby_OIDs)                                                 # select those parcels in the 'Parcels' layer
+    elif Proximity_Engine == 'indexed':                                                                 # use the indexed proximity selection on the parcel layer
+        Nearby_OIDs = proximity_selection.select_parcels_near_selector(AllParcels, Selector, Selector_Distance, Selector_Where) # find the OBJECTIDs of parcels within the distance of the active Selector features with a prefilter, a segment index, and an exact distance check
+        layer_io.select_by_oids('Parcels', Nearby_OIDs)                                                 # select those parcels in the 'Parcels' layer
+    else:                                                                                               # otherwise use the arcpy selection
+        arcpy.SelectLayerByLocation_management('Parcels', "WITHIN_A_DISTANCE", 'Selector', Selector_Distance, "NEW_SELECTION")  # Select all parcels within 2km of the "active" Selector
+    if Copy_Engine == 'streaming':                                                                      # stream the selected parcels to the predefined feature class in batches
+        streaming_writer.copy_features('Parcels', Parcel_selection_path)                                # copy the features from 'Parcels' without holding the selection in memory
+    else:                                                                                               # otherwise use the arcpy copy
+        arcpy.CopyFeatures_management('Parcels', Parcel_selection_path)                                 # copy the features from 'Parcels' to the predefined 'Parcel_selection_path' file
+    arcpy.MakeFeatureLayer_management(Parcel_selection_path, 'Parcel_Selection')                        # make a temporary layer for the selected parcels
+    span.end(features_out=layer_io.count_features('Parcel_Selection'))                                  # end the stage span with the number of parcels selected
+    arcpy.SelectLayerByAttribute_management('Parcels', "CLEAR_SELECTION")                               # Clear selection on the full parcel layer
+    print('Parcels selected and set aside, \nproceeding with public and First Nations keyword selection from Excel document.\n')   # print a statement to the terminal indcating next steps
+
+    # Acquire keywords and proceed to setting up definition queries
+    span = tracer.start('classify')                                                                     # start the stage span
+    keyWords = spreadsheet_loader.load_column(Input, 'Public_Terms', Terms_Column)                      # stream the terms column of the 'Public_Terms' sheet (read-only, cached while the workbook is unchanged), without the header, empty cells, or repeated terms
+    print('{} keywords loaded from Public_Terms.'.format(len(keyWords)))                                # print a statement to the terminal with the number of keywords
+
+    # Fields for dissolution and final table
+
+    # Define the list of owner fields that could contain owner information
+    #   These fields will be investigated for the key terms that relate to public or First Nations ownership
+    #ownerFields = ['OWNER_NAME', 'TAX_NAME', 'OWNER_MORE', 'TAX_ADD_L1']                                # this is the full list of fields that do and could potentially contain ownership designations/names
+    ownerFields = ['OWNER_NAME', 'TAX_NAME']                                                        # this list contains fields that are supposed to only contain ownership designations/names
+
+
+    # Classify the parcels by owner name
+    #   Instead of building one large SQL expression from the keyWords list, the owner fields of the selected
+    #   parcels are read once and compared against the keyWords in memory (see ownership_classifier.py).
+    #   'exact' matches the names the same way the SQL expression did; 'normalized' and 'substring' also catch
+    #   variants in case, punctuation, and abbreviations (e.g. 'DEPT'/'DEPARTMENT').
+    classifier = ownership_classifier.OwnershipClassifier(keyWords, Match_Mode)                     # set up the classifier with the keyWords list
+    Private_OIDs = ownership_classifier.select_non_matching('Parcel_Selection', classifier, ownerFields)    # collect the OBJECTIDs of parcels with an owner or tax name that does not match any keyword
+    print('{} non-public parcels found.'.format(len(Private_OIDs)))                                 # print a statement to the terminal with the number of parcels found
+    print('Owner names have been classified.\n')                                                    # print a statement to the terminal which indicates the actions which have been completed
+    span.end(features_out=len(Private_OIDs))                                                        # end the stage span with the number of non-public parcels
+
+
+    print('Starting selection of non-public parcels...')
+    span = tracer.start('dissolve', features_in=len(Private_OIDs))                                  # start the stage span
+    layer_io.select_by_oids('Parcel_Selection', Private_OIDs)                                       # select all polygons within 'Parcel_Selection' that were classified as non-public
+    # Dissolve the non-public parcels to produce pre-defined feature class by name with multipart options, dissolving along lines
+    if Dissolve_Engine == 'tiled':                                                                  # use the parallel tiled dissolve on the selected parcels
+        span.features_out = tiled_dissolve.dissolve_to('Parcel_Selection', Parcel_selection_dissolved_path, spill_dir=Scratch_Folder)   # union the parcels tile by tile in worker processes and write one multipart feature
+    else:                                                                                           # otherwise use the arcpy dissolve
+        arcpy.Dissolve_management('Parcel_Selection', Parcel_selection_dissolved_path,
+                                  "", "", 'MULTI_PART', 'DISSOLVE_LINES')
+
+    print('Finished with dissolving. Check for a shapefile named MNPrivateParcelSelection_Dissolved_' + today_full_str) # print statement to the terminal with the expected name of the product
+    span.end()                                                                                  # end the stage span
+
+    # Display time taken just for fun:
+    tracer.finish()                                                                                 # print the time taken and write the JSON trace of the run
+    return Parcel_selection_dissolved_path                                                          # return the path of the private ownership layer to the calling script
+
+
+if __name__ == '__main__':
+    main()
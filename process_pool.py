@@ -0,0 +1,31 @@
+#-------------------------------------------------------------------------------
+# Name:        process_pool.py (Worker Process Pools for the Production Scripts)
+# Purpose:      A shared way to start worker processes from the production scripts.
+#
+#                   The scripts keep their steps in main() behind an
+#                   "if __name__ == '__main__':" guard, so 'spawn' workers (the default on
+#                   Windows), which re-import the script that started them, only load its
+#                   settings and the modules they need.
+#
+# Author:      draleigh
+#
+# Created:     18 October 2026
+# Copyright:   (c) draleigh 2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+
+
+# Import modules and packages
+import os,contextlib,multiprocessing                                                        # list of required modules
+from concurrent.futures import ProcessPoolExecutor                                          # the pool of worker processes
+
+
+# Open a pool of 'workers' processes (None uses every core)
+#   'initializer' is run once in each worker with 'initargs', e.g. to load an index that every task uses.
+#   with process_pool.worker_pool(8) as pool:
+#       futures = [pool.submit(function, argument) for argument in arguments]
+@contextlib.contextmanager
+def worker_pool(workers=None, initializer=None, initargs=()):
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'), initializer=initializer, initargs=initargs) as pool:
+        yield pool
@@ -0,0 +1,175 @@
+#-------------------------------------------------------------------------------
+# Name:        product_cache.py (Product Cache)
+# Purpose:      Every product is written under a new name each day (e.g.
+#                   'PrivateParcelSelection_Dissolved_<date>'), so each run rebuilt every
+#                   product even when none of its inputs had changed, and the workspace
+#                   geodatabase filled up with dated copies. This module keeps an index of
+#                   the products that have been built, keyed by a fingerprint of their inputs:
+#
+#                   1. fingerprint() hashes everything a product depends on: the edition of
+#                       each input feature class (see layer_io.dataset_edition()), the
+#                       contents of small layers such as the active Selector features (so a
+#                       change to 'Requires_Deletion' is a new fingerprint), the hash of each
+#                       workbook, and settings such as the 2 km distance, the TRS threshold,
+#                       and the grouping rules.
+#                   2. publish() looks the fingerprint up; if the product was built from the
+#                       same inputs before, its datasets are copied to today's names (in a
+#                       few seconds for the dissolved layers) instead of being rebuilt.
+#                   3. store() records a product after it is built, and evict() deletes the
+#                       dated copies that are no longer needed: copies that have not been
+#                       used for MAX_DAYS days, then the least recently used copies until the
+#                       products take no more than MAX_BYTES. The latest copy of each
+#                       product is never deleted.
+#
+#                   The index is a SQLite file that persists between dated runs (as with the
+#                   shard cache of forest_stand_pipeline.py).
+#
+#                   key = product_cache.fingerprint({'parcels': product_cache.edition(AllParcels), 'distance': '2 kilometers'})
+#                   with product_cache.ProductCache(Product_Cache) as cache:
+#                       if not cache.publish('private', key, [Private_Dissolved], today_full_str):
+#                           ... build the product ...
+#                           cache.store('private', key, [Private_Dissolved], today_full_str)
+#                       cache.evict()
+#
+# Author:      draleigh
+#
+# Created:     18 October 2026
+# Copyright:   (c) draleigh 2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+
+
+# Import modules and packages
+import json,time,hashlib,sqlite3                                                            # list of required modules
+import layer_io                                                                             # shared feature reading/writing helpers
+import spreadsheet_loader                                                                   # workbook hashing
+import trs_incremental                                                                      # geometry hashing
+
+
+CACHE_VERSION = 1                                                                           # part of every fingerprint; raise it when a change to the scripts changes their products
+MAX_DAYS = 14                                                                               # dated copies not used for this many days are deleted
+MAX_BYTES = 10 * 1024 ** 3                                                                  # the dated copies are trimmed to this size (10 GB)
+
+
+# Describe the edition of a feature class or open-format dataset (see layer_io.dataset_edition())
+#   A dataset whose edition cannot be told gets a value that matches no earlier build, so its products are rebuilt.
+def edition(path):
+    value = layer_io.dataset_edition(path)
+    if value is None:
+        print('The edition of {} cannot be told (no file geodatabase files or editor tracking); products that use it are rebuilt.'.format(path))
+        return 'unknown:{}'.format(time.time())
+    return 'edition:' + value
+
+
+# Hash the contents of a small layer: the geometry and 'fields' of every feature that matches 'where'
+#   Suited to layers that are read in full anyway, such as the Selector features or the work areas.
+def content_hash(path, fields=(), where=None):
+    hashes = sorted(trs_incremental.geometry_hash(geom) + repr(values) for _, values, geom in layer_io.read_features(path, fields, where)
+                    if geom is not None)
+    return 'content:' + hashlib.sha1('|'.join(hashes).encode('utf-8')).hexdigest()
+
+
+# Hash a file (e.g. a workbook or the rule table)
+def file_hash(path):
+    return 'file:' + spreadsheet_loader.file_hash(path)
+
+
+# Fingerprint a product from {name: value} of everything it depends on
+#   Values are turned into text with repr(), so use the helpers above for datasets and files.
+def fingerprint(parts):
+    text = '|'.join('{}={!r}'.format(name, parts[name]) for name in sorted(parts))
+    return hashlib.sha1('{}|{}'.format(CACHE_VERSION, text).encode('utf-8')).hexdigest()
+
+
+# Size of a dataset in bytes, from its files on disk (see layer_io.dataset_size()), so storing a product does not read it back
+def dataset_bytes(path):
+    return layer_io.dataset_size(path)
+
+
+# Persistent index of built products: one entry per dated copy, with the datasets that make it up
+class ProductCache(object):
+
+    def __init__(self, path):
+        self.path = path                                                                    # location of the SQLite file
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS products (product TEXT, product_key TEXT, datasets TEXT, run_date TEXT, created REAL, used REAL, bytes INTEGER)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS products_key ON products (product, product_key)')
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    # Return (datasets, first run date, bytes) of the latest copy of a product built from 'key' that still exists, or None
+    def lookup(self, product, key):
+        rows = self.conn.execute('SELECT rowid, datasets, run_date, bytes FROM products WHERE product = ? AND product_key = ? ORDER BY created DESC', (product, key)).fetchall()
+        for rowid, datasets, run_date, size in rows:
+            datasets = json.loads(datasets)
+            if all(layer_io.dataset_exists(path) for path in datasets):
+                return datasets, min(row[2] for row in rows), size
+            self.conn.execute('DELETE FROM products WHERE rowid = ?', (rowid,))             # deleted by hand since it was stored
+        self.conn.commit()
+        return None
+
+    # Copy the cached datasets of a product to 'targets' (today's names, in the order they were stored)
+    #   Returns False, copying nothing, if the product has not been built from 'key' before.
+    def publish(self, product, key, targets, run_date):
+        start_time = time.time()
+        cached = self.lookup(product, key)
+        if cached is None or len(cached[0]) != len(targets):
+            return False
+        datasets, built, size = cached
+        targets = [str(path) for path in targets]
+        if targets != datasets:                                                             # not already published under today's names (e.g. by an earlier run today)
+            for source, target in zip(datasets, targets):
+                layer_io.delete_dataset(target)
+                layer_io.copy_dataset(source, target)
+            self.store(product, key, targets, run_date, size)                               # the earlier copy is now unused, so it ages out
+        else:
+            self.conn.execute('UPDATE products SET used = ? WHERE datasets = ?', (time.time(), json.dumps(datasets)))
+            self.conn.commit()
+        print('{}: inputs unchanged since {}, published from the cache (%s seconds).'.format(product, built) % round(time.time() - start_time))
+        return True
+
+    # Record the datasets of a product that has just been built from 'key'
+    #   'size' is taken from the files of the datasets on disk (see dataset_bytes()) unless it is given.
+    def store(self, product, key, datasets, run_date, size=None):
+        datasets = [str(path) for path in datasets]
+        self.conn.execute('DELETE FROM products WHERE datasets = ?', (json.dumps(datasets),))  # the same names rebuilt (e.g. a second run on the same day)
+        if size is None:
+            size = sum(dataset_bytes(path) for path in datasets)
+        now = time.time()
+        self.conn.execute('INSERT INTO products (product, product_key, datasets, run_date, created, used, bytes) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                          (product, key, json.dumps(datasets), run_date, now, now, size))
+        self.conn.commit()
+
+    # Delete the dated copies that are no longer needed, and return their datasets
+    #   Copies not used for 'max_days' days go first, then the least recently used copies until the
+    #   rest take no more than 'max_bytes'. The latest copy of each product is always kept.
+    def evict(self, max_bytes=MAX_BYTES, max_days=MAX_DAYS):
+        rows = self.conn.execute('SELECT rowid, product, datasets, created, used, bytes FROM products ORDER BY used').fetchall()
+        latest = {}
+        for rowid, product, _, created, _, _ in rows:
+            if product not in latest or created > latest[product][1]:
+                latest[product] = (rowid, created)
+        keep = set(rowid for rowid, _ in latest.values())
+        total = sum(row[5] for row in rows)
+        cutoff = time.time() - max_days * 86400
+        deleted = []
+        for rowid, product, datasets, created, used, size in rows:                          # least recently used first
+            if rowid in keep or (used >= cutoff and total <= max_bytes):
+                continue
+            for path in json.loads(datasets):
+                layer_io.delete_dataset(path)
+                deleted.append(path)
+            self.conn.execute('DELETE FROM products WHERE rowid = ?', (rowid,))
+            total -= size
+        self.conn.commit()
+        if deleted:
+            print('Deleted {} dated copies from the product cache ({:.1f} MB kept).'.format(len(deleted), total / 1024.0 ** 2))
+        return deleted
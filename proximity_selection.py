@@ -0,0 +1,209 @@
+#-------------------------------------------------------------------------------
+# Name:        proximity_selection.py (Indexed Proximity Selection of Parcels)
+# Purpose:      This module replaces the
+#                   SelectLayerByLocation_management('Parcels', "WITHIN_A_DISTANCE", 'Selector', '2 kilometers', ...)
+#                   step of the ownership scripts, which is the slowest step against
+#                   the statewide parcel feature class. It works in three stages:
+#
+#                   1. A vectorized NumPy bounding-box prefilter of the parcel envelopes
+#                       against the Selector feature envelopes expanded by the distance.
+#                       The envelopes are read first (from the spatial index of a GeoPackage),
+#                       and only the parcels that pass are parsed for the later stages.
+#                   2. An STR-tree index over the Selector segments (trails are broken into
+#                       their individual line segments so that long, winding trails do not
+#                       produce huge envelopes).
+#                   3. An exact distance check, run only on the parcels that survive the
+#                       prefilter, against the nearby segments from the index.
+#
+#                   The result is a set of OBJECTIDs that the scripts can select with
+#                   layer_io.select_by_oids().
+#
+# Author:      draleigh
+#
+# Created:     18 October 2026
+# Copyright:   (c) draleigh 2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+
+
+# Import modules and packages
+import re,time                                                                              # list of required modules
+import numpy as np                                                                          # vectorized envelope tests
+import shapely                                                                              # vectorized geometry functions
+from shapely import wkb                                                                     # parse the parcels that pass the prefilter
+from shapely import STRtree                                                                 # the spatial index over the Selector segments
+import layer_io                                                                             # shared feature reading/writing helpers
+
+
+SELECTOR_WHERE = "Requires_Deletion = 'No'"                                                 # the active Selector features
+CHUNK_SIZE = 50000                                                                          # number of parcels tested at a time
+
+# Linear units accepted by parse_distance(), in meters (the parcel data must be projected in meters)
+UNITS = {'meter': 1.0, 'meters': 1.0, 'm': 1.0,
+         'kilometer': 1000.0, 'kilometers': 1000.0, 'km': 1000.0,
+         'foot': 0.3048, 'feet': 0.3048, 'ft': 0.3048,
+         'mile': 1609.344, 'miles': 1609.344, 'mi': 1609.344}
+
+
+# Convert a distance such as '2 kilometers' (as used with SelectLayerByLocation_management) to map units (meters)
+#   'linear_unit' is the (name, meters per unit) of the parcels' coordinate system (see layer_io.linear_unit());
+#   a coordinate system in any unit other than meters raises ValueError, since the distance would be off by
+#   the unit's scale. Data without a coordinate system (None) is assumed to be in meters.
+def parse_distance(distance, linear_unit=None):
+    if linear_unit is not None and linear_unit[1] != 1.0:
+        raise ValueError("The parcels are in {} rather than meters; project them to a coordinate system in meters first".format(linear_unit[0]))
+    if isinstance(distance, (int, float)):
+        return float(distance)
+    match = re.match(r'^\s*([\d.]+)\s*([A-Za-z]*)\s*$', str(distance))
+    unit = match.group(2).lower() if match else None
+    if match is None or (unit and unit not in UNITS):
+        raise ValueError("Cannot read the distance '{}'".format(distance))
+    return float(match.group(1)) * UNITS.get(unit, 1.0)
+
+
+# Break a Selector geometry into pieces for the index
+#   Lines become their individual two-point segments; polygons and points are kept whole
+#   (a parcel inside a polygon is at distance 0 even when it is far from the boundary).
+def _pieces(geometry):
+    pieces = []
+    for part in shapely.get_parts(geometry):
+        if part.geom_type == 'LineString':
+            coords = shapely.get_coordinates(part)
+            if len(coords) > 1:
+                pieces.extend(shapely.linestrings(np.stack([coords[:-1], coords[1:]], axis=1)))
+        elif part.geom_type in ('Polygon', 'Point'):
+            pieces.append(part)
+        else:                                                                               # nested collections
+            pieces.extend(_pieces(part))
+    return pieces
+
+
+# The Selector features broken into indexed segments
+class SelectorIndex(object):
+
+    def __init__(self, geometries, names=None):
+        self.names = list(names) if names is not None else [None] * len(geometries)       # e.g. the 'TRAIL_NAME' of each feature
+        self.envelopes = shapely.bounds(np.asarray(geometries, dtype=object)).reshape(-1, 4)   # one envelope per Selector feature
+        pieces, owners = [], []
+        for position, geometry in enumerate(geometries):
+            feature_pieces = _pieces(geometry)
+            pieces.extend(feature_pieces)
+            owners.extend([position] * len(feature_pieces))
+        self.pieces = np.asarray(pieces, dtype=object)                                      # segments, polygons, and points
+        self.owners = np.asarray(owners, dtype=np.int64)                                    # the Selector feature of each piece
+        self.tree = STRtree(self.pieces)
+
+    @classmethod
+    def from_layer(cls, selector, where=SELECTOR_WHERE, name_field='TRAIL_NAME'):
+        geometries, names = [], []
+        fields = [name_field] if name_field else []
+        for oid, values, geom in layer_io.read_features(selector, fields, where):
+            if geom is None or geom.is_empty:
+                continue
+            geometries.append(geom)
+            names.append(values[0] if values else oid)
+        return cls(geometries, names)
+
+    def __len__(self):
+        return len(self.names)
+
+    # Return the positions of the Selector features matching a list of names (e.g. one trail)
+    def positions(self, names):
+        names = set(names)
+        return [i for i, name in enumerate(self.names) if name in names]
+
+
+# Stage 1: vectorized envelope prefilter
+#   'envelopes' is an (n, 4) array of parcel (xmin, ymin, xmax, ymax); returns a boolean mask of the
+#   parcels whose envelopes overlap any Selector envelope expanded by 'distance'.
+def bbox_prefilter(envelopes, selector_envelopes, distance, block_size=256):
+    envelopes = np.asarray(envelopes, dtype=float).reshape(-1, 4)
+    expanded = np.asarray(selector_envelopes, dtype=float).reshape(-1, 4) + np.array([-distance, -distance, distance, distance])
+    keep = np.zeros(len(envelopes), dtype=bool)
+    if len(expanded) == 0 or len(envelopes) == 0:
+        return keep
+    total = np.array([expanded[:, 0].min(), expanded[:, 1].min(), expanded[:, 2].max(), expanded[:, 3].max()])
+    candidates = np.flatnonzero((envelopes[:, 0] <= total[2]) & (envelopes[:, 2] >= total[0]) &
+                                (envelopes[:, 1] <= total[3]) & (envelopes[:, 3] >= total[1]))     # cheap test against the overall extent first
+    boxes = envelopes[candidates]
+    for start in range(0, len(expanded), block_size):                                       # test against the Selector envelopes a block at a time to bound memory
+        block = expanded[start:start + block_size]
+        overlap = ((boxes[:, None, 0] <= block[None, :, 2]) & (boxes[:, None, 2] >= block[None, :, 0]) &
+                   (boxes[:, None, 1] <= block[None, :, 3]) & (boxes[:, None, 3] >= block[None, :, 1]))
+        keep[candidates[overlap.any(axis=1)]] = True
+    return keep
+
+
+# Stages 2 and 3: index lookup and exact distance check for parcels that passed the prefilter
+#   Returns a boolean mask of the geometries within 'distance' of any Selector piece.
+def within_distance(geometries, index, distance):
+    geometries = np.asarray(geometries, dtype=object)
+    found = np.zeros(len(geometries), dtype=bool)
+    if len(geometries) == 0 or len(index.pieces) == 0:
+        return found
+    pairs = index.tree.query(geometries, predicate='dwithin', distance=distance)          # exact distance, but only against pieces near each parcel
+    found[np.unique(pairs[0])] = True
+    return found
+
+
+# Return the OBJECTIDs (from the parallel list 'oids') of the geometries within 'distance' (in meters) of the Selector features in 'index'
+#   Runs all three stages on one chunk of parcels that is already in memory.
+def select_geometries(oids, geometries, index, distance):
+    if not len(oids):
+        return set()
+    geometries = np.asarray(geometries, dtype=object)
+    keep = np.flatnonzero(bbox_prefilter(shapely.bounds(geometries), index.envelopes, distance))
+    close = within_distance(geometries[keep], index, distance)
+    return set(oids[i] for i in keep[close])
+
+
+# Return the OBJECTIDs of parcels within 'distance' (e.g. '2 kilometers') of the Selector features in 'index'
+#   'parcels' can be a feature class, feature layer, or open-format dataset; 'where' filters the parcels.
+#   The envelopes are prefiltered first, and only the parcels that pass are parsed for the exact check.
+def select_within_distance(parcels, index, distance, where=None):
+    distance = parse_distance(distance, layer_io.linear_unit(parcels))
+    all_oids, envelopes = layer_io.read_envelopes(parcels, where)                           # stage 1 over the envelopes alone
+    candidates = set(all_oids[bbox_prefilter(envelopes, index.envelopes, distance)].tolist())
+    selected = set()
+    if not candidates:
+        return selected
+    oids, geometries = [], []
+    for oid, _, geometry_wkb in layer_io.read_wkb(parcels, where=where):                    # fetch the candidates a chunk at a time
+        if oid not in candidates:
+            continue
+        oids.append(oid)
+        geometries.append(wkb.loads(geometry_wkb))
+        if len(oids) >= CHUNK_SIZE:
+            selected.update(_select_candidates(oids, geometries, index, distance))
+            oids, geometries = [], []
+    selected.update(_select_candidates(oids, geometries, index, distance))
+    return selected
+
+
+# Stages 2 and 3 for parcels that already passed the prefilter
+def _select_candidates(oids, geometries, index, distance):
+    close = within_distance(geometries, index, distance)
+    return set(oid for oid, near in zip(oids, close) if near)
+
+
+# Return the OBJECTIDs of the parcels in a snapshot (see parcel_snapshot.py) within 'distance' of the Selector features in 'index'
+#   The prefilter runs over the mapped envelopes, so only the parcels that pass it are parsed; 'positions' limits the parcels tested.
+def select_snapshot(snapshot, index, distance, positions=None):
+    distance = parse_distance(distance, snapshot.linear_unit)
+    positions = np.arange(len(snapshot)) if positions is None else np.asarray(positions, dtype=np.int64)
+    selected = set()
+    for start in range(0, len(positions), CHUNK_SIZE):
+        chunk = positions[start:start + CHUNK_SIZE]
+        keep = chunk[bbox_prefilter(snapshot.envelopes[chunk], index.envelopes, distance)]
+        close = within_distance(snapshot.geometries(keep), index, distance)
+        selected.update(snapshot.oids[keep[close]].tolist())
+    return selected
+
+
+# Convenience wrapper: index the active Selector features and select the parcels near them
+def select_parcels_near_selector(parcels, selector, distance='2 kilometers', selector_where=SELECTOR_WHERE, parcel_where=None, name_field='TRAIL_NAME'):
+    start_time = time.time()
+    index = SelectorIndex.from_layer(selector, selector_where, name_field)                  # read the Selector features once
+    selected = select_within_distance(parcels, index, distance, parcel_where)
+    print('{} parcels within {} of {} Selector features (%s seconds).'.format(len(selected), distance, len(index)) % round(time.time() - start_time))
+    return selected
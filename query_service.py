@@ -0,0 +1,448 @@
+#-------------------------------------------------------------------------------
+# Name:        query_service.py (Local Query Service for Parcel, TRS, and Lakeshore Lookups)
+# Purpose:      One-off questions (which parcels are within 2 km of a trail, what are the
+#                   TRS values of a parcel, which parcels front a lake) meant editing the
+#                   constants of a production script and running it cold, with minutes of
+#                   layer setup each time. This script loads the data once and answers
+#                   them over HTTP on this computer:
+#
+#                   GET  /near?trail=<TRAIL_NAME>&distance=2 kilometers   parcels near a trail (every active Selector feature without 'trail')
+#                   GET  /trs?parcel=<OBJECTID>                           TRS values of a parcel
+#                   GET  /lakeshore?lake=<DOWLKNUM>                       parcels that touch a lake, with their frontage
+#                   GET  /stands?parcel=<OBJECTID>                        forest stands on a parcel, with their 'Groupings'
+#                   GET  /status                                          editions of the data and the number of features loaded
+#                   POST /reload                                          load the data again now
+#
+#                   1. The parcels are opened from a memory-mapped snapshot (see
+#                       parcel_snapshot.py); the PLS sections, the active Selector features,
+#                       the lakes, and the forest stands are held in spatial indexes.
+#                   2. Each lookup uses the same code as the production scripts
+#                       (proximity_selection.py, trs_spatial_join.py, lakeshore_engine.py,
+#                       and forest_stand_rules.py), on only the parcels near the feature
+#                       asked about.
+#                   3. Requests are answered on threads of their own; each request uses the
+#                       indexes that were current when it arrived. The snapshot of an earlier
+#                       parcel edition is deleted only once no request is answering from it.
+#                   4. The editions of the inputs (see layer_io.dataset_edition(); lock files
+#                       do not count) are checked every 'Reload_Interval' seconds. When a
+#                       new data release lands and its editions have stayed
+#                       the same for 'Reload_Settle' seconds (so a release that is still being
+#                       copied is not loaded half-written), the indexes are loaded again in
+#                       the background and swapped in once they are ready, so the service
+#                       keeps answering while it reloads.
+#
+#                   python query_service.py                      start the service (Ctrl+C stops it)
+#                   python query_service.py near "Trail Name"    ask it from another window
+#                   python query_service.py trs 123456
+#                   python query_service.py lakeshore 27011700
+#
+# Author:      draleigh
+#
+# Created:     18 October 2026
+# Copyright:   (c) draleigh 2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+
+
+# Import modules and packages
+import os,re,sys,json,time,shutil,argparse,threading                                        # list of required modules
+from datetime import date                                                                   # extract submodules
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer                         # the HTTP service
+from urllib.parse import urlsplit, parse_qs, urlencode                                      # request parameters
+from urllib.error import HTTPError                                                          # error replies to the client
+from urllib.request import Request, urlopen                                                 # the client
+import numpy as np                                                                          # the parcel and stand columns
+import shapely                                                                              # vectorized geometry functions
+from shapely import STRtree                                                                 # the spatial index over the forest stands
+import forest_stand_rules,lakeshore_engine,layer_io,parcel_snapshot,proximity_selection,trs_spatial_join   # the selection logic of the production scripts
+
+
+# Define Data Locations and Other Variables
+AllParcels = r"*folderpath*\parcel_FC"                                                      # define the location of the Minnesota parcel dataset
+PLS_Section = r"*folderpath*\pls_sect_data"                                                 # define the location of the feature class with TRS information
+Selector = r"*folderpath*\selector_feature_class"                                           # define the location of the current dataset which contains the selection features
+Lakes = r"*folderpath*\dnr_hydro_features_all"                                              # define the location of the lakes feature class
+ForestStandInventory = r"*folderpath*\dnr_forest_stand_inventory"                           # define the location of the forest stand inventory dataset
+Grouping_Rules = forest_stand_rules.RULE_TABLE                                              # define the location of the rule table of 'MN_CTYPE' groupings and age cutoffs
+Snapshot_Folder = r"*folderpath*\query_service_snapshots"                                   # define the folder that receives a parcel snapshot for each edition of the parcels
+Selector_Where = "Requires_Deletion = 'No'"                                                 # define the expression for the active Selector features
+Selector_Distance = '2 kilometers'                                                          # define the distance used when a request does not give one
+Host = '127.0.0.1'                                                                          # define the address the service listens on (this computer only)
+Port = 8765                                                                                 # define the port the service listens on
+Reload_Interval = 60                                                                        # define how often (in seconds) the editions of the inputs are checked (None never reloads by itself)
+Reload_Settle = 300                                                                         # define how long (in seconds) a new edition must stay unchanged before it is loaded
+
+
+# The data locations of the service, from the variables above
+def default_sources():
+    return {'parcels': AllParcels, 'sections': PLS_Section, 'selector': Selector, 'lakes': Lakes, 'stands': ForestStandInventory}
+
+
+# Describe the edition of every input (see layer_io.dataset_edition())
+#   An input whose edition cannot be told is None; it is only loaded again by a POST to /reload.
+def source_editions(sources):
+    return dict((name, layer_io.dataset_edition(path)) for name, path in sources.items())
+
+
+# Every index the lookups use, loaded once from one edition of the data
+class QueryIndexes(object):
+
+    def __init__(self, sources, editions=None):
+        start_time = time.time()
+        self.sources = dict(sources)
+        self.editions = editions if editions is not None else source_editions(sources)
+        self.loaded = time.strftime('%Y-%m-%dT%H:%M:%S')
+        self.snapshot_path = os.path.join(Snapshot_Folder, re.sub(r'\W+', '_', self.editions['parcels'] or 'loaded_' + time.strftime('%Y%m%d%H%M%S')))  # one snapshot per edition, so a snapshot in use is never rewritten
+        self.parcels = parcel_snapshot.ensure(sources['parcels'], self.snapshot_path, edition=self.editions['parcels'])
+        self.oid_order = np.argsort(self.parcels.oids, kind='stable')                       # OBJECTID lookups by binary search
+        self.sorted_oids = np.asarray(self.parcels.oids)[self.oid_order]
+        self.sections = trs_spatial_join.SectionIndex.from_layer(sources['sections'])
+        self.selector_geometries, names = [], []                                            # the active Selector features, kept to index one trail at a time
+        for oid, values, geom in layer_io.read_features(sources['selector'], ['TRAIL_NAME'], Selector_Where):
+            if geom is not None and not geom.is_empty:
+                self.selector_geometries.append(geom)
+                names.append(values[0])
+        self.selector = proximity_selection.SelectorIndex(self.selector_geometries, names)
+        self._trail_indexes, self._trail_lock = {None: self.selector}, threading.Lock()
+        self.lakes = {}                                                                     # {lake ID: [lake polygons]}
+        for _, values, geom in layer_io.read_features(sources['lakes'], [lakeshore_engine.LAKE_ID_FIELD]):
+            lake_id = lakeshore_engine.normalize_lake_id(values[0])
+            if lake_id and geom is not None and not geom.is_empty:
+                self.lakes.setdefault(lake_id, []).append(geom)
+        self._load_stands(sources['stands'], forest_stand_rules.load_rules(Grouping_Rules), date.today().year)
+        print('Query indexes loaded: {} parcels, {} sections, {} Selector features, {} lakes, {} stands (%s seconds).'.format(
+            len(self.parcels), len(self.sections), len(self.selector), len(self.lakes), len(self.stand_oids)) % round(time.time() - start_time))
+
+    # Read every stand with its cover type and age, and group it with the rule table (as forest_stand_rules.build_groupings() does)
+    def _load_stands(self, inventory, rules, year):
+        fields = [forest_stand_rules.CTYPE_FIELD, forest_stand_rules.STAND_AGE_FIELD, forest_stand_rules.SURVEY_YEAR_FIELD]
+        rows, geometries = [], []
+        for oid, values, geom in layer_io.read_features(inventory, fields):
+            if geom is None or geom.is_empty:
+                continue
+            rows.append((oid,) + tuple(-1 if v is None else v for v in values))
+            geometries.append(geom)
+        columns = np.asarray(rows, dtype=np.int64).reshape(-1, 4)
+        self.stand_oids = columns[:, 0]
+        self.stand_ctypes = columns[:, 1]
+        self.stand_ages = forest_stand_rules.stand_ages(columns[:, 2], columns[:, 3], year)
+        self.stand_groupings = forest_stand_rules.classify(self.stand_ctypes, self.stand_ages, rules)
+        self.stand_tree = STRtree(np.asarray(geometries, dtype=object))
+
+    # Return the snapshot position of a parcel, or raise LookupError
+    def position(self, oid):
+        i = int(np.searchsorted(self.sorted_oids, oid))
+        if i >= len(self.sorted_oids) or self.sorted_oids[i] != oid:
+            raise LookupError('No parcel with OBJECTID {}.'.format(oid))
+        return int(self.oid_order[i])
+
+    def parcel_geometry(self, oid):
+        return self.parcels.geometries([self.position(oid)])[0]
+
+    # The Selector features of one trail (every active feature for None), indexed once per trail
+    def trail_index(self, trail=None):
+        with self._trail_lock:
+            if trail not in self._trail_indexes:
+                positions = self.selector.positions([trail])
+                if not positions:
+                    raise LookupError("No active Selector feature is named '{}'.".format(trail))
+                self._trail_indexes[trail] = proximity_selection.SelectorIndex([self.selector_geometries[i] for i in positions],
+                                                                               [self.selector.names[i] for i in positions])
+            return self._trail_indexes[trail]
+
+    # Return the sorted OBJECTIDs of the parcels within 'distance' of a trail (as the ownership scripts select them)
+    def near(self, trail=None, distance=None):
+        index = self.trail_index(trail)
+        meters = proximity_selection.parse_distance(distance or Selector_Distance, self.parcels.linear_unit)   # the unit of the parcels, as layer_io.linear_unit() reads it
+        envelopes = index.envelopes
+        bbox = (envelopes[:, 0].min() - meters, envelopes[:, 1].min() - meters, envelopes[:, 2].max() + meters, envelopes[:, 3].max() + meters)
+        return sorted(proximity_selection.select_snapshot(self.parcels, index, meters, self.parcels.within_bbox(bbox)))
+
+    # Return the 'TRS_SEARCH' values of the sections a parcel intersects (as append_TRS_values_to_parcel_data.py joins them)
+    def trs(self, oid):
+        return self.sections.lookup(self.parcel_geometry(oid))
+
+    # Return [(OBJECTID, Frontage_M, Frontage_Pct)] for the parcels that touch a lake (as lakeshore_engine.join_parcels_to_lakes() finds them)
+    def lakeshore(self, lake_id):
+        lake_id = lakeshore_engine.normalize_lake_id(lake_id)
+        if lake_id not in self.lakes:
+            raise LookupError("No lake with {} '{}'.".format(lakeshore_engine.LAKE_ID_FIELD, lake_id))
+        index = lakeshore_engine.LakeIndex([lake_id] * len(self.lakes[lake_id]), self.lakes[lake_id])
+        positions = self.parcels.within_bbox(index.extent())
+        geometries = self.parcels.geometries(positions)
+        found = index.join(geometries)
+        oids = self.parcels.oids[positions]
+        return sorted((int(oids[p]),) + lakeshore_engine.frontage_metrics(frontages, float(shapely.length(geometries[p]))) for p, frontages in found.items())
+
+    # Return [(stand OBJECTID, MN_CTYPE, age, Groupings)] for the forest stands that intersect a parcel
+    def stands(self, oid):
+        hits = np.sort(self.stand_tree.query(self.parcel_geometry(oid), predicate='intersects'))
+        return [(int(self.stand_oids[i]), int(self.stand_ctypes[i]), int(self.stand_ages[i]), self.stand_groupings[i]) for i in hits]
+
+    def status(self):
+        return {'loaded': self.loaded, 'editions': self.editions, 'parcels': len(self.parcels), 'sections': len(self.sections),
+                'selector_features': len(self.selector), 'lakes': len(self.lakes), 'stands': len(self.stand_oids)}
+
+
+# Read a required whole-number parameter, or raise ValueError
+def _int_param(params, name):
+    if name not in params:
+        raise ValueError("The '{}' parameter is required.".format(name))
+    try:
+        return int(params[name])
+    except ValueError:
+        raise ValueError("'{}' must be a whole number, not '{}'.".format(name, params[name]))
+
+
+def _near(indexes, params):
+    distance = params.get('distance', Selector_Distance)
+    oids = indexes.near(params.get('trail'), distance)
+    return {'trail': params.get('trail'), 'distance': distance, 'count': len(oids), 'parcels': oids}
+
+
+def _trs(indexes, params):
+    oid = _int_param(params, 'parcel')
+    sections = indexes.trs(oid)
+    return {'parcel': oid, 'trs': ', '.join(sections), 'sections': sections, 'area': float(indexes.parcels.areas[indexes.position(oid)])}
+
+
+def _lakeshore(indexes, params):
+    if 'lake' not in params:
+        raise ValueError("The 'lake' parameter is required.")
+    parcels = indexes.lakeshore(params['lake'])
+    return {'lake': lakeshore_engine.normalize_lake_id(params['lake']), 'count': len(parcels),
+            'parcels': [{'parcel': oid, 'Frontage_M': length, 'Frontage_Pct': percent} for oid, length, percent in parcels]}
+
+
+def _stands(indexes, params):
+    oid = _int_param(params, 'parcel')
+    stands = indexes.stands(oid)
+    return {'parcel': oid, 'count': len(stands),
+            'stands': [{'stand': stand, forest_stand_rules.CTYPE_FIELD: ctype, 'StangeAge': age, 'Groupings': grouping} for stand, ctype, age, grouping in stands]}
+
+
+def _status(indexes, params):
+    return indexes.status()
+
+
+ROUTES = {'/near': _near, '/trs': _trs, '/lakeshore': _lakeshore, '/stands': _stands, '/status': _status}
+
+
+# Answer one request: JSON in every reply, with 404 for unknown parcels, lakes, and trails and 400 for bad parameters
+class QueryHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        start_time = time.time()
+        url = urlsplit(self.path)
+        route = ROUTES.get(url.path.rstrip('/') or '/')
+        if route is None:
+            return self._reply(404, {'error': 'Unknown lookup {}; use one of {}.'.format(url.path, ', '.join(sorted(ROUTES)))})
+        params = dict((name, values[-1]) for name, values in parse_qs(url.query).items())
+        indexes = self.server.acquire()                                                     # the whole request uses one edition, even if a reload finishes meanwhile
+        snapshot_path = indexes.snapshot_path
+        try:
+            result = route(indexes, params)
+        except LookupError as e:
+            return self._reply(404, {'error': e.args[0] if e.args else str(e)})
+        except ValueError as e:
+            return self._reply(400, {'error': str(e)})
+        except Exception as e:                                                              # keep serving after an unexpected error
+            return self._reply(500, {'error': '{}: {}'.format(type(e).__name__, e)})
+        finally:
+            indexes = None                                                                  # drop the request's maps of the snapshot before it can be deleted
+            self.server.release(snapshot_path)
+        result['milliseconds'] = round((time.time() - start_time) * 1000, 1)
+        self._reply(200, result)
+
+    def do_POST(self):
+        if urlsplit(self.path).path.rstrip('/') != '/reload':
+            return self._reply(404, {'error': 'Unknown action {}; use /reload.'.format(self.path)})
+        try:
+            reloaded = self.server.reload(force=True)
+        except Exception as e:
+            return self._reply(500, {'error': '{}: {}'.format(type(e).__name__, e)})
+        self._reply(200, {'reloaded': reloaded, 'status': self.server.indexes.status()})
+
+    def _reply(self, code, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        print('{} {}'.format(time.strftime('%H:%M:%S'), format % args))
+
+
+# The HTTP service: one thread per request, and a thread that reloads the indexes when the data changes
+class QueryServer(ThreadingHTTPServer):
+
+    daemon_threads = True
+
+    def __init__(self, address=None, sources=None, reload_interval=None, reload_settle=None):
+        self.sources = sources if sources is not None else default_sources()
+        self.indexes = QueryIndexes(self.sources)
+        self._reload_lock = threading.Lock()
+        self._users_lock = threading.Lock()
+        self._users = {}                                                                    # {snapshot path: number of requests answering from it}
+        self._stopped = threading.Event()
+        ThreadingHTTPServer.__init__(self, address or (Host, Port), QueryHandler)
+        if reload_interval:
+            settle = reload_settle if reload_settle is not None else Reload_Settle
+            self._watcher = threading.Thread(target=self._watch, args=(reload_interval, settle), daemon=True)
+            self._watcher.start()
+
+    # Load the indexes again if any input has a new edition (or always with 'force'); returns True if they were reloaded
+    #   'editions' are those the watcher saw settle; they are read again when not given.
+    def reload(self, force=False, editions=None):
+        with self._reload_lock:                                                             # one reload at a time
+            editions = editions if editions is not None else source_editions(self.sources)
+            if not force and editions == self.indexes.editions:
+                return False
+            print('Loading a new edition of the data: {}'.format(dict((name, e) for name, e in editions.items() if e != self.indexes.editions.get(name)) or 'reload requested'))
+            indexes = QueryIndexes(self.sources, editions)                                  # requests are still answered from the current indexes meanwhile
+            with self._users_lock:
+                self.indexes = indexes
+            self._remove_old_snapshots()
+            return True
+
+    # Return the current indexes for a request, counting the request as a user of their snapshot until release()
+    def acquire(self):
+        with self._users_lock:
+            indexes = self.indexes
+            self._users[indexes.snapshot_path] = self._users.get(indexes.snapshot_path, 0) + 1
+            return indexes
+
+    # End a request's use of a snapshot; the last request on a snapshot of an earlier edition deletes it
+    def release(self, snapshot_path):
+        with self._users_lock:
+            self._users[snapshot_path] -= 1
+            if self._users[snapshot_path]:
+                return
+            del self._users[snapshot_path]
+            if snapshot_path == self.indexes.snapshot_path:
+                return
+        self._remove_old_snapshots()
+
+    # Delete the snapshots of earlier parcel editions that no request is answering from
+    #   A snapshot still in use is deleted when its last request ends (see release()).
+    def _remove_old_snapshots(self):
+        with self._users_lock:                                                              # held while deleting, so no request starts on a snapshot being deleted and no two threads delete one
+            keep = set(self._users) | {self.indexes.snapshot_path}
+            folder = os.path.dirname(self.indexes.snapshot_path)
+            for name in os.listdir(folder):
+                path = os.path.join(folder, name)
+                if path not in keep and os.path.isdir(path) and '.building.' not in name:     # not a snapshot that a reload is still writing
+                    try:
+                        shutil.rmtree(path)
+                    except OSError as e:                                                    # e.g. a file the operating system still holds open; tried again after the next reload
+                        print('The old parcel snapshot {} could not be deleted yet: {}'.format(path, e))
+
+    # Check the editions every 'interval' seconds; a new edition is loaded once it has stayed the same for 'settle' seconds
+    def _watch(self, interval, settle):
+        pending, since = None, None                                                         # the new editions waiting to settle, and when they were first seen
+        while not self._stopped.wait(interval):
+            try:
+                editions = source_editions(self.sources)
+                if editions == self.indexes.editions:
+                    pending = None
+                elif editions != pending:                                                   # new, or still changing (e.g. a release that is being copied)
+                    pending, since = editions, time.time()
+                    print('New edition of the data seen; loading it once it has not changed for {} seconds.'.format(settle))
+                elif time.time() - since >= settle:
+                    self.reload(editions=editions)
+                    pending = None
+            except Exception as e:                                                          # e.g. a release that was still incomplete; try again later
+                print('Reload failed, still answering from the edition loaded at {}: {}: {}'.format(self.indexes.loaded, type(e).__name__, e))
+
+    def server_close(self):
+        self._stopped.set()
+        ThreadingHTTPServer.server_close(self)
+
+
+# Client for the service, e.g. QueryClient().trs(123456)
+#   Unknown parcels, lakes, and trails raise LookupError; bad parameters raise ValueError.
+class QueryClient(object):
+
+    def __init__(self, host=None, port=None, timeout=60):
+        self.url = 'http://{}:{}'.format(host or Host, port or Port)
+        self.timeout = timeout
+
+    def _request(self, path, params=None, method='GET'):
+        query = '?' + urlencode(dict((k, v) for k, v in (params or {}).items() if v is not None)) if params else ''
+        try:
+            with urlopen(Request(self.url + path + query, method=method), timeout=self.timeout) as response:
+                return json.loads(response.read().decode('utf-8'))
+        except HTTPError as e:
+            message = json.loads(e.read().decode('utf-8')).get('error', str(e))
+            if e.code == 404:
+                raise LookupError(message)
+            if e.code == 400:
+                raise ValueError(message)
+            raise RuntimeError(message)
+
+    def near(self, trail=None, distance=None):
+        return self._request('/near', {'trail': trail, 'distance': distance})
+
+    def trs(self, parcel):
+        return self._request('/trs', {'parcel': parcel})
+
+    def lakeshore(self, lake):
+        return self._request('/lakeshore', {'lake': lake})
+
+    def stands(self, parcel):
+        return self._request('/stands', {'parcel': parcel})
+
+    def status(self):
+        return self._request('/status')
+
+    def reload(self):
+        return self._request('/reload', method='POST')
+
+
+# Command line entry point: start the service, or ask a running service
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Answer parcel, TRS, lakeshore, and forest stand lookups from indexes loaded once.')
+    parser.add_argument('--host', default=Host)
+    parser.add_argument('--port', type=int, default=Port)
+    commands = parser.add_subparsers(dest='command')
+    commands.add_parser('serve', help='start the service (the default)')
+    near = commands.add_parser('near', help='parcels within a distance of a trail')
+    near.add_argument('trail', nargs='?', default=None, help="'TRAIL_NAME' of the trail (every active Selector feature if left out)")
+    near.add_argument('--distance', default=None, help="e.g. '2 kilometers' (default: {})".format(Selector_Distance))
+    for name, help_text in [('trs', 'TRS values of a parcel'), ('stands', 'forest stands on a parcel')]:
+        commands.add_parser(name, help=help_text).add_argument('parcel', type=int, help='OBJECTID of the parcel')
+    commands.add_parser('lakeshore', help='parcels that touch a lake').add_argument('lake', help='DOWLKNUM of the lake')
+    commands.add_parser('status', help='editions and sizes of the loaded data')
+    commands.add_parser('reload', help='load the data again now')
+    args = parser.parse_args(argv)
+    if args.command in (None, 'serve'):
+        server = QueryServer((args.host, args.port), reload_interval=Reload_Interval)
+        print('Answering lookups at http://{}:{} (Ctrl+C stops the service).'.format(args.host, args.port))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+        return 0
+    client = QueryClient(args.host, args.port)
+    try:
+        if args.command == 'near':
+            result = client.near(args.trail, args.distance)
+        elif args.command in ('trs', 'stands'):
+            result = getattr(client, args.command)(args.parcel)
+        elif args.command == 'lakeshore':
+            result = client.lakeshore(args.lake)
+        else:
+            result = getattr(client, args.command)()
+    except (LookupError, ValueError) as e:
+        print(e.args[0] if e.args else e)
+        return 1
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,121 @@
+#-------------------------------------------------------------------------------
+# Name:        spreadsheet_loader.py (Cached Spreadsheet Input Loader)
+# Purpose:      This module loads the term and ID lists that the production scripts
+#                   keep in Excel workbooks ('First_Nations_Terms.xlsx', 'Public_Property_Terms.xlsx',
+#                   'Test_Lakes.xlsx'), replacing the full openpyxl.load_workbook() and
+#                   iter_rows() loops of each script.
+#
+#                   1. The sheet is streamed in read-only mode, so the workbook is never
+#                       loaded into memory as a whole.
+#                   2. The column is found by its header name (or number), so inserting
+#                       or moving columns does not break the scripts.
+#                   3. Values are stripped of surrounding spaces, and empty cells and
+#                       repeated values are dropped (keeping the first occurrence).
+#                   4. The values are kept in a small JSON cache keyed by the workbook's
+#                       modification time and size (and, if those change, its contents),
+#                       so an unchanged workbook is not opened at all.
+#
+# Author:      draleigh
+#
+# Created:     18 October 2026
+# Copyright:   (c) draleigh 2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+
+
+# Import modules and packages
+import os,json,hashlib,tempfile                                                             # list of required modules
+import openpyxl                                                                             # reading .xlsx workbooks
+
+
+CACHE_DIR = os.path.join(tempfile.gettempdir(), 'arcmap_layer_production_xlsx')            # default location of the cached columns
+
+
+# Hash the contents of a file
+def file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Clean a column of values: strip text, drop empty cells, and drop repeated values (keeping the first)
+#   Values other than text and numbers (e.g. dates) are turned into text.
+def clean_values(values):
+    cleaned, seen = [], set()
+    for value in values:
+        if value is not None and not isinstance(value, (str, int, float)):
+            value = str(value)
+        if isinstance(value, str):
+            value = value.strip()
+        if value is None or value == '' or value in seen:
+            continue
+        seen.add(value)
+        cleaned.append(value)
+    return cleaned
+
+
+# Stream one column of a sheet in read-only mode
+#   'column' is a header name from 'header_row', a column number (1 for column A), or None for the first column.
+def read_column(path, sheet, column=None, header_row=1):
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)                       # read-only mode streams the rows instead of loading the whole workbook
+    try:
+        rows = wb[sheet].iter_rows(min_row=header_row, values_only=True)
+        header = next(rows, ())
+        if column is None:
+            position = 0
+        elif isinstance(column, int):
+            position = column - 1
+        else:
+            names = [str(name).strip() if name is not None else None for name in header]
+            if column not in names:
+                raise ValueError("No column named '{}' in sheet '{}' of {} (columns: {})".format(column, sheet, path, [n for n in names if n]))
+            position = names.index(column)
+        return [row[position] if position < len(row) else None for row in rows]
+    finally:
+        wb.close()
+
+
+# Load a cleaned column of values, using the cache when the workbook has not changed
+#   'normalize' (optional) is applied to every value after loading, e.g. lakeshore_engine.normalize_lake_id.
+def load_column(path, sheet, column=None, header_row=1, normalize=None, cache_dir=CACHE_DIR):
+    values = None
+    stat = os.stat(path)
+    cache_path = None
+    if cache_dir:
+        key = '|'.join([os.path.abspath(path), str(sheet), str(column), str(header_row)])
+        cache_path = os.path.join(cache_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.json')
+        cached = _read_cache(cache_path)
+        if cached is not None:
+            if cached['mtime'] == stat.st_mtime and cached['size'] == stat.st_size:         # unchanged workbook: no need to open it
+                values = cached['values']
+            elif cached['sha1'] == file_hash(path):                                         # touched but not changed
+                values = cached['values']
+                _write_cache(cache_path, dict(cached, mtime=stat.st_mtime, size=stat.st_size))
+    if values is None:
+        values = clean_values(read_column(path, sheet, column, header_row))
+        if cache_path:
+            _write_cache(cache_path, {'mtime': stat.st_mtime, 'size': stat.st_size, 'sha1': file_hash(path), 'values': values})
+    if normalize is not None:
+        values = clean_values(normalize(value) for value in values)
+    return values
+
+
+# Read a cache entry (None if there is none)
+def _read_cache(cache_path):
+    try:
+        with open(cache_path) as f:
+            return json.load(f)
+    except (IOError, OSError, ValueError):                                                  # a missing or damaged cache is simply rebuilt
+        return None
+
+
+# Write a cache entry; the temporary file keeps a half-written cache from being read
+def _write_cache(cache_path, entry):
+    if not os.path.isdir(os.path.dirname(cache_path)):
+        os.makedirs(os.path.dirname(cache_path))
+    temp_path = cache_path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(entry, f)
+    os.replace(temp_path, cache_path)
@@ -0,0 +1,155 @@
+#-------------------------------------------------------------------------------
+# Name:        stage_graph.py (Stage Dependency Graph)
+# Purpose:      This module runs the stages of several products as one dependency
+#                   graph, so that a result that more than one product needs (e.g. the
+#                   parcels near the Selector features) is computed once, and stages
+#                   that do not depend on each other run at the same time:
+#
+#                   1. Each stage is a function and the names of the stages whose results
+#                       it takes, in the order of its arguments.
+#                   2. run() runs only the stages that the requested targets need. A stage
+#                       starts as soon as its inputs are ready, in a pool of threads, so
+#                       the results stay in memory and are shared without being copied;
+#                       the heavy work inside a stage (dissolves, joins) still goes to
+#                       worker processes through process_pool.py.
+#                   3. A result is released as soon as every stage that takes it has
+#                       finished (unless it is a target), so the graph holds no more than
+#                       it has to.
+#                   4. If a stage fails, no new stages start, the running ones finish,
+#                       and the error is raised.
+#
+#                   graph = stage_graph.StageGraph()
+#                   graph.add('selector', load_selector)
+#                   graph.add('nearby', select_nearby, ['parcels', 'selector'])
+#                   results = graph.run(['nearby'], workers=4, tracer=tracer)
+#
+# Author:      draleigh
+#
+# Created:     18 October 2026
+# Copyright:   (c) draleigh 2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+
+
+# Import modules and packages
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED                    # the pool of stage threads
+
+
+# One stage of the graph: a function and the names of the stages whose results are its arguments
+class Stage(object):
+
+    def __init__(self, name, function, inputs=()):
+        self.name = name
+        self.function = function
+        self.inputs = list(inputs)
+
+    def __repr__(self):
+        return 'Stage({!r}, inputs={!r})'.format(self.name, self.inputs)
+
+
+# The stages of one or more products, keyed by name
+class StageGraph(object):
+
+    def __init__(self):
+        self.stages = {}
+
+    def add(self, name, function, inputs=()):
+        if name in self.stages:
+            raise ValueError("There is already a stage named '{}'.".format(name))
+        self.stages[name] = Stage(name, function, inputs)
+        return self.stages[name]
+
+    def __contains__(self, name):
+        return name in self.stages
+
+    def __len__(self):
+        return len(self.stages)
+
+    # Return the names of the stages that 'targets' need (the targets and everything upstream of them), in dependency order
+    #   Raises ValueError for an unknown stage or a cycle.
+    def order(self, targets=None):
+        targets = list(self.stages) if targets is None else list(targets)
+        ordered, visiting, done = [], set(), set()
+
+        def visit(name, path):
+            if name in done:
+                return
+            if name not in self.stages:
+                raise ValueError("Unknown stage '{}'{}.".format(name, ' (an input of {})'.format(path[-1]) if path else ''))
+            if name in visiting:
+                raise ValueError('The stages form a cycle: {}.'.format(' -> '.join(path[path.index(name):] + [name])))
+            visiting.add(name)
+            for input_name in self.stages[name].inputs:
+                visit(input_name, path + [name])
+            visiting.discard(name)
+            done.add(name)
+            ordered.append(name)
+
+        for name in targets:
+            visit(name, [])
+        return ordered
+
+    # The stages that can run at the same time, level by level (for printing a plan)
+    def levels(self, targets=None):
+        level = {}
+        for name in self.order(targets):
+            level[name] = 1 + max([level[i] for i in self.stages[name].inputs] or [-1])
+        plan = [[] for _ in range(max(level.values()) + 1)] if level else []
+        for name in self.order(targets):
+            plan[level[name]].append(name)
+        return plan
+
+    # Run the stages that 'targets' need (every stage if None) and return {target: result}
+    #   'workers' is the number of stages that may run at once (None runs every ready stage);
+    #   'tracer' (a stage_tracing.Tracer made with concurrent=True) records a span for each stage.
+    def run(self, targets=None, workers=None, tracer=None):
+        targets = list(self.stages) if targets is None else list(targets)
+        names = self.order(targets)
+        waiting = dict((name, set(self.stages[name].inputs)) for name in names)            # inputs each stage is still waiting for
+        consumers = dict((name, 0) for name in names)                                       # stages still to take each result
+        for name in names:
+            for input_name in set(self.stages[name].inputs):
+                consumers[input_name] += 1
+        results, running, error = {}, {}, None
+        keep = set(targets)
+        with ThreadPoolExecutor(max_workers=workers or max(1, len(names))) as pool:
+            while waiting or running:
+                if error is None:
+                    for name in [n for n in names if n in waiting and not waiting[n]]:     # every stage whose inputs are ready
+                        del waiting[name]
+                        stage = self.stages[name]
+                        running[pool.submit(self._run_stage, stage, [results[i] for i in stage.inputs], tracer)] = name
+                if not running:
+                    break
+                finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except BaseException as stage_error:
+                        if error is None:
+                            error = stage_error
+                            print("Stage '{}' failed: {}".format(name, stage_error))
+                        continue
+                    for other in waiting:
+                        waiting[other].discard(name)
+                    for input_name in set(self.stages[name].inputs):                        # release the results that no other stage needs
+                        consumers[input_name] -= 1
+                        if consumers[input_name] == 0 and input_name not in keep:
+                            results.pop(input_name, None)
+        if error is not None:
+            raise error
+        return dict((name, results[name]) for name in targets)
+
+    # Run one stage in a pool thread, inside a span of its own
+    @staticmethod
+    def _run_stage(stage, arguments, tracer):
+        if tracer is None:
+            return stage.function(*arguments)
+        with tracer.stage(stage.name) as span:
+            result = stage.function(*arguments)
+            if isinstance(result, int) and not isinstance(result, bool):                    # e.g. the number of features written
+                span.features_out = result
+            elif hasattr(result, '__len__'):                                                # e.g. a set of OBJECTIDs
+                span.features_out = len(result)
+        return result
@@ -0,0 +1,336 @@
+#-------------------------------------------------------------------------------
+# Name:        stage_tracing.py (Stage Tracing for the Production Scripts)
+# Purpose:      This module replaces the 'block_start = time.time()' and
+#                   "print('... (%s seconds)' % round(time.time() - block_start))" pairs
+#                   of the production scripts with named stage spans:
+#
+#                   1. Each span records its wall time, CPU time (of the script and of the
+#                       worker processes it finished with), peak memory (resident set size),
+#                       the change in the current memory over the span, and the number of
+#                       features that went in and came out. The peak is the span's own only
+#                       where the high-water mark can be reset (Linux); elsewhere it is the
+#                       peak of the process so far, and the span says so ('peak_memory_scope').
+#                   2. Long stages report their progress at most every PROGRESS_INTERVAL
+#                       seconds, instead of printing a line for every row.
+#                   3. Every run writes a JSON trace of its spans to the trace folder.
+#                   4. Stages named in 'profile' run under cProfile (the hottest functions
+#                       go into the trace, and the full profile into a .prof file beside it),
+#                       and stages named in 'memory' run under tracemalloc (the largest
+#                       allocation sites go into the trace). '*' selects every stage.
+#
+#                   tracer = stage_tracing.Tracer('forest_stand_groupings', Trace_Folder)
+#                   span = tracer.start('dissolve', features_in=len(stands))
+#                   ...
+#                   span.end(features_out=count)
+#                   tracer.finish()
+#
+# Author:      draleigh
+#
+# Created:     18 October 2026
+# Copyright:   (c) draleigh 2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+
+
+# Import modules and packages
+import os,sys,json,time,platform,datetime,contextlib,threading                              # list of required modules
+import cProfile,pstats,tracemalloc                                                          # the opt-in profiling hooks
+
+try:                                                                                        # resource is only available on Linux and macOS
+    import resource
+except ImportError:
+    resource = None
+
+
+PROGRESS_INTERVAL = 15.0                                                                    # seconds between progress lines of a stage
+HOT_PATHS = 15                                                                              # functions listed in the trace for a profiled stage
+ALLOCATION_SITES = 10                                                                       # allocation sites listed in the trace for a stage under tracemalloc
+
+
+# A field of /proc/self/status in MB (None if there is no such file, i.e. not Linux)
+def _proc_status_mb(field):
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return round(int(line.split()[1]) / 1024.0, 1)
+    except (IOError, OSError):
+        pass
+    return None
+
+
+# The memory counters of this process on Windows (PROCESS_MEMORY_COUNTERS)
+def _windows_counters():
+    import ctypes
+    from ctypes import wintypes
+
+    class Counters(ctypes.Structure):                                                       # PROCESS_MEMORY_COUNTERS
+        _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD)] + \
+                   [(name, ctypes.c_size_t) for name in ('PeakWorkingSetSize', 'WorkingSetSize', 'QuotaPeakPagedPoolUsage',
+                                                         'QuotaPagedPoolUsage', 'QuotaPeakNonPagedPoolUsage',
+                                                         'QuotaNonPagedPoolUsage', 'PagefileUsage', 'PeakPagefileUsage')]
+
+    counters = Counters()
+    counters.cb = ctypes.sizeof(counters)
+    ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb)
+    return counters
+
+
+# Peak memory (resident set size) of this process, in MB (None if it cannot be measured)
+#   On Linux this is the peak since the last reset_peak_memory(); elsewhere it is the peak since the process started.
+def peak_memory_mb():
+    peak = _proc_status_mb('VmHWM')
+    if peak is not None:
+        return peak
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(peak / (1024.0 * 1024.0) if sys.platform == 'darwin' else peak / 1024.0, 1)   # bytes on macOS, kilobytes on Linux
+    if os.name == 'nt':
+        return round(_windows_counters().PeakWorkingSetSize / (1024.0 * 1024.0), 1)
+    return None
+
+
+# Current memory (resident set size, or working set on Windows) of this process, in MB (None if it cannot be measured)
+def current_memory_mb():
+    current = _proc_status_mb('VmRSS')
+    if current is not None:
+        return current
+    if os.name == 'nt':
+        return round(_windows_counters().WorkingSetSize / (1024.0 * 1024.0), 1)
+    return None
+
+
+# Start measuring the peak memory afresh
+#   Returns True if the high-water mark was reset (Linux only); elsewhere the peak since the process started is kept.
+def reset_peak_memory():
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except (IOError, OSError):
+        return False
+
+
+# Peak memory of the largest worker process this process has finished with, in MB (None if it cannot be measured)
+def peak_worker_memory_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return round(peak / (1024.0 * 1024.0) if sys.platform == 'darwin' else peak / 1024.0, 1)
+
+
+# CPU seconds used by the worker processes this process has finished with (None if it cannot be measured)
+def worker_cpu_seconds():
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+# Does a stage name appear in a list of stage names ('*' matches every stage)?
+def _selected(name, names):
+    return '*' in names or name in names
+
+
+# One named stage of a run
+class Span(object):
+
+    def __init__(self, tracer, name, parent=None, features_in=None):
+        self.tracer = tracer
+        self.name = name
+        self.parent = parent
+        self.features_in = features_in
+        self.features_out = None
+        self.seconds = None
+        self.cpu_seconds = None
+        self.worker_cpu_seconds = None
+        self.peak_memory = None
+        self.peak_scope = tracer.peak_scope                                                 # 'stage' if the peak was reset when the span started, else 'process'
+        self.memory_delta = None                                                            # change in the current memory over the span, in MB
+        self.extra = {}                                                                     # hot paths, allocation sites, and anything a script adds
+        self._wall_start = time.perf_counter()
+        self._cpu_clock = time.thread_time if tracer.concurrent else time.process_time      # spans that run side by side count only their own thread
+        self._cpu_start = self._cpu_clock()
+        self._worker_cpu_start = worker_cpu_seconds()
+        self._memory_start = current_memory_mb()
+        self._thread = threading.get_ident()
+        self._last_progress = self._wall_start
+        self._profiler = None
+        self._tracing_memory = False
+
+    # Record the peak memory seen so far
+    def observe(self, peak):
+        if peak is not None and (self.peak_memory is None or peak > self.peak_memory):
+            self.peak_memory = peak
+
+    # Report progress (e.g. once per row); a line is printed at most every PROGRESS_INTERVAL seconds, and when 'done' reaches 'total'
+    def progress(self, done, total=None):
+        now = time.perf_counter()
+        if now - self._last_progress < self.tracer.progress_interval and done != total:
+            return
+        self._last_progress = now
+        elapsed = max(now - self._wall_start, 1e-9)
+        rate = done / elapsed
+        if total:
+            left = ', about %s seconds left' % round((total - done) / rate) if rate > 0 and done < total else ''
+            print('  {}: {} of {} ({:.0%}), {:.0f} per second{}'.format(self.name, done, total, done / float(total), rate, left))
+        else:
+            print('  {}: {} done, {:.0f} per second'.format(self.name, done, rate))
+
+    # End the span; prints one line with its measurements
+    def end(self, features_out=None):
+        if features_out is not None:
+            self.features_out = features_out
+        self.tracer._end(self)
+        return self
+
+    # The span as a dictionary for the JSON trace
+    def as_dict(self):
+        record = {'stage': self.name, 'parent': self.parent.name if self.parent else None,
+                  'seconds': self.seconds, 'cpu_seconds': self.cpu_seconds, 'worker_cpu_seconds': self.worker_cpu_seconds,
+                  'peak_memory_mb': self.peak_memory, 'peak_memory_scope': self.peak_scope, 'memory_delta_mb': self.memory_delta,
+                  'features_in': self.features_in, 'features_out': self.features_out}
+        features = self.features_in if self.features_in is not None else self.features_out
+        if features is not None and self.seconds:
+            record['features_per_second'] = round(features / self.seconds, 1)
+        record.update(self.extra)
+        return record
+
+
+# Records the spans of one run and writes them to a JSON trace
+#   'profile' and 'memory' are lists of stage names to run under cProfile and tracemalloc ('*' for every stage).
+#   'concurrent' is for spans that run side by side in threads (see stage_graph.py): each span's CPU time is
+#   then that of its own thread, and its peak memory is the peak while it was open, whichever span caused it.
+#   A span's peak memory is its own ('peak_memory_scope': 'stage') only where the high-water mark can be reset;
+#   elsewhere it is the peak of the process so far ('process'), and 'memory_delta_mb' is the better measure of the stage.
+class Tracer(object):
+
+    def __init__(self, product, trace_folder=None, profile=(), memory=(), progress_interval=PROGRESS_INTERVAL, echo=True, concurrent=False):
+        self.product = product
+        self.concurrent = concurrent
+        self.trace_folder = trace_folder
+        self.profile = list(profile or [])
+        self.memory = list(memory or [])
+        self.progress_interval = progress_interval
+        self.echo = echo
+        self.started = datetime.datetime.now()
+        self.spans = []                                                                     # finished spans, in the order they ended
+        self.open_spans = []                                                                # spans that have started but not ended, outermost first
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        self._worker_cpu_start = worker_cpu_seconds()
+        self.peak_scope = None                                                              # set by the reset when each span starts
+        self.trace_path = None
+        if trace_folder:
+            stamp = self.started.strftime('%Y%m%d_%H%M%S')
+            self.trace_path = os.path.join(trace_folder, '{}_{}.json'.format(product, stamp))
+
+    # Record the peak memory in every open span, then start measuring it afresh
+    def _observe(self, reset=False):
+        peak = peak_memory_mb()
+        for span in self.open_spans:
+            span.observe(peak)
+        if reset:
+            self.peak_scope = 'stage' if reset_peak_memory() else 'process'
+        return peak
+
+    # Start a stage span (inside any span that is still open in the same thread)
+    def start(self, name, features_in=None):
+        self._observe(reset=True)
+        thread = threading.get_ident()
+        parents = [span for span in self.open_spans if span._thread == thread]
+        span = Span(self, name, parents[-1] if parents else None, features_in)
+        self.open_spans.append(span)
+        if _selected(name, self.profile) and not any(s._profiler for s in self.open_spans):   # only one profiler can run at a time
+            span._profiler = cProfile.Profile()
+            span._profiler.enable()
+        if _selected(name, self.memory) and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            span._tracing_memory = True
+        return span
+
+    def _end(self, span):
+        if span._profiler is not None:
+            span._profiler.disable()
+            span.extra['hot_paths'] = self._hot_paths(span)
+            span._profiler = None
+        if span._tracing_memory:
+            snapshot = tracemalloc.take_snapshot()
+            span.extra['traced_peak_mb'] = round(tracemalloc.get_traced_memory()[1] / (1024.0 * 1024.0), 1)
+            span.extra['allocation_sites'] = [{'site': '{}:{}'.format(stat.traceback[0].filename, stat.traceback[0].lineno),
+                                               'size_mb': round(stat.size / (1024.0 * 1024.0), 2), 'blocks': stat.count}
+                                              for stat in snapshot.statistics('lineno')[:ALLOCATION_SITES]]
+            tracemalloc.stop()
+            span._tracing_memory = False
+        span.seconds = round(time.perf_counter() - span._wall_start, 3)
+        span.cpu_seconds = round(span._cpu_clock() - span._cpu_start, 3)
+        workers = worker_cpu_seconds()
+        span.worker_cpu_seconds = round(workers - span._worker_cpu_start, 3) if workers is not None else None
+        self._observe()
+        current = current_memory_mb()
+        if current is not None and span._memory_start is not None:
+            span.memory_delta = round(current - span._memory_start, 1)
+        if span in self.open_spans:
+            self.open_spans.remove(span)
+        self.spans.append(span)
+        if self.echo:
+            counts = ''
+            if span.features_in is not None or span.features_out is not None:
+                counts = ', features {} in / {} out'.format('-' if span.features_in is None else span.features_in,
+                                                           '-' if span.features_out is None else span.features_out)
+            memory = 'peak {} MB'.format(span.peak_memory) if span.peak_scope == 'stage' else 'process peak {} MB'.format(span.peak_memory)
+            if span.memory_delta is not None:
+                memory += ', {:+} MB'.format(span.memory_delta)
+            print('[{}] {} seconds, {} CPU seconds, {}{}'.format(span.name, round(span.seconds, 1), round(span.cpu_seconds, 1), memory, counts))
+
+    # The hottest functions of a profiled span (by cumulative time); the full profile is saved beside the trace
+    def _hot_paths(self, span):
+        if self.trace_path:
+            span._profiler.dump_stats('{}_{}.prof'.format(os.path.splitext(self.trace_path)[0], span.name))
+        stats = pstats.Stats(span._profiler)
+        stats.sort_stats('cumulative')
+        hot = []
+        for function in stats.fcn_list[:HOT_PATHS]:
+            calls, _, own, cumulative, _ = stats.stats[function]
+            filename, line, name = function
+            hot.append({'function': '{}:{}({})'.format(os.path.basename(filename), line, name), 'calls': calls,
+                        'seconds': round(own, 3), 'cumulative_seconds': round(cumulative, 3)})
+        return hot
+
+    # Context manager form of start()/end()
+    #   with tracer.stage('join', features_in=count) as span:
+    #       span.features_out = ...
+    @contextlib.contextmanager
+    def stage(self, name, features_in=None):
+        span = self.start(name, features_in)
+        try:
+            yield span
+        finally:
+            span.end()
+
+    # The whole run as a dictionary for the JSON trace
+    def as_dict(self):
+        workers = worker_cpu_seconds()
+        return {'product': self.product, 'started': self.started.isoformat(timespec='seconds'),
+                'seconds': round(time.perf_counter() - self._wall_start, 3),
+                'cpu_seconds': round(time.process_time() - self._cpu_start, 3),
+                'worker_cpu_seconds': round(workers - self._worker_cpu_start, 3) if workers is not None else None,
+                'peak_memory_mb': max([s.peak_memory for s in self.spans if s.peak_memory is not None] or [peak_memory_mb() or 0.0]),
+                'peak_worker_memory_mb': peak_worker_memory_mb(),
+                'machine': {'platform': platform.platform(), 'python': platform.python_version(), 'cpus': os.cpu_count()},
+                'stages': [span.as_dict() for span in sorted(self.spans, key=lambda s: s._wall_start)]}
+
+    # End any open spans, write the JSON trace (if there is a trace folder), and print the time taken
+    #   Returns the trace as a dictionary.
+    def finish(self):
+        while self.open_spans:
+            self.open_spans[-1].end()
+        trace = self.as_dict()
+        if self.trace_path:
+            if not os.path.isdir(self.trace_folder):
+                os.makedirs(self.trace_folder)
+            with open(self.trace_path, 'w') as f:
+                json.dump(trace, f, indent=2)
+        if self.echo:
+            print('{} took %s seconds...'.format(self.product) % round(trace['seconds']) + (' (trace: {})'.format(self.trace_path) if self.trace_path else ''))
+        return trace
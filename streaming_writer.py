@@ -0,0 +1,205 @@
+#-------------------------------------------------------------------------------
+# Name:        streaming_writer.py (Streaming Output Writer)
+# Purpose:      The statewide parcel copies ('Parcel_Selection_<date>',
+#                   'Parcel_Data_Addition_<date>') were made with CopyFeatures_management
+#                   on whole selections, which holds the selection in memory and writes it
+#                   in one go. This module writes features as they are produced instead:
+#
+#                   1. Features are handed to the writer one at a time (or as a generator
+#                       from any pipeline) and gathered into batches of BATCH_SIZE.
+#                   2. For open-format targets, a background thread writes the batches
+#                       through layer_io.write_features(), so writing overlaps with the
+#                       reading and computing that produce the features. At most
+#                       QUEUE_BATCHES batches wait for the writer; when they are all full the
+#                       producer waits, so memory stays flat however many features there are.
+#                   3. Targets in a geodatabase are written with an arcpy InsertCursor in
+#                       the producer's own thread, since arcpy is not thread-safe. If arcpy
+#                       is not available, output_path() moves them to a GeoPackage (or
+#                       FlatGeobuf file) of the same name beside the geodatabase.
+#                   4. copy_features() between two arcpy datasets uses the source as the
+#                       template of the new feature class and copies arcpy geometries
+#                       ('SHAPE@'), so true curves, Z and M values, and GUID, Blob, and
+#                       BigInteger fields are kept. CopyFeatures_management (the scripts'
+#                       default 'Copy_Engine') also keeps domains and subtypes.
+#
+#                   with streaming_writer.StreamingWriter(target, fields, 'MultiPolygon', template=source) as writer:
+#                       for values, geom in features:
+#                           writer.write(values, geom)
+#
+# Author:      draleigh
+#
+# Created:     18 October 2026
+# Copyright:   (c) draleigh 2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+
+
+# Import modules and packages
+import os,queue,threading                                                                   # list of required modules
+import arcpy_runtime                                                                        # arcpy is only available on machines with ArcGIS installed
+from arcpy_runtime import arcpy                                                             # imported on first use, so open-format runs never import it
+import layer_io                                                                             # shared feature reading/writing helpers
+
+
+BATCH_SIZE = 10000                                                                          # features in each batch handed to the writer thread
+QUEUE_BATCHES = 4                                                                           # batches that may wait for the writer before the producer waits
+FALLBACK_FORMATS = {'.gpkg': 'GeoPackage', '.fgb': 'FlatGeobuf'}                           # formats used for geodatabase targets when arcpy is not available
+_DONE = object()                                                                            # marks the end of the features in the queue
+
+
+# Return the path that a target will be written to
+#   Open-format targets, and geodatabase targets when arcpy is available, are returned unchanged.
+#   Otherwise r"...\Parcels.gdb\Parcel_Selection" becomes r"...\Parcels.gpkg\Parcel_Selection"
+#   ('.gpkg') or r"...\Parcel_Selection.fgb" ('.fgb'), beside the geodatabase.
+def output_path(target, fallback='.gpkg'):
+    if fallback not in FALLBACK_FORMATS:
+        raise ValueError("Unknown fallback format '{}' (expected one of {}).".format(fallback, sorted(FALLBACK_FORMATS)))
+    if layer_io.is_open_format(target) or arcpy_runtime.available():
+        return target
+    workspace, name = os.path.split(str(target))
+    if fallback == '.fgb':
+        return os.path.join(os.path.dirname(workspace), name + '.fgb')
+    return os.path.join(os.path.splitext(workspace)[0] + '.gpkg', name)
+
+
+# Write features to a new open-format layer from a background thread, or to a new feature class in the producer's thread
+#   'fields' is a list of (name, type, length) using the same type names as AddField, and 'template'
+#   is a dataset whose coordinate system is copied (as for layer_io.write_features()).
+#   Use it as a context manager, or call close() when every feature has been written.
+class StreamingWriter(object):
+
+    def __init__(self, target, fields, geometry_type='MultiPolygon', template=None, batch_size=BATCH_SIZE, queue_batches=QUEUE_BATCHES, fallback='.gpkg'):
+        self.target = output_path(target, fallback)
+        self.batch_size = batch_size
+        self.written = 0
+        self._batch = []
+        self._queue = queue.Queue(maxsize=queue_batches)                                    # the bound on the batches in memory
+        self._error = None
+        self._closed = False
+        self._cursor = self._thread = None
+        if not layer_io.is_open_format(self.target):                                        # arcpy is not thread-safe, so geodatabase targets are written in this thread
+            self._sr = layer_io.create_feature_class(self.target, fields, geometry_type, template)
+            self._cursor = arcpy.da.InsertCursor(self.target, [name for name, _, _ in fields] + ['SHAPE@'])
+            return
+        self._thread = threading.Thread(target=self._run, args=(list(fields), geometry_type, template), name='streaming_writer')
+        self._thread.daemon = True
+        self._thread.start()
+
+    # Writer thread: hand the queued features to layer_io.write_features() as one stream of rows
+    def _run(self, fields, geometry_type, template):
+        try:
+            self.written = layer_io.write_features(self.target, fields, self._rows(), geometry_type, template, self.batch_size)
+        except BaseException as error:                                                      # kept, and raised again in the producer's thread
+            self._error = error
+
+    def _rows(self):
+        while True:
+            batch = self._queue.get()
+            if batch is _DONE:
+                return
+            for row in batch:
+                yield row
+
+    # Hand a batch to the writer thread, waiting while the queue is full
+    #   The wait is rechecked every second, so a failed writer is reported instead of leaving the producer waiting.
+    def _put(self, item):
+        while True:
+            self._raise_error()
+            try:
+                self._queue.put(item, timeout=1.0)
+                return
+            except queue.Full:
+                if not self._thread.is_alive():                                             # the writer failed while the producer waited
+                    self._raise_error()
+                    raise RuntimeError('The writer thread for {} stopped unexpectedly.'.format(self.target))
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise RuntimeError('Writing {} failed: {}'.format(self.target, self._error)) from self._error
+
+    # Add one feature: a tuple of field values in the order of 'fields', and a shapely geometry (or None)
+    def write(self, values, geometry):
+        if self._cursor is not None:
+            self._cursor.insertRow(list(values) + [layer_io.arcpy_geometry(geometry, self._sr)])
+            self.written += 1
+            return
+        self._batch.append((values, geometry))
+        if len(self._batch) >= self.batch_size:
+            self._put(self._batch)
+            self._batch = []
+
+    # Add every (values, geometry) pair from an iterable
+    def write_many(self, rows):
+        for values, geometry in rows:
+            self.write(values, geometry)
+
+    # Write the last batch, wait for the writer thread, and return the number of features written
+    def close(self):
+        if not self._closed and self._thread is None:
+            self._closed = True
+            cursor, self._cursor = self._cursor, None
+            del cursor                                                                      # releases the lock on the feature class
+        if not self._closed:
+            self._closed = True
+            if self._batch:
+                self._put(self._batch)
+                self._batch = []
+            self._put(_DONE)
+            self._thread.join()
+        self._raise_error()
+        return self.written
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+            return
+        self._batch = []                                                                    # the producer failed: let the writer finish what it has, and keep the producer's error
+        try:
+            self.close()
+        except RuntimeError:
+            pass
+
+
+# Write (values, geometry) pairs from 'rows' (e.g. a generator) to 'target'; returns the number of features written
+def write_stream(target, fields, rows, geometry_type='MultiPolygon', template=None, batch_size=BATCH_SIZE, queue_batches=QUEUE_BATCHES, fallback='.gpkg'):
+    with StreamingWriter(target, fields, geometry_type, template, batch_size, queue_batches, fallback) as writer:
+        writer.write_many(rows)
+    return writer.written
+
+
+# Copy features from 'source' to a new feature class at 'target', streaming them in batches
+#   (the equivalent of CopyFeatures_management, without holding the selection in memory)
+#   'where' is a SQL expression and 'oids' a set of OBJECTIDs; feature layers honor their current selection.
+#   Every attribute field is copied, except those that arcpy maintains itself (e.g. 'Shape_Area').
+#   Returns the number of features copied.
+def copy_features(source, target, where=None, oids=None, batch_size=BATCH_SIZE, queue_batches=QUEUE_BATCHES, fallback='.gpkg'):
+    if not layer_io.is_open_format(source) and not layer_io.is_open_format(output_path(target, fallback)):
+        return _copy_arcpy(source, target, where, oids)
+    fields = layer_io.list_fields(source)
+    names = [name for name, _, _ in fields]
+    rows = ((values, geom) for oid, values, geom in layer_io.read_features(source, names, where) if oids is None or oid in oids)
+    source_dataset = layer_io.split_open_path(source)
+    target_dataset = layer_io.split_open_path(output_path(target, fallback))
+    if source_dataset and target_dataset and source_dataset[0] == target_dataset[0]:       # SQLite cannot read and write the same GeoPackage at once
+        rows = list(rows)
+    return write_stream(target, fields, rows, layer_io.geometry_type(source), source, batch_size, queue_batches, fallback)
+
+
+# Copy between two arcpy datasets in the calling thread, with the source as the template of the new feature class
+#   and arcpy geometries throughout, so nothing passes through WKB: true curves, Z and M values, field
+#   aliases, and field types such as GUID, Blob, and BigInteger are kept.
+def _copy_arcpy(source, target, where=None, oids=None):
+    desc = arcpy.Describe(source)
+    arcpy.CreateFeatureclass_management(os.path.dirname(str(target)), os.path.basename(str(target)), desc.shapeType.upper(), source,
+                                        'ENABLED' if desc.hasM else 'DISABLED', 'ENABLED' if desc.hasZ else 'DISABLED', desc.spatialReference)
+    names = [field.name for field in arcpy.ListFields(source) if field.type not in ('OID', 'Geometry') and not field.required]
+    copied = 0
+    with arcpy.da.SearchCursor(source, ['OID@', 'SHAPE@'] + names, where) as rows, arcpy.da.InsertCursor(target, ['SHAPE@'] + names) as cursor:
+        for row in rows:
+            if oids is None or row[0] in oids:
+                cursor.insertRow(row[1:])
+                copied += 1
+    return copied
@@ -0,0 +1,18 @@
+# Shared setup for the tests: the modules live at the top of the repository, next to the production scripts
+import os,sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+import layer_io
+
+
+# Write polygons to a GeoPackage layer (or shapefile) and return its path
+#   write_layer(path, [('PIN', 'TEXT', 20)], [(('1',), polygon), ...])
+@pytest.fixture
+def write_layer():
+    def write(path, fields, rows, geometry_type='Polygon'):
+        layer_io.delete_dataset(path)
+        layer_io.write_features(path, fields, rows, geometry_type)
+        return path
+    return write
@@ -0,0 +1,39 @@
+import os
+import subprocess
+import sys
+import types
+import pytest
+import arcpy_runtime
+
+
+@pytest.fixture
+def fresh_runtime(monkeypatch):
+    monkeypatch.setattr(arcpy_runtime, '_module', None)
+    monkeypatch.setattr(arcpy_runtime, '_missing', False)
+    return arcpy_runtime
+
+
+def test_importing_the_helpers_does_not_import_arcpy():
+    code = 'import sys, layer_io, tiled_dissolve, forest_stand_pipeline; print("arcpy" in sys.modules)'
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, cwd=os.path.dirname(arcpy_runtime.__file__))
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == 'False'
+
+
+def test_the_proxy_imports_arcpy_on_first_use(fresh_runtime, monkeypatch):
+    fake = types.ModuleType('arcpy')
+    fake.GetCount_management = lambda path: 7
+    monkeypatch.setitem(sys.modules, 'arcpy', fake)
+    assert not fresh_runtime.loaded()
+    assert 'not loaded yet' in repr(fresh_runtime.arcpy)
+    assert fresh_runtime.arcpy.GetCount_management('parcels') == 7
+    assert fresh_runtime.loaded() and fresh_runtime.available()
+
+
+def test_a_missing_arcpy_is_reported_once(fresh_runtime, monkeypatch):
+    monkeypatch.setitem(sys.modules, 'arcpy', None)                                         # makes 'import arcpy' fail
+    assert not fresh_runtime.available()
+    monkeypatch.delitem(sys.modules, 'arcpy')
+    with pytest.raises(ImportError):                                                        # the failed import is not tried again
+        fresh_runtime.arcpy.CopyFeatures_management
+    assert not fresh_runtime.loaded()
@@ -0,0 +1,68 @@
+import os,time
+from shapely.geometry import box
+import layer_io
+import product_cache
+
+
+FIELDS = [('NAME', 'TEXT', 20)]
+
+
+def test_gpkg_edition_and_size(tmp_path, write_layer):
+    path = write_layer(str(tmp_path / 'data.gpkg' / 'parcels'), FIELDS, [(('a',), box(0, 0, 1, 1))])
+    write_layer(str(tmp_path / 'data.gpkg' / 'other'), FIELDS, [(('b',), box(0, 0, 1, 1))])
+    first = layer_io.dataset_edition(path)
+    assert first is not None and first == layer_io.dataset_edition(path)
+    assert layer_io.dataset_size(path) > 0
+    write_layer(path, FIELDS, [(('a',), box(0, 0, 1, 1)), (('c',), box(1, 1, 2, 2))])
+    assert layer_io.dataset_edition(path) != first
+
+
+def test_shapefile_edition_ignores_lock_files(tmp_path, write_layer):
+    path = write_layer(str(tmp_path / 'parcels.shp'), FIELDS, [(('a',), box(0, 0, 1, 1))])
+    edition = layer_io.dataset_edition(path)
+    open(str(tmp_path / 'parcels.sr.lock'), 'w').close()
+    assert layer_io.dataset_edition(path) == edition
+    assert sorted(os.path.splitext(p)[1] for p in layer_io.dataset_files(path)) == ['.cpg', '.dbf', '.shp', '.shx']
+
+
+def test_file_geodatabase_edition_covers_the_whole_geodatabase(tmp_path):
+    gdb = str(tmp_path / 'data.gdb')
+    import fiona
+
+    def write(name):
+        with fiona.open(gdb, 'w', driver='OpenFileGDB', layer=name, schema={'geometry': 'Polygon', 'properties': {'NAME': 'str'}}) as dst:
+            dst.write({'geometry': {'type': 'Polygon', 'coordinates': [[(0, 0), (1, 0), (1, 1), (0, 0)]]}, 'properties': {'NAME': name}})
+
+    write('parcels')
+    parcels = os.path.join(gdb, 'parcels')
+    edition = layer_io.dataset_edition(parcels)
+    open(os.path.join(gdb, 'a00000009.host.1234.sr.lock'), 'w').close()
+    assert edition is not None and layer_io.dataset_edition(parcels) == edition
+    assert layer_io.dataset_size(parcels) == 0
+    write('lakes')
+    assert layer_io.dataset_edition(parcels) != edition
+
+
+def test_unknown_edition_never_matches(tmp_path):
+    missing = str(tmp_path / 'missing.gdb' / 'parcels')
+    assert layer_io.dataset_edition(missing) is None
+    assert product_cache.edition(missing) != product_cache.edition(missing)
+
+
+def test_fingerprint_is_order_independent():
+    assert product_cache.fingerprint({'a': 1, 'b': '2'}) == product_cache.fingerprint({'b': '2', 'a': 1})
+    assert product_cache.fingerprint({'a': 1}) != product_cache.fingerprint({'a': 2})
+
+
+def test_product_cache_publishes_and_evicts(tmp_path, write_layer):
+    first = write_layer(str(tmp_path / 'private_20261016.gpkg' / 'private'), FIELDS, [(('a',), box(0, 0, 1, 1))])
+    second = str(tmp_path / 'private_20261017.gpkg' / 'private')
+    with product_cache.ProductCache(str(tmp_path / 'products.sqlite')) as cache:
+        assert not cache.publish('private', 'key', [second], '20261017')
+        cache.store('private', 'key', [first], '20261016')
+        assert cache.publish('private', 'key', [second], '20261017')
+        assert layer_io.count_features(second) == 1
+        assert not cache.publish('private', 'other key', [second], '20261017')
+        cache.conn.execute('UPDATE products SET used = ?, created = created - 1 WHERE datasets LIKE ?', (time.time() - 30 * 86400, '%20261016%'))
+        assert cache.evict() == [first]                                                     # the latest copy is always kept
+        assert not layer_io.dataset_exists(first) and layer_io.dataset_exists(second)
@@ -0,0 +1,73 @@
+import fiona
+from shapely.geometry import box
+import forest_stand_pipeline
+import layer_io
+from forest_stand_rules import Rule
+
+
+RULES = [Rule('Young Forest', [12, 13], max_age=20), Rule('Oak', [30]), Rule('Remove', [12, 13])]
+FIELDS = [('MN_CTYPE', 'LONG', None), ('STAND_AGE', 'LONG', None), ('SURVEY_YR', 'LONG', None)]
+
+# Stands along a row of unit squares; the two work areas cover x 0-4 and x 6-10
+STANDS = [((12, 5, 2020), box(0, 0, 1, 1)), ((12, 5, 2020), box(1, 0, 2, 1)), ((30, 50, 2000), box(2, 0, 3, 1)),
+          ((12, 80, 2000), box(3, 0, 4, 1)), ((99, 5, 2020), box(6, 0, 7, 1)), ((30, 5, 2020), box(7, 0, 8, 1)),
+          ((12, 5, 2020), box(3.5, 0, 6.5, 1))]                                              # straddles both work areas, so it is in neither
+AREAS = [box(0, -1, 4, 2), box(6, -1, 10, 2)]
+
+
+def _inventory(tmp_path, write_layer):
+    return write_layer(str(tmp_path / 'fsi.gpkg' / 'stands'), FIELDS, STANDS)
+
+
+def test_filter_stands_keeps_grouped_stands_within_a_work_area(tmp_path, write_layer):
+    stands = forest_stand_pipeline.filter_stands(_inventory(tmp_path, write_layer), AREAS, RULES, 2026)
+    assert sorted(stands.oids.tolist()) == [1, 2, 3, 6]                                     # 4 is removed, 5 is not in the rules, 7 crosses the gap
+    assert stands.counts() == {'Young Forest': 2, 'Oak': 2}
+    assert len(forest_stand_pipeline.filter_stands(_inventory(tmp_path, write_layer), [], RULES, 2026)) == 0
+
+
+def test_run_writes_only_the_dissolved_product(tmp_path, write_layer):
+    inventory = _inventory(tmp_path, write_layer)
+    areas = write_layer(str(tmp_path / 'areas.gpkg' / 'areas'), [('AREA_NAME', 'TEXT', 20)], [(('West',), AREAS[0]), (('East',), AREAS[1])])
+    target = str(tmp_path / 'out.gpkg' / 'dissolved')
+    stands = forest_stand_pipeline.run(inventory, areas, target, RULES, 2026, workers=1)
+    assert len(stands) == 4
+    assert fiona.listlayers(str(tmp_path / 'out.gpkg')) == ['dissolved']
+    dissolved = dict((values[0], geom) for _, values, geom in layer_io.read_features(target, ['Groupings']))
+    assert sorted(dissolved) == ['Oak', 'Young Forest']
+    assert dissolved['Young Forest'].equals(box(0, 0, 2, 1))
+    assert dissolved['Oak'].area == 2.0
+
+
+def test_shard_cache_evicts_other_editions(tmp_path):
+    with forest_stand_pipeline.ShardCache(str(tmp_path / 'shards.sqlite')) as cache:
+        cache.save('old', 'North', {'Aspen': (b'wkb', 3)}, '20261016', edition='1:100')
+        cache.save('new', 'North', {}, '20261017', edition='2:120')
+        assert cache.get('new') == {} and cache.get('missing') is None
+        assert cache.evict('2:120') == 1
+        assert cache.get('old') is None and cache.get('new') == {}
+
+
+def test_shard_key_changes_with_the_edition_and_rules():
+    key = forest_stand_pipeline.shard_key(AREAS[0], '1:100', RULES, 2026)
+    assert key == forest_stand_pipeline.shard_key(AREAS[0], '1:100', RULES, 2026)
+    assert key != forest_stand_pipeline.shard_key(AREAS[0], '2:100', RULES, 2026)
+    assert key != forest_stand_pipeline.shard_key(AREAS[0], '1:100', RULES[:2], 2026)
+    assert key != forest_stand_pipeline.shard_key(AREAS[1], '1:100', RULES, 2026)
+
+
+def test_run_sharded_reuses_cached_work_areas(tmp_path, write_layer, capsys):
+    inventory = _inventory(tmp_path, write_layer)
+    areas = write_layer(str(tmp_path / 'areas.gpkg' / 'areas'), [('AREA_NAME', 'TEXT', 20)], [(('West',), AREAS[0]), (('East',), AREAS[1])])
+    cache = str(tmp_path / 'shards.sqlite')
+    target = str(tmp_path / 'out.gpkg' / 'dissolved')
+    counts = forest_stand_pipeline.run_sharded(inventory, areas, target, RULES, 2026, cache, workers=1)
+    assert counts == {'Young Forest': 2, 'Oak': 2}
+    assert '2 work areas, 0 cached, 2 to process.' in capsys.readouterr().out
+    expected = dict((values[0], geom) for _, values, geom in layer_io.read_features(target, ['Groupings']))
+
+    layer_io.delete_dataset(target)
+    assert forest_stand_pipeline.run_sharded(inventory, areas, target, RULES, 2026, cache, workers=1) == counts
+    assert '2 work areas, 2 cached, 0 to process.' in capsys.readouterr().out
+    rerun = dict((values[0], geom) for _, values, geom in layer_io.read_features(target, ['Groupings']))
+    assert sorted(rerun) == sorted(expected) and all(rerun[g].equals(expected[g]) for g in expected)
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+from shapely.geometry import box
+import forest_stand_rules
+import layer_io
+from forest_stand_rules import Rule
+
+
+RULES = [Rule('Young Forest', [12, 13], max_age=20), Rule('Oak', [30]), Rule('Aspen', [12, 13], min_age=20)]
+
+
+def test_load_rules_keeps_the_table_order(tmp_path):
+    path = tmp_path / 'rules.csv'
+    path.write_text('Grouping,MN_CTYPE,MinAge,MaxAge\nYoung Forest,12 13,,20\n,,,\nOak,"30, 79",,\n')
+    rules = forest_stand_rules.load_rules(str(path))
+    assert [(r.grouping, r.ctypes, r.min_age, r.max_age) for r in rules] == [('Young Forest', [12, 13], None, 20), ('Oak', [30, 79], None, None)]
+    path.write_text('Grouping,MN_CTYPE,MinAge,MaxAge\nOak,,,\n')
+    with pytest.raises(ValueError):
+        forest_stand_rules.load_rules(str(path))
+
+
+def test_the_shipped_rule_table_loads():
+    rules = forest_stand_rules.load_rules()
+    assert rules and forest_stand_rules.prefilter(rules).startswith('MN_CTYPE IN (')
+
+
+def test_classify_uses_the_first_matching_rule():
+    ages = forest_stand_rules.stand_ages([5, 30, 10, 1], [2020, 2020, 0, 2020], 2026)
+    assert ages[:2].tolist() == [11, 36]
+    assert ages[2] == forest_stand_rules.UNKNOWN_AGE
+    groupings = forest_stand_rules.classify(np.array([12, 12, 30, 99]), np.array([11, 36, 50, 5]), RULES)
+    assert groupings.tolist() == ['Young Forest', 'Aspen', 'Oak', None]
+
+
+def test_build_groupings_carries_each_stand_its_own_values(tmp_path, write_layer):
+    fields = [('STAND_ID', 'TEXT', 10), ('MN_CTYPE', 'LONG', None), ('STAND_AGE', 'LONG', None), ('SURVEY_YR', 'LONG', None)]
+    stands = [('a', 12, 5, 2020), ('b', 99, 5, 2020), ('c', 30, 40, 2010), ('d', 12, 30, 2020), ('e', 13, 1, 2025)]
+    source = write_layer(str(tmp_path / 'fsi.gpkg' / 'stands'), fields, [(values, box(i, 0, i + 1, 1)) for i, values in enumerate(stands)])
+    target = str(tmp_path / 'out.gpkg' / 'reduced')
+    counts = forest_stand_rules.build_groupings(source, target, RULES, 2026)
+    assert counts == {'Young Forest': 2, 'Oak': 1, 'Aspen': 1}
+    copied = dict((values[0], values[1:]) for _, values, _ in layer_io.read_features(target, ['STAND_ID', 'Groupings', 'StangeAge'], geometry=False))
+    assert copied == {'a': ('Young Forest', 11), 'c': ('Oak', 56), 'd': ('Aspen', 36), 'e': ('Young Forest', 2)}
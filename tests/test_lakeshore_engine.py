@@ -0,0 +1,59 @@
+from shapely.geometry import box
+import lakeshore_engine
+from lakeshore_engine import LakeIndex
+
+
+# Lake '1' is a 10 x 10 square, and lake '2' is made of two features that share an edge
+def _index():
+    return LakeIndex(['1', '2', '2'], [box(0, 0, 10, 10), box(20, 0, 30, 10), box(30, 0, 40, 10)])
+
+
+def test_lake_ids():
+    assert lakeshore_engine.normalize_lake_id(18030800.0) == '18030800'
+    assert lakeshore_engine.normalize_lake_id(' 01006200 ') == '01006200'
+    assert lakeshore_engine.normalize_lake_id('  ') is None
+    assert list(lakeshore_engine.lake_id_expressions(['b', 'a', "o'k", 'a'], chunk_size=2)) == \
+        ["DOWLKNUM IN ('a', 'b')", "DOWLKNUM IN ('o''k')"]
+
+
+def test_lakes_are_read_by_id(tmp_path, write_layer):
+    lakes = write_layer(str(tmp_path / 'lakes.gpkg' / 'lakes'), [('DOWLKNUM', 'TEXT', 20)],
+                        [(('18030800',), box(0, 0, 10, 10)), (('01000200',), box(20, 0, 30, 10)), (('01000300',), box(50, 0, 60, 10))])
+    index, missing = LakeIndex.from_layer(lakes, [18030800.0, '01000200', '09999999', None], chunk_size=1)
+    assert sorted(index.lake_ids) == ['01000200', '18030800']
+    assert missing == ['09999999']
+
+
+def test_parcels_are_joined_to_every_lake_they_touch(tmp_path, write_layer):
+    parcels = write_layer(str(tmp_path / 'parcels.gpkg' / 'parcels'), [('PIN', 'TEXT', 20)],
+                          [(('a',), box(8, 2, 12, 6)), (('b',), box(12, 2, 14, 6)), (('c',), box(5, 8, 25, 12)), (('d',), box(100, 0, 101, 1))])
+    lakes_by_oid, perimeter_by_oid = lakeshore_engine.join_parcels_to_lakes(parcels, _index(), workers=1, chunk_size=2)
+    assert dict((oid, sorted(lakes)) for oid, lakes in lakes_by_oid.items()) == {1: ['1'], 3: ['1', '2']}
+    assert perimeter_by_oid == {1: 16.0, 3: 48.0}
+
+
+def test_frontage_is_the_shoreline_inside_each_parcel():
+    parcels = [box(8, 2, 12, 6),                                                            # 4 m along the east shore of lake 1
+               box(12, 2, 14, 6),                                                           # touches no lake
+               box(25, 8, 35, 12)]                                                          # across both features of lake 2
+    found = _index().join(parcels)
+    assert sorted(found) == [0, 2]
+    assert found[0] == {'1': 4.0}
+    assert list(found[2]) == ['2'] and abs(found[2]['2'] - 14.0) < 1e-9                    # 10 m of north shore, plus the 2 m of shared edge in each feature
+
+
+def test_frontage_tolerance():
+    parcel = [box(10.5, 2, 12, 6)]
+    assert _index().join(parcel) == {}
+    assert _index().frontage(parcel, [0], [0], tolerance=1.0)[0] > 0
+
+
+def test_frontage_metrics():
+    assert lakeshore_engine.frontage_metrics({'1': 4.0}, 16.0) == (4.0, 25.0)
+    assert lakeshore_engine.frontage_metrics({'1': 40.0}, 16.0) == (40.0, 100.0)            # capped at the whole perimeter
+    assert lakeshore_engine.frontage_metrics({}, 0.0) == (0, 0.0)
+
+
+def test_selection_values_list_the_lakes_and_frontage():
+    values = lakeshore_engine.selection_values({1: {'2': 3.0, '1': 1.0}}, {1: 16.0})
+    assert values == {1: ('2, 1', 4.0, 25.0)}                                      # the lakes in the order they were found
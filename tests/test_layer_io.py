@@ -0,0 +1,56 @@
+import os
+import pytest
+import shapely
+from shapely.geometry import box
+import layer_io
+
+
+FIELDS = [('PIN', 'TEXT', 20), ('Shape_Area', 'DOUBLE', None)]
+
+
+def _parcels(tmp_path, write_layer, name='parcels.gpkg/parcels'):
+    rows = [(('A', 1.0), box(0, 0, 1, 1)), (('B', 4.0), box(2, 0, 4, 2)), (('C', 9.0), box(5, 0, 8, 3))]
+    return write_layer(str(tmp_path / name), FIELDS, rows)
+
+
+def test_split_open_path():
+    assert layer_io.split_open_path(os.path.join('data', 'Parcels.gpkg', 'Parcel_Data')) == (os.path.join('data', 'Parcels.gpkg'), 'Parcel_Data', 'GPKG')
+    assert layer_io.split_open_path('/data/pls_sect.shp') == ('/data/pls_sect.shp', None, 'ESRI Shapefile')
+    assert layer_io.split_open_path('/data/ParcelProcessing.gdb/Input_Parcel_Data') is None
+    assert layer_io.split_open_path('Parcel_Data') is None
+
+
+def test_arcpy_paths_need_arcpy():
+    if layer_io.arcpy_runtime.available():
+        pytest.skip('arcpy is installed')
+    with pytest.raises(RuntimeError):
+        list(layer_io.read_features('Parcel_Data'))
+
+
+@pytest.mark.parametrize('name', ['parcels.gpkg/parcels', 'parcels.shp'])
+def test_read_features_wkb_and_envelopes_agree(tmp_path, write_layer, name):
+    path = _parcels(tmp_path, write_layer, name)
+    features = list(layer_io.read_features(path, ['PIN'], where="Shape_Area > 2"))
+    assert [values for _, values, _ in features] == [('B',), ('C',)]
+    raw = list(layer_io.read_wkb(path, ['PIN'], where="Shape_Area > 2"))
+    assert [(oid, values) for oid, values, _ in raw] == [(oid, values) for oid, values, _ in features]
+    assert all(shapely.from_wkb(blob).equals(geom) for (_, _, blob), (_, _, geom) in zip(raw, features))
+    oids, envelopes = layer_io.read_envelopes(path)
+    assert envelopes.tolist() == [[0, 0, 1, 1], [2, 0, 4, 2], [5, 0, 8, 3]]
+    assert len(oids) == 3 and layer_io.count_features(path) == 3 and layer_io.count_features(path, 'Shape_Area > 2') == 2
+
+
+def test_read_features_by_bbox(tmp_path, write_layer):
+    path = _parcels(tmp_path, write_layer)
+    assert [values for _, values, _ in layer_io.read_features(path, ['PIN'], bbox=(4.5, 0, 6, 1))] == [('C',)]
+
+
+def test_update_field_and_copy_with_field(tmp_path, write_layer):
+    path = _parcels(tmp_path, write_layer)
+    oids = dict((values[0], oid) for oid, values, _ in layer_io.read_features(path, ['PIN'], geometry=False))
+    target = str(tmp_path / 'copy.gpkg' / 'parcels_trs')
+    assert layer_io.copy_with_field(path, target, ('TRS', 'TEXT', 50), {oids['B']: 'T45N R12W S1'}, 'Shape_Area > 2') == 2
+    assert [values for _, values, _ in layer_io.read_features(target, ['PIN', 'TRS'], geometry=False)] == [('B', 'T45N R12W S1'), ('C', None)]
+    copied = dict((values[0], oid) for oid, values, _ in layer_io.read_features(target, ['PIN'], geometry=False))
+    assert layer_io.update_field(target, 'TRS', {copied['C']: 'T45N R12W S2'}) == 1
+    assert [values for _, values, _ in layer_io.read_features(target, ['TRS'], geometry=False)] == [('T45N R12W S1',), ('T45N R12W S2',)]
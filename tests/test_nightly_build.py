@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+import shapely
+import benchmark_data
+import layer_io
+import lakeshore_engine
+import nightly_build
+import ownership_classifier
+import proximity_selection
+import spreadsheet_loader
+import trs_spatial_join
+
+
+@pytest.fixture(scope='module')
+def data(tmp_path_factory):
+    return benchmark_data.generate(str(tmp_path_factory.mktemp('bench')), 1500, seed=3)
+
+
+@pytest.fixture
+def nightly(data, tmp_path, monkeypatch):
+    layers = data['layers']
+    settings = {'GDB': str(tmp_path / 'Nightly.gpkg'), 'AllParcels': layers['parcels'], 'Selector': layers['selector'],
+                'FN_Input': data['terms'], 'Public_Input': data['terms'], 'PLS_Section': layers['pls_sections'], 'Lakes': layers['lakes'],
+                'Lake_Input': data['lakes_workbook'], 'ForestStandInventory': layers['forest_stands'], 'WorkAreas': layers['work_areas'],
+                'Parcel_Snapshot': str(tmp_path / 'parcel_snapshot'), 'Scratch_Folder': str(tmp_path / 'Scratch'), 'Process_Workers': 1,
+                'Trace_Folder': None, 'Product_Cache': None, 'Tile_Pyramid': None, 'Selector_Distance': '300 meters',
+                'Products': {'first_nations': 'dissolve_first_nations', 'trs': 'trs_write', 'lakeshore': 'lakeshore_write'}}
+    for name, value in settings.items():
+        monkeypatch.setattr(nightly_build, name, value)
+    return nightly_build
+
+
+def _outputs(nightly):
+    return nightly.output_paths(nightly.GDB, nightly.today_full_str)
+
+
+def test_products_match_the_scripts(nightly, data):
+    parcels = data['layers']['parcels']
+    built = nightly.main()
+    outputs = _outputs(nightly)
+
+    # First Nations: the parcels near the Selector trails with a First Nations owner name
+    index = proximity_selection.SelectorIndex.from_layer(data['layers']['selector'])
+    nearby = proximity_selection.select_within_distance(parcels, index, '300 meters')
+    terms = [ownership_classifier.OwnershipClassifier(spreadsheet_loader.load_column(data['terms'], sheet, cache_dir=None)) for sheet in ('FN_Terms', 'Public_Terms')]
+    ownership = ownership_classifier.classify_ownership(parcels, terms[0], terms[1], exclusive=False)
+    expected = shapely.union_all([geom for oid, _, geom in layer_io.read_features(parcels) if oid in nearby & ownership['first_nations']])
+    dissolved = [geom for _, _, geom in layer_io.read_features(outputs['first_nations'])]
+    assert built['first_nations'] == 1 and shapely.symmetric_difference(dissolved[0], expected).area < 1e-6
+
+    # TRS: every parcel of at least the threshold, with every attribute field and its sections
+    where = 'Shape_Area >= {}'.format(nightly.TRS_Threshold)
+    values = trs_spatial_join.format_trs_field(trs_spatial_join.join_trs(parcels, data['layers']['pls_sections'], where), nightly.TRS_Field_Length)
+    pins = dict((oid, values_[0]) for oid, values_, _ in layer_io.read_features(parcels, ['PIN'], where, geometry=False))
+    written = dict((row[0], row[1:]) for _, row, _ in layer_io.read_features(outputs['trs'], ['PIN', 'OWNER_NAME', 'TRS'], geometry=False))
+    assert built['trs'] == len(pins) == len(written)
+    assert dict((pins[oid], value) for oid, value in values.items()) == dict((pin, row[1]) for pin, row in written.items() if row[1] is not None)
+
+    # Lakeshore: the parcels that touch a listed lake
+    lake_ids = spreadsheet_loader.load_column(data['lakes_workbook'], 'Test_Lakes', 2, normalize=lakeshore_engine.normalize_lake_id, cache_dir=None)
+    lakes, _ = lakeshore_engine.LakeIndex.from_layer(data['layers']['lakes'], lake_ids)
+    lakes_by_oid, _ = lakeshore_engine.join_parcels_to_lakes(parcels, lakes, workers=1)
+    assert built['lakeshore'] == len(lakes_by_oid) == layer_io.count_features(outputs['lakeshore'])
+
+
+def test_large_parcels_get_no_trs_field_value(nightly, data, monkeypatch):
+    areas = np.array([values[0] for _, values, _ in layer_io.read_features(data['layers']['parcels'], ['Shape_Area'], geometry=False)])
+    cap = float(np.percentile(areas[areas >= nightly.TRS_Threshold], 75))
+    monkeypatch.setattr(nightly, 'TRS_Area_Cap', cap)
+    monkeypatch.setattr(nightly, 'Products', {'trs': 'trs_write'})
+    nightly.main()
+    rows = [values for _, values, _ in layer_io.read_features(_outputs(nightly)['trs'], ['Shape_Area', 'TRS'], geometry=False)]
+    assert all(trs is None for area, trs in rows if area >= cap)                             # copied, but without a value cut short to fit the field
+    assert any(trs is not None for area, trs in rows if area < cap)
+
+
+def test_both_trs_outputs_report_both_counts(nightly, monkeypatch):
+    monkeypatch.setattr(nightly, 'TRS_Output', 'both')
+    monkeypatch.setattr(nightly, 'Products', {'trs': 'trs_write'})
+    features, rows = nightly.main()['trs']
+    outputs = _outputs(nightly)
+    assert features == layer_io.count_features(outputs['trs'])
+    assert rows == layer_io.count_features(outputs['trs_table']) and rows >= features
@@ -0,0 +1,66 @@
+import pytest
+import layer_io
+import ownership_classifier
+from ownership_classifier import OwnershipClassifier, classify_rows
+
+
+FIRST_NATIONS = ['RED LAKE BAND OF CHIPPEWA']
+PUBLIC = ['STATE OF MINNESOTA', 'US DEPARTMENT OF THE INTERIOR']
+
+ROWS = [(1, ('RED LAKE BAND OF CHIPPEWA', 'JOHN SMITH')),                                  # First Nations, with a private name
+        (2, ('RED LAKE BAND OF CHIPPEWA', 'STATE OF MINNESOTA')),                          # First Nations, with a public name
+        (3, ('STATE OF MINNESOTA', None)),                                                  # public
+        (4, ('JOHN SMITH', 'STATE OF MINNESOTA')),                                          # private wins over public
+        (5, (None, None))]                                                                  # unknown
+
+
+def _classify(exclusive):
+    return classify_rows(ROWS, OwnershipClassifier(FIRST_NATIONS), OwnershipClassifier(PUBLIC), exclusive)
+
+
+def test_exclusive_categories_follow_precedence():
+    result = _classify(True)
+    assert result == {'first_nations': {1, 2}, 'public': {3}, 'private': {4}, 'unknown': {5}}
+
+
+def test_overlapping_categories_keep_first_nations_parcels_with_private_owners():
+    result = _classify(False)
+    assert result == {'first_nations': {1, 2}, 'public': {3}, 'private': {1, 2, 4}, 'unknown': {5}}   # the band's name is not a public term either
+
+
+def test_normalize_name():
+    assert ownership_classifier.normalize_name('U.S. Dept. of the Interior') == 'US DEPARTMENT OF THE INTERIOR'
+    assert ownership_classifier.normalize_name("Mille Lacs Band's") == 'MILLE LACS BANDS'
+    assert ownership_classifier.normalize_name(None) == ''
+
+
+def test_match_modes():
+    exact = OwnershipClassifier(PUBLIC)
+    normalized = OwnershipClassifier(PUBLIC, match='normalized')
+    substring = OwnershipClassifier(PUBLIC, match='substring')
+    assert exact.matches('STATE OF MINNESOTA') and not exact.matches('State of Minn.')
+    assert normalized.matches('State of Minn.') and not normalized.matches('STATE OF MINNESOTA DNR')
+    assert substring.matches('STATE OF MINNESOTA DNR') and not substring.matches('ESTATE OF MINNESOTAN')
+    assert not exact.matches(None)
+
+
+def test_keyword_automaton_finds_whole_words():
+    automaton = ownership_classifier.KeywordAutomaton(['STATE', 'STATE OF MINNESOTA', 'DNR'])
+    assert automaton.search('STATE OF MINNESOTA DNR') == {'STATE', 'STATE OF MINNESOTA', 'DNR'}
+    assert automaton.search('ESTATE OF JOHN SMITH') == set()
+
+
+def test_select_matching_reads_one_pass(tmp_path, write_layer):
+    from shapely.geometry import box
+    parcels = write_layer(str(tmp_path / 'parcels.gpkg' / 'parcels'), [('OWNER_NAME', 'TEXT', 50), ('TAX_NAME', 'TEXT', 50)],
+                          [(values, box(i, 0, i + 1, 1)) for i, (_, values) in enumerate(ROWS)])
+    oids = [oid for oid, _, _ in layer_io.read_features(parcels, geometry=False)]
+    public = OwnershipClassifier(PUBLIC)
+    assert ownership_classifier.select_matching(parcels, public) == {oids[1], oids[2], oids[3]}
+    assert ownership_classifier.select_non_matching(parcels, public) == {oids[0], oids[1], oids[3]}
+    assert ownership_classifier.select_matching(parcels, public, within={oids[2]}) == {oids[2]}
+
+
+def test_unknown_match_mode():
+    with pytest.raises(ValueError):
+        OwnershipClassifier(PUBLIC, match='fuzzy')
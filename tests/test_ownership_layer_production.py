@@ -0,0 +1,24 @@
+import pytest
+import ownership_layer_production
+import product_cache
+
+
+# The index of built products is closed even when a stage fails
+def test_product_cache_is_closed_when_a_stage_fails(tmp_path, monkeypatch):
+    closed, ProductCache = [], product_cache.ProductCache
+
+    class RecordingCache(ProductCache):
+        def close(self):
+            closed.append(self.path)
+            ProductCache.close(self)
+
+    def failing_stage(tracer, cache):
+        raise RuntimeError('stage failed')
+
+    monkeypatch.setattr(product_cache, 'ProductCache', RecordingCache)
+    monkeypatch.setattr(ownership_layer_production, 'Product_Cache', str(tmp_path / 'product_cache.sqlite'))
+    monkeypatch.setattr(ownership_layer_production, 'Trace_Folder', None)
+    monkeypatch.setattr(ownership_layer_production, 'produce_layers', failing_stage)
+    with pytest.raises(RuntimeError, match='stage failed'):
+        ownership_layer_production.main()
+    assert closed == [str(tmp_path / 'product_cache.sqlite')]
@@ -0,0 +1,57 @@
+import pickle
+import numpy as np
+from shapely.geometry import box
+import layer_io
+import parcel_snapshot
+
+
+FIELDS = [('OWNER_NAME', 'TEXT', 80), ('TAX_NAME', 'TEXT', 80)]
+ROWS = [(('SMITH JOHN', 'SMITH JOHN'), box(0, 0, 10, 10)),
+        (('STATE OF MINNESOTA', None), box(20, 0, 40, 10)),
+        (('SMITH JOHN', 'COUNTY'), box(0, 20, 10, 50))]
+
+
+def test_build_writes_the_columns(tmp_path, write_layer):
+    source = write_layer(str(tmp_path / 'parcels.gpkg' / 'parcels'), FIELDS, ROWS)
+    snapshot = parcel_snapshot.build(source, str(tmp_path / 'snapshot'))
+    assert len(snapshot) == 3
+    assert snapshot.areas.tolist() == [100.0, 200.0, 300.0]
+    assert snapshot.envelopes[1].tolist() == [20.0, 0.0, 40.0, 10.0]
+    assert snapshot.values('OWNER_NAME') == ['SMITH JOHN', 'STATE OF MINNESOTA']
+    assert snapshot.codes('TAX_NAME')[1] == -1                                              # <Null>
+    assert snapshot.matching('OWNER_NAME', ['SMITH JOHN']).tolist() == [True, False, True]
+    assert snapshot.within_bbox((15, 0, 16, 100)).tolist() == []
+    oid = int(snapshot.oids[2])
+    assert snapshot.positions([oid]).tolist() == [2]
+    assert [geom.area for _, geom in snapshot.iter_features([2, 0], chunk_size=1)] == [300.0, 100.0]
+    assert pickle.loads(pickle.dumps(snapshot)).oids.tolist() == snapshot.oids.tolist()
+
+
+def test_ensure_rebuilds_only_when_the_parcels_change(tmp_path, write_layer, capsys):
+    source = write_layer(str(tmp_path / 'parcels.gpkg' / 'parcels'), FIELDS, ROWS)
+    folder = str(tmp_path / 'snapshot')
+    parcel_snapshot.ensure(source, folder)
+    assert 'written' in capsys.readouterr().out
+    assert len(parcel_snapshot.ensure(source, folder)) == 3
+    assert 'written' not in capsys.readouterr().out
+    write_layer(source, FIELDS, ROWS[:2])
+    assert len(parcel_snapshot.ensure(source, folder)) == 2
+    assert not parcel_snapshot.is_current(folder, source, ['OWNER_NAME', 'OTHER'])
+
+
+def test_an_unknown_edition_reuses_the_snapshot(tmp_path, write_layer, monkeypatch, capsys):
+    source = write_layer(str(tmp_path / 'parcels.gpkg' / 'parcels'), FIELDS, ROWS)
+    folder = str(tmp_path / 'snapshot')
+    parcel_snapshot.ensure(source, folder)
+    write_layer(source, FIELDS, ROWS[:1])
+    monkeypatch.setattr(layer_io, 'dataset_edition', lambda path: None)
+    capsys.readouterr()
+    assert len(parcel_snapshot.ensure(source, folder)) == 3                                 # the snapshot is not rebuilt on every run
+    assert 'Warning' in capsys.readouterr().out
+    assert len(parcel_snapshot.ensure(source, folder, rebuild=True)) == 1
+
+
+def test_empty_layer(tmp_path, write_layer):
+    source = write_layer(str(tmp_path / 'parcels.gpkg' / 'parcels'), FIELDS, [])
+    snapshot = parcel_snapshot.build(source, str(tmp_path / 'snapshot'))
+    assert len(snapshot) == 0 and np.asarray(snapshot.geometries()).size == 0
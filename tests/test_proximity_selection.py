@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+import shapely
+from shapely.geometry import LineString, box
+import proximity_selection
+from proximity_selection import SelectorIndex
+
+
+# A winding trail and a polygon selector; parcels on a grid of 10 x 10 squares
+TRAIL = LineString([(0, 0), (100, 0), (100, 100)])
+LAKE = box(200, 200, 240, 240)
+PARCELS = [box(x, y, x + 10, y + 10) for x in range(-50, 300, 15) for y in range(-50, 300, 15)]
+
+
+def test_parse_distance_units():
+    assert proximity_selection.parse_distance('2 kilometers') == 2000.0
+    assert proximity_selection.parse_distance('100 feet') == pytest.approx(30.48)
+    assert proximity_selection.parse_distance('250') == 250.0
+    assert proximity_selection.parse_distance(75) == 75.0
+    assert proximity_selection.parse_distance('2 km', ('Meter', 1.0)) == 2000.0
+    with pytest.raises(ValueError):
+        proximity_selection.parse_distance('2 furlongs')
+    with pytest.raises(ValueError):                                                         # a layer in feet would be queried with a distance in meters
+        proximity_selection.parse_distance('2 km', ('Foot_US', 0.3048006096012192))
+    with pytest.raises(ValueError):
+        proximity_selection.parse_distance('2 km', ('degree', None))
+
+
+def test_trails_are_indexed_by_segment():
+    index = SelectorIndex([TRAIL, LAKE], ['Trail', 'Lake'])
+    assert len(index) == 2
+    assert len(index.pieces) == 3                                                           # two trail segments and the lake polygon
+    assert index.owners.tolist() == [0, 0, 1]
+    assert index.positions(['Lake']) == [1]
+
+
+def test_prefilter_keeps_every_parcel_within_the_distance():
+    index = SelectorIndex([TRAIL, LAKE])
+    envelopes = shapely.bounds(np.asarray(PARCELS, dtype=object))
+    keep = proximity_selection.bbox_prefilter(envelopes, index.envelopes, 20.0, block_size=1)
+    near = np.array([min(TRAIL.distance(p), LAKE.distance(p)) <= 20.0 for p in PARCELS])
+    assert keep[near].all()                                                                 # never drops a parcel that is close enough
+    assert not keep.all()
+
+
+def test_selection_matches_a_brute_force_distance_check(tmp_path, write_layer):
+    rows = [((str(i),), geom) for i, geom in enumerate(PARCELS)]
+    parcels = write_layer(str(tmp_path / 'parcels.gpkg' / 'parcels'), [('PIN', 'TEXT', 20)], rows)
+    index = SelectorIndex([TRAIL, LAKE])
+    expected = set(oid for oid, geom in enumerate(PARCELS, start=1) if min(TRAIL.distance(geom), LAKE.distance(geom)) <= 20.0)
+    assert expected
+    assert proximity_selection.select_within_distance(parcels, index, '20 meters') == expected
+    oids = np.arange(1, len(PARCELS) + 1)
+    assert proximity_selection.select_geometries(oids, PARCELS, index, 20.0) == expected
+
+
+def test_a_parcel_inside_a_polygon_selector_is_selected():
+    index = SelectorIndex([box(0, 0, 1000, 1000)])
+    assert proximity_selection.select_geometries(np.array([7]), [box(400, 400, 410, 410)], index, 1.0) == {7}
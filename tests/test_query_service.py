@@ -0,0 +1,60 @@
+import os,threading
+import pytest
+import benchmark_data
+import layer_io
+import parcel_snapshot
+import proximity_selection
+import query_service
+
+
+@pytest.fixture(scope='module')
+def data(tmp_path_factory):
+    return benchmark_data.generate(str(tmp_path_factory.mktemp('bench')), 500, seed=5)
+
+
+@pytest.fixture
+def server(data, tmp_path, monkeypatch):
+    layers = data['layers']
+    monkeypatch.setattr(query_service, 'Snapshot_Folder', str(tmp_path / 'snapshots'))
+    sources = {'parcels': layers['parcels'], 'sections': layers['pls_sections'], 'selector': layers['selector'],
+               'lakes': layers['lakes'], 'stands': layers['forest_stands']}
+    server = query_service.QueryServer(('127.0.0.1', 0), sources)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _client(server):
+    return query_service.QueryClient('127.0.0.1', server.server_address[1])
+
+
+def test_lookups_over_http(server, data):
+    client = _client(server)
+    near = client.near(distance='300 meters')
+    snapshot = parcel_snapshot.ParcelSnapshot(server.indexes.snapshot_path)
+    index = proximity_selection.SelectorIndex.from_layer(data['layers']['selector'], query_service.Selector_Where)
+    assert near['parcels'] == sorted(proximity_selection.select_snapshot(snapshot, index, '300 meters'))
+    assert client.near(distance='0.3 kilometers')['parcels'] == near['parcels']
+    parcel = near['parcels'][0]
+    assert client.trs(parcel)['sections'] == server.indexes.trs(parcel)
+    assert client.status()['parcels'] == layer_io.count_features(data['layers']['parcels'])
+    with pytest.raises(LookupError):
+        client.trs(10 ** 9)
+    with pytest.raises(ValueError):
+        client.near(distance='far')
+
+
+def test_a_replaced_snapshot_is_kept_while_a_request_uses_it(server):
+    client = _client(server)
+    old = server.acquire()                                                                  # a request still answering from the first edition
+    editions = dict(old.editions, parcels='next release')
+    assert server.reload(force=True, editions=editions)
+    assert server.indexes.snapshot_path != old.snapshot_path
+    assert os.path.isdir(old.snapshot_path) and len(old.parcels.geometries([0])) == 1
+    assert client.status()['editions']['parcels'] == 'next release'                         # new requests use the new edition
+    assert os.path.isdir(old.snapshot_path)
+    path, old = old.snapshot_path, None
+    server.release(path)
+    assert not os.path.exists(path) and os.path.isdir(server.indexes.snapshot_path)
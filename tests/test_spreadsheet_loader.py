@@ -0,0 +1,59 @@
+import os
+import openpyxl
+import pytest
+import lakeshore_engine
+import spreadsheet_loader
+
+
+def _workbook(path, sheet, rows):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = sheet
+    for row in rows:
+        ws.append(row)
+    wb.save(str(path))
+    return str(path)
+
+
+def test_columns_by_header_number_or_first(tmp_path):
+    path = _workbook(tmp_path / 'terms.xlsx', 'Terms', [('Terms', 'Notes'), (' STATE OF MN ', 'a'), ('COUNTY', None), (None, 'b'), ('COUNTY', 'c')])
+    assert spreadsheet_loader.load_column(path, 'Terms', cache_dir=None) == ['STATE OF MN', 'COUNTY']
+    assert spreadsheet_loader.load_column(path, 'Terms', 'Terms', cache_dir=None) == ['STATE OF MN', 'COUNTY']
+    assert spreadsheet_loader.load_column(path, 'Terms', 2, cache_dir=None) == ['a', 'b', 'c']
+    with pytest.raises(ValueError):
+        spreadsheet_loader.load_column(path, 'Terms', 'Keywords', cache_dir=None)
+
+
+def test_lake_ids_are_read_from_column_b_whatever_its_header(tmp_path):
+    path = _workbook(tmp_path / 'lakes.xlsx', 'Test_Lakes', [('Name', 'Lake Number'), ('Lake A', 18030800.0), ('Lake B', '01006200 '), ('Lake A', 18030800)])
+    ids = spreadsheet_loader.load_column(path, 'Test_Lakes', 2, normalize=lakeshore_engine.normalize_lake_id, cache_dir=None)
+    assert ids == ['18030800', '01006200']
+
+
+def test_the_cache_is_used_until_the_workbook_changes(tmp_path, monkeypatch):
+    path = _workbook(tmp_path / 'terms.xlsx', 'Terms', [('Terms',), ('A',), ('B',)])
+    cache_dir = str(tmp_path / 'cache')
+    assert spreadsheet_loader.load_column(path, 'Terms', cache_dir=cache_dir) == ['A', 'B']
+    assert len(os.listdir(cache_dir)) == 1
+
+    opened = []
+    monkeypatch.setattr(spreadsheet_loader, 'read_column', lambda *args: opened.append(args) or [])
+    assert spreadsheet_loader.load_column(path, 'Terms', cache_dir=cache_dir) == ['A', 'B']
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + 10))                                     # touched but not changed
+    assert spreadsheet_loader.load_column(path, 'Terms', cache_dir=cache_dir) == ['A', 'B']
+    assert opened == []
+    monkeypatch.undo()
+
+    _workbook(tmp_path / 'terms.xlsx', 'Terms', [('Terms',), ('C',)])
+    assert spreadsheet_loader.load_column(path, 'Terms', cache_dir=cache_dir) == ['C']
+
+
+def test_a_damaged_cache_is_rebuilt(tmp_path):
+    path = _workbook(tmp_path / 'terms.xlsx', 'Terms', [('Terms',), ('A',)])
+    cache_dir = str(tmp_path / 'cache')
+    spreadsheet_loader.load_column(path, 'Terms', cache_dir=cache_dir)
+    for name in os.listdir(cache_dir):
+        with open(os.path.join(cache_dir, name), 'w') as f:
+            f.write('{not json')
+    assert spreadsheet_loader.load_column(path, 'Terms', cache_dir=cache_dir) == ['A']
@@ -0,0 +1,49 @@
+import pytest
+from stage_graph import StageGraph
+
+
+def _graph():
+    graph = StageGraph()
+    graph.add('read', lambda: [1, 2, 3])
+    graph.add('double', lambda values: [v * 2 for v in values], ['read'])
+    graph.add('total', lambda values: sum(values), ['double'])
+    graph.add('count', lambda values: len(values), ['read'])
+    return graph
+
+
+def test_order_and_levels():
+    graph = _graph()
+    assert graph.order(['total']) == ['read', 'double', 'total']
+    assert graph.levels() == [['read'], ['double', 'count'], ['total']]
+
+
+def test_run_returns_the_targets():
+    assert _graph().run(['total', 'count']) == {'total': 12, 'count': 3}
+    assert _graph().run(['total'], workers=1) == {'total': 12}
+
+
+def test_cycle_is_reported():
+    graph = StageGraph()
+    graph.add('a', lambda b: b, ['b'])
+    graph.add('b', lambda a: a, ['a'])
+    with pytest.raises(ValueError, match='cycle'):
+        graph.order()
+
+
+def test_unknown_input_and_duplicate_stage():
+    graph = StageGraph()
+    graph.add('a', lambda missing: missing, ['missing'])
+    with pytest.raises(ValueError, match="Unknown stage 'missing'"):
+        graph.run()
+    with pytest.raises(ValueError):
+        graph.add('a', lambda: None)
+
+
+def test_failed_stage_raises_and_stops_its_consumers():
+    ran = []
+    graph = StageGraph()
+    graph.add('read', lambda: 1 / 0)
+    graph.add('write', lambda value: ran.append(value), ['read'])
+    with pytest.raises(ZeroDivisionError):
+        graph.run()
+    assert ran == []
@@ -0,0 +1,74 @@
+import json
+import os
+import sys
+import threading
+import stage_tracing
+
+
+def test_spans_are_nested_and_written_to_the_trace(tmp_path, capsys):
+    tracer = stage_tracing.Tracer('parcels', str(tmp_path / 'Traces'))
+    with tracer.stage('read', features_in=10) as read:
+        inner = tracer.start('parse')
+        inner.end(features_out=8)
+        read.features_out = 8
+    tracer.start('left_open')
+    trace = tracer.finish()
+
+    assert [s['stage'] for s in trace['stages']] == ['read', 'parse', 'left_open']       # in the order they started
+    stages = dict((s['stage'], s) for s in trace['stages'])
+    assert stages['parse']['parent'] == 'read' and stages['read']['parent'] is None
+    assert (stages['read']['features_in'], stages['read']['features_out']) == (10, 8)
+    for record in trace['stages']:
+        assert record['seconds'] >= 0 and record['cpu_seconds'] >= 0
+        assert record['peak_memory_scope'] in ('stage', 'process')
+    if sys.platform.startswith('linux'):
+        assert stages['read']['peak_memory_mb'] > 0 and stages['read']['memory_delta_mb'] is not None
+    with open(tracer.trace_path) as f:
+        assert json.load(f)['stages'] == trace['stages']
+    out = capsys.readouterr().out
+    assert '[read]' in out and 'features 10 in / 8 out' in out and 'parcels took' in out
+
+
+def test_without_a_trace_folder_nothing_is_written(tmp_path):
+    tracer = stage_tracing.Tracer('parcels', echo=False)
+    tracer.start('read').end()
+    assert tracer.finish()['product'] == 'parcels' and tracer.trace_path is None
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_profiled_and_memory_traced_stages(tmp_path):
+    tracer = stage_tracing.Tracer('parcels', str(tmp_path), profile=['classify'], memory=['*'], echo=False)
+    with tracer.stage('classify'):
+        data = [str(i) * 10 for i in range(20000)]
+    trace = tracer.finish()
+    record = trace['stages'][0]
+    assert record['hot_paths'] and record['allocation_sites'] and record['traced_peak_mb'] > 0
+    assert os.path.exists(os.path.splitext(tracer.trace_path)[0] + '_classify.prof')
+    assert len(data) == 20000
+
+
+def test_progress_is_throttled(capsys):
+    tracer = stage_tracing.Tracer('parcels', progress_interval=3600, echo=False)
+    span = tracer.start('copy')
+    for done in range(1, 101):
+        span.progress(done, 100)
+    span.end()
+    lines = capsys.readouterr().out.splitlines()
+    assert lines == [line for line in lines if 'copy: 100 of 100 (100%)' in line] and len(lines) == 1   # only the last row is reported
+
+
+def test_concurrent_spans_have_their_own_parents():
+    tracer = stage_tracing.Tracer('nightly', concurrent=True, echo=False)
+    outer = tracer.start('graph')
+    done = []
+
+    def stage():
+        tracer.start('in_thread').end()
+        done.append(True)
+
+    thread = threading.Thread(target=stage)
+    thread.start()
+    thread.join()
+    outer.end()
+    stages = dict((s['stage'], s) for s in tracer.finish()['stages'])
+    assert done and stages['in_thread']['parent'] is None                                   # a span in another thread does not nest under 'graph'
@@ -0,0 +1,65 @@
+import os
+import pytest
+from shapely.geometry import box
+import arcpy_runtime
+import layer_io
+import streaming_writer
+from streaming_writer import StreamingWriter
+
+
+FIELDS = [('PIN', 'TEXT', 20), ('Shape_Area', 'DOUBLE', None)]
+
+
+def _rows(count):
+    for i in range(count):
+        yield ('P{}'.format(i), float(i)), box(i, 0, i + 1, 1)
+
+
+def test_streamed_rows_are_all_written_with_a_bounded_queue(tmp_path):
+    target = str(tmp_path / 'out.gpkg' / 'parcels')
+    with StreamingWriter(target, FIELDS, 'Polygon', batch_size=7, queue_batches=2) as writer:
+        for values, geom in _rows(250):
+            writer.write(values, geom)
+            assert writer._queue.qsize() <= 2                                               # the producer waits rather than piling up batches
+    assert writer.written == 250
+    rows = list(layer_io.read_features(target, ['PIN', 'Shape_Area']))
+    assert len(rows) == 250 and rows[-1][1] == ('P249', 249.0) and rows[-1][2].equals(box(249, 0, 250, 1))
+
+
+def test_write_stream_and_copy_features(tmp_path, write_layer):
+    source = write_layer(str(tmp_path / 'in.gpkg' / 'parcels'), FIELDS, list(_rows(20)))
+    assert streaming_writer.write_stream(str(tmp_path / 'all.gpkg' / 'parcels'), FIELDS, _rows(5), 'Polygon', batch_size=2) == 5
+    target = str(tmp_path / 'copy.gpkg' / 'parcels')
+    assert streaming_writer.copy_features(source, target, where='Shape_Area >= 10', oids={11, 12, 13, 1}, batch_size=2) == 3
+    assert sorted(values[0] for _, values, _ in layer_io.read_features(target, ['PIN'], geometry=False)) == ['P10', 'P11', 'P12']
+    same = str(tmp_path / 'in.gpkg' / 'copy')                                               # a copy into the GeoPackage it is read from
+    assert streaming_writer.copy_features(source, same, batch_size=4) == 20
+
+
+def test_geodatabase_targets_fall_back_without_arcpy(tmp_path):
+    if arcpy_runtime.available():
+        pytest.skip('arcpy writes geodatabase targets itself')
+    gdb = os.path.join(str(tmp_path), 'Parcels.gdb')
+    assert streaming_writer.output_path(os.path.join(gdb, 'Parcel_Selection')) == os.path.join(str(tmp_path), 'Parcels.gpkg', 'Parcel_Selection')
+    assert streaming_writer.output_path(os.path.join(gdb, 'Parcel_Selection'), '.fgb') == os.path.join(str(tmp_path), 'Parcel_Selection.fgb')
+    with pytest.raises(ValueError):
+        streaming_writer.output_path(os.path.join(gdb, 'Parcel_Selection'), '.shp')
+    assert streaming_writer.write_stream(os.path.join(gdb, 'Parcel_Selection'), FIELDS, _rows(3), 'Polygon') == 3
+    assert layer_io.count_features(os.path.join(str(tmp_path), 'Parcels.gpkg', 'Parcel_Selection')) == 3
+
+
+def test_a_producer_error_is_kept(tmp_path):
+    target = str(tmp_path / 'out.gpkg' / 'parcels')
+    with pytest.raises(KeyError):
+        with StreamingWriter(target, FIELDS, 'Polygon', batch_size=2) as writer:
+            writer.write_many(_rows(5))
+            raise KeyError('producer')
+
+
+def test_a_writer_error_is_raised_in_the_producer(tmp_path):
+    target = str(tmp_path / 'out.gpkg' / 'parcels')
+    with pytest.raises(RuntimeError, match='Writing'):
+        with StreamingWriter(target, FIELDS, 'Polygon', batch_size=1, queue_batches=1) as writer:
+            writer.write(('P1', 1.0), 'not a geometry')
+            for values, geom in _rows(50):
+                writer.write(values, geom)
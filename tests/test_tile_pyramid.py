@@ -0,0 +1,56 @@
+import gzip,sqlite3
+import numpy as np
+import pyproj
+import mapbox_vector_tile
+from shapely.geometry import box, Polygon
+import tile_pyramid
+
+
+FIELDS = [('Groupings', 'TEXT', 50), ('Acres', 'DOUBLE', None)]
+NORTH = box(480000, 5000000, 482000, 5002000)                                              # UTM zone 15N, about 45 km apart
+SOUTH = box(480000, 4955000, 482000, 4957000)
+
+
+def _tiles(path):
+    with sqlite3.connect(path) as conn:
+        return dict(((z, x, 2 ** z - 1 - row), data) for z, x, row, data in conn.execute('SELECT zoom_level, tile_column, tile_row, tile_data FROM tiles'))
+
+
+def test_projection_matches_pyproj():
+    project = tile_pyramid.mercator_projection(tile_pyramid.coordinate_system(pyproj.CRS.from_epsg(26915).to_wkt()))
+    x, y = pyproj.Transformer.from_crs(26915, 3857, always_xy=True).transform(480000, 5000000)
+    assert np.allclose(project(np.array([[480000.0, 5000000.0]])), [[x, y]])
+
+
+def test_encoded_tile_decodes():
+    square = Polygon([(100, 100), (100, 1000), (1000, 1000), (1000, 100)])
+    hole = Polygon([(2000, 2000), (3000, 2000), (3000, 3000), (2000, 3000)], [[(2400, 2400), (2600, 2400), (2600, 2600), (2400, 2600)]])
+    data = tile_pyramid.encode_tile({'forest': [(1, {'Groupings': 'Aspen', 'Acres': 2.5, 'Note': None}, [square, hole])]})
+    layer = mapbox_vector_tile.decode(data, default_options={'y_coord_down': True})['forest']
+    assert layer['extent'] == tile_pyramid.EXTENT
+    feature, = layer['features']
+    assert feature['id'] == 1 and feature['properties'] == {'Groupings': 'Aspen', 'Acres': 2.5}
+    assert feature['geometry']['type'] == 'MultiPolygon' and len(feature['geometry']['coordinates'][1]) == 2
+    assert tile_pyramid.encode_tile({'forest': [(1, {}, [Polygon([(0, 0), (0.2, 0), (0.2, 0.2)])])]}) is None   # collapses on the grid
+
+
+def test_only_the_tiles_under_changed_parts_are_rendered(tmp_path, write_layer):
+    layer = str(tmp_path / 'forest.gpkg' / 'forest')
+    target = str(tmp_path / 'tiles.mbtiles')
+    write_layer(layer, FIELDS, [(('Aspen', 1.0), NORTH), (('Oak', 2.0), SOUTH)])
+    first, changed = tile_pyramid.build_pyramid({'forest': layer}, target, 8, 10, workers=1, epsg=26915)
+    assert first > 0 and changed == {'forest'}
+    before = _tiles(target)
+    assert tile_pyramid.build_pyramid({'forest': layer}, target, 8, 10, workers=1, epsg=26915) == (0, set())
+    write_layer(layer, FIELDS, [(('Aspen', 1.0), NORTH), (('Maple', 2.0), SOUTH)])
+    rendered, changed = tile_pyramid.build_pyramid({'forest': layer}, target, 8, 10, workers=1, epsg=26915)
+    assert 0 < rendered < first and changed == {'forest'}
+    after = _tiles(target)
+    south = tile_pyramid.mercator_projection(26915)(np.array(SOUTH.bounds).reshape(2, 2)).ravel()
+    redrawn = set(tile for tile in after if after[tile] != before[tile])
+    assert redrawn and all((x, y) in tile_pyramid.tiles_covering(south, z) for z, x, y in redrawn)
+    names = [f['properties']['Groupings'] for data in after.values() for f in mapbox_vector_tile.decode(gzip.decompress(data))['forest']['features']]
+    assert 'Maple' in names and 'Oak' not in names
+    write_layer(layer, FIELDS, [])
+    tile_pyramid.build_pyramid({'forest': layer}, target, 8, 10, workers=1, epsg=26915)
+    assert _tiles(target) == {}
@@ -0,0 +1,63 @@
+import os
+import shapely
+from shapely.geometry import Polygon, box
+import layer_io
+import tiled_dissolve
+
+
+# A grid of overlapping squares in two groups, so the tiles must be stitched back together
+def _features():
+    features = []
+    for i in range(8):
+        for j in range(8):
+            features.append((('A' if (i + j) % 3 else 'B',), box(i, j, i + 1.5, j + 1.5)))
+    return features
+
+
+def test_tiled_dissolve_matches_a_single_union():
+    features = _features()
+    dissolved = tiled_dissolve.dissolve_features(iter(features), workers=1, features_per_tile=4)
+    assert sorted(dissolved) == [('A',), ('B',)]
+    for key, geometry in dissolved.items():
+        expected = shapely.union_all([geom for values, geom in features if values == key])
+        assert geometry.geom_type == 'MultiPolygon'
+        assert abs(geometry.area - expected.area) < 1e-9
+        assert shapely.symmetric_difference(geometry, expected).area < 1e-9
+
+
+def test_tiled_dissolve_without_features():
+    assert tiled_dissolve.dissolve_features(iter([]), workers=1) == {}
+
+
+# Unit squares that share their edges and surround a 2 x 2 hole (group A), and a polygon with its own hole (group B)
+def _ring_features():
+    features = [(('A',), box(i, j, i + 1, j + 1)) for i in range(6) for j in range(6) if not (2 <= i < 4 and 2 <= j < 4)]
+    features.append((('B',), Polygon([(10, 0), (16, 0), (16, 6), (10, 6)], [[(12, 2), (14, 2), (14, 4), (12, 4)]])))
+    features.append((('B',), box(16, 0, 18, 6)))                                           # shares an edge with the polygon with a hole
+    return features
+
+
+def test_tiled_dissolve_keeps_shared_edges_and_holes(tmp_path, write_layer):
+    features = _ring_features()
+    source = write_layer(str(tmp_path / 'input.gpkg' / 'parcels'), [('GROUP_ID', 'TEXT', 5)], features)
+    target = str(tmp_path / 'output.gpkg' / 'dissolved')
+    spill_dir = str(tmp_path / 'scratch')
+    assert tiled_dissolve.dissolve_to(source, target, ['GROUP_ID'], workers=1, spill_dir=spill_dir) == 2
+    assert os.listdir(spill_dir) == []                                                      # the spill files are removed
+    dissolved = dict((values, geom) for _, values, geom in layer_io.read_features(target, ['GROUP_ID']))
+    for key in [('A',), ('B',)]:
+        expected = shapely.union_all([geom for values, geom in features if values == key])
+        geometry = dissolved[key]
+        assert geometry.geom_type == 'MultiPolygon' and len(geometry.geoms) == 1            # the shared edges are dissolved away
+        assert len(geometry.geoms[0].interiors) == 1                                        # and the hole is kept
+        assert shapely.symmetric_difference(geometry, expected).area < 1e-9
+    assert dissolved[('A',)].area == 32.0
+    assert dissolved[('B',)].area == 44.0
+
+
+def test_tiled_dissolve_with_tiles_smaller_than_the_hole():
+    features = _ring_features()
+    dissolved = tiled_dissolve.dissolve_features(iter(features), workers=1, features_per_tile=1)
+    expected = shapely.union_all([geom for values, geom in features if values == ('A',)])
+    assert len(dissolved[('A',)].geoms[0].interiors) == 1
+    assert shapely.symmetric_difference(dissolved[('A',)], expected).area < 1e-9
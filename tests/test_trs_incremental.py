@@ -0,0 +1,82 @@
+import pytest
+from shapely.geometry import box, Polygon
+import trs_incremental
+
+
+SECTION_FIELDS = [('TRS_SEARCH', 'TEXT', 50)]
+PARCEL_FIELDS = [('PIN', 'TEXT', 20), ('Shape_Area', 'DOUBLE', None)]
+
+
+def _sections(tmp_path, write_layer):
+    rows = [(('T45N R12W S{}'.format(n),), box(x, 0, x + 10, 10)) for n, x in ((1, 0), (2, 10), (3, 20))]
+    return write_layer(str(tmp_path / 'pls.gpkg' / 'sections'), SECTION_FIELDS, rows)
+
+
+def test_refresh_reuses_unchanged_parcels(tmp_path, write_layer):
+    sections = _sections(tmp_path, write_layer)
+    parcels = str(tmp_path / 'parcels.gpkg' / 'parcels')
+    store = str(tmp_path / 'trs.sqlite')
+    write_layer(parcels, PARCEL_FIELDS, [(('A', 1.0), box(1, 1, 2, 2)), (('B', 4.0), box(8, 1, 12, 2)), (('C', 1.0), box(21, 1, 22, 2))])
+
+    trs, stats = trs_incremental.refresh_trs(parcels, sections, store)
+    assert stats == {'added': 3, 'modified': 0, 'unchanged': 0, 'removed': 0}
+    assert sorted(trs.values()) == [['T45N R12W S1'], ['T45N R12W S1', 'T45N R12W S2'], ['T45N R12W S3']]
+
+    # The same parcels again: every TRS string comes from the store
+    assert trs_incremental.refresh_trs(parcels, sections, store) == (trs, {'added': 0, 'modified': 0, 'unchanged': 3, 'removed': 0})
+
+    # 'A' keeps its shape but starts its ring elsewhere, 'B' moves into section 2, 'C' is removed, and 'D' is added
+    write_layer(parcels, PARCEL_FIELDS, [(('A', 1.0), Polygon([(2, 2), (1, 2), (1, 1), (2, 1)])), (('B', 1.0), box(11, 1, 12, 2)),
+                                         (('D', 1.0), box(25, 1, 26, 2))])
+    trs, stats = trs_incremental.refresh_trs(parcels, sections, store)
+    assert stats == {'added': 1, 'modified': 1, 'unchanged': 1, 'removed': 1}
+    assert sorted(trs.values()) == [['T45N R12W S1'], ['T45N R12W S2'], ['T45N R12W S3']]
+    with trs_incremental.FingerprintStore(store) as fingerprints:
+        assert sorted(fingerprints.load()) == ['A', 'B', 'D']
+
+
+def test_new_sections_invalidate_the_store(tmp_path, write_layer):
+    sections = _sections(tmp_path, write_layer)
+    parcels = write_layer(str(tmp_path / 'parcels.gpkg' / 'parcels'), PARCEL_FIELDS, [(('A', 1.0), box(1, 1, 2, 2))])
+    store = str(tmp_path / 'trs.sqlite')
+    trs_incremental.refresh_trs(parcels, sections, store)
+    write_layer(sections, SECTION_FIELDS, [(('T46N R12W S1',), box(0, 0, 10, 10))])
+    trs, stats = trs_incremental.refresh_trs(parcels, sections, store)
+    assert stats['added'] == 1 and list(trs.values()) == [['T46N R12W S1']]
+
+
+def test_filter_limits_the_results_but_not_the_store(tmp_path, write_layer):
+    sections = _sections(tmp_path, write_layer)
+    parcels = write_layer(str(tmp_path / 'parcels.gpkg' / 'parcels'), PARCEL_FIELDS, [(('A', 1.0), box(1, 1, 2, 2)), (('B', 4.0), box(8, 1, 12, 2))])
+    store = str(tmp_path / 'trs.sqlite')
+    trs_incremental.refresh_trs(parcels, sections, store)
+    trs, stats = trs_incremental.refresh_trs(parcels, sections, store, where='Shape_Area < 2')
+    assert list(trs.values()) == [['T45N R12W S1']]
+    assert stats == {'added': 0, 'modified': 0, 'unchanged': 2, 'removed': 0}
+    assert trs_incremental.refresh_trs(parcels, sections, store)[1]['unchanged'] == 2     # the parcel left out by the filter is still stored
+
+
+def test_duplicate_parcel_ids_are_refused(tmp_path, write_layer):
+    sections = _sections(tmp_path, write_layer)
+    parcels = write_layer(str(tmp_path / 'parcels.gpkg' / 'parcels'), PARCEL_FIELDS, [(('A', 1.0), box(1, 1, 2, 2)), (('A', 1.0), box(21, 1, 22, 2)),
+                                                                                      ((None, 1.0), box(3, 3, 4, 4)), ((None, 1.0), box(5, 5, 6, 6))])
+    store = str(tmp_path / 'trs.sqlite')
+    with pytest.raises(ValueError, match="'PIN' gives the same ID to more than one parcel \\(1 IDs"):
+        trs_incremental.refresh_trs(parcels, sections, store)
+    with trs_incremental.FingerprintStore(store) as fingerprints:
+        assert fingerprints.load() == {}
+
+
+def test_stores_of_joined_strings_are_still_read(tmp_path):
+    store = str(tmp_path / 'trs.sqlite')
+    with trs_incremental.FingerprintStore(store) as fingerprints:
+        fingerprints.conn.execute("INSERT INTO parcels (parcel_id, raw_hash, geom_hash, trs) VALUES ('A', 'r', 'g', 'T45N R12W S1, T45N R12W S2')")
+        fingerprints.save([('B', 'r', 'g', ['T45N R12W S1']), ('C', 'r', 'g', None)], [], '20261018')
+        assert fingerprints.load() == {'A': ('r', 'g', ['T45N R12W S1', 'T45N R12W S2']), 'B': ('r', 'g', ['T45N R12W S1']), 'C': ('r', 'g', None)}
+
+
+def test_geometry_hash_ignores_ring_start_and_tiny_differences():
+    a = box(0, 0, 1, 1)
+    assert trs_incremental.geometry_hash(a) == trs_incremental.geometry_hash(Polygon([(1, 1), (0, 1), (0, 0), (1, 0)]))
+    assert trs_incremental.geometry_hash(a) == trs_incremental.geometry_hash(box(0, 0, 1.0000001, 1))
+    assert trs_incremental.geometry_hash(a) != trs_incremental.geometry_hash(box(0, 0, 1.01, 1))
@@ -0,0 +1,56 @@
+import os
+import pytest
+import shapely
+from shapely.geometry import box
+import trs_parallel
+import trs_spatial_join
+from trs_spatial_join import SectionIndex
+
+
+# Two sections in township T45N R12W and one in T46N R12W, to the north
+SECTIONS = [('T45N R12W S1', box(0, 0, 10, 10)), ('T45N R12W S2', box(10, 0, 20, 10)), ('T46N R12W S1', box(0, 10, 10, 20))]
+
+
+def _layers(tmp_path, write_layer, extra=()):
+    sections = write_layer(str(tmp_path / 'pls.gpkg' / 'sections'), [('TRS_SEARCH', 'TEXT', 50)], [((label,), geom) for label, geom in SECTIONS])
+    rows = [(('A',), box(1, 1, 2, 2)), (('B',), box(8, 8, 12, 12)), (('C',), box(5, 9, 6, 15)),
+            (('D',), box(21, 21, 22, 22))] + list(extra)                                     # D is outside every tile envelope
+    parcels = write_layer(str(tmp_path / 'parcels.gpkg' / 'parcels'), [('PIN', 'TEXT', 20)], rows)
+    return parcels, sections
+
+
+def test_tiles_and_their_envelopes():
+    index = SectionIndex([geom for _, geom in SECTIONS], [label for label, _ in SECTIONS])
+    section_tiles, envelopes = trs_parallel.tile_envelopes(index)
+    assert section_tiles == ['T45N R12W', 'T45N R12W', 'T46N R12W']
+    assert envelopes == {'T45N R12W': (0.0, 0.0, 20.0, 10.0), 'T46N R12W': (0.0, 10.0, 10.0, 20.0)}
+    points = shapely.points([(5, 5), (5, 15), (15, 15)])
+    assert trs_parallel.assign_tiles(points, index, section_tiles, envelopes) == ['T45N R12W', 'T46N R12W', trs_parallel.OUTSIDE]
+
+
+def test_parallel_join_matches_the_bulk_join_and_resumes(tmp_path, write_layer):
+    parcels, sections = _layers(tmp_path, write_layer)
+    checkpoints = str(tmp_path / 'checkpoints')
+    expected = trs_spatial_join.join_trs(parcels, sections)
+    assert trs_parallel.join_trs_parallel(parcels, sections, checkpoints, workers=1) == expected
+
+    # A rerun only processes the tiles without a checkpoint
+    os.remove(trs_parallel.checkpoint_path(checkpoints, 'T46N R12W'))
+    assert trs_parallel.join_trs_parallel(parcels, sections, checkpoints, workers=1) == expected
+
+
+def test_checkpoints_of_other_parcels_are_refused(tmp_path, write_layer):
+    parcels, sections = _layers(tmp_path, write_layer)
+    checkpoints = str(tmp_path / 'checkpoints')
+    trs_parallel.join_trs_parallel(parcels, sections, checkpoints, workers=1)
+    _layers(tmp_path, write_layer, [(('E',), box(3, 3, 4, 4))])
+    with pytest.raises(ValueError, match='different run'):
+        trs_parallel.join_trs_parallel(parcels, sections, checkpoints, workers=1)
+
+
+def test_checkpoints_round_trip(tmp_path):
+    path = trs_parallel.checkpoint_path(str(tmp_path), 'T45N R12W')
+    assert os.path.basename(path) == 'tile_T45N_R12W.json'
+    trs_parallel.write_checkpoint(path, {7: 'T45N R12W S1'})
+    assert trs_parallel.read_checkpoint(path) == {7: 'T45N R12W S1'}
+    assert not os.path.exists(path + '.tmp')
@@ -0,0 +1,64 @@
+from shapely.geometry import box
+import layer_io
+import trs_spatial_join
+from trs_spatial_join import SectionIndex
+
+
+SECTION_FIELDS = [('TRS_SEARCH', 'TEXT', 50)]
+PARCEL_FIELDS = [('PIN', 'TEXT', 20), ('Shape_Area', 'DOUBLE', None)]
+
+
+def _sections(tmp_path, write_layer):
+    rows = [(('T45N R12W S{}'.format(n),), box(x, 0, x + 10, 10)) for n, x in ((1, 0), (2, 10), (3, 20))]
+    return write_layer(str(tmp_path / 'pls.gpkg' / 'sections'), SECTION_FIELDS, rows)
+
+
+def _parcels(tmp_path, write_layer):
+    rows = [(('A', 1.0), box(1, 1, 2, 2)),                                                  # inside section 1
+            (('B', 4.0), box(8, 1, 12, 2)),                                                 # across sections 1 and 2
+            (('C', 100.0), box(5, 5, 25, 6)),                                               # across all three sections
+            (('D', 1.0), box(40, 1, 41, 2))]                                                # outside every section
+    return write_layer(str(tmp_path / 'parcels.gpkg' / 'parcels'), PARCEL_FIELDS, rows)
+
+
+def test_section_index_lookup_keeps_read_order():
+    index = SectionIndex([box(10, 0, 20, 10), box(0, 0, 10, 10)], ['T45N R12W S2', 'T45N R12W S1'])
+    assert index.lookup(box(8, 1, 12, 2)) == ['T45N R12W S2', 'T45N R12W S1']
+    assert index.lookup(box(40, 1, 41, 2)) == []
+    assert len(index) == 2
+
+
+def test_join_trs_matches_every_intersecting_section(tmp_path, write_layer):
+    sections, parcels = _sections(tmp_path, write_layer), _parcels(tmp_path, write_layer)
+    trs = trs_spatial_join.join_trs(parcels, sections)
+    assert sorted(trs.values()) == [['T45N R12W S1'], ['T45N R12W S1', 'T45N R12W S2'], ['T45N R12W S1', 'T45N R12W S2', 'T45N R12W S3']]
+    assert sorted(trs_spatial_join.join_trs(parcels, sections, where='Shape_Area < 50').values()) == [['T45N R12W S1'], ['T45N R12W S1', 'T45N R12W S2']]
+
+
+def test_iter_parcel_sections_skips_empty_and_unmatched_geometries():
+    index = SectionIndex([box(0, 0, 10, 10)], ['T45N R12W S1'])
+    parcels = [(1, box(1, 1, 2, 2)), (2, None), (3, box(0, 0, 0, 0).buffer(0)), (4, box(20, 20, 21, 21))]
+    assert list(trs_spatial_join.iter_parcel_sections(parcels, index)) == [(1, ['T45N R12W S1'])]
+
+
+def test_relation_table_keeps_each_section_as_read(tmp_path):
+    target = str(tmp_path / 'out.gpkg' / 'Parcel_TRS')
+    trs_by_oid = {2: ['T45N R12W S2', 'T45N R12W S1'], 1: ['Lot 3, Govt Lot']}                # a label with a comma in it stays whole
+    assert trs_spatial_join.write_relation_table(target, trs_by_oid) == 3
+    assert [values for _, values, _ in layer_io.read_features(target, ['PARCEL_OID', 'TRS_SEARCH'], geometry=False)] == \
+        [(1, 'Lot 3, Govt Lot'), (2, 'T45N R12W S2'), (2, 'T45N R12W S1')]
+
+
+def test_format_trs_field():
+    trs_by_oid = {1: ['T45N R12W S{}'.format(s) for s in range(1, 7)], 2: ['T45N R12W S1']}
+    assert trs_spatial_join.format_trs_field(trs_by_oid, 100) == {1: ', '.join(trs_by_oid[1]), 2: 'T45N R12W S1'}
+    assert trs_spatial_join.format_trs_field(trs_by_oid, 100, compact=True) == {1: 'T45N R12W S1-6', 2: 'T45N R12W S1'}
+    assert trs_spatial_join.format_trs_field(trs_by_oid, 31)[1] == 'T45N R12W S1, T45N R12W S2...'
+
+
+def test_command_line_copies_the_parcels_over_the_threshold(tmp_path, write_layer):
+    sections, parcels = _sections(tmp_path, write_layer), _parcels(tmp_path, write_layer)
+    target = str(tmp_path / 'out.gpkg' / 'parcels_trs')
+    trs_spatial_join.main([parcels, sections, target, '--threshold', '2'])
+    rows = dict((values[0], values[1]) for _, values, _ in layer_io.read_features(target, ['PIN', 'TRS'], geometry=False))
+    assert rows == {'B': 'T45N R12W S1, T45N R12W S2', 'C': 'T45N R12W S1, T45N R12W S2, T45N R12W S3'}
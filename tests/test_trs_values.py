@@ -0,0 +1,37 @@
+import trs_values
+
+
+def test_parse_trs_tolerates_padding_spacing_and_missing_directions():
+    expected = (45, 'N', 12, 'W', 6)
+    for value in ('T45N R12W S6', 'T045N R12W S06', 'T45 R12 S6', 'T45NR12WS6', 't45n r12w sec 6'):
+        assert trs_values.parse_trs(value) == expected
+    assert trs_values.parse_trs('T45N R12W') == (45, 'N', 12, 'W', None)
+    assert trs_values.parse_trs('not a section') is None
+    assert trs_values.parse_trs(None) is None
+
+
+def test_township_range():
+    assert trs_values.township_range('T045N R012E S06') == 'T45N R12E'
+    assert trs_values.township_range('') is None
+
+
+def test_split_trs():
+    assert trs_values.split_trs('T45N R12W S1, T45N R12W S2') == ['T45N R12W S1', 'T45N R12W S2']
+    assert trs_values.split_trs(None) == []
+
+
+def test_compact_trs_collapses_runs_and_keeps_township_order():
+    values = ['T46N R12W S31'] + ['T45N R12W S{}'.format(s) for s in (6, 1, 2, 3, 4, 5, 8)] + ['T46N R12W S31']
+    assert trs_values.compact_trs(values) == 'T46N R12W S31; T45N R12W S1-6,8'
+
+
+def test_compact_trs_keeps_unreadable_values():
+    assert trs_values.compact_trs(['T45N R12W S1', 'unknown', 'T45N R12W S3']) == 'T45N R12W S1,3; unknown'
+    assert trs_values.compact_trs([]) == ''
+
+
+def test_fit_field_cuts_at_whole_entries():
+    value = 'T45N R12W S1, T45N R12W S2, T45N R12W S3'
+    assert trs_values.fit_field(value, 100) == value
+    assert trs_values.fit_field(value, 30) == 'T45N R12W S1...'
+    assert trs_values.fit_field(None, 10) is None
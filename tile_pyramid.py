@@ -0,0 +1,357 @@
+#-------------------------------------------------------------------------------
+# Name:        tile_pyramid.py (Display Tile Pyramid and Levels of Detail)
+# Purpose:      The dissolved layers ('PrivateParcelSelection_Dissolved_<date>',
+#                   'FirstNations_Parcels_Dissolved<date>', and
+#                   'ForestStandSelection_Reduced_Dissolved_<date>' with its 'Groupings')
+#                   are only used for display and labeling, but at statewide zoom every
+#                   vertex of their multipart polygons is drawn, so the map documents render
+#                   and export to PDF slowly. This module publishes them for display:
+#
+#                   1. write_levels_of_detail() writes simplified copies of each layer
+#                       (e.g. 'PrivateParcelSelection_LOD1' to '_LOD3') with
+#                       shapely.simplify(preserve_topology=True), which keeps every polygon
+#                       part valid and its holes inside it. Each copy suits the scales at which
+#                       its tolerance is smaller than a pixel, so a map document can switch
+#                       between them with scale ranges.
+#                   2. build_pyramid() cuts the layers into a pyramid of vector tiles
+#                       (Mapbox Vector Tiles in an MBTiles file, in Web Mercator), one tile
+#                       layer per dataset with its fields as properties (so 'Groupings' can
+#                       be labeled). Each zoom level is simplified to half a pixel and snapped
+#                       to the 4096-unit tile grid.
+#                   3. The tiles are rendered in worker processes, each of which loads the
+#                       layers once (as in lakeshore_engine.py).
+#                   4. Each polygon part is fingerprinted with its field values; the
+#                       fingerprints and envelopes of the last build are kept in the MBTiles
+#                       file, so a new build only renders the tiles that lie under parts that
+#                       were added, changed, or removed. A layer whose parts are unchanged is
+#                       not simplified again either.
+#
+#                   The layers are projected to Web Mercator with pyproj, and the tiles are
+#                   encoded with mapbox_vector_tile; pass 'epsg' when the layers do not
+#                   record their coordinate system.
+#
+#                   tile_pyramid.publish({'PrivateParcelSelection': Private_Dissolved, 'ForestStandSelection': Forest_Dissolved},
+#                                        r"*folderpath*\MapLayers.mbtiles", lod_workspace=GDB)
+#
+# Author:      draleigh
+#
+# Created:     18 October 2026
+# Copyright:   (c) draleigh 2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+
+
+# Import modules and packages
+import os,sys,json,math,gzip,time,sqlite3,argparse                                          # list of required modules
+from concurrent.futures import as_completed                                                 # collect the tiles as the workers finish them
+import numpy as np                                                                          # vectorized projection and tile ranges
+import shapely                                                                              # vectorized simplification and clipping
+from shapely import STRtree                                                                 # the spatial index over the polygon parts in each worker
+import pyproj                                                                               # projection to Web Mercator
+from mapbox_vector_tile import encoder as mvt_encoder                                       # Mapbox Vector Tile encoding
+import layer_io                                                                             # shared feature reading/writing helpers
+import process_pool                                                                         # worker processes for the tiles
+import trs_incremental                                                                      # geometry hashing
+
+
+PYRAMID_VERSION = 2                                                                         # raise when a change here changes the tiles, so the next build renders every tile
+MIN_ZOOM = 5                                                                                # the statewide view
+MAX_ZOOM = 14                                                                               # clients draw closer zooms from these tiles
+EXTENT = 4096                                                                               # tile grid units per tile side
+BUFFER = 64                                                                                 # tile units drawn beyond each edge, so outlines meet across tiles
+SIMPLIFY_PIXELS = 0.5                                                                       # simplification tolerance of each zoom level, in pixels of a 256-pixel tile
+LOD_TOLERANCES = (10.0, 50.0, 250.0)                                                        # tolerances (in layer units, e.g. meters) of the levels of detail; a tolerance t is under a pixel at scales smaller than about 1:(t / 0.000265)
+TILES_PER_TASK = 64                                                                         # tiles sent to a worker at a time
+
+EARTH_RADIUS = 6378137.0                                                                    # Web Mercator sphere
+ORIGIN = math.pi * EARTH_RADIUS                                                             # Web Mercator half-width of the world
+ENCODE_OPTIONS = {'extents': EXTENT, 'y_coord_down': True,                                  # the parts are already in tile units, rows counted from the top
+                  'on_invalid_geometry': mvt_encoder.on_invalid_geometry_make_valid}        # rings that rounding to the grid made invalid are repaired (or dropped if they collapsed)
+
+
+# Return the pyproj coordinate system of a dataset, from its WKT or an arcpy SpatialReference, or None
+def coordinate_system(sr):
+    if sr is None or sr == '':
+        return None
+    if not isinstance(sr, str):
+        return pyproj.CRS.from_epsg(sr.factoryCode) if sr.factoryCode else pyproj.CRS.from_wkt(sr.exportToString())
+    return pyproj.CRS.from_wkt(sr)
+
+
+# Return a function that projects an (n, 2) array of coordinates in the coordinate system 'crs'
+#   (an EPSG code or a pyproj CRS) to Web Mercator
+def mercator_projection(crs):
+    if crs is None:
+        raise ValueError('The layers do not record their coordinate system; pass its EPSG code.')
+    transformer = pyproj.Transformer.from_crs(crs, 3857, always_xy=True)
+    return lambda coords: np.column_stack(transformer.transform(coords[:, 0], coords[:, 1]))
+
+
+# Return the Web Mercator bounds (xmin, ymin, xmax, ymax) of tile (x, y) at zoom 'z' (rows counted from the top, as in XYZ tiles)
+def tile_bounds(z, x, y):
+    size = 2 * ORIGIN / 2 ** z
+    return (-ORIGIN + x * size, ORIGIN - (y + 1) * size, -ORIGIN + (x + 1) * size, ORIGIN - y * size)
+
+
+# Return the set of (x, y) tiles at zoom 'z' that an (n, 4) array of Web Mercator envelopes touch, including each tile's buffer
+def tiles_covering(envelopes, z):
+    envelopes = np.asarray(envelopes, dtype=float).reshape(-1, 4)
+    size = 2 * ORIGIN / 2 ** z
+    margin = size * BUFFER / EXTENT
+    last = 2 ** z - 1
+    x0 = np.clip(np.floor((envelopes[:, 0] - margin + ORIGIN) / size), 0, last).astype(np.int64)
+    x1 = np.clip(np.floor((envelopes[:, 2] + margin + ORIGIN) / size), 0, last).astype(np.int64)
+    y0 = np.clip(np.floor((ORIGIN - envelopes[:, 3] - margin) / size), 0, last).astype(np.int64)
+    y1 = np.clip(np.floor((ORIGIN - envelopes[:, 1] + margin) / size), 0, last).astype(np.int64)
+    single = (x0 == x1) & (y0 == y1)
+    tiles = set(zip(x0[single].tolist(), y0[single].tolist()))                              # most envelopes fall in a single tile
+    for a, b, c, d in zip(x0[~single].tolist(), x1[~single].tolist(), y0[~single].tolist(), y1[~single].tolist()):
+        tiles.update((x, y) for x in range(a, b + 1) for y in range(c, d + 1))
+    return tiles
+
+
+# Encode a tile from {layer name: [(feature ID, {field: value}, [polygons in tile units])]}; returns None for an empty tile
+#   Coordinates are rounded to the grid and rings wound as the specification requires by the encoder;
+#   features whose rings all collapse are left out, along with layers left with no features.
+def encode_tile(layers):
+    tile = mvt_encoder.VectorTile(default_options=ENCODE_OPTIONS)
+    for name, features in layers.items():
+        tile.add_layer(name, [{'id': fid, 'properties': dict((field, value) for field, value in properties.items() if value is not None),
+                               'geometry': polygons[0] if len(polygons) == 1 else shapely.multipolygons(polygons)} for fid, properties, polygons in features])
+    for i in reversed(range(len(tile.tile.layers))):
+        if not len(tile.tile.layers[i].features):
+            del tile.tile.layers[i]
+    return tile.tile.SerializeToString() if len(tile.tile.layers) else None
+
+
+_worker = None                                                                              # the polygon parts in each worker process
+
+
+# Worker initializer: load the projected polygon parts once per worker
+#   'features' is [(layer name, {field: value})]; 'part_feature' gives the feature of each part.
+def _load_parts(features, part_feature, part_wkb):
+    global _worker
+    parts = shapely.from_wkb(part_wkb)
+    _worker = {'features': features, 'part_feature': np.asarray(part_feature), 'parts': parts, 'tree': STRtree(parts),
+               'bounds': shapely.bounds(parts), 'zoom': None, 'simplified': {}}
+
+
+# Worker: render tiles [(z, x, y)] (all at one zoom); returns [(z, x, y, gzipped tile or None)]
+def _render_tiles(tiles):
+    w = _worker
+    rendered = []
+    for z, x, y in tiles:
+        if w['zoom'] != z:
+            w['zoom'], w['simplified'] = z, {}                                              # simplified parts are reused by the neighbouring tiles of a task
+        xmin, ymin, xmax, ymax = tile_bounds(z, x, y)
+        size = xmax - xmin
+        tolerance = size / 256 * SIMPLIFY_PIXELS
+        margin = size * BUFFER / EXTENT
+        candidates = np.sort(w['tree'].query(shapely.box(xmin - margin, ymin - margin, xmax + margin, ymax + margin)))   # in layer and feature order, so a tile is the same however it was found
+        bounds = w['bounds'][candidates]
+        candidates = candidates[(bounds[:, 2] - bounds[:, 0] >= tolerance) | (bounds[:, 3] - bounds[:, 1] >= tolerance)]   # parts smaller than a pixel are not drawn
+        missing = [i for i in candidates.tolist() if i not in w['simplified']]
+        if missing:
+            for i, geom in zip(missing, shapely.simplify(w['parts'][missing], tolerance, preserve_topology=True)):
+                w['simplified'][i] = geom
+        geometries = np.array([w['simplified'][i] for i in candidates.tolist()], dtype=object)
+        clipped = shapely.clip_by_rect(geometries, xmin - margin, ymin - margin, xmax + margin, ymax + margin)
+        scale = EXTENT / size
+        clipped = shapely.transform(clipped, lambda c: (c - [xmin, ymax]) * [scale, -scale])  # to tile units, rows counted from the top
+        polygons, index = shapely.get_parts(clipped, return_index=True)
+        keep = (shapely.get_type_id(polygons) == 3) & ~shapely.is_empty(polygons)            # clipping can leave lines and points on the tile edge
+        layers = {}
+        for fid, polygon in zip(w['part_feature'][candidates[index[keep]]].tolist(), polygons[keep]):
+            name, properties = w['features'][fid]
+            features = layers.setdefault(name, {})
+            if fid not in features:
+                features[fid] = (fid + 1, properties, [])
+            features[fid][2].append(polygon)                                                # the parts of a feature are one multipolygon in the tile
+        data = encode_tile(dict((name, list(features.values())) for name, features in layers.items()))
+        rendered.append((z, x, y, gzip.compress(data) if data is not None else None))
+    return rendered
+
+
+# MBTiles file of vector tiles, with the fingerprints of the polygon parts of the last build
+class TileStore(object):
+
+    def __init__(self, path):
+        self.path = path                                                                    # location of the MBTiles file
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS metadata (name TEXT, value TEXT)')
+        self.conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS metadata_name ON metadata (name)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB)')
+        self.conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS tile_index ON tiles (zoom_level, tile_column, tile_row)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS source_parts (layer TEXT, part_hash TEXT, xmin REAL, ymin REAL, xmax REAL, ymax REAL)')
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def metadata(self, name):
+        row = self.conn.execute('SELECT value FROM metadata WHERE name = ?', (name,)).fetchone()
+        return row[0] if row else None
+
+    def set_metadata(self, values):
+        self.conn.executemany('INSERT OR REPLACE INTO metadata (name, value) VALUES (?, ?)', [(name, str(value)) for name, value in values.items()])
+        self.conn.commit()
+
+    # Return {part hash: (layer, envelope)} of the last build
+    def parts(self):
+        return dict((row[1], (row[0], row[2:])) for row in self.conn.execute('SELECT layer, part_hash, xmin, ymin, xmax, ymax FROM source_parts'))
+
+    def set_parts(self, parts):
+        self.conn.execute('DELETE FROM source_parts')
+        self.conn.executemany('INSERT INTO source_parts VALUES (?, ?, ?, ?, ?, ?)', [(layer, part_hash) + tuple(envelope) for part_hash, (layer, envelope) in parts.items()])
+        self.conn.commit()
+
+    # Forget the last build, so that every tile is rendered again
+    def clear(self):
+        self.conn.execute('DELETE FROM tiles')
+        self.conn.execute('DELETE FROM source_parts')
+        self.conn.execute("DELETE FROM metadata WHERE name = 'pyramid_settings'")
+        self.conn.commit()
+
+    # Write rendered tiles [(z, x, y, data or None)]; tiles that are now empty are deleted
+    def write(self, tiles):
+        for z, x, y, data in tiles:
+            row = 2 ** z - 1 - y                                                            # MBTiles counts rows from the bottom
+            if data is None:
+                self.conn.execute('DELETE FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?', (z, x, row))
+            else:
+                self.conn.execute('INSERT OR REPLACE INTO tiles VALUES (?, ?, ?, ?)', (z, x, row, data))
+        self.conn.commit()
+
+    def count(self):
+        return self.conn.execute('SELECT COUNT(*) FROM tiles').fetchone()[0]
+
+
+# Read the layers {layer name: path}, project them to Web Mercator, and split them into polygon parts
+#   Returns (features [(layer name, {field: value})], part feature indices, projected parts, {part hash: (layer, envelope)}, {layer: {field: 'String' or 'Number'}}).
+def read_parts(sources, epsg=None):
+    features, part_feature, parts, hashes, fields = [], [], [], {}, {}
+    for name, path in sources.items():
+        field_types = layer_io.list_fields(path)
+        names = [field for field, _, _ in field_types]
+        fields[name] = dict((field, 'Number' if field_type in ('SHORT', 'LONG', 'FLOAT', 'DOUBLE') else 'String') for field, field_type, _ in field_types)
+        project = mercator_projection(epsg if epsg is not None else coordinate_system(layer_io.spatial_reference(path)))
+        for _, values, geom in layer_io.read_features(path, names):
+            if geom is None or geom.is_empty:
+                continue
+            properties = dict((field, value if isinstance(value, (bool, int, float, str)) or value is None else str(value)) for field, value in zip(names, values))
+            pieces = shapely.get_parts(geom)
+            projected = shapely.transform(pieces, project)
+            envelopes = shapely.bounds(projected)
+            for piece, envelope in zip(pieces, envelopes.tolist()):
+                part_hash = trs_incremental.geometry_hash(piece) + '|' + name + '|' + repr(values)   # a part with new field values counts as changed
+                hashes[part_hash] = (name, tuple(envelope))
+            part_feature.extend([len(features)] * len(pieces))
+            parts.extend(projected)
+            features.append((name, properties))
+    return features, part_feature, parts, hashes, fields
+
+
+# Build (or bring up to date) the tile pyramid of the layers {layer name: path} in the MBTiles file 'target'
+#   Returns (number of tiles rendered, set of layer names whose parts changed since the last build).
+def build_pyramid(sources, target, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM, workers=None, epsg=None):
+    start_time = time.time()
+    features, part_feature, parts, hashes, fields = read_parts(sources, epsg)
+    settings = json.dumps({'version': PYRAMID_VERSION, 'zoom': [min_zoom, max_zoom], 'extent': EXTENT, 'buffer': BUFFER, 'simplify': SIMPLIFY_PIXELS,
+                           'layers': fields}, sort_keys=True)
+    with TileStore(target) as store:
+        if store.metadata('pyramid_settings') != settings:                                  # a first build, or new zooms, layers, or fields
+            store.clear()
+        previous = store.parts()
+        changed = [hashes[h] for h in set(hashes) - set(previous)] + [previous[h] for h in set(previous) - set(hashes)]
+        envelopes = np.array([envelope for _, envelope in changed], dtype=float).reshape(-1, 4)
+        tasks = []
+        for z in range(min_zoom, max_zoom + 1):
+            tiles = sorted(tiles_covering(envelopes, z))                                    # only the tiles under parts that changed
+            tasks += [[(z, x, y) for x, y in tiles[i:i + TILES_PER_TASK]] for i in range(0, len(tiles), TILES_PER_TASK)]
+        rendered = 0
+        if tasks:
+            part_wkb = shapely.to_wkb(np.asarray(parts, dtype=object)) if parts else []
+            with process_pool.worker_pool(workers, _load_parts, (features, part_feature, part_wkb)) as pool:
+                futures = [pool.submit(_render_tiles, task) for task in tasks]
+                for future in as_completed(futures):
+                    tiles = future.result()                                                 # re-raises any worker error
+                    store.write(tiles)
+                    rendered += len(tiles)
+        store.set_parts(hashes)
+        store.set_metadata(_metadata(target, parts, fields, min_zoom, max_zoom))
+        store.set_metadata({'pyramid_settings': settings})                                  # last, so an interrupted build is finished by the next one
+        print('{} tiles rendered for {} changed parts; {} tiles in {} (%s seconds).'.format(rendered, len(changed), store.count(), target) % round(time.time() - start_time))
+    return rendered, set(layer for layer, _ in changed)
+
+
+# MBTiles metadata (version 1.3): bounds and center in degrees, and the fields of each tile layer
+def _metadata(target, parts, fields, min_zoom, max_zoom):
+    if parts:
+        bounds = shapely.bounds(np.asarray(parts, dtype=object))
+        xmin, ymin, xmax, ymax = bounds[:, 0].min(), bounds[:, 1].min(), bounds[:, 2].max(), bounds[:, 3].max()
+    else:
+        xmin = ymin = xmax = ymax = 0.0
+    west, south, east, north = pyproj.Transformer.from_crs(3857, 4326, always_xy=True).transform_bounds(xmin, ymin, xmax, ymax)
+    vector_layers = [{'id': name, 'minzoom': min_zoom, 'maxzoom': max_zoom, 'fields': layer_fields} for name, layer_fields in fields.items()]
+    return {'name': os.path.splitext(os.path.basename(target))[0], 'format': 'pbf', 'type': 'overlay', 'version': PYRAMID_VERSION,
+            'minzoom': min_zoom, 'maxzoom': max_zoom, 'bounds': '{:.6f},{:.6f},{:.6f},{:.6f}'.format(west, south, east, north),
+            'center': '{:.6f},{:.6f},{}'.format((west + east) / 2, (south + north) / 2, min_zoom), 'json': json.dumps({'vector_layers': vector_layers})}
+
+
+# Write the levels of detail of 'source' as '<base>_LOD1', '<base>_LOD2', ... (coarser as the number rises), replacing any earlier copies
+#   The source is read once and each level is simplified from it. Each polygon part is simplified on its own
+#   (as in the tiles): checking every ring of a statewide multipolygon against the others is many times slower,
+#   and parts that come to overlap by less than the tolerance do not show when drawn.
+def write_levels_of_detail(source, base, tolerances=LOD_TOLERANCES):
+    fields = layer_io.list_fields(source)
+    features = [(values, geom) for _, values, geom in layer_io.read_features(source, [name for name, _, _ in fields]) if geom is not None and not geom.is_empty]
+    parts, index = shapely.get_parts(np.array([geom for _, geom in features], dtype=object), return_index=True)
+    targets = []
+    for level, tolerance in enumerate(tolerances, 1):
+        target = '{}_LOD{}'.format(base, level)
+        simplified = shapely.multipolygons(shapely.simplify(parts, tolerance, preserve_topology=True), indices=index)
+        layer_io.delete_dataset(target)
+        layer_io.write_features(target, fields, ((values, geom) for (values, _), geom in zip(features, simplified)), template=source)
+        targets.append(target)
+    return targets
+
+
+# Publish the layers {layer name: path} for display: the tile pyramid in 'target', and the levels of detail
+#   as '<lod_workspace>\<layer name>_LOD<n>' (None writes none). The levels of detail keep the same names
+#   from run to run, so map documents need not be repointed, and are only rewritten when their layer changed.
+def publish(sources, target, lod_workspace=None, tolerances=LOD_TOLERANCES, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM, workers=None, epsg=None):
+    rendered, changed = build_pyramid(sources, target, min_zoom, max_zoom, workers, epsg)
+    if lod_workspace is not None:
+        for name, path in sources.items():
+            base = os.path.join(lod_workspace, name)
+            if name in changed or not all(layer_io.dataset_exists('{}_LOD{}'.format(base, level)) for level in range(1, len(tolerances) + 1)):
+                write_levels_of_detail(path, base, tolerances)
+                print('Levels of detail of {} written to {}_LOD1 to _LOD{}.'.format(name, base, len(tolerances)))
+    return rendered, changed
+
+
+# Command line entry point: publish dissolved layers, e.g. "python tile_pyramid.py MapLayers.mbtiles private=<path> forest=<path>"
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Publish dissolved layers as a vector tile pyramid (MBTiles) and levels of detail.')
+    parser.add_argument('target', help='MBTiles file')
+    parser.add_argument('layers', nargs='+', help='layers as <tile layer name>=<dataset>')
+    parser.add_argument('--lod-workspace', default=None, help='workspace for the levels of detail (default: none written)')
+    parser.add_argument('--min-zoom', type=int, default=MIN_ZOOM)
+    parser.add_argument('--max-zoom', type=int, default=MAX_ZOOM)
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: every core)')
+    parser.add_argument('--epsg', type=int, default=None, help='EPSG code of the layers, if they do not record their coordinate system')
+    args = parser.parse_args(argv)
+    sources = dict(layer.split('=', 1) for layer in args.layers)
+    publish(sources, args.target, args.lod_workspace, LOD_TOLERANCES, args.min_zoom, args.max_zoom, args.workers, args.epsg)
+    return 0
+
+
+if __name__ == '__main__':
+    import tile_pyramid                                                                     # run from the module rather than '__main__', so the tile processes can find _render_tiles
+    sys.exit(tile_pyramid.main())
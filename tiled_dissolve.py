@@ -0,0 +1,189 @@
+#-------------------------------------------------------------------------------
+# Name:        tiled_dissolve.py (Parallel Tiled Dissolve)
+# Purpose:      This module replaces the single, monolithic Dissolve_management
+#                   (MULTI_PART, DISSOLVE_LINES) at the end of each product with a dissolve
+#                   that is spread across worker processes:
+#
+#                   1. The input polygons are partitioned into a grid of square tiles by the
+#                       center of their envelopes (polygons are not cut). The polygons are
+#                       streamed to a spill file as they are read, then written out to one
+#                       spill file per tile and group key, so the parent process never holds
+#                       the input geometries.
+#                   2. Each tile and group key (e.g. each 'Groupings' value) is unioned in a
+#                       worker process with a cascaded (tree) union, reading its own spill file.
+#                   3. The tiles are stitched together along their shared edges by merging
+#                       neighbouring 2x2 blocks of tiles, level by level, until a single
+#                       geometry is left for each group key. Every merge is also done in a
+#                       worker, so no worker ever holds more than four tiles' results.
+#
+#                   Because a union does not depend on the order in which polygons are
+#                   combined, the result is the same multipart geometry per group key that
+#                   Dissolve_management produces.
+#
+# Author:      draleigh
+#
+# Created:     18 October 2026
+# Copyright:   (c) draleigh 2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+
+
+# Import modules and packages
+import os,math,pickle,shutil,struct,tempfile,time                                           # list of required modules
+from concurrent.futures import as_completed                                                 # collect results as the workers finish them
+import shapely                                                                              # union and geometry functions
+from shapely import wkb                                                                     # geometries are passed to the workers as WKB
+from shapely.geometry import MultiPolygon                                                   # the dissolved output is always multipart
+import layer_io                                                                             # shared feature reading/writing helpers
+import process_pool                                                                         # worker processes for the tiles
+
+
+FEATURES_PER_TILE = 5000                                                                    # target number of polygons in each tile
+SPILL_BUFFER = 64 * 1024 ** 2                                                               # bytes of tile WKB held in memory before they are appended to the tile spill files
+
+
+# Worker: union a list of WKB polygons (one tile and group key, or a block of already-dissolved tiles)
+def _union(geometries):
+    return wkb.dumps(shapely.union_all([wkb.loads(g) for g in geometries]))               # union_all is a cascaded union
+
+
+# Worker: union the WKB polygons in one tile's spill file
+def _union_file(path):
+    return _union(list(_read_spill(path)))
+
+
+# Append WKB polygons to a tile spill file, each preceded by its length
+def _append_spill(path, geometries):
+    with open(path, 'ab') as f:
+        for geometry in geometries:
+            f.write(struct.pack('<I', len(geometry)))
+            f.write(geometry)
+
+
+# Yield the WKB polygons of a tile spill file
+def _read_spill(path):
+    with open(path, 'rb') as f:
+        while True:
+            header = f.read(4)
+            if not header:
+                return
+            yield f.read(struct.unpack('<I', header)[0])
+
+
+# Make the dissolved geometry multipart (as with 'MULTI_PART'), dropping any lines/points left from touching corners
+def _as_multipolygon(geometry):
+    polygons = [part for part in shapely.get_parts(geometry) if part.geom_type == 'Polygon' and not part.is_empty]
+    return MultiPolygon(polygons)
+
+
+# Choose a grid of square tiles over the extent so that each tile holds about FEATURES_PER_TILE polygons
+def _grid(extent, count, features_per_tile):
+    xmin, ymin, xmax, ymax = extent
+    tiles = max(1, int(math.ceil(count / float(features_per_tile))))
+    size = max(math.sqrt(max(xmax - xmin, 1e-9) * max(ymax - ymin, 1e-9) / tiles), 1e-9)
+    return xmin, ymin, size
+
+
+# Dissolve polygons by the values of 'dissolve_fields' (an empty list dissolves everything into one feature)
+#   Returns {tuple of group values: MultiPolygon}.
+#   The polygons are spilled to files in 'spill_dir' (see dissolve_features()).
+def dissolve(source, dissolve_fields=(), where=None, workers=None, features_per_tile=FEATURES_PER_TILE, spill_dir=None):
+    features = ((values, geom) for _, values, geom in layer_io.read_features(source, list(dissolve_fields), where))
+    return dissolve_features(features, workers, features_per_tile, spill_dir)
+
+
+# Dissolve polygons given as (tuple of group values, shapely geometry), e.g. a generator over a cursor
+#   The polygons are streamed to spill files in a folder made under 'spill_dir' (the scripts' 'Scratch_Folder', created if
+#   needed; None uses the system temporary folder), which is deleted afterwards.
+#   Returns {tuple of group values: MultiPolygon}.
+def dissolve_features(features, workers=None, features_per_tile=FEATURES_PER_TILE, spill_dir=None):
+    start_time = time.time()
+    if spill_dir:
+        os.makedirs(spill_dir, exist_ok=True)
+    folder = tempfile.mkdtemp(prefix='tiled_dissolve_', dir=spill_dir)
+    try:
+        tiles = _partition(features, folder, features_per_tile)                             # {(group, column, row): spill file}
+        if not tiles:
+            return {}
+        print('Dissolving {} groups across {} tiles (%s seconds to partition).'.format(
+            len(set(key[0] for key in tiles)), len(tiles)) % round(time.time() - start_time))
+
+        with process_pool.worker_pool(workers) as pool:
+            # 2. Union each tile and group key
+            futures = dict((pool.submit(_union_file, path), key) for key, path in tiles.items())
+            tiles = {}
+            for future in as_completed(futures):
+                tiles[futures[future]] = future.result()
+
+            # 3. Stitch neighbouring 2x2 blocks of tiles together until one geometry is left per group key
+            while any(column != 0 or row != 0 for _, column, row in tiles):
+                blocks = {}
+                for (values, column, row), geometry in tiles.items():
+                    blocks.setdefault((values, column // 2, row // 2), []).append(geometry)
+                futures = {}
+                tiles = {}
+                for key, geometries in blocks.items():
+                    if len(geometries) == 1:                                                # nothing to stitch in this block
+                        tiles[key] = geometries[0]
+                    else:
+                        futures[pool.submit(_union, geometries)] = key
+                for future in as_completed(futures):
+                    tiles[futures[future]] = future.result()
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+    print('Dissolve complete (%s seconds).' % round(time.time() - start_time))
+    return dict((values, _as_multipolygon(wkb.loads(geometry))) for (values, _, _), geometry in tiles.items())
+
+
+# 1. Partition the polygons into tile spill files by the center of each envelope
+#   The grid depends on the extent and number of the polygons, so they are first streamed to a single
+#   spill file while the extent is measured, then copied from it into one spill file per tile and group key.
+#   Returns {(group values, column, row): spill file}.
+def _partition(features, folder, features_per_tile):
+    staged = os.path.join(folder, 'staged.pickle')
+    count, extent = 0, [float('inf'), float('inf'), float('-inf'), float('-inf')]
+    with open(staged, 'wb') as f:
+        for values, geom in features:
+            if geom is None or geom.is_empty:
+                continue
+            xmin, ymin, xmax, ymax = geom.bounds
+            extent = [min(extent[0], xmin), min(extent[1], ymin), max(extent[2], xmax), max(extent[3], ymax)]
+            pickle.dump((values, (xmin + xmax) / 2.0, (ymin + ymax) / 2.0, wkb.dumps(geom)), f, pickle.HIGHEST_PROTOCOL)
+            count += 1
+    if not count:
+        return {}
+    x0, y0, size = _grid(extent, count, features_per_tile)
+    tiles, buffers, buffered = {}, {}, 0                                                    # tile spill files, and the WKB not yet appended to them
+    with open(staged, 'rb') as f:
+        for _ in range(count):
+            values, x, y, geometry = pickle.load(f)
+            key = (values, int((x - x0) // size), int((y - y0) // size))
+            if key not in tiles:
+                tiles[key] = os.path.join(folder, 'tile_{}.wkb'.format(len(tiles)))
+            buffers.setdefault(key, []).append(geometry)
+            buffered += len(geometry)
+            if buffered >= SPILL_BUFFER:
+                for key, geometries in buffers.items():
+                    _append_spill(tiles[key], geometries)
+                buffers, buffered = {}, 0
+    for key, geometries in buffers.items():
+        _append_spill(tiles[key], geometries)
+    os.remove(staged)
+    return tiles
+
+
+# Dissolve 'source' into a new feature class at 'target' (the equivalent of
+#   Dissolve_management(source, target, dissolve_fields, "", 'MULTI_PART', 'DISSOLVE_LINES'))
+#   Returns the number of dissolved features written.
+def dissolve_to(source, target, dissolve_fields=(), where=None, workers=None, spill_dir=None):
+    dissolve_fields = list(dissolve_fields)
+    dissolved = dissolve(source, dissolve_fields, where, workers, spill_dir=spill_dir)
+    return write_dissolved(target, layer_io.field_definitions(source, dissolve_fields), dissolved, source)
+
+
+# Write {tuple of group values: MultiPolygon} to a new feature class, in order of the group values
+#   'fields' is a list of (name, type, length) for the group values; 'template' supplies the coordinate system.
+def write_dissolved(target, fields, dissolved, template=None):
+    rows = ((values, dissolved[values]) for values in sorted(dissolved, key=lambda values: tuple('' if v is None else str(v) for v in values)))
+    return layer_io.write_features(target, fields, rows, 'MultiPolygon', template=template)
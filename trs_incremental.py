@@ -0,0 +1,181 @@
+#-------------------------------------------------------------------------------
+# Name:        trs_incremental.py (Incremental TRS Refresh)
+# Purpose:      This module keeps a fingerprint store of every parcel's geometry hash
+#                   and TRS result (keyed by a parcel ID field such as 'PIN') so that a
+#                   new parcel release only needs the PLS intersection for parcels that
+#                   were added or whose geometry changed. Every other parcel receives its
+#                   cached TRS sections.
+#
+#                   Each parcel's geometry is first compared by a hash of its raw WKB bytes,
+#                   which needs no geometry parsing. Only parcels whose bytes changed are
+#                   parsed and compared by their normalized geometry hash, so an unchanged
+#                   release costs one cursor pass rather than a full geometry pass.
+#
+#                   The store is a SQLite file that persists between dated runs. A hash
+#                   of the PLS sections is also stored; if the sections change, every
+#                   parcel is recomputed.
+#
+# Author:      draleigh
+#
+# Created:     18 October 2026
+# Copyright:   (c) draleigh 2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+
+
+# Import modules and packages
+import json,sqlite3,hashlib,time                                                                 # list of required modules
+import shapely                                                                              # used to normalize geometries before hashing
+from shapely import wkb                                                                     # parse the parcels whose raw bytes changed
+import layer_io                                                                             # shared feature reading/writing helpers
+import trs_spatial_join                                                                     # the section index and bulk join
+import trs_values                                                                           # reading TRS strings of stores written before section lists were kept
+
+
+# Coordinates are snapped to this grid (in map units) before hashing, so that tiny
+#   floating point differences between exports do not count as geometry changes
+HASH_PRECISION = 0.001
+
+
+# Hash a geometry so that identical shapes (regardless of ring start point or vertex order) match
+def geometry_hash(geometry):
+    snapped = shapely.normalize(shapely.set_precision(geometry, HASH_PRECISION))
+    return hashlib.sha1(shapely.to_wkb(snapped)).hexdigest()
+
+
+# Hash a geometry's WKB bytes exactly as read (no parsing), to find the parcels whose geometry may have changed
+def raw_hash(geometry_wkb):
+    return hashlib.sha1(geometry_wkb).hexdigest()
+
+
+# Persistent store of {parcel ID: (raw WKB hash, geometry hash, [TRS_SEARCH, ...])}
+class FingerprintStore(object):
+
+    def __init__(self, path):
+        self.path = path                                                                    # location of the SQLite file
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS parcels (parcel_id TEXT PRIMARY KEY, geom_hash TEXT, trs TEXT, run_date TEXT, raw_hash TEXT)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+        if 'raw_hash' not in [row[1] for row in self.conn.execute('PRAGMA table_info(parcels)')]:   # stores written before raw hashes were kept
+            self.conn.execute('ALTER TABLE parcels ADD COLUMN raw_hash TEXT')
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def get_meta(self, key):
+        row = self.conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        self.conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+
+    # Return {parcel ID: (raw WKB hash, geometry hash, [TRS_SEARCH, ...] or None)} for every stored parcel
+    def load(self):
+        return {pid: (raw, geom_hash, _sections(trs)) for pid, raw, geom_hash, trs in self.conn.execute('SELECT parcel_id, raw_hash, geom_hash, trs FROM parcels')}
+
+    # Drop every stored parcel (used when the PLS sections change)
+    def clear(self):
+        self.conn.execute('DELETE FROM parcels')
+
+    # Save new or changed parcels [(parcel ID, raw WKB hash, geometry hash, [TRS_SEARCH, ...] or None)] and drop removed parcel IDs
+    def save(self, rows, removed, run_date):
+        self.conn.executemany('INSERT OR REPLACE INTO parcels (parcel_id, raw_hash, geom_hash, trs, run_date) VALUES (?, ?, ?, ?, ?)',
+                              ((pid, raw, geom_hash, json.dumps(trs) if trs is not None else None, run_date) for pid, raw, geom_hash, trs in rows))
+        self.conn.executemany('DELETE FROM parcels WHERE parcel_id = ?', ((pid,) for pid in removed))
+        self.conn.commit()
+
+
+# Read the stored sections of a parcel: a JSON list, or the joined TRS string of a store written before lists were kept
+def _sections(text):
+    if text is None:
+        return None
+    return json.loads(text) if text.startswith('[') else trs_values.split_trs(text)
+
+
+# Hash the PLS sections (labels and geometries, in read order) so that a new PLS release invalidates the store
+def sections_hash(index):
+    digest = hashlib.sha1()
+    for label, geometry in zip(index.labels, index.geometries):
+        digest.update(label.encode('utf-8'))
+        digest.update(geometry_hash(geometry).encode('ascii'))
+    return digest.hexdigest()
+
+
+# Refresh TRS values incrementally
+#   Returns ({OBJECTID: [TRS_SEARCH, ...]}, {'added': n, 'modified': n, 'unchanged': n, 'removed': n}).
+#   Every parcel in 'parcels' is fingerprinted, so the store always describes the whole release; 'where' (e.g.
+#   "Shape_Area < 11700000") only limits the parcels whose TRS sections are returned. 'parcels' should be the
+#   dataset itself rather than a layer with a selection, since the parcels a selection leaves out would count as removed.
+#   Parcels with an empty parcel ID cannot be matched between releases, so they are always recomputed.
+#   Raises ValueError if a parcel ID is used by more than one parcel, since their stored results would overwrite each other.
+def refresh_trs(parcels, sections, store_path, id_field='PIN', where=None, trs_field='TRS_SEARCH', run_date=None):
+    start_time = time.time()
+    run_date = run_date or time.strftime('%Y%m%d')
+    index = trs_spatial_join.SectionIndex.from_layer(sections, trs_field)                   # read the PLS sections once
+    with FingerprintStore(store_path) as store:
+        current_sections = sections_hash(index)
+        if store.get_meta('sections_hash') != current_sections:                              # a new PLS release invalidates every cached result
+            store.clear()
+        stored = store.load()
+        trs_by_oid, changed, rows, seen, duplicates = {}, [], [], set(), set()
+        stats = {'added': 0, 'modified': 0, 'unchanged': 0, 'removed': 0}
+        for oid, values, geometry_wkb in layer_io.read_wkb(parcels, [id_field]):             # diff every parcel against the store
+            if geometry_wkb is None:
+                continue
+            pid = values[0]
+            pid = str(pid) if pid not in (None, '') else None
+            if pid in seen:
+                duplicates.add(pid)
+                continue
+            raw = raw_hash(geometry_wkb)
+            cached = stored.get(pid) if pid is not None else None
+            if cached is not None and cached[0] == raw:                                     # identical bytes: copy the cached TRS sections without parsing
+                seen.add(pid)
+                stats['unchanged'] += 1
+                if cached[2] is not None:
+                    trs_by_oid[oid] = cached[2]
+                continue
+            geom = wkb.loads(geometry_wkb)                                                  # the bytes changed (or were never stored): compare the shapes
+            if geom.is_empty:
+                continue
+            if pid is not None:
+                seen.add(pid)
+            geom_hash = geometry_hash(geom)
+            if cached is not None and cached[1] == geom_hash:                               # same shape written differently: keep the TRS sections, store the new bytes' hash
+                stats['unchanged'] += 1
+                if cached[2] is not None:
+                    trs_by_oid[oid] = cached[2]
+                rows.append((pid, raw, geom_hash, cached[2]))
+                continue
+            stats['modified' if cached is not None else 'added'] += 1
+            changed.append((oid, pid, raw, geom_hash, geom))
+        if duplicates:
+            raise ValueError("'{}' gives the same ID to more than one parcel ({} IDs, e.g. {}); choose a field that identifies each parcel.".format(
+                id_field, len(duplicates), ', '.join(sorted(duplicates)[:5])))
+        print('{added} added, {modified} modified, {unchanged} unchanged parcels.'.format(**stats))
+
+        geometry_by_oid = dict((oid, geom) for oid, _, _, _, geom in changed)                 # run the PLS intersection only for changed parcels
+        found = dict(trs_spatial_join.iter_parcel_sections(geometry_by_oid.items(), index))
+        for oid, pid, raw, geom_hash, _ in changed:
+            trs = found.get(oid)
+            if trs is not None:
+                trs_by_oid[oid] = trs
+            if pid is not None:
+                rows.append((pid, raw, geom_hash, trs))
+        removed = [pid for pid in stored if pid not in seen]
+        stats['removed'] = len(removed)
+        store.save(rows, removed, run_date)
+        store.set_meta('sections_hash', current_sections)
+        store.conn.commit()
+    if where is not None:                                                                   # return only the parcels that match 'where'
+        matching = set(oid for oid, _, _ in layer_io.read_features(parcels, where=where, geometry=False))
+        trs_by_oid = dict((oid, trs) for oid, trs in trs_by_oid.items() if oid in matching)
+    print('Incremental TRS refresh complete (%s seconds).' % round(time.time() - start_time))
+    return trs_by_oid, stats
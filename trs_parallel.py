@@ -0,0 +1,197 @@
+#-------------------------------------------------------------------------------
+# Name:        trs_parallel.py (Parallel TRS Join by Township/Range Tiles)
+# Purpose:      This module spreads the bulk TRS join (trs_spatial_join.py) across
+#                   worker processes so that statewide runs use every core, and
+#                   checkpoints each finished tile so that a failed run can resume.
+#
+#                   1. The PLS sections are grouped into tiles by the township/range
+#                       part of their 'TRS_SEARCH' values (e.g. 'T45N R12W'), and each
+#                       tile is described by the envelope of its sections.
+#                   2. Only the tile names and envelopes are sent to the workers. Each
+#                       worker loads the PLS sections once, reads the parcels whose
+#                       envelopes overlap its tile, and keeps the parcels whose point
+#                       inside the parcel falls in one of the tile's sections (a point in
+#                       no section goes to the first tile, by name, whose envelope holds
+#                       it; parcels outside every tile envelope form an '_outside' tile).
+#                   3. Every worker joins its parcels against the whole section index, so
+#                       parcels crossing tile edges still pick up the neighbouring sections.
+#                   4. A finished tile is written to a JSON checkpoint file; a rerun with
+#                       the same checkpoint folder (and the same parcel and section
+#                       editions) only processes the missing tiles.
+#
+# Author:      draleigh
+#
+# Created:     18 October 2026
+# Copyright:   (c) draleigh 2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+
+
+# Import modules and packages
+import os,json,re,time                                                                      # list of required modules
+from concurrent.futures import as_completed                                                 # collect the tiles as the workers finish them
+import numpy as np                                                                          # used for the tile envelopes
+import shapely                                                                              # vectorized geometry functions
+from shapely import wkb                                                                     # parse the parcels read as WKB
+import layer_io                                                                             # shared feature reading/writing helpers
+import process_pool                                                                         # worker processes for the tiles
+import trs_spatial_join                                                                     # the section index and bulk join
+import trs_values                                                                           # township/range parsing
+
+
+CHECKPOINT_VERSION = 2                                                                      # part of the manifest; raise it when the checkpoint contents change
+UNTILED = '_untiled'                                                                        # tile name for PLS sections without a township/range
+OUTSIDE = '_outside'                                                                        # tile name for parcels outside every tile envelope
+MANIFEST_NAME = 'manifest.json'                                                             # file in the checkpoint folder that describes the run
+
+
+# Turn a tile name into a safe checkpoint file name ('T45N R12W' -> 'tile_T45N_R12W.json')
+def checkpoint_path(checkpoint_dir, tile):
+    return os.path.join(checkpoint_dir, 'tile_{}.json'.format(re.sub(r'[^A-Za-z0-9]+', '_', tile).strip('_')))
+
+
+# Read a finished tile back from its checkpoint ({OBJECTID: [TRS_SEARCH, ...]})
+def read_checkpoint(path):
+    with open(path) as f:
+        return {int(oid): trs for oid, trs in json.load(f).items()}
+
+
+# Write a finished tile to its checkpoint; the temporary file keeps half-written tiles from counting as done
+def write_checkpoint(path, trs_by_oid):
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump({str(oid): trs for oid, trs in trs_by_oid.items()}, f)
+    os.replace(temp_path, path)
+
+
+# Confirm that a checkpoint folder belongs to this run (or start a new one)
+#   Resuming with different inputs would mix results, so a mismatch raises an error.
+def _check_manifest(checkpoint_dir, manifest):
+    if not os.path.isdir(checkpoint_dir):
+        os.makedirs(checkpoint_dir)
+    path = os.path.join(checkpoint_dir, MANIFEST_NAME)
+    if os.path.exists(path):
+        with open(path) as f:
+            existing = json.load(f)
+        if existing != manifest:
+            raise ValueError('Checkpoint folder {} was written for a different run ({}); use a new folder.'.format(checkpoint_dir, existing))
+    else:
+        with open(path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+
+# Tile envelopes of the PLS sections
+#   Returns ([tile of every section, in read order], {tile: (xmin, ymin, xmax, ymax)}).
+def tile_envelopes(index):
+    section_tiles = [trs_values.township_range(label) or UNTILED for label in index.labels]
+    bounds = shapely.bounds(np.asarray(index.geometries, dtype=object)).reshape(-1, 4)
+    envelopes = {}
+    for tile, box in zip(section_tiles, bounds):
+        known = envelopes.get(tile)
+        envelopes[tile] = box if known is None else np.concatenate([np.minimum(known[:2], box[:2]), np.maximum(known[2:], box[2:])])
+    return section_tiles, dict((tile, tuple(float(v) for v in box)) for tile, box in envelopes.items())
+
+
+# Return the tile of each point: the tile of the first section (in read order) that contains it, the first tile
+#   (by name) whose envelope holds it if no section does, or OUTSIDE if it is outside every tile envelope
+def assign_tiles(points, index, section_tiles, envelopes):
+    names = sorted(envelopes)
+    boxes = np.asarray([envelopes[name] for name in names], dtype=float).reshape(-1, 4)
+    owners = index.query(points)
+    tiles = []
+    for i, point in enumerate(points):
+        sections = owners.get(i)
+        if sections:
+            tiles.append(section_tiles[sections[0]])                                         # points on a shared edge go to the first section read
+            continue
+        x, y = point.x, point.y
+        inside = np.flatnonzero((boxes[:, 0] <= x) & (boxes[:, 2] >= x) & (boxes[:, 1] <= y) & (boxes[:, 3] >= y))
+        tiles.append(names[inside[0]] if len(inside) else OUTSIDE)
+    return tiles
+
+
+_worker_sections = None                                                                     # (section index, tile of every section, tile envelopes) in each worker process
+
+
+# Worker initializer: read the PLS sections once per worker
+def _load_sections(sections, trs_field):
+    global _worker_sections
+    index = trs_spatial_join.SectionIndex.from_layer(sections, trs_field)
+    _worker_sections = (index,) + tile_envelopes(index)
+
+
+# Yield (OBJECTID, geometry) for the parcels that could belong to 'tile'
+#   A tile reads the parcels whose envelopes overlap its own; OUTSIDE reads the envelopes of every parcel
+#   and parses only those not wholly inside a tile envelope.
+def _tile_candidates(tile, parcels, where, envelopes):
+    if tile != OUTSIDE:
+        for oid, _, geom in layer_io.read_features(parcels, where=where, bbox=envelopes[tile]):
+            if geom is not None and not geom.is_empty:
+                yield oid, geom
+        return
+    oids, bounds = layer_io.read_envelopes(parcels, where)
+    boxes = np.asarray(list(envelopes.values()), dtype=float).reshape(-1, 4)
+    inside = np.zeros(len(oids), dtype=bool)
+    for box in boxes:                                                                        # a parcel wholly inside a tile envelope has its point in that tile
+        inside |= (bounds[:, 0] >= box[0]) & (bounds[:, 1] >= box[1]) & (bounds[:, 2] <= box[2]) & (bounds[:, 3] <= box[3])
+    candidates = set(oids[~inside].tolist())
+    if not candidates:
+        return
+    for oid, _, geometry_wkb in layer_io.read_wkb(parcels, where=where):
+        if oid in candidates:
+            yield oid, wkb.loads(geometry_wkb)
+
+
+# Worker: read one tile's parcels, join them against the sections, and checkpoint the result
+def _join_tile(tile, parcels, where, path):
+    index, section_tiles, envelopes = _worker_sections
+    owned, oids, geometries = [], [], []
+
+    def keep(oids, geometries):
+        if oids:
+            points = shapely.point_on_surface(np.asarray(geometries, dtype=object))          # a point that is always inside the parcel
+            owned.extend((oid, geom) for oid, geom, owner in zip(oids, geometries, assign_tiles(points, index, section_tiles, envelopes)) if owner == tile)
+
+    for oid, geom in _tile_candidates(tile, parcels, where, envelopes):
+        oids.append(oid)
+        geometries.append(geom)
+        if len(oids) >= trs_spatial_join.CHUNK_SIZE:
+            keep(oids, geometries)
+            oids, geometries = [], []
+    keep(oids, geometries)
+    trs_by_oid = dict(trs_spatial_join.iter_parcel_sections(owned, index))
+    write_checkpoint(path, trs_by_oid)
+    return tile, len(owned)
+
+
+# Run the TRS join across worker processes, one township/range tile at a time
+#   Returns {OBJECTID: [TRS_SEARCH, ...]} for every parcel, merging finished tiles from 'checkpoint_dir'.
+#   'parcels' and 'sections' must be dataset paths rather than layer names, since each worker opens them itself.
+def join_trs_parallel(parcels, sections, checkpoint_dir, where=None, trs_field='TRS_SEARCH', workers=None):
+    start_time = time.time()
+    _check_manifest(checkpoint_dir, {'version': CHECKPOINT_VERSION, 'parcels': str(parcels), 'sections': str(sections), 'where': where, 'trs_field': trs_field,
+                                     'parcels_edition': layer_io.dataset_edition(parcels), 'sections_edition': layer_io.dataset_edition(sections),
+                                     'parcel_count': layer_io.count_features(parcels, where)})   # a changed layer (or one whose edition cannot be told but whose count changed) is a different run
+    index = trs_spatial_join.SectionIndex.from_layer(sections, trs_field)                   # read the PLS sections for the tile envelopes
+    section_tiles, envelopes = tile_envelopes(index)
+    sizes = dict((tile, section_tiles.count(tile)) for tile in envelopes)
+    tiles = sorted(envelopes) + [OUTSIDE]
+    pending = [tile for tile in tiles if not os.path.exists(checkpoint_path(checkpoint_dir, tile))]
+    print('{} tiles, {} already checkpointed, {} to process (%s seconds to prepare).'.format(
+        len(tiles), len(tiles) - len(pending), len(pending)) % round(time.time() - start_time))
+
+    if pending:
+        pending.sort(key=lambda tile: -sizes.get(tile, 0))                                   # start the tiles with the most sections first to balance the workers
+        with process_pool.worker_pool(workers, _load_sections, (sections, trs_field)) as pool:
+            futures = [pool.submit(_join_tile, tile, parcels, where, checkpoint_path(checkpoint_dir, tile)) for tile in pending]
+            done = 0
+            for future in as_completed(futures):
+                tile, count = future.result()                                                # re-raises any worker error
+                done += 1
+                print('Tile {} finished ({} parcels, {} of {} tiles).'.format(tile, count, done, len(pending)))
+
+    trs_by_oid = {}
+    for tile in tiles:                                                                       # merge every tile's checkpoint
+        trs_by_oid.update(read_checkpoint(checkpoint_path(checkpoint_dir, tile)))
+    print('Parallel TRS join complete (%s seconds).' % round(time.time() - start_time))
+    return trs_by_oid
@@ -0,0 +1,171 @@
+#-------------------------------------------------------------------------------
+# Name:        trs_spatial_join.py (Bulk TRS Join Between Parcels and PLS Sections)
+# Purpose:      This module replaces the per-parcel select loop in
+#                   append_TRS_values_to_parcel_data.py with a bulk spatial join.
+#
+#                   The PLS section polygons are read once into an STR-tree spatial
+#                   index, the parcels are streamed through that index in chunks, and
+#                   a dictionary of {OBJECTID: [TRS_SEARCH, TRS_SEARCH, ...]} is built
+#                   in a single pass. The lists are joined into the 'TRS' field, which is
+#                   then written back with a single UpdateCursor (or GeoPackage update) pass.
+#
+#                   It can be run from the command line against GeoPackage/shapefile
+#                   copies of the data so that it can be benchmarked without arcpy:
+#                       python trs_spatial_join.py Parcels.gpkg/Input_Parcel_Data Parcels.gpkg/pls_sect_data Parcels.gpkg/Parcel_Data_Addition
+#
+# Author:      draleigh
+#
+# Created:     18 October 2026
+# Copyright:   (c) draleigh 2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+
+
+# Import modules and packages
+import argparse,time                                                                        # list of required modules
+import numpy as np                                                                          # used to group the index query results
+from shapely import STRtree                                                                 # the spatial index over the PLS sections
+import layer_io                                                                             # shared feature reading/writing helpers
+import trs_values                                                                           # TRS string helpers
+
+
+# Number of parcels handed to the spatial index at a time (keeps memory bounded on statewide runs)
+CHUNK_SIZE = 20000
+
+
+# Hold the PLS section polygons in an STR-tree along with their 'TRS_SEARCH' values
+#   Sections keep the order in which they were read, so the TRS strings list sections in
+#   the same order that the original SearchCursor over 'PLS_Section' produced them.
+class SectionIndex(object):
+
+    def __init__(self, geometries, labels):
+        self.geometries = np.asarray(geometries, dtype=object)                              # section polygons
+        self.labels = list(labels)                                                          # 'TRS_SEARCH' value of each section
+        self.tree = STRtree(self.geometries)                                                # build the index once
+
+    @classmethod
+    def from_layer(cls, sections, trs_field='TRS_SEARCH', where=None):
+        geometries, labels = [], []
+        for oid, values, geom in layer_io.read_features(sections, [trs_field], where):     # one read of the PLS feature class
+            if geom is None or geom.is_empty:
+                continue
+            geometries.append(geom)
+            labels.append(str(values[0]))                                                   # match the str() conversion of the original loop
+        return cls(geometries, labels)
+
+    def __len__(self):
+        return len(self.labels)
+
+    # Return {position in 'geometries': [section positions that intersect]} for a list of parcel geometries
+    def query(self, geometries):
+        pairs = self.tree.query(np.asarray(geometries, dtype=object), predicate='intersects')   # bulk query for the whole chunk
+        matches = {}
+        if pairs.shape[1] == 0:
+            return matches
+        order = np.lexsort((pairs[1], pairs[0]))                                            # sort by parcel, then by section read order
+        parcels, sections = pairs[0][order], pairs[1][order]
+        breaks = np.flatnonzero(np.diff(parcels)) + 1                                       # boundaries between parcels
+        for part_parcels, part_sections in zip(np.split(parcels, breaks), np.split(sections, breaks)):
+            matches[int(part_parcels[0])] = part_sections.tolist()
+        return matches
+
+    # Return the list of 'TRS_SEARCH' values that intersect a single geometry
+    def lookup(self, geometry):
+        return [self.labels[i] for i in self.query([geometry]).get(0, [])]
+
+
+# Stream (OBJECTID, geometry) pairs through the section index and yield (OBJECTID, [TRS_SEARCH, ...])
+#   Parcels that do not intersect any section are skipped.
+def iter_parcel_sections(parcels, index):
+    oids, geometries = [], []
+    for oid, geom in parcels:
+        if geom is None or geom.is_empty:
+            continue
+        oids.append(oid)
+        geometries.append(geom)
+        if len(oids) >= CHUNK_SIZE:                                                         # query the index one chunk at a time
+            for item in _query_chunk(oids, geometries, index):
+                yield item
+            oids, geometries = [], []
+    for item in _query_chunk(oids, geometries, index):
+        yield item
+
+
+def _query_chunk(oids, geometries, index):
+    if not oids:
+        return
+    for position, sections in sorted(index.query(geometries).items()):
+        yield oids[position], [index.labels[i] for i in sections]
+
+
+# Build {OBJECTID: [TRS_SEARCH, TRS_SEARCH, ...]} for every parcel in one pass
+#   'parcels' and 'sections' can be feature classes, feature layers, or open-format datasets.
+#   'where' filters the parcels (for example "Shape_Area < 11700000").
+#   The section lists are joined into text only for the 'TRS' field (see format_trs_field()).
+def join_trs(parcels, sections, where=None, trs_field='TRS_SEARCH', index=None):
+    if index is None:
+        index = SectionIndex.from_layer(sections, trs_field)                                # read the PLS sections once
+    stream = ((oid, geom) for oid, _, geom in layer_io.read_features(parcels, where=where))
+    return dict(iter_parcel_sections(stream, index))
+
+
+# Write TRS strings (see format_trs_field()) back to the parcel layer in a single update pass
+def write_trs(parcels, trs_by_oid, field='TRS'):
+    return layer_io.update_field(parcels, field, trs_by_oid)
+
+
+# Write a many-to-many 'Parcel_TRS' table with one row per parcel/section pair
+#   'trs_by_oid' is {OBJECTID: [TRS_SEARCH, ...]} as returned by any of the join modes.
+#   The 'PARCEL_OID' field joins back to the OBJECTID of the parcel feature class.
+def write_relation_table(target, trs_by_oid, parcel_field='PARCEL_OID', trs_field='TRS_SEARCH', trs_length=50):
+    rows = ((oid, value) for oid in sorted(trs_by_oid) for value in trs_by_oid[oid])
+    return layer_io.write_table(target, [(parcel_field, 'LONG', None), (trs_field, 'TEXT', trs_length)], rows)
+
+
+# Join the section lists into TRS strings for a text field of 'length' characters ('T45N R12W S1, T45N R12W S2')
+#   With 'compact' set, consecutive sections are collapsed into ranges (e.g. 'T45N R12W S1-6') first.
+def format_trs_field(trs_by_oid, length, compact=False):
+    formatted = {}
+    for oid, labels in trs_by_oid.items():
+        value = trs_values.compact_trs(labels) if compact else ', '.join(labels)            # join() keeps string building linear
+        formatted[oid] = trs_values.fit_field(value, length)
+    return formatted
+
+
+# Command line entry point for running the bulk join without arcpy
+#   Copies the parcels over the size threshold to 'target' with a populated 'TRS' field.
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Append PLS TRS values to parcels with a bulk spatial join.')
+    parser.add_argument('parcels', help='input parcel dataset (e.g. Parcels.gpkg/Input_Parcel_Data)')
+    parser.add_argument('sections', help='PLS section dataset with a TRS_SEARCH field')
+    parser.add_argument('target', help='output dataset that will receive the TRS field')
+    parser.add_argument('--threshold', type=float, default=8093.71, help='minimum Shape_Area of parcels to copy')
+    parser.add_argument('--max-area', type=float, default=None, help='maximum Shape_Area of parcels to receive TRS values (default: no limit)')
+    parser.add_argument('--field-length', type=int, default=2000, help='length of the TRS text field')
+    parser.add_argument('--compact', action='store_true', help='collapse consecutive sections into ranges (e.g. T45N R12W S1-6)')
+    parser.add_argument('--relation-table', help='also write a Parcel_TRS table with one row per parcel/section pair')
+    args = parser.parse_args(argv)
+
+    start_time = time.time()                                                                # define the start time of the run
+    index = SectionIndex.from_layer(args.sections)
+    print('Indexed {} PLS sections (%s seconds).'.format(len(index)) % round(time.time() - start_time))
+    block_start = time.time()
+    where = 'Shape_Area >= {}'.format(args.threshold)
+    if args.max_area is not None:
+        where += ' AND Shape_Area < {}'.format(args.max_area)
+    trs_by_oid = join_trs(args.parcels, args.sections, where, index=index)
+    print('Joined TRS values to {} parcels (%s seconds).'.format(len(trs_by_oid)) % round(time.time() - block_start))
+    if args.relation_table:
+        block_start = time.time()
+        rows = write_relation_table(args.relation_table, trs_by_oid)
+        print('Wrote {} parcel/section rows to {} (%s seconds).'.format(rows, args.relation_table) % round(time.time() - block_start))
+    block_start = time.time()
+    copied = layer_io.copy_with_field(args.parcels, args.target, ('TRS', 'TEXT', args.field_length),
+                                      format_trs_field(trs_by_oid, args.field_length, args.compact),
+                                      'Shape_Area >= {}'.format(args.threshold))
+    print('Wrote {} parcels to {} (%s seconds).'.format(copied, args.target) % round(time.time() - block_start))
+    print('This run took %s seconds...' % round(time.time() - start_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+#-------------------------------------------------------------------------------
+# Name:        trs_values.py (Township, Range, and Section Value Helpers)
+# Purpose:      Helpers for reading the 'TRS_SEARCH' values of the Public Land Survey
+#                   (PLS) section polygons, e.g. 'T45N R12W S6'.
+#
+#                   The township/range part of each value is used to group parcels
+#                   into tiles for parallel processing.
+#
+# Author:      draleigh
+#
+# Created:     18 October 2026
+# Copyright:   (c) draleigh 2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+
+
+# Import modules and packages
+import re                                                                                   # regular expressions for parsing TRS values
+
+
+# Pattern for 'TRS_SEARCH' values; tolerant of zero padding, missing spaces, and missing directions
+#   'T45N R12W S6', 'T045N R12W S06', 'T45 R12 S6', 'T45NR12WS6' all parse to the same values
+TRS_PATTERN = re.compile(r'T\s*0*(\d+)\s*([NS]?)\s*R\s*0*(\d+)\s*([EW]?)\s*(?:S(?:EC)?\s*0*(\d+))?', re.IGNORECASE)
+
+
+# Split a 'TRS_SEARCH' value into (township, township direction, range, range direction, section)
+#   Returns None if the value cannot be read. The section is None if the value has no section.
+def parse_trs(value):
+    if value is None:
+        return None
+    match = TRS_PATTERN.search(str(value))
+    if match is None:
+        return None
+    township, t_dir, rng, r_dir, section = match.groups()
+    return (int(township), (t_dir or 'N').upper(), int(rng), (r_dir or 'W').upper(),
+            int(section) if section else None)
+
+
+# Return the township/range part of a 'TRS_SEARCH' value (e.g. 'T45N R12W'), or None if it cannot be read
+def township_range(value):
+    parsed = parse_trs(value)
+    if parsed is None:
+        return None
+    return 'T{}{} R{}{}'.format(*parsed[:4])
+
+
+# Split a joined TRS string ("T45N R12W S1, T45N R12W S2") back into its 'TRS_SEARCH' values
+def split_trs(value):
+    if not value:
+        return []
+    return [part for part in value.split(', ') if part]
+
+
+# Collapse a list of 'TRS_SEARCH' values into a compact string
+#   Consecutive sections within the same township/range become ranges:
+#   ['T45N R12W S1', ..., 'T45N R12W S6', 'T45N R12W S8', 'T46N R12W S31'] -> 'T45N R12W S1-6,8; T46N R12W S31'
+#   Townships/ranges keep the order in which they first appear; values that cannot be read are kept as they are.
+def compact_trs(values):
+    groups, order = {}, []
+    for value in values:
+        parsed = parse_trs(value)
+        key = township_range(value) if (parsed and parsed[4] is not None) else str(value)
+        if key not in groups:
+            groups[key] = set()
+            order.append(key)
+        if parsed and parsed[4] is not None:
+            groups[key].add(parsed[4])
+    parts = []
+    for key in order:
+        sections = sorted(groups[key])
+        if not sections:                                                                    # a value that could not be read
+            parts.append(key)
+            continue
+        runs, start, previous = [], sections[0], sections[0]
+        for section in sections[1:] + [None]:                                               # the trailing None closes the last run
+            if section is not None and section == previous + 1:
+                previous = section
+                continue
+            runs.append(str(start) if start == previous else '{}-{}'.format(start, previous))
+            start = previous = section
+        parts.append('{} S{}'.format(key, ','.join(runs)))
+    return '; '.join(parts)
+
+
+# Fit a TRS string into a text field of 'length' characters
+#   Values that are too long are cut at the last whole entry and end with '...'
+#   (the Parcel_TRS relation table always holds the complete list).
+def fit_field(value, length):
+    if value is None or len(value) <= length:
+        return value
+    cut = value[:length - 3]
+    for separator in ('; ', ', '):
+        if separator in cut:
+            cut = cut[:cut.rindex(separator)]
+            break
+    return cut + '...'